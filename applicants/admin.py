@@ -8,6 +8,7 @@ admin.site.register(AllowedStatusTransition)
 admin.site.register(Applicant)
 _register(ApplicantHistoryHead, ['applicant', 'node'])
 _register(ApplicantHistoryNode, ['previous', 'applicant'])
+_register(ApplicantStatusEvent, ['applicant', 'from_status', 'to_status', 'author'])
 admin.site.register(ApplicantSource)
 _register(ApplicantWorkerLink, ['applicant', 'worker'])
 admin.site.register(Status)
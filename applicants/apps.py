@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApplicantsConfig(AppConfig):
     name = 'applicants'
     verbose_name = 'База соискателей'
+
+    def ready(self):
+        # signal receivers outside of the models module
+        from applicants import statistics  # noqa: F401
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from applicants.models import (
+    ApplicantStatusEvent,
+    rebuild_status_events,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recreates applicant status change events from the history snapshots'
+
+    def handle(self, *args, **options):
+        rebuild_status_events()
+        print('Status events: {}'.format(ApplicantStatusEvent.objects.count()))
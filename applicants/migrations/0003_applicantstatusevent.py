@@ -0,0 +1,45 @@
+# Generated by Django 3.2.12 on 2023-02-13 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_status_events(apps, schema_editor):
+    from applicants.models import rebuild_status_events
+    rebuild_status_events(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('applicants', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicantStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Временная метка')),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='applicants.applicant', verbose_name='Соискатель')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('from_status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='applicants.status', verbose_name='Из статуса')),
+                ('to_status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='applicants.status', verbose_name='В статус')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса соискателя',
+                'verbose_name_plural': 'Смены статусов соискателей',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='applicantstatusevent',
+            index=models.Index(fields=['timestamp', 'to_status'], name='applicantstatusevent_ts_idx'),
+        ),
+        migrations.RunPython(
+            fill_status_events,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -2,6 +2,7 @@
 
 import datetime
 
+from django.apps import apps as global_apps
 from django.contrib.auth.models import User
 from django.db import models
 from django.db import transaction
@@ -254,6 +255,18 @@ class Applicant(models.Model):
 
         if update_last_edited:
             self.last_edited = timezone.now()
+
+        created = self.pk is None
+        if save_history and not created:
+            previous_status_id = Applicant.objects.filter(
+                pk=self.pk
+            ).values_list(
+                'status',
+                flat=True
+            ).first()
+        else:
+            previous_status_id = None
+
         super().save(*args, **kwargs)
 
         if save_history:
@@ -262,6 +275,14 @@ class Applicant(models.Model):
             else:
                 self._create_history_head()
 
+            if created or previous_status_id != self.status_id:
+                ApplicantStatusEvent.objects.create(
+                    applicant=self,
+                    from_status_id=previous_status_id,
+                    to_status_id=self.status_id,
+                    author=self.author,
+                )
+
     def is_valid_to_save(self):
         if hasattr(self, 'worker_link'):
             return True
@@ -494,6 +515,124 @@ class ApplicantHistoryHead(models.Model):
         return '{} {}'.format(self.pk, self.applicant)
 
 
+class ApplicantStatusEvent(models.Model):
+    """
+    Смена статуса соискателя (для отчетов, вместо обхода ApplicantHistoryNode)
+    """
+    timestamp = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Временная метка')
+
+    applicant = models.ForeignKey(
+        Applicant,
+        on_delete=models.CASCADE,
+        related_name='status_events',
+        verbose_name='Соискатель')
+
+    from_status = models.ForeignKey(
+        Status,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='Из статуса',
+        null=True,
+        blank=True)
+
+    to_status = models.ForeignKey(
+        Status,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='В статус',
+        null=True,
+        blank=True)
+
+    # Applicant.author at the moment of the change
+    author = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='Автор',
+        null=True,
+        blank=True)
+
+    class Meta:
+        verbose_name = 'Смена статуса соискателя'
+        verbose_name_plural = 'Смены статусов соискателей'
+        indexes = [
+            models.Index(
+                fields=['timestamp', 'to_status'],
+                name='applicantstatusevent_ts_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return '{} {}: {} -> {}'.format(
+            self.timestamp,
+            self.applicant_id,
+            self.from_status_id,
+            self.to_status_id
+        )
+
+
+def status_transitions(chain):
+    """
+    `chain` is [(timestamp, status_id, author_id), ...] of the history
+    snapshots of an applicant, from the oldest one.
+    Returns [(timestamp, from_status_id, to_status_id, author_id), ...].
+    """
+    transitions = []
+    for index, (timestamp, status_id, author_id) in enumerate(chain):
+        if index == 0:
+            transitions.append((timestamp, None, status_id, author_id))
+        elif chain[index - 1][1] != status_id:
+            transitions.append((timestamp, chain[index - 1][1], status_id, author_id))
+    return transitions
+
+
+def rebuild_status_events(apps=global_apps):
+    """
+    Recreates ApplicantStatusEvent from the history snapshots.
+    `apps` is here for the data migration.
+    """
+    node_model = apps.get_model('applicants', 'ApplicantHistoryNode')
+    head_model = apps.get_model('applicants', 'ApplicantHistoryHead')
+    event_model = apps.get_model('applicants', 'ApplicantStatusEvent')
+
+    nodes = {
+        pk: (previous_id, (timestamp, status_id, author_id))
+        for pk, previous_id, timestamp, status_id, author_id in
+        node_model.objects.values_list(
+            'pk',
+            'previous',
+            'timestamp',
+            'applicant__status',
+            'applicant__author',
+        ).iterator(chunk_size=10000)
+    }
+
+    def _events():
+        for applicant_id, node_id in head_model.objects.values_list(
+            'applicant',
+            'node',
+        ).iterator(chunk_size=10000):
+            chain = []
+            while node_id is not None:
+                node_id, snapshot = nodes[node_id]
+                chain.append(snapshot)
+            chain.reverse()
+            for timestamp, from_status_id, to_status_id, author_id in status_transitions(chain):
+                yield event_model(
+                    timestamp=timestamp,
+                    applicant_id=applicant_id,
+                    from_status_id=from_status_id,
+                    to_status_id=to_status_id,
+                    author_id=author_id,
+                )
+
+    with transaction.atomic():
+        event_model.objects.all().delete()
+        event_model.objects.bulk_create(_events(), batch_size=5000)
+
+
 class VacantCustomerLocation(models.Model):
     location = models.OneToOneField(CustomerLocation, on_delete=models.CASCADE,
                                     verbose_name='Объект')
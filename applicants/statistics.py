@@ -0,0 +1,362 @@
+import datetime
+
+import pytz
+
+from django.core.cache import cache
+from django.db.models import (
+    Avg,
+    Count,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    Min,
+    OuterRef,
+    Subquery,
+)
+from django.db.models.functions import (
+    Coalesce,
+    TruncDate,
+)
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from applicants.models import (
+    Applicant,
+    ApplicantStatusEvent,
+    Status,
+    StatusFinal,
+    StatusInitial,
+    active_applicants,
+)
+
+from the_redhuman_is.models import (
+    TimeSheet,
+    WorkerTurnout,
+)
+
+
+HOME_TIMEZONE = pytz.timezone('Europe/Moscow')
+
+# The counts of the days older than SETTLE_DAYS are cached. They change
+# only with backdated timesheets or edits of old applicants, the receivers
+# below drop them then (see _invalidate).
+SETTLE_DAYS = 28
+SETTLED_DAY_CACHE_TIMEOUT = 60 * 60 * 12
+
+STATUSES_CACHE_KEY = 'applicants:statuses'
+STATUSES_CACHE_TIMEOUT = 60 * 10
+
+
+def _load_statuses():
+    """
+    Statuses by name, with `initial` and `final`.
+    """
+    statuses = cache.get(STATUSES_CACHE_KEY)
+    if statuses is None:
+        statuses = {
+            status.name: status
+            for status in Status.objects.select_related(
+                'initial',
+                'final',
+            )
+        }
+        cache.set(STATUSES_CACHE_KEY, statuses, STATUSES_CACHE_TIMEOUT)
+    return statuses
+
+
+def get_status(name):
+    """
+    Raises Status.DoesNotExist like Status.objects.get(name=name).
+    """
+    try:
+        return _load_statuses()[name]
+    except KeyError:
+        raise Status.DoesNotExist(f'Статус "{name}" не найден.')
+
+
+def get_initial_status():
+    for status in _load_statuses().values():
+        if hasattr(status, 'initial'):
+            return status
+    raise Status.DoesNotExist('Начальный статус не найден.')
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+@receiver(post_save, sender=StatusInitial)
+@receiver(post_delete, sender=StatusInitial)
+@receiver(post_save, sender=StatusFinal)
+@receiver(post_delete, sender=StatusFinal)
+def _reset_statuses(sender, **kwargs):
+    cache.delete(STATUSES_CACHE_KEY)
+
+
+def settled_before():
+    """
+    The first day whose counts are not cached.
+    """
+    return timezone.localdate() - datetime.timedelta(days=SETTLE_DAYS)
+
+
+def _generation_key(name):
+    return f'applicants:{name}:generation'
+
+
+def _generation(name):
+    return cache.get(_generation_key(name), 0)
+
+
+def _invalidate(*names):
+    # The cached days are keyed by the generation, a new one drops them all
+    for name in names:
+        key = _generation_key(name)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+@receiver(post_save, sender=TimeSheet)
+@receiver(post_delete, sender=TimeSheet)
+def _timesheet_changed(sender, instance, **kwargs):
+    if instance.sheet_date < settled_before():
+        _invalidate('first_turnouts')
+
+
+@receiver(post_save, sender=WorkerTurnout)
+@receiver(post_delete, sender=WorkerTurnout)
+def _turnout_changed(sender, instance, **kwargs):
+    # A first turnout moves the first turnouts of the later days too
+    if TimeSheet.objects.filter(
+            pk=instance.timesheet_id,
+            sheet_date__lt=settled_before()
+    ).exists():
+        _invalidate('first_turnouts')
+
+
+@receiver(post_save, sender=Applicant)
+@receiver(post_delete, sender=Applicant)
+def _applicant_changed(sender, instance, **kwargs):
+    # The source, the author and the active flag of an old applicant
+    # change the counts of its days
+    if instance.init_date < settled_before():
+        _invalidate('conveyor', 'first_turnouts')
+
+
+def home_date_to_utc_time(date):
+    dt = datetime.datetime.combine(
+        date,
+        datetime.time()
+    )
+    return HOME_TIMEZONE.localize(dt).astimezone(pytz.utc)
+
+
+def status_events(begin_time, end_time):
+    return ApplicantStatusEvent.objects.filter(
+        timestamp__gte=begin_time,
+        timestamp__lt=end_time,
+        applicant__active=True,
+    )
+
+
+def _memoized_by_day(name, params, first_day, last_day, compute, empty):
+    """
+    `compute(first_day, last_day)` returns {day: value} for the days having
+    a value; the other days get `empty`. The values of the settled days (see
+    SETTLE_DAYS) are cached.
+    """
+    days = [
+        first_day + datetime.timedelta(days=d)
+        for d in range((last_day - first_day).days + 1)
+    ]
+    key_prefix = f'applicants:{name}:{_generation(name)}:{params}'
+    settled = settled_before()
+    keys = {day: f'{key_prefix}:{day}' for day in days if day < settled}
+    cached = cache.get_many(keys.values())
+    result = {
+        day: cached[key]
+        for day, key in keys.items()
+        if key in cached
+    }
+
+    missing = [day for day in days if day not in result]
+    if missing:
+        computed = compute(min(missing), max(missing))
+        for day in missing:
+            result[day] = computed.get(day, empty)
+        cache.set_many(
+            {
+                keys[day]: result[day]
+                for day in missing
+                if day in keys
+            },
+            SETTLED_DAY_CACHE_TIMEOUT
+        )
+    return result
+
+
+def conveyor_counts(first_day, last_day, source_pk=None, manager_pk=None):
+    """
+    Returns {day: {status pk: number of applicants}}: the applicants who got
+    the status that day and (for the initial status) the ones who applied
+    that day.
+    """
+    initial_status = get_initial_status()
+
+    def _compute(first_day, last_day):
+        events = status_events(
+            home_date_to_utc_time(first_day),
+            home_date_to_utc_time(last_day + datetime.timedelta(days=1))
+        ).exclude(
+            to_status=initial_status
+        )
+        applicants = active_applicants().filter(
+            init_date__gte=first_day,
+            init_date__lte=last_day
+        )
+        if source_pk:
+            events = events.filter(applicant__source__pk=source_pk)
+            applicants = applicants.filter(source__pk=source_pk)
+        if manager_pk:
+            events = events.filter(author__pk=manager_pk)
+            applicants = applicants.filter(author__pk=manager_pk)
+
+        counts = {}
+        for status_id, day, count in events.annotate(
+            day=TruncDate('timestamp', tzinfo=HOME_TIMEZONE)
+        ).order_by().values_list(
+            'to_status',
+            'day',
+        ).annotate(
+            Count('applicant', distinct=True)
+        ):
+            counts.setdefault(day, {})[status_id] = count
+
+        for day, count in applicants.order_by().values_list(
+            'init_date'
+        ).annotate(
+            Count('pk', distinct=True)
+        ):
+            counts.setdefault(day, {})[initial_status.pk] = count
+
+        return counts
+
+    return _memoized_by_day(
+        'conveyor',
+        f'{source_pk}:{manager_pk}',
+        first_day,
+        last_day,
+        _compute,
+        {}
+    )
+
+
+def first_turnout_counts(first_day, last_day, source_pk=None, manager_pk=None):
+    """
+    Returns {day: (first turnouts, of them from applicants,
+    from russian applicants, from other applicants)}.
+    """
+    def _compute(first_day, last_day):
+        rows = WorkerTurnout.objects.filter(
+            timesheet__sheet_date__gte=first_day,
+            timesheet__sheet_date__lte=last_day,
+        ).annotate(
+            has_turnouts_before=Exists(
+                WorkerTurnout.objects.filter(
+                    worker=OuterRef('worker'),
+                    timesheet__sheet_date__lt=OuterRef('timesheet__sheet_date'),
+                )
+            )
+        ).filter(
+            has_turnouts_before=False
+        ).order_by().values_list(
+            'timesheet__sheet_date',
+            'worker__applicant_link__applicant',
+            'worker__applicant_link__applicant__source',
+            'worker__applicant_link__applicant__author',
+            'worker__citizenship__name',
+        ).annotate(
+            Count('pk')
+        )
+
+        counts = {}
+        for day, applicant_id, source_id, author_id, citizenship, count in rows:
+            count_all, count_applicants, count_russian, count_not_russian = counts.get(
+                day,
+                (0, 0, 0, 0)
+            )
+            count_all += count
+            if (
+                    applicant_id is not None and
+                    (not source_pk or source_pk == source_id) and
+                    (not manager_pk or manager_pk == author_id)
+            ):
+                count_applicants += count
+                if citizenship == 'РФ':
+                    count_russian += count
+                else:
+                    count_not_russian += count
+            counts[day] = (count_all, count_applicants, count_russian, count_not_russian)
+        return counts
+
+    return _memoized_by_day(
+        'first_turnouts',
+        f'{source_pk}:{manager_pk}',
+        first_day,
+        last_day,
+        _compute,
+        (0, 0, 0, 0)
+    )
+
+
+def first_reached(applicants, statuses):
+    """
+    Returns {(applicant pk, status pk): the first time the applicant
+    got the status}.
+    """
+    return {
+        (applicant_id, status_id): timestamp
+        for applicant_id, status_id, timestamp in ApplicantStatusEvent.objects.filter(
+            applicant__in=applicants,
+            to_status__in=statuses,
+        ).order_by().values_list(
+            'applicant',
+            'to_status',
+        ).annotate(
+            Min('timestamp')
+        )
+    }
+
+
+def average_lifetimes(applicants, statuses):
+    """
+    Returns {status pk: average time from the first record of the applicants
+    having the status now to their last edit}.
+    """
+    return dict(
+        applicants.filter(
+            status__in=statuses
+        ).annotate(
+            first_event=Subquery(
+                ApplicantStatusEvent.objects.filter(
+                    applicant=OuterRef('pk')
+                ).order_by(
+                    'timestamp'
+                ).values(
+                    'timestamp'
+                )[:1]
+            )
+        ).order_by().values_list(
+            'status'
+        ).annotate(
+            lifetime=Avg(
+                ExpressionWrapper(
+                    F('last_edited') - Coalesce('first_event', 'last_edited'),
+                    output_field=DurationField()
+                )
+            )
+        )
+    )
@@ -1,3 +1,129 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+import pytz
+
+from django.core.cache import cache
+from django.test import (
+    SimpleTestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from applicants import statistics
+from applicants.models import status_transitions
+
+
+def _day(day):
+    return datetime.datetime(2023, 2, day, 12, 0)
+
+
+class StatusTransitionsTest(SimpleTestCase):
+    def test_empty(self):
+        self.assertEqual(status_transitions([]), [])
+
+    def test_creation(self):
+        self.assertEqual(
+            status_transitions([(_day(1), 10, 1)]),
+            [(_day(1), None, 10, 1)]
+        )
+
+    def test_status_changes_only(self):
+        # Edits which keep the status (name, phone, author) are not counted
+        chain = [
+            (_day(1), 10, 1),
+            (_day(2), 10, 2),
+            (_day(3), 20, 2),
+            (_day(4), 20, 3),
+            (_day(5), 10, 3),
+        ]
+        self.assertEqual(
+            status_transitions(chain),
+            [
+                (_day(1), None, 10, 1),
+                (_day(3), 10, 20, 2),
+                (_day(5), 20, 10, 3),
+            ]
+        )
+
+    def test_author_at_change(self):
+        chain = [
+            (_day(1), None, 1),
+            (_day(2), 10, 2),
+        ]
+        self.assertEqual(
+            status_transitions(chain)[-1],
+            (_day(2), None, 10, 2)
+        )
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+class MemoizedByDayTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def _compute(self, first_day, last_day):
+        self.calls.append((first_day, last_day))
+        return {first_day: first_day.day}
+
+    def _counts(self, first_day, last_day):
+        return statistics._memoized_by_day(
+            'test',
+            'params',
+            first_day,
+            last_day,
+            self._compute,
+            0
+        )
+
+    def test_home_day_bounds(self):
+        self.assertEqual(
+            statistics.home_date_to_utc_time(datetime.date(2023, 2, 1)),
+            datetime.datetime(2023, 1, 31, 21, 0, tzinfo=pytz.utc)
+        )
+
+    def test_days(self):
+        first_day = datetime.date(2020, 3, 5)
+        last_day = datetime.date(2020, 3, 7)
+        self.assertEqual(
+            self._counts(first_day, last_day),
+            {
+                datetime.date(2020, 3, 5): 5,
+                datetime.date(2020, 3, 6): 0,
+                datetime.date(2020, 3, 7): 0,
+            }
+        )
+        self.assertEqual(self.calls, [(first_day, last_day)])
+
+    def test_settled_days_cached(self):
+        first_day = datetime.date(2020, 3, 5)
+        last_day = datetime.date(2020, 3, 7)
+        self._counts(first_day, last_day)
+        self.assertEqual(self._counts(first_day, last_day)[first_day], 5)
+        self.assertEqual(len(self.calls), 1)
+
+        # Only the missing days are computed
+        self._counts(datetime.date(2020, 3, 6), datetime.date(2020, 3, 9))
+        self.assertEqual(
+            self.calls[1],
+            (datetime.date(2020, 3, 8), datetime.date(2020, 3, 9))
+        )
+
+    def test_recent_days_not_cached(self):
+        today = timezone.localdate()
+        self._counts(today, today)
+        self._counts(today, today)
+        self.assertEqual(self.calls, [(today, today), (today, today)])
+
+    def test_invalidate(self):
+        day = datetime.date(2020, 3, 5)
+        self._counts(day, day)
+        statistics._invalidate('test')
+        self._counts(day, day)
+        self.assertEqual(len(self.calls), 2)
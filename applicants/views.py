@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 import datetime
-import pytz
 import re
 
 from urllib.parse import urlencode
@@ -12,7 +11,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.core.exceptions import MultipleObjectsReturned
 from django.urls import reverse
-from django.db.models import Q
+from django.db.models import (
+    OuterRef,
+    Q,
+    Subquery,
+)
 from django.forms import model_to_dict
 from django.http import HttpResponseRedirect, JsonResponse, HttpResponse
 from django.shortcuts import render
@@ -22,11 +25,13 @@ from django.views.generic import ListView, CreateView, UpdateView, DetailView, T
 from django.views.generic.edit import FormView
 
 from applicants import forms
+from applicants import statistics
 
 from applicants.models import AllowedStatusTransition
 from applicants.models import Applicant
 from applicants.models import ApplicantHistoryNode
 from applicants.models import ApplicantSource
+from applicants.models import ApplicantStatusEvent
 from applicants.models import Status
 from applicants.models import StatusFinal
 from applicants.models import StatusInitial
@@ -37,7 +42,6 @@ from the_redhuman_is.auth import staff_account_required
 from the_redhuman_is.models import Metro
 from the_redhuman_is.models import CustomerLocation
 from the_redhuman_is.models import Country
-from the_redhuman_is.models import WorkerTurnout
 from utils.date_time import date_from_string
 from utils.date_time import string_from_date
 from utils.date_time import time_interval_format
@@ -328,13 +332,13 @@ class ApplicantsListView(CustomLoginRequired, ListView):
         if present_status_pk:
             status = Status.objects.get(pk=present_status_pk)
             if not hasattr(status, 'initial'):
-                def _check(applicant):
-                    return applicant.status == status
-                pks = []
-                for applicant in self.queryset.all():
-                    if applicant.find_first_in_history(_check):
-                        pks.append(applicant.pk)
-                self.queryset = self.queryset.filter(pk__in=pks)
+                self.queryset = self.queryset.filter(
+                    pk__in=ApplicantStatusEvent.objects.filter(
+                        to_status=status
+                    ).values(
+                        'applicant'
+                    )
+                )
 
         return self.queryset.order_by(
             '-last_edited',
@@ -749,9 +753,9 @@ def funnel(request):
         'отказ СБ',
         'перезвон',
     ]
-    status_chain = [(Status.objects.get(name=name), True) for name in names]
+    status_chain = [(statistics.get_status(name), True) for name in names]
     status_chain.extend(
-        [(Status.objects.get(name=name), False) for name in extra_names]
+        [(statistics.get_status(name), False) for name in extra_names]
     )
 
     data = []
@@ -809,30 +813,38 @@ def funnel(request):
         status, need_gantt = status_chain[i]
         data[i]['url'] = _url(status)
 
-    for applicant in applicants:
-        for i in range(len(status_chain))[1:]:
-            status, need_gantt = status_chain[i]
-            def _check(applicant):
-                return applicant.status == status
-            if hasattr(status, 'final'):
-                if _check(applicant):
-                    current = applicant
-                else:
-                    current = None
-            else:
-                current = applicant.find_first_in_history(_check)
-            if current:
-                data[i]['count'] += 1
-                if not need_gantt:
-                    continue
-                prev_status, tmp = status_chain[i - 1]
-                def _check_previous(applicant):
-                    return applicant.status == prev_status
-                previous = applicant.find_first_in_history(_check_previous)
-                if previous:
-                    if current.last_edited > previous.last_edited:
-                        data[i - 1]['timedelta_count'] += 1
-                        data[i - 1]['timedelta'] += (current.last_edited - previous.last_edited)
+    first_reached = statistics.first_reached(
+        applicants,
+        [status for status, _ in status_chain]
+    )
+    applicant_ids = list(applicants.values_list('pk', flat=True))
+
+    for i in range(len(status_chain))[1:]:
+        status, need_gantt = status_chain[i]
+        if hasattr(status, 'final'):
+            current = dict(
+                applicants.filter(
+                    status=status
+                ).values_list(
+                    'pk',
+                    'last_edited'
+                )
+            )
+        else:
+            current = {
+                applicant_id: first_reached[(applicant_id, status.pk)]
+                for applicant_id in applicant_ids
+                if (applicant_id, status.pk) in first_reached
+            }
+        data[i]['count'] += len(current)
+        if not need_gantt:
+            continue
+        prev_status, tmp = status_chain[i - 1]
+        for applicant_id, current_timestamp in current.items():
+            previous_timestamp = first_reached.get((applicant_id, prev_status.pk))
+            if previous_timestamp and current_timestamp > previous_timestamp:
+                data[i - 1]['timedelta_count'] += 1
+                data[i - 1]['timedelta'] += (current_timestamp - previous_timestamp)
 
     def _interval_in_seconds(interval):
         return interval.days * 24 * 60 * 60 + interval.seconds
@@ -848,37 +860,24 @@ def funnel(request):
             previous_seconds += item['seconds']
         item['timedelta'] = time_interval_format(avg_time)
 
-    def _average_lifetime(status):
-        lifetime = datetime.timedelta()
-        filtered_applicants = applicants.filter(
-            status=status
-        )
-        for applicant in filtered_applicants:
-            lifetime += (
-                applicant.last_edited -
-                applicant.history_list()[0].last_edited
-            )
-        if filtered_applicants.exists():
-            return _interval_in_seconds(
-                lifetime / filtered_applicants.count()
-            )
-        return None
-
     statuses_with_lifetime = [
-        'выход',
-        'резерв',
-        'не согласен',
-        'не подходит',
-        'отказ СБ',
+        statistics.get_status(name)
+        for name in [
+            'выход',
+            'резерв',
+            'не согласен',
+            'не подходит',
+            'отказ СБ',
+        ]
     ]
+    lifetimes = statistics.average_lifetimes(applicants, statuses_with_lifetime)
     index = len(names) - 1
-    for name in statuses_with_lifetime:
-        status=Status.objects.get(name=name)
-        lifetime = _average_lifetime(status)
+    for status in statuses_with_lifetime:
+        lifetime = lifetimes.get(status.pk)
         if lifetime is not None:
             data[index]['need_gantt'] = True
             data[index]['begin'] = 0
-            data[index]['seconds'] = lifetime
+            data[index]['seconds'] = _interval_in_seconds(lifetime)
         index += 1
 
     return render(
@@ -896,19 +895,6 @@ def funnel(request):
     )
 
 
-# Todo: date_utils?
-def _home_date_to_utc_time(date):
-    dt = datetime.datetime.combine(
-        date,
-        datetime.time()
-    )
-    return pytz.timezone('Europe/Moscow').localize(dt).astimezone(pytz.timezone('UTC'))
-
-
-def _utc_time_to_home_date(dt):
-    return dt.astimezone(pytz.timezone('Europe/Moscow')).date()
-
-
 @staff_account_required
 def conveyor_report(request):
     source_pk, manager_pk, first_day, last_day = _base_filters(request)
@@ -918,10 +904,7 @@ def conveyor_report(request):
     else:
         last_day = timezone.now().date()
 
-    begin_time = _home_date_to_utc_time(first_day)
-    end_time = _home_date_to_utc_time(last_day + datetime.timedelta(days=1))
-
-    initial_status = Status.objects.get(initial__isnull=False)
+    initial_status = statistics.get_initial_status()
 
     names = [
         'приглашен на оформление',
@@ -934,61 +917,19 @@ def conveyor_report(request):
         'выход',
     ]
 
-    statuses = [Status.objects.get(name=name) for name in names]
+    statuses = [statistics.get_status(name) for name in names]
     days = [
         first_day + datetime.timedelta(days=d) for d in range(0, (last_day-first_day).days + 1)
     ]
 
     all_statuses = [initial_status] + statuses
 
-    grid = { status: {day:[] for day in days} for status in all_statuses }
-
-    nodes = ApplicantHistoryNode.objects.filter(
-        timestamp__gte=begin_time,
-        timestamp__lt=end_time
-    ).select_related(
-        'applicant'
-    ).filter(
-        applicant__active=True,
-        applicant__status__in=statuses
-    )
-
-    # For initial status
-    apps = active_applicants().filter(
-        init_date__gte=first_day,
-        init_date__lte=last_day
-    ).distinct()
-
     if source_pk:
         source_pk = int(source_pk)
-        nodes = nodes.filter(
-            applicant__source__pk=source_pk
-        )
-        apps = apps.filter(
-            source__pk=source_pk
-        )
     if manager_pk:
         manager_pk = int(manager_pk)
-        nodes = nodes.filter(
-            applicant__author__pk=manager_pk
-        )
-        apps = apps.filter(
-            author__pk=manager_pk
-        )
 
-    for node in nodes:
-        if not node.previous or not _same_enough(node.previous.applicant, node.applicant):
-            head = node.head()
-            if head:
-                row = grid[node.applicant.status]
-                day = _utc_time_to_home_date(node.timestamp)
-                cell = row[day]
-                if head not in cell:
-                    cell.append(head)
-
-    initial_row = grid[initial_status]
-    for applicant in apps:
-        initial_row[applicant.init_date].append(applicant)
+    grid = statistics.conveyor_counts(first_day, last_day, source_pk, manager_pk)
 
     def _applicants_url(status, day):
         params = {
@@ -1007,7 +948,7 @@ def conveyor_report(request):
     for status in all_statuses:
         row = []
         for day in days:
-            row.append((len(grid[status][day]), _applicants_url(status, day)))
+            row.append((grid[day].get(status.pk, 0), _applicants_url(status, day)))
         if hasattr(status, 'final'):
             name = 'выходы (журнал)'
         else:
@@ -1038,30 +979,18 @@ def conveyor_report(request):
         )
 
     # Real turnouts
+    first_turnouts = statistics.first_turnout_counts(first_day, last_day, source_pk, manager_pk)
     row_all = []
     row_applicants = []
     row_applicants_russian = []
     row_applicants_not_russian = []
     for day in days:
-        count_all = 0
-        count_applicants = 0
-        count_applicants_russian = 0
-        count_applicants_not_russian = 0
-        turnouts = WorkerTurnout.objects.filter(
-            timesheet__sheet_date=day
-        )
-        for turnout in turnouts:
-            if turnout.is_first():
-                count_all += 1
-                if hasattr(turnout.worker, 'applicant_link'):
-                    applicant = turnout.worker.applicant_link.applicant
-                    if ((not source_pk or source_pk == applicant.source.pk) and
-                        (not manager_pk or manager_pk == applicant.author.pk)):
-                        count_applicants += 1
-                        if turnout.worker.citizenship.name=='РФ':
-                            count_applicants_russian += 1
-                        else:
-                            count_applicants_not_russian += 1
+        (
+            count_all,
+            count_applicants,
+            count_applicants_russian,
+            count_applicants_not_russian,
+        ) = first_turnouts[day]
 
         row_all.append((count_all, _workers_url(day, 'new_turnouts')))
         row_applicants.append((count_applicants, _workers_url(day, 'new_applicants')))
@@ -1144,35 +1073,38 @@ def conveyor_details(request):
         return [(app, _url(app)) for app in apps.order_by('-author')]
 
     def _general_list():
-        begin_time = _home_date_to_utc_time(day)
-        end_time = _home_date_to_utc_time(day + datetime.timedelta(days=1))
+        begin_time = statistics.home_date_to_utc_time(day)
+        end_time = statistics.home_date_to_utc_time(day + datetime.timedelta(days=1))
 
-        nodes = ApplicantHistoryNode.objects.filter(
-            timestamp__gte=begin_time,
-            timestamp__lt=end_time,
-        ).select_related(
-            'applicant'
-        ).filter(
-            applicant__active=True,
-            applicant__status=status
+        events = statistics.status_events(begin_time, end_time).filter(
+            to_status=status
         )
         if source_pk:
-            nodes = nodes.filter(
+            events = events.filter(
                 applicant__source__pk=source_pk
             )
         if manager_pk:
-            nodes = nodes.filter(
-                applicant__author__pk=manager_pk
+            events = events.filter(
+                author__pk=manager_pk
             )
 
-        heads = []
-        for node in nodes:
-            if not node.previous or not _same_enough(node.previous.applicant, node.applicant):
-                head = node.head()
-                if head and head not in heads:
-                    heads.append(head)
+        applicants = Applicant.objects.filter(
+            pk__in=events.values('applicant')
+        ).annotate(
+            first_event=Subquery(
+                events.filter(
+                    applicant=OuterRef('pk')
+                ).order_by(
+                    'timestamp'
+                ).values(
+                    'timestamp'
+                )[:1]
+            )
+        ).order_by(
+            'first_event'
+        )
 
-        return [(head.applicant, _url(head.applicant)) for head in heads]
+        return [(applicant, _url(applicant)) for applicant in applicants]
 
     if hasattr(status, 'initial'):
         apps = _initial_list()
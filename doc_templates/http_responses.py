@@ -1,16 +1,69 @@
-from django.http import HttpResponse
+import tempfile
+
+from django.http import (
+    HttpResponse,
+    StreamingHttpResponse,
+)
 
 from urllib.parse import quote_plus
 
+from utils.files import (
+    iter_file,
+    iter_zip,
+)
 
-def xlsx_content_response(workbook, filename):
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _set_attachment_filename(response, filename):
     response[
         'Content-Disposition'
     ] = "attachment; filename*=UTF-8''{}".format(quote_plus(filename))
 
+
+def xlsx_content_response(workbook, filename):
+    response = HttpResponse(
+        content_type=XLSX_CONTENT_TYPE
+    )
+    _set_attachment_filename(response, filename)
+
     workbook.save(response)
 
     return response
+
+
+def workbook_temporary_file(workbook):
+    # Write-only workbooks keep their rows on disk, so saving into a temporary
+    # file (instead of memory) keeps the memory usage independent of the size.
+    workbook_file = tempfile.TemporaryFile()
+    workbook.save(workbook_file)
+    workbook_file.seek(0)
+    return workbook_file
+
+
+def _iter_and_close(file_obj):
+    with file_obj:
+        yield from iter_file(file_obj)
+
+
+def xlsx_streaming_response(workbook, filename):
+    response = StreamingHttpResponse(
+        _iter_and_close(workbook_temporary_file(workbook)),
+        content_type=XLSX_CONTENT_TYPE
+    )
+    _set_attachment_filename(response, filename)
+    return response
+
+
+def zip_streaming_response(entries, filename):
+    """
+    `entries` is an iterable of (name, binary file object) pairs,
+    see utils.files.iter_zip.
+    """
+    response = StreamingHttpResponse(
+        iter_zip(entries),
+        content_type='application/zip'
+    )
+    _set_attachment_filename(response, filename)
+    return response
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class FinanceConfig(AppConfig):
     name = 'finance'
+
+    def ready(self):
+        from django.db.models import CharField, TextField
+        from utils.expressions import ILikeContains
+
+        # The ledger searches by comments and account names (finance.ledger)
+        CharField.register_lookup(ILikeContains)
+        TextField.register_lookup(ILikeContains)
@@ -0,0 +1,247 @@
+import datetime
+import decimal
+
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    Q,
+    SmallIntegerField,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from finance.models import (
+    Account,
+    AccountMonthTurnover,
+    Operation,
+    month_of,
+)
+
+
+# Operations of an account (with the non-closed descendants, the same as
+# Account.operations) ordered by (timepoint, pk) and paginated by the key of
+# the last row (the cursor), not by OFFSET. Every row gets the balance of
+# the account after the operation: the balance before the first row is the
+# sum of the stored monthly turnovers (AccountMonthTurnover) of the earlier
+# months and of the operations of its month, then the operations between
+# the first and the last rows are added up.
+
+LEDGER_PAGE_SIZE = 100
+MAX_LEDGER_PAGE_SIZE = 1000
+
+
+def subtree_account_ids(account):
+    ids = {account.pk}
+    level = {account.pk}
+    while level:
+        level = set(
+            Account.objects.filter(
+                parent__in=level,
+                closed=False
+            ).values_list(
+                'pk',
+                flat=True
+            )
+        )
+        ids.update(level)
+    return ids
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+
+def _signed_amount(account_ids):
+    # Operations between the accounts of the subtree don't change its balance
+    return Case(
+        When(
+            Q(debet__in=account_ids) & Q(credit__in=account_ids),
+            then=Value(decimal.Decimal('0.00'))
+        ),
+        When(debet__in=account_ids, then=F('amount')),
+        default=-F('amount'),
+        output_field=DecimalField(max_digits=30, decimal_places=2)
+    )
+
+
+def account_operations(account_ids, first_day=None, last_day=None):
+    """
+    Operations with the accounts on any side, with `direction` (1 for debit,
+    -1 for credit) and the payment interval (`first_day`, `last_day`).
+    The days are filtered by timepoint ranges, so the indexes are used.
+    """
+    operations = Operation.objects.filter(
+        Q(debet__in=account_ids) | Q(credit__in=account_ids)
+    )
+    if first_day:
+        operations = operations.filter(
+            timepoint__gte=_day_start(first_day)
+        )
+    if last_day:
+        operations = operations.filter(
+            timepoint__lt=_day_start(last_day + datetime.timedelta(days=1))
+        )
+    return operations.annotate(
+        direction=Case(
+            When(debet__in=account_ids, then=Value(1)),
+            default=Value(-1),
+            output_field=SmallIntegerField()
+        ),
+        first_day=F('intervalpayment__first_day'),
+        last_day=F('intervalpayment__last_day'),
+    )
+
+
+def search_operations(operations, text):
+    """
+    Operations with the text in the comment or in the full name of an account.
+    Both are served by the trigram indexes (`ilike` lookup).
+    """
+    accounts = Account.objects.filter(
+        full_name__ilike=text
+    ).values('pk')
+    return operations.filter(
+        Q(comment__ilike=text) |
+        Q(debet__in=accounts) |
+        Q(credit__in=accounts)
+    )
+
+
+def encode_cursor(operation):
+    return f'{operation.timepoint.isoformat()}|{operation.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Returns (timepoint, pk). Raises ValueError for a malformed cursor.
+    """
+    timepoint, pk = cursor.rsplit('|', 1)
+    timepoint = parse_datetime(timepoint)
+    if timepoint is None:
+        raise ValueError(f'Invalid cursor {cursor}')
+    return timepoint, int(pk)
+
+
+def _before(timepoint, pk, inclusive=False):
+    pk_lookup = 'pk__lte' if inclusive else 'pk__lt'
+    return Q(timepoint__lt=timepoint) | Q(timepoint=timepoint, **{pk_lookup: pk})
+
+
+def _after(timepoint, pk, inclusive=False):
+    pk_lookup = 'pk__gte' if inclusive else 'pk__gt'
+    return Q(timepoint__gt=timepoint) | Q(timepoint=timepoint, **{pk_lookup: pk})
+
+
+def balance_before(account_ids, timepoint, pk):
+    """
+    Saldo of the accounts before the operation with the key (timepoint, pk).
+    """
+    month = month_of(timepoint)
+    stored = AccountMonthTurnover.objects.filter(
+        account__in=account_ids,
+        month__lt=month
+    ).aggregate(
+        debit=Sum('debit'),
+        credit=Sum('credit')
+    )
+    in_month = Operation.objects.filter(
+        Q(debet__in=account_ids) | Q(credit__in=account_ids),
+        _before(timepoint, pk),
+        timepoint__gte=_day_start(month),
+    ).aggregate(
+        amount=Sum(_signed_amount(account_ids))
+    )
+    zero = decimal.Decimal('0.00')
+    return (
+        (stored['debit'] or zero) -
+        (stored['credit'] or zero) +
+        (in_month['amount'] or zero)
+    )
+
+
+def _key(operation):
+    return operation.timepoint, operation.pk
+
+
+def _set_balances(account_ids, operations):
+    first = min(operations, key=_key)
+    last = max(operations, key=_key)
+
+    balance = balance_before(account_ids, first.timepoint, first.pk)
+    # All the operations of the span, including the ones filtered out
+    # by the search
+    span = Operation.objects.filter(
+        Q(debet__in=account_ids) | Q(credit__in=account_ids),
+        _after(first.timepoint, first.pk, inclusive=True),
+        _before(last.timepoint, last.pk, inclusive=True),
+    ).annotate(
+        signed_amount=_signed_amount(account_ids)
+    ).order_by(
+        'timepoint',
+        'pk',
+    ).values_list(
+        'pk',
+        'signed_amount',
+    )
+
+    balances = {}
+    for pk, amount in span.iterator():
+        balance += amount
+        balances[pk] = balance
+    for operation in operations:
+        operation.balance = balances[operation.pk]
+
+
+def ledger_page(
+        account,
+        first_day=None,
+        last_day=None,
+        search_text=None,
+        cursor=None,
+        descending=False,
+        limit=LEDGER_PAGE_SIZE):
+    """
+    Returns {'operations': [...], 'next': cursor of the next page or None}.
+    The operations have `direction`, `first_day`, `last_day` and `balance`
+    (saldo of the account after the operation).
+    `cursor` is (timepoint, pk) of the last row of the previous page.
+    """
+    account_ids = subtree_account_ids(account)
+    operations = account_operations(account_ids, first_day, last_day)
+    if search_text:
+        operations = search_operations(operations, search_text)
+    if cursor is not None:
+        if descending:
+            operations = operations.filter(_before(*cursor))
+        else:
+            operations = operations.filter(_after(*cursor))
+
+    if descending:
+        order = ('-timepoint', '-pk')
+    else:
+        order = ('timepoint', 'pk')
+    rows = list(
+        operations.select_related(
+            'debet',
+            'credit',
+            'author',
+        ).order_by(
+            *order
+        )[:limit + 1]
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    if rows:
+        _set_balances(account_ids, rows)
+
+    return {
+        'operations': rows,
+        'next': next_cursor,
+    }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from finance.models import reconcile_account_turnovers
+
+
+class Command(BaseCommand):
+    help = 'Recomputes monthly account turnovers from the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report the number of out of sync turnovers',
+        )
+
+    def handle(self, *args, **options):
+        count = reconcile_account_turnovers(dry_run=options['check'])
+        if options['check']:
+            print('Out of sync turnovers: {}'.format(count))
+        else:
+            print('Fixed turnovers: {}'.format(count))
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.12 on 2023-02-14 15:40
+
+from decimal import Decimal
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_month_turnovers(apps, schema_editor):
+    from finance.models import reconcile_account_turnovers
+    reconcile_account_turnovers(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='AccountMonthTurnover',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('debit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=30, verbose_name='Дебет')),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=30, verbose_name='Кредит')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['full_name'], name='account_full_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(fields=['debet', 'timepoint', 'id'], name='operation_debet_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(fields=['credit', 'timepoint', 'id'], name='operation_credit_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['comment'], name='operation_comment_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddField(
+            model_name='accountmonthturnover',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_turnovers', to='finance.account', verbose_name='Счет'),
+        ),
+        migrations.AddConstraint(
+            model_name='accountmonthturnover',
+            constraint=models.UniqueConstraint(fields=('account', 'month'), name='unique_account_month_turnover'),
+        ),
+        migrations.RunPython(fill_month_turnovers, migrations.RunPython.noop),
+    ]
@@ -5,19 +5,27 @@ import decimal
 import pytz
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
 from django.core.cache import cache
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, F
+from django.db.models.functions import TruncMonth
 from django.db.models.signals import (
+    post_delete,
+    post_save,
     pre_delete,
-#    post_save,
+    pre_save,
 )
+from django.dispatch import receiver
 from django.utils import timezone
 
 from utils.date_time import string_from_date
 
 
+TURNOVER_CACHE_TIMEOUT = 60 * 60 * 6  # 6h
+
 # Todo: payment interval?
 def update_if_changed(
             operation,
@@ -90,6 +98,14 @@ class Account(models.Model):
 
     class Meta:
         ordering = ('full_name',)
+        indexes = [
+            # the ledger search (`ilike` lookup)
+            GinIndex(
+                fields=['full_name'],
+                opclasses=['gin_trgm_ops'],
+                name='account_full_name_trgm',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if self.parent:
@@ -203,7 +219,7 @@ class Account(models.Model):
             value = self._turnover('debet') - self._turnover('credit')
         else:
             value = amount_sum(self.operations(opertype))
-        cache.set(key, value, 60 * 60 * 6)  # 6h
+        cache.set(key, value, TURNOVER_CACHE_TIMEOUT)
         return value
 
     def operations(self, opertype, model=None):
@@ -314,6 +330,24 @@ class Operation(models.Model):
         verbose_name="Операцию запрещено редактировать"
     )
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the ledger by (timepoint, pk)
+            models.Index(
+                fields=['debet', 'timepoint', 'id'],
+                name='operation_debet_time_idx',
+            ),
+            models.Index(
+                fields=['credit', 'timepoint', 'id'],
+                name='operation_credit_time_idx',
+            ),
+            GinIndex(
+                fields=['comment'],
+                opclasses=['gin_trgm_ops'],
+                name='operation_comment_trgm',
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.amount < 0:
             self.amount = -self.amount
@@ -424,6 +458,100 @@ class Operation(models.Model):
 #        return accounts
 
 
+def force_update_operation(operation, **fields):
+    """
+    Sets the fields of the operation ignoring the is_closed flag (and the
+    other checks of Operation.save). Unlike a queryset update() it sends
+    the save signals, so the balances and the turnovers stay in sync.
+    """
+    # The accounts the operation is moved off keep stale caches otherwise
+    accounts = {operation.debet, operation.credit}
+    for name, value in fields.items():
+        setattr(operation, name, value)
+    models.Model.save(operation, update_fields=list(fields))
+
+    accounts.update([operation.debet, operation.credit])
+    for account in accounts:
+        account.drop_turnover_cache()
+
+
+def turnover_saldos(accounts):
+    """
+    Same as Account.turnover_saldo() for many accounts at once: the cached
+    values are fetched with a couple of get_many calls, the missing ones are
+    calculated with a single grouped query per operation side.
+    Returns {account pk: saldo}.
+    """
+    accounts = list(accounts)
+    if not accounts:
+        return {}
+
+    tag_keys = {account._ctt_cache_key(): account for account in accounts}
+    tags = cache.get_many(tag_keys.keys())
+    for key, account in tag_keys.items():
+        if key not in tags:
+            tags[key] = account._cache_to_tag_inc()
+
+    saldo_keys = {
+        account.pk: 'fin:acc:{0}:saldo{1}'.format(
+            account.pk,
+            tags[account._ctt_cache_key()]
+        )
+        for account in accounts
+    }
+    cached = cache.get_many(saldo_keys.values())
+
+    saldos = {}
+    missing = []
+    for pk, key in saldo_keys.items():
+        if key in cached:
+            saldos[pk] = cached[key]
+        else:
+            missing.append(pk)
+    if not missing:
+        return saldos
+
+    # Every (non-closed) descendant is a part of the turnover of the account
+    roots = {pk: {pk} for pk in missing}
+    level = set(missing)
+    while level:
+        children = Account.objects.filter(
+            parent__in=level,
+            closed=False
+        ).values_list(
+            'pk',
+            'parent'
+        )
+        level = set()
+        for child, parent in children:
+            roots.setdefault(child, set()).update(roots[parent])
+            level.add(child)
+
+    def _turnovers(side):
+        return Operation.objects.filter(
+            **{f'{side}__in': roots.keys()}
+        ).order_by().values_list(
+            side
+        ).annotate(
+            models.Sum('amount')
+        )
+
+    values = {pk: decimal.Decimal(0.0) for pk in missing}
+    for account_pk, amount in _turnovers('debet'):
+        for root in roots[account_pk]:
+            values[root] += amount
+    for account_pk, amount in _turnovers('credit'):
+        for root in roots[account_pk]:
+            values[root] -= amount
+
+    cache.set_many(
+        {saldo_keys[pk]: value for pk, value in values.items()},
+        TURNOVER_CACHE_TIMEOUT
+    )
+    saldos.update(values)
+    return saldos
+
+
 class IntervalPayment(models.Model):
     operation = models.OneToOneField(
         Operation,
@@ -450,3 +578,211 @@ class IntervalPayment(models.Model):
 # Todo: look at the commit d12ec02a9597c13c18ff27461aea63cabc793afe and cleanup
 #post_save.connect(Operation.post_save, sender=Operation)
 pre_delete.connect(Operation.pre_delete, sender=Operation)
+
+
+# Debit and credit turnovers of the account (without the children) for
+# a month (months are in the default time zone). The balance of an account
+# at the beginning of a month is the sum of its earlier months, so the ledger
+# (finance.ledger) does not sum up all the history of the account.
+# Kept up to date by the Operation signals below; `reconcile_account_turnovers`
+# command fixes them after bulk updates which bypass the signals.
+class AccountMonthTurnover(models.Model):
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        verbose_name='Счет',
+        related_name='month_turnovers'
+    )
+    month = models.DateField(
+        verbose_name='Месяц'
+    )
+    debit = models.DecimalField(
+        verbose_name='Дебет',
+        max_digits=30,
+        decimal_places=2,
+        default=decimal.Decimal('0.00')
+    )
+    credit = models.DecimalField(
+        verbose_name='Кредит',
+        max_digits=30,
+        decimal_places=2,
+        default=decimal.Decimal('0.00')
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'month'],
+                name='unique_account_month_turnover',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.account} {self.month:%m.%Y}: {self.debit} / {self.credit}'
+
+
+def month_of(timepoint):
+    """
+    The first day of the month of the timepoint in the default time zone.
+    Many operations are saved with a date timepoint, it is taken as is.
+    """
+    if not isinstance(timepoint, datetime.datetime):
+        return timepoint.replace(day=1)
+    if timezone.is_naive(timepoint):
+        timepoint = timezone.make_aware(timepoint)
+    return timezone.localtime(timepoint).date().replace(day=1)
+
+
+def _month_turnovers(side, model=None):
+    if model is None:
+        model = Operation
+    return model.objects.annotate(
+        month=TruncMonth(
+            'timepoint',
+            output_field=models.DateField(),
+            tzinfo=timezone.get_default_timezone()
+        )
+    ).order_by().values_list(
+        side,
+        'month',
+    ).annotate(
+        models.Sum('amount')
+    )
+
+
+def reconcile_account_turnovers(dry_run=False, apps=None):
+    """
+    Recomputes all the monthly account turnovers from the ledger.
+    Returns the number of the turnovers which were missing or out of sync.
+    """
+    if apps is None:
+        operation_model = Operation
+        turnover_model = AccountMonthTurnover
+    else:
+        operation_model = apps.get_model('finance', 'Operation')
+        turnover_model = apps.get_model('finance', 'AccountMonthTurnover')
+
+    with transaction.atomic():
+        stored = turnover_model.objects.all()
+        if not dry_run:
+            # Locked before the ledger is read: an operation saved meanwhile
+            # waits for the commit and adds its F() increment to the fixed
+            # value instead of being overwritten
+            stored = stored.select_for_update()
+        stored = list(stored)
+
+        zero = decimal.Decimal('0.00')
+        turnovers = {}
+        for account_id, month, amount in _month_turnovers('debet', operation_model):
+            turnovers[(account_id, month)] = [amount, zero]
+        for account_id, month, amount in _month_turnovers('credit', operation_model):
+            turnovers.setdefault((account_id, month), [zero, zero])[1] = amount
+
+        to_create = []
+        to_update = []
+        to_delete = []
+        for turnover in stored:
+            key = (turnover.account_id, turnover.month)
+            debit, credit = turnovers.pop(key, (zero, zero))
+            if debit == zero and credit == zero:
+                to_delete.append(turnover.pk)
+            elif turnover.debit != debit or turnover.credit != credit:
+                turnover.debit = debit
+                turnover.credit = credit
+                to_update.append(turnover)
+        for (account_id, month), (debit, credit) in turnovers.items():
+            to_create.append(
+                turnover_model(
+                    account_id=account_id,
+                    month=month,
+                    debit=debit,
+                    credit=credit
+                )
+            )
+
+        if not dry_run:
+            turnover_model.objects.filter(pk__in=to_delete).delete()
+            # A month turnover created by a concurrent save is kept
+            turnover_model.objects.bulk_create(
+                to_create,
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+            turnover_model.objects.bulk_update(
+                to_update,
+                ['debit', 'credit'],
+                batch_size=1000
+            )
+
+    return len(to_create) + len(to_update) + len(to_delete)
+
+
+def _update_month_turnover(account_id, month, debit, credit):
+    turnover, _ = AccountMonthTurnover.objects.get_or_create(
+        account_id=account_id,
+        month=month
+    )
+    AccountMonthTurnover.objects.filter(
+        pk=turnover.pk
+    ).update(
+        debit=F('debit') + debit,
+        credit=F('credit') + credit,
+    )
+
+
+def _apply_month_turnovers(debet_id, credit_id, timepoint, amount):
+    zero = decimal.Decimal('0.00')
+    month = month_of(timepoint)
+    _update_month_turnover(debet_id, month, amount, zero)
+    _update_month_turnover(credit_id, month, zero, amount)
+
+
+@receiver(pre_save, sender=Operation)
+def remember_operation_before_save(sender, instance, **kwargs):
+    """
+    The stored (debet, credit, timepoint, amount) of the operation, for the
+    denormalizations updated on save: the month turnovers (below) and the
+    worker balances (the_redhuman_is.models.WorkerBalance).
+    """
+    instance._before_save = None
+    if instance.pk is not None:
+        instance._before_save = Operation.objects.filter(
+            pk=instance.pk
+        ).values_list(
+            'debet',
+            'credit',
+            'timepoint',
+            'amount',
+        ).first()
+
+
+@receiver(post_save, sender=Operation)
+def update_month_turnovers_on_save(sender, instance, **kwargs):
+    current = (
+        instance.debet_id,
+        instance.credit_id,
+        instance.timepoint,
+        instance.amount,
+    )
+    previous = getattr(instance, '_before_save', None)
+    if previous is not None:
+        debet_id, credit_id, timepoint, amount = previous
+        if (debet_id, credit_id, month_of(timepoint), amount) == (
+                instance.debet_id,
+                instance.credit_id,
+                month_of(instance.timepoint),
+                instance.amount):
+            return
+        _apply_month_turnovers(debet_id, credit_id, timepoint, -amount)
+
+    _apply_month_turnovers(*current)
+
+
+@receiver(post_delete, sender=Operation)
+def update_month_turnovers_on_delete(sender, instance, **kwargs):
+    _apply_month_turnovers(
+        instance.debet_id,
+        instance.credit_id,
+        instance.timepoint,
+        -instance.amount
+    )
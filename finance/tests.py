@@ -1,7 +1,15 @@
-from django.test import TestCase
+import datetime
+
+from decimal import Decimal
+from unittest.mock import call, patch
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
 from model_mommy import mommy
 
-from finance.models import Account
+from finance import models
+from finance.ledger import decode_cursor, encode_cursor
+from finance.models import Account, Operation, month_of
 
 
 class AccountModelTestCase(TestCase):
@@ -26,3 +34,66 @@ class AccountModelTestCase(TestCase):
         self.assertEqual(self.ac1111.full_name, 't1 > d2 > t3 > t4')
         self.assertEqual(self.ac2.full_name, 't1 > t4')
 
+
+class LedgerCursorTestCase(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        timepoint = timezone.make_aware(datetime.datetime(2023, 1, 31, 23, 30))
+        operation = Operation(pk=42, timepoint=timepoint)
+        self.assertEqual(decode_cursor(encode_cursor(operation)), (timepoint, 42))
+
+    def test_malformed_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor('yesterday|42')
+        with self.assertRaises(ValueError):
+            decode_cursor('42')
+
+    def test_month_of(self):
+        # 2023-01-31 21:30 UTC is February in Moscow
+        timepoint = datetime.datetime(2023, 1, 31, 21, 30, tzinfo=datetime.timezone.utc)
+        self.assertEqual(month_of(timepoint), datetime.date(2023, 2, 1))
+        self.assertEqual(
+            month_of(datetime.datetime(2023, 1, 31, 23, 30)),
+            datetime.date(2023, 1, 1)
+        )
+        self.assertEqual(
+            month_of(datetime.date(2023, 1, 31)),
+            datetime.date(2023, 1, 1)
+        )
+
+    @patch.object(models, '_update_month_turnover')
+    def test_save_with_date_timepoint(self, update_month_turnover):
+        # Turnout payments and timesheets save operations with a date timepoint
+        operation = Operation(
+            pk=42,
+            debet_id=1,
+            credit_id=2,
+            timepoint=datetime.date(2023, 3, 1),
+            amount=Decimal('100.00'),
+        )
+        operation._before_save = (1, 2, datetime.date(2023, 2, 28), Decimal('100.00'))
+        models.update_month_turnovers_on_save(Operation, operation)
+        zero = Decimal('0.00')
+        self.assertEqual(
+            update_month_turnover.call_args_list,
+            [
+                call(1, datetime.date(2023, 2, 1), Decimal('-100.00'), zero),
+                call(2, datetime.date(2023, 2, 1), zero, Decimal('-100.00')),
+                call(1, datetime.date(2023, 3, 1), Decimal('100.00'), zero),
+                call(2, datetime.date(2023, 3, 1), zero, Decimal('100.00')),
+            ]
+        )
+
+
+class ForceUpdateOperationTestCase(SimpleTestCase):
+    @patch.object(Account, 'drop_turnover_cache', autospec=True)
+    @patch.object(models.models.Model, 'save')
+    def test_caches_of_previous_accounts_dropped(self, save, drop_turnover_cache):
+        debet, credit, new_credit = Account(pk=1), Account(pk=2), Account(pk=3)
+        operation = Operation(pk=42, debet=debet, credit=credit)
+        models.force_update_operation(operation, credit=new_credit)
+        save.assert_called_once_with(operation, update_fields=['credit'])
+        self.assertEqual(operation.credit, new_credit)
+        self.assertEqual(
+            {call_args[0][0] for call_args in drop_turnover_cache.call_args_list},
+            {debet, credit, new_credit}
+        )
@@ -17,7 +17,8 @@ from django.core.exceptions import (
 
 from finance.models import (
     Account,
-    Operation
+    Operation,
+    force_update_operation,
 )
 
 from the_redhuman_is import forms
@@ -328,12 +329,12 @@ def add_operation(request):
 
                 # getting around is_closed flag
                 # Todo: get rid of this (don't break standard is_closed mechanism)
-                Operation.objects.filter(pk=operation.pk).update(
+                force_update_operation(
+                    operation,
                     credit=credit,
                     amount=amount,
                     comment=f'{operation.comment}\n{comment}'
                 )
-                operation.credit = credit
             else:
                 _create_new_operation()
 
@@ -455,6 +455,7 @@ _CASHIER_PAGES = _OPERATIONS_PAGE + [
     ('the_redhuman_is', 'account_total_detail'),
     ('the_redhuman_is', 'operating_account_detail'),
     ('the_redhuman_is', 'operating_account_detail_json'),
+    ('the_redhuman_is', 'operating_account_ledger_json'),
     ('the_redhuman_is', 'operating_account_tree'),
     ('the_redhuman_is', 'operating_account_tree_json'),
     ('the_redhuman_is', 'operating_account_add_operation'),
@@ -335,6 +335,8 @@ SIMPLE_JWT = {
 
 # HUEY
 
+# Push campaigns use a queue of their own (see tasks.push_campaign_huey),
+# run its consumer next to run_huey: python manage.py run_push_campaigns
 HUEY = {
     'immediate': False
 }
@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from django.core.cache import cache
+from django.utils import timezone
+from pyquery import PyQuery as pq
+from requests.adapters import HTTPAdapter
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+from .models import (
+    HrSiteAccount,
+    HrSiteAdv,
+    HrSiteReport,
+)
+from .search_sites import (
+    search_avito,
+    search_birge,
+    search_jerdesh,
+    search_jobmo,
+    search_rabota,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# A search (see views.search) runs as a huey task (crawl_hr_sites):
+# every site is crawled in its own thread with its own pool: the plain HTML
+# sites with a Fetcher (one keep-alive session, pages fetched concurrently),
+# the JS ones with a BrowserPool (the keywords in parallel headless Chromes).
+# The progress and the found ads are published to the cache (Redis),
+# the report is written once, when the search is over.
+
+PROGRESS_TIMEOUT = 60 * 60
+
+FETCH_TIMEOUT = 30
+FETCH_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/110.0 Safari/537.36'
+    ),
+}
+
+SITE_THREADS = {
+    'avito': 2,
+    'birge': 4,
+    'rabota': 4,
+    'jerdesh': 4,
+    'jobmo': 2,
+}
+
+CHROMEDRIVER_PATH = '/usr/bin/chromedriver'
+
+
+def _progress_key(key):
+    return f'search_ads:progress:{key}'
+
+
+def get_progress(key):
+    """
+    Returns {'status': ..., 'done': ..., 'ads': [...] (when done)}
+    or None for an unknown search.
+    """
+    return cache.get(_progress_key(key))
+
+
+class Progress:
+    """
+    Statuses of the sites of a search, published to the cache.
+    """
+    def __init__(self, key):
+        self.key = key
+        self._lock = threading.Lock()
+        self._statuses = {}
+
+    def _publish(self, status, done=False, ads=None):
+        cache.set(
+            _progress_key(self.key),
+            {
+                'status': status,
+                'done': done,
+                'ads': ads,
+            },
+            PROGRESS_TIMEOUT
+        )
+
+    def queued(self):
+        self._publish('В очереди...')
+
+    def set(self, site, status):
+        with self._lock:
+            self._statuses[site] = status
+            self._publish('; '.join(self._statuses.values()))
+
+    def finish(self, ads):
+        self._publish('Поиск завершен', done=True, ads=ads)
+
+
+class Fetcher:
+    """
+    Fetches pages (as PyQuery documents) with a keep-alive session,
+    `fetch_many` fetches them concurrently with `threads` connections.
+    """
+    def __init__(self, threads=4):
+        self.threads = threads
+        self.session = requests.Session()
+        self.session.headers.update(FETCH_HEADERS)
+        adapter = HTTPAdapter(pool_connections=threads, pool_maxsize=threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url):
+        response = self.session.get(url, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def fetch(self, url):
+        # bytes: the parser takes the charset from the page
+        return pq(self.get(url))
+
+    def fetch_many(self, urls):
+        """
+        Returns the pages in the order of the urls; the pages which failed
+        to load are exceptions.
+        """
+        def _fetch(url):
+            try:
+                return self.fetch(url)
+            except Exception as exc:
+                return exc
+
+        if len(urls) <= 1:
+            return [_fetch(url) for url in urls]
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            return list(executor.map(_fetch, urls))
+
+    def close(self):
+        self.session.close()
+
+
+class FixtureFetcher(Fetcher):
+    """
+    Replays saved pages: `directory`/pages.json maps the urls to the files.
+    """
+    def __init__(self, directory, threads=1):
+        super().__init__(threads)
+        self.directory = directory
+        with open(os.path.join(directory, 'pages.json')) as f:
+            self.pages = json.load(f)
+
+    def get(self, url):
+        try:
+            name = self.pages[url]
+        except KeyError:
+            raise requests.HTTPError(f'No saved page for {url}')
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            return f.read()
+
+
+class RecordingFetcher(Fetcher):
+    """
+    Fetches the pages and saves them for FixtureFetcher.
+    """
+    def __init__(self, directory, threads=4):
+        super().__init__(threads)
+        self.directory = directory
+        self.pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        content = super().get(url)
+        with self._lock:
+            name = f'page_{len(self.pages) + 1}.html'
+            self.pages[url] = name
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(content)
+            with open(os.path.join(self.directory, 'pages.json'), 'w') as f:
+                json.dump(self.pages, f, ensure_ascii=False, indent=4)
+        return content
+
+
+def _new_browser():
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    prefs = {"profile.managed_default_content_settings.images": 2}
+    options.add_experimental_option("prefs", prefs)
+    return webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+
+
+class BrowserPool:
+    """
+    Headless Chromes, started when needed (up to `size`) and reused
+    until `close`.
+    """
+    def __init__(self, size, new_browser=_new_browser):
+        self.size = size
+        self._new_browser = new_browser
+        self._idle = queue.Queue()
+        self._browsers = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._browsers) < self.size:
+                browser = self._new_browser()
+                self._browsers.append(browser)
+                return browser
+        return self._idle.get()
+
+    def map(self, function, items):
+        """
+        `function(browser, item)` for the items in parallel browsers.
+        """
+        def _call(item):
+            browser = self._acquire()
+            try:
+                return function(browser, item)
+            finally:
+                self._idle.put(browser)
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(_call, items))
+
+    def close(self):
+        for browser in self._browsers:
+            try:
+                browser.quit()
+            except Exception as exc:
+                logger.warning('Failed to close the browser: %s', exc)
+        self._browsers = []
+
+
+# In the order of the results
+SITES = ['avito', 'birge', 'rabota', 'jerdesh', 'jobmo']
+
+
+def _search_site(site, keywords, accounts, pagenum, maxpos, progress, in_vacancies):
+    threads = SITE_THREADS[site]
+    if site in ('avito', 'jobmo'):
+        browsers = BrowserPool(threads)
+        try:
+            if site == 'avito':
+                return search_avito(browsers, keywords, accounts, pagenum, maxpos, progress, in_vacancies)
+            return search_jobmo(browsers, keywords, accounts, pagenum, maxpos, progress)
+        finally:
+            browsers.close()
+
+    search = {
+        'birge': search_birge,
+        'rabota': search_rabota,
+        'jerdesh': search_jerdesh,
+    }[site]
+    fetcher = Fetcher(threads)
+    try:
+        return search(fetcher, keywords, accounts, pagenum, maxpos, progress)
+    finally:
+        fetcher.close()
+
+
+def crawl(key, sites, keywords, account_ids, pagenum, maxpos, in_vacancies='no', save=False):
+    """
+    Searches the ads of the accounts on the sites and publishes them to the
+    progress of the search `key`. Saves the report if `save`.
+    """
+    progress = Progress(key)
+    create_time = timezone.now()
+    accounts = list(HrSiteAccount.objects.filter(pk__in=account_ids))
+    sites = [site for site in SITES if site in sites]
+
+    ads = []
+    with ThreadPoolExecutor(max_workers=max(1, len(sites))) as executor:
+        futures = [
+            (
+                site,
+                executor.submit(
+                    _search_site,
+                    site,
+                    keywords,
+                    accounts,
+                    pagenum,
+                    maxpos,
+                    progress,
+                    in_vacancies
+                )
+            )
+            for site in sites
+        ]
+        for site, future in futures:
+            try:
+                ads.extend(future.result())
+            except Exception:
+                logger.exception('Search on %s failed', site)
+                progress.set(site, f'{site}: ошибка поиска')
+
+    if save:
+        report = HrSiteReport.objects.create(
+            create_time=create_time,
+            key=key,
+            positionCount=maxpos,
+            sites=', '.join(sites),
+            managers=', '.join(
+                f'{account.name} ({account.phone})' for account in accounts
+            ),
+            current_status='Поиск завершен',
+        )
+        for ad in ads:
+            ad.report = report
+        HrSiteAdv.objects.bulk_create(ads)
+
+    progress.finish([ad.get_dict() for ad in ads])
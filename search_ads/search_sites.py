@@ -1,19 +1,36 @@
-from urllib.parse import quote
+import logging
 import re
-from .models import HrSiteAdv, HrSiteReport, HrSiteAccount, get_digit_str
-from .read_png import get_digits
+import time
+
+from urllib.parse import quote
+
 from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 from pyquery import PyQuery as pq
 
+from .models import HrSiteAdv, get_digit_str
+from .read_png import get_digits
+
+
+logger = logging.getLogger(__name__)
+
+
+# The search functions take a fetcher (crawler.Fetcher: pages of the plain
+# HTML sites are fetched concurrently over one session) or a browser pool
+# (crawler.BrowserPool: the keywords are searched in parallel browsers)
+# and publish the status to `progress` (crawler.Progress).
 
-def search_birge(keywords, accounts, maxpagenum, maxpos,report):
+
+def _raise_failed(page):
+    if isinstance(page, Exception):
+        raise page
+    return page
+
+
+def search_birge(fetcher, keywords, accounts, maxpagenum, maxpos, progress):
     url = 'https://moscow.birge.ru/catalog/rabota_predlagayu/filter/clear/apply/?'
-    print("search in birge")
-    print(keywords)
     ads = []
     status0 = "Поиск в Бирге "
     try:
@@ -21,33 +38,25 @@ def search_birge(keywords, accounts, maxpagenum, maxpos,report):
             key_url = url + "text=" + quote(keyword)
             position = 1
             for pagenum in range(0, maxpagenum):
-                report.current_status = status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+" "
-                report.save()
+                progress.set('birge', status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+" ")
                 if pagenum==0:
-                    r=pq(url=key_url)
+                    r = fetcher.fetch(key_url)
                 else:
-                    r=pq(url=key_url+"&PAGEN_1="+str(pagenum+1))
-                print("page: " + str(pagenum))
-                refs = [link.attrib["href"] for link in r(".href-detail")]
-                
-                print("found refs: {}".format(len(refs)))
-                for ref in refs:
+                    r = fetcher.fetch(key_url+"&PAGEN_1="+str(pagenum+1))
+                refs = [
+                    "https://moscow.birge.ru" + link.attrib["href"]
+                    for link in r(".href-detail")
+                ]
+                # Only the ads up to `maxpos` are looked at
+                refs = refs[:max(0, maxpos - position + 1)]
+                logger.debug('birge: page %s, found refs: %s', pagenum, len(refs))
+                for ref, item_r in zip(refs, fetcher.fetch_many(refs)):
                     try:
-                        ref = "https://moscow.birge.ru"+ref
-                        #print(ref)
-                        item_r = pq(url=ref)
-                        print(item_r(".name_ads").text())
-                        report.current_status = status0 + "по ключевому слову " + keyword + ", страница " + str(pagenum)+" позиция "+str(position)+", \""+item_r(".name_ads").text()+"\""
-                        report.save()
-                        #print(driver.find_element_by_class_name("name_ads").get_attribute("innerText"))
-                        if item_r(".dont_copy_phone") is None:
-                            position += 1
-                            continue
+                        item_r = _raise_failed(item_r)
+                        progress.set('birge', status0 + "по ключевому слову " + keyword + ", страница " + str(pagenum)+" позиция "+str(position)+", \""+item_r(".name_ads").text()+"\"")
                         item_phone_url = item_r(".dont_copy_phone").attr("src")
                         item_phone = str(get_digits(fname="https://moscow.birge.ru"+item_phone_url,site="birge"))
-                        print("position: {}".format(position))
                         for account in accounts:
-                            print("{0} - {1}".format(item_phone, account.phone))
                             if item_phone == account.phone:
                                 ad = HrSiteAdv()
                                 ad.account = account
@@ -55,7 +64,6 @@ def search_birge(keywords, accounts, maxpagenum, maxpos,report):
                                 ad.site = "Бирге"
                                 ad.date_time_str = item_r(".city-date").text()
                                 ad.ref = ref
-                                print("got page " + ad.ref)
                                 ad.title = item_r(".name_ads").text()
                                 ad.position = position
                                 ads.append(ad)
@@ -63,124 +71,110 @@ def search_birge(keywords, accounts, maxpagenum, maxpos,report):
                         if position >= maxpos:
                             break
                     except Exception as exc:
-                        print("error: {}".format(str(exc)))
+                        logger.warning('birge %s: %s', ref, exc)
                     position += 1
                 if pagenum + 1 >= maxpagenum:
                      break
                 if position >= maxpos:
                     break
     except ConnectionResetError:
-        print("connection error")
+        logger.warning('birge: connection error')
 
     return ads
 
 
-def search_avito(driver, keywords, accounts, maxpagenum, maxpos,report,in_vacancies=False):
-    print("search in avito")
+def _search_avito_keyword(driver, keyword, accounts, maxpagenum, maxpos, progress, in_vacancies):
     if in_vacancies=='on':
         host_url = 'https://www.avito.ru/moskva/vakansii?s_trg=3&'
     else:
         host_url = 'https://www.avito.ru/moskva?s_trg=3&'
     ads = []
     status0 = "Поиск в Авито "
-    try:
-        for keyword in keywords:
-            key_url = host_url + "q=" + quote(keyword, encoding='utf-8')
-            print(key_url)
-            position = 1
-            driver.get(key_url)
-            for pagenum in range(0, maxpagenum):
-                report.current_status = status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+" "
-                report.save()
-                print("page: " + str(pagenum))
-                refs = [link.get_attribute("href") for link in driver.find_elements_by_class_name("item-description-title-link")]
-                #print(refs)
-                for ref in refs:
-                    if position >= maxpos:
-                        return ads
-                    print("position: {}".format(position))
-                    try:
-                        print(ref)
-                        driver.get(ref)
-                        phone_tag = None #driver.find_element_by_css_selector(".js-item-phone-button")
-                        phone_tag = WebDriverWait(driver,5).until(EC.element_to_be_clickable((By.CSS_SELECTOR,".js-item-phone .js-item-phone-button")))
-                        phone_tag.click()
-                        print("clicked")
-                        phone_img_url=None
-                        phone_img=WebDriverWait(driver, 5).until(EC.visibility_of_element_located((By.CSS_SELECTOR,".js-item-phone .js-item-phone-button img")))
-                        print("item")
-                        phone_img_url = phone_img.get_attribute("src")
-                        item_phone = str(get_digits(phone_img_url))
-                        report.current_status = status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+", распознан номер "+item_phone
-                        report.save()
-                        print("recognized: '{}'".format(item_phone))
-                        for account in accounts:
-                            print("account phone: '{}'".format(account.phone))
-                            if item_phone == account.phone:
-                                report.current_status = status0 + "по ключевому слову " + keyword + ", страница " + str(
-                                    pagenum)+" позиция "+str(position)+", найдено совпадание по "+str(account)
-                                report.save()
-                                ad = HrSiteAdv()
-                                ad.account = account
-                                ad.keyword = keyword
-                                ad.date_time_str = driver.find_element_by_class_name("title-info-metadata-item").get_attribute("innerText")
-                                ad.ref = ref
-                                ad.site = "Авито"
-                                print("got page "+ad.ref)
-                                ad.title = driver.find_element_by_css_selector(".title-info-title-text").get_attribute("innerText")
-                                ad.position = position
-                                ads.append(ad)
-                                break
-                    except Exception as exc:
-                        print("error: {}".format(str(exc)))
-                    position += 1
-                    if position >= maxpos:
-                        break
-                if pagenum+1 >= maxpagenum:
-                    break
-                if position >= maxpos:
-                    break
-                driver.back()
-                try:
-                    pag = WebDriverWait(driver, 5).until(
-                        EC.visibility_of_element_located((By.CSS_SELECTOR, ".js-pagination-next")))
-                    #pag = driver.find_element_by_class_name("js-pagination-next")
-                    if pag is None:
-                        print("no next page")
+    key_url = host_url + "q=" + quote(keyword, encoding='utf-8')
+    position = 1
+    driver.get(key_url)
+    for pagenum in range(0, maxpagenum):
+        progress.set('avito', status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+" ")
+        refs = [
+            link.get_attribute("href")
+            for link in driver.find_elements(By.CLASS_NAME, "item-description-title-link")
+        ]
+        for ref in refs:
+            if position >= maxpos:
+                return ads
+            try:
+                driver.get(ref)
+                phone_tag = WebDriverWait(driver,5).until(EC.element_to_be_clickable((By.CSS_SELECTOR,".js-item-phone .js-item-phone-button")))
+                phone_tag.click()
+                phone_img=WebDriverWait(driver, 5).until(EC.visibility_of_element_located((By.CSS_SELECTOR,".js-item-phone .js-item-phone-button img")))
+                phone_img_url = phone_img.get_attribute("src")
+                item_phone = str(get_digits(phone_img_url))
+                progress.set('avito', status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+", распознан номер "+item_phone)
+                for account in accounts:
+                    if item_phone == account.phone:
+                        progress.set('avito', status0 + "по ключевому слову " + keyword + ", страница " + str(
+                            pagenum)+" позиция "+str(position)+", найдено совпадание по "+str(account))
+                        ad = HrSiteAdv()
+                        ad.account = account
+                        ad.keyword = keyword
+                        ad.date_time_str = driver.find_element(By.CLASS_NAME, "title-info-metadata-item").get_attribute("innerText")
+                        ad.ref = ref
+                        ad.site = "Авито"
+                        ad.title = driver.find_element(By.CSS_SELECTOR, ".title-info-title-text").get_attribute("innerText")
+                        ad.position = position
+                        ads.append(ad)
                         break
-                    else:
-                        pag.click()
-                except:
-                    break
-    except ConnectionResetError:
-        print("connection error")
+            except Exception as exc:
+                logger.warning('avito %s: %s', ref, exc)
+            position += 1
+            if position >= maxpos:
+                break
+        if pagenum+1 >= maxpagenum:
+            break
+        if position >= maxpos:
+            break
+        driver.back()
+        try:
+            pag = WebDriverWait(driver, 5).until(
+                EC.visibility_of_element_located((By.CSS_SELECTOR, ".js-pagination-next")))
+            if pag is None:
+                break
+            else:
+                pag.click()
+        except Exception:
+            break
 
     return ads
 
 
-def search_rabota(keywords, accounts, pagenum, maxpos,report):
-    #print(keywords)
-    #print(accounts)
-    print("search in rabota")
+def search_avito(browsers, keywords, accounts, maxpagenum, maxpos, progress, in_vacancies=False):
+    def _search(driver, keyword):
+        try:
+            return _search_avito_keyword(driver, keyword, accounts, maxpagenum, maxpos, progress, in_vacancies)
+        except ConnectionResetError:
+            logger.warning('avito: connection error')
+            return []
+
+    return [ad for ads in browsers.map(_search, keywords) for ad in ads]
+
+
+def search_rabota(fetcher, keywords, accounts, pagenum, maxpos, progress):
     url = 'https://www.rabota.ru/vacancy/'
     results = []
     status0 = "Поиск в Работа "
     for keyword in keywords:
-        print("keyword: " + keyword)
         key_url = url + quote(keyword)
-        print("url: "+key_url)
+        page_urls = [key_url] + [
+            key_url + "?page=" + str(i + 1)
+            for i in range(1, pagenum)
+        ]
+        pages = fetcher.fetch_many(page_urls)
         position = 1
         for i in range(0, pagenum):
             try:
-                report.current_status = status0 + "по ключевому слову "+keyword+", страница "+str(i)+" позиция "+str(position)+" "
-                report.save()
-                if i == 0:
-                    r = pq(url=key_url) #session.get(key_url)
-                else:
-                    r = pq(url=key_url + "?page=" + str(i + 1)) #session.get(key_url + "?page=" + str(i + 1))
-                    print(key_url + "?page=" + str(i))
+                progress.set('rabota', status0 + "по ключевому слову "+keyword+", страница "+str(i)+" позиция "+str(position)+" ")
+                r = _raise_failed(pages[i])
                 items = r.find(".list-vacancies__item")
-                print("Searching items " + str(len(items)))
                 for item in items:
                     try:
                         pq_item=pq(item)
@@ -193,16 +187,13 @@ def search_rabota(keywords, accounts, pagenum, maxpos,report):
                             tel_href = tel_href_item.attr('href')
                         else:
                             continue
-                        item_tel = get_digit_str(tel_href)[1:] #re.search("[0-9]+", tel_href).group(0)
-                        print(item_tel)
-                        report.current_status = status0 + "по ключевому слову " + keyword + ", страница " + str(i)+" позиция "+str(position)+" по номеру " + str(item_tel)
-                        report.save()
+                        item_tel = get_digit_str(tel_href)[1:]
+                        progress.set('rabota', status0 + "по ключевому слову " + keyword + ", страница " + str(i)+" позиция "+str(position)+" по номеру " + str(item_tel))
                         if item_tel == "":
                             continue
                         for account in accounts:
                             if account.phone == get_digit_str(item_tel):
                                 ad = HrSiteAdv()
-                                print("watching tel " + str(item_tel))
                                 ad.account = account
                                 ad.title = pq_item.find(".list-vacancies__company-title").attr('title')
                                 ad.keyword = keyword
@@ -215,40 +206,35 @@ def search_rabota(keywords, accounts, pagenum, maxpos,report):
                         if position >= maxpos:
                             break
                     except Exception as exc:
-                        print("error: {}".format(str(exc)))
+                        logger.warning('rabota: %s', exc)
                     position += 1
 
             except Exception as exc:
-                print("error: {}".format(str(exc)))
+                logger.warning('rabota %s: %s', page_urls[i], exc)
             position += 1
             if position >= maxpos:
                 break
-    print(results)
     return results
 
 
-def search_jerdesh(keywords, accounts, pagenum, maxpos,report):
-    print("search in jerdesh")
+def search_jerdesh(fetcher, keywords, accounts, pagenum, maxpos, progress):
     url = 'http://jerdesh.ru/search'
     ads = []
     status0 = "Поиск в Жердеш "
     for keyword in keywords:
         keyword = re.sub(" +", "+", keyword)
-        # tel = re.search("[0-9]+",tel).group(0)
         page_url = url + "/pattern," + quote(keyword,encoding='utf-8')
+        page_urls = [page_url] + [
+            page_url + "/iPage," + str(i + 1)
+            for i in range(1, pagenum)
+        ]
+        pages = fetcher.fetch_many(page_urls)
         position = 1
         for i in range(0, pagenum):
             try:
-                report.current_status = status0 + "по ключевому слову "+keyword+", страница "+str(i)+" позиция "+str(position)+" "
-                report.save()
-                print("page: " + str(i))
-                print(page_url)
-                if i == 0:
-                    r = pq(url=page_url) #session.get(url)
-                else:
-                    r = pq(url=page_url + "/iPage," + str(i + 1)) #session.get(page_url + "/iPage," + str(i + 1))
+                progress.set('jerdesh', status0 + "по ключевому слову "+keyword+", страница "+str(i)+" позиция "+str(position)+" ")
+                r = _raise_failed(pages[i])
                 items = r(".listing-card")
-                print("items: " + str(len(items)))
                 for item in items:
                     try:
                         pq_item=pq(item)
@@ -257,16 +243,11 @@ def search_jerdesh(keywords, accounts, pagenum, maxpos,report):
                             continue
                         else:
                             position += 1
-                        print("position: " + str(position))
                         item_tel = get_digit_str(phone_item.attr('title'))[1:]
-                        print("tel: " + item_tel)
-                        print("title: " + pq_item.find(".title").attr('title'))
-                        report.current_status = status0 + "по ключевому слову " + keyword + ", страница " + str(pagenum)+" позиция "+str(position)+", \""+pq_item.find(".title").attr('title')+"\""
-                        report.save()
+                        progress.set('jerdesh', status0 + "по ключевому слову " + keyword + ", страница " + str(i)+" позиция "+str(position)+", \""+pq_item.find(".title").attr('title')+"\"")
                         for account in accounts:
                             if account.phone == get_digit_str(item_tel):
                                 ad = HrSiteAdv()
-                                print(item_tel)
                                 title_item = pq_item.find(".title")
                                 ad.title = title_item.attr('title')
                                 ad.position = position
@@ -281,91 +262,91 @@ def search_jerdesh(keywords, accounts, pagenum, maxpos,report):
                         if position >= maxpos:
                             break
                     except Exception as exc:
-                        print(exc)
+                        logger.warning('jerdesh: %s', exc)
                     position += 1
                     if position >= maxpos:
                         break
             except Exception as exc:
                 position += 1
-                print(exc)
+                logger.warning('jerdesh %s: %s', page_urls[i], exc)
             if position >= maxpos:
                 break
 
     return ads
 
 
-def search_jobmo(driver, keywords, accounts, maxpagenum, maxpos,report):
-    print("search in jobmo")
-    #print(accounts)
+def _jobmo_phone(driver):
+    return get_digit_str(
+        driver.find_element(By.CSS_SELECTOR, "#p a").get_attribute("innerText")
+    )
+
+
+def _search_jobmo_keyword(driver, keyword, accounts, maxpagenum, maxpos, progress):
     ads = []
     url = 'https://www.job-mo.ru/search.php?r=vac&submit=1&'
     status0 = "Поиск в JobMo "
-    try:
-        for keyword in keywords:
-            print(keyword)
-            key_url = url + "srprofecy=" + quote(keyword, encoding="windows-1251")
-            print(key_url)
-            position = 1
-            for pagenum in range(0, maxpagenum):
-                if pagenum == 0:
-                    driver.get(key_url)
-                else:
-                    driver.get(key_url+"&page="+str(pagenum+1))
-                report.current_status = status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+" "
-                report.save()
-                print("page: " + str(pagenum))
-                refs = [link.get_attribute("href") for link in driver.find_elements_by_css_selector(".prof a")]
-                print(refs)
-                for ref in refs:
-                    try:
-                        print(ref)
-                        print("position: {}".format(position))
-                        driver.get(ref)
-                        try:
-                            WebDriverWait(driver,5).until(EC.visibility_of_element_located((By.ID,"p")))
-                        except TimeoutException:
-                            position += 1
-                            continue
-                        phone_tag = driver.find_element_by_css_selector("#p a")
-                        phone_tag.click()
-                        try:
-                            item_phone = get_digit_str(driver.find_element_by_css_selector("#p a").get_attribute("innerText"))
-                        except StaleElementReferenceException:
-                            time.sleep(1)
-                            item_phone = get_digit_str(
-                                driver.find_element_by_css_selector("#p a").get_attribute("innerText"))
-                        wn = 0
-                        while item_phone == '' or wn >= 5:
-                            time.sleep(0.5)
-                            item_phone = get_digit_str(driver.find_element_by_css_selector("#p a").get_attribute("innerText"))
-                        #print(phone_tag.get_attribute("class"))
-                        print("phone: '{}'".format(item_phone))
-                        print(keyword)
-                        for account in accounts:
-                            print("account phone: '{}'".format(account.phone))
-                            report.save()
-                            if account.phone in item_phone:
-                                report.current_status = status0 + "по ключевому слову " + keyword + ", страница " + str(pagenum)+" позиция "+str(position)+", найдено совпадение по телефону менеджера "+account.name
-                                ad = HrSiteAdv()
-                                ad.account = account
-                                ad.keyword = keyword
-                                ad.date_time_str = driver.find_element_by_class_name("small").get_attribute("innerText")
-                                ad.ref = ref
-                                ad.site = "Job-mo"
-                                print("got page "+ad.ref)
-                                ad.title = driver.find_element_by_css_selector(".contentmain h1").get_attribute("innerText")
-                                ad.position = position
-                                ads.append(ad)
-                                break
-                    except Exception as exc:
-                        print(exc)
+    key_url = url + "srprofecy=" + quote(keyword, encoding="windows-1251")
+    position = 1
+    for pagenum in range(0, maxpagenum):
+        if pagenum == 0:
+            driver.get(key_url)
+        else:
+            driver.get(key_url+"&page="+str(pagenum+1))
+        progress.set('jobmo', status0 + "по ключевому слову "+keyword+", страница "+str(pagenum)+" позиция "+str(position)+" ")
+        refs = [
+            link.get_attribute("href")
+            for link in driver.find_elements(By.CSS_SELECTOR, ".prof a")
+        ]
+        for ref in refs:
+            try:
+                driver.get(ref)
+                try:
+                    WebDriverWait(driver,5).until(EC.visibility_of_element_located((By.ID,"p")))
+                except TimeoutException:
                     position += 1
-                    if position >= maxpos:
+                    continue
+                phone_tag = driver.find_element(By.CSS_SELECTOR, "#p a")
+                phone_tag.click()
+                try:
+                    item_phone = _jobmo_phone(driver)
+                except StaleElementReferenceException:
+                    time.sleep(1)
+                    item_phone = _jobmo_phone(driver)
+                wn = 0
+                while item_phone == '' and wn < 5:
+                    wn += 1
+                    time.sleep(0.5)
+                    item_phone = _jobmo_phone(driver)
+                for account in accounts:
+                    if account.phone in item_phone:
+                        progress.set('jobmo', status0 + "по ключевому слову " + keyword + ", страница " + str(pagenum)+" позиция "+str(position)+", найдено совпадение по телефону менеджера "+account.name)
+                        ad = HrSiteAdv()
+                        ad.account = account
+                        ad.keyword = keyword
+                        ad.date_time_str = driver.find_element(By.CLASS_NAME, "small").get_attribute("innerText")
+                        ad.ref = ref
+                        ad.site = "Job-mo"
+                        ad.title = driver.find_element(By.CSS_SELECTOR, ".contentmain h1").get_attribute("innerText")
+                        ad.position = position
+                        ads.append(ad)
                         break
-                if position >= maxpos:
-                    break
-
-    except ConnectionResetError:
-        print("connection error")
+            except Exception as exc:
+                logger.warning('jobmo %s: %s', ref, exc)
+            position += 1
+            if position >= maxpos:
+                break
+        if position >= maxpos:
+            break
 
     return ads
+
+
+def search_jobmo(browsers, keywords, accounts, maxpagenum, maxpos, progress):
+    def _search(driver, keyword):
+        try:
+            return _search_jobmo_keyword(driver, keyword, accounts, maxpagenum, maxpos, progress)
+        except ConnectionResetError:
+            logger.warning('jobmo: connection error')
+            return []
+
+    return [ad for ads in browsers.map(_search, keywords) for ad in ads]
@@ -0,0 +1,8 @@
+from huey.contrib.djhuey import db_task
+
+
+@db_task()
+def crawl_hr_sites(key, sites, keywords, account_ids, pagenum, maxpos, in_vacancies, save):
+    from .crawler import crawl
+
+    crawl(key, sites, keywords, account_ids, pagenum, maxpos, in_vacancies, save)
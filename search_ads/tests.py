@@ -1,3 +1,79 @@
-from django.test import TestCase
+import os
+import unittest
 
-# Create your tests here.
+import numpy
+
+from django.apps import apps
+from django.test import SimpleTestCase
+
+from .read_png import (
+    glyph_bank,
+    segment_digits,
+)
+
+
+TEST_PAGES = os.path.join(os.path.dirname(__file__), 'test_pages')
+
+
+class DigitRecognitionTest(SimpleTestCase):
+    def _phone_image(self, bank, digits):
+        height = bank.images[0].shape[0] + 4
+        parts = [numpy.zeros((height, 3))]
+        for digit in digits:
+            glyph = bank.images[list(bank.digits).index(digit)]
+            parts.append(numpy.pad(glyph, ((2, height - glyph.shape[0] - 2), (0, 0))))
+            parts.append(numpy.zeros((height, 3)))
+        return numpy.hstack(parts)
+
+    def test_recognize_phone(self):
+        for site in ['avito', 'birge']:
+            bank = glyph_bank(site)
+            digits = [8, 9, 1, 6, 2, 3, 4, 5, 0, 7, 1]
+            image = self._phone_image(bank, digits)
+            recognized = [
+                bank.recognize(image[ymin:ymax, xmin:xmax])
+                for (xmin, xmax), (ymin, ymax) in segment_digits(image)
+            ]
+            self.assertEqual(recognized, digits, site)
+
+
+class _Progress:
+    def __init__(self):
+        self.statuses = []
+
+    def set(self, site, status):
+        self.statuses.append((site, status))
+
+
+@unittest.skipUnless(apps.is_installed('search_ads'), 'search_ads is not installed')
+class SavedPagesSearchTest(SimpleTestCase):
+    def setUp(self):
+        from .crawler import FixtureFetcher
+        from .models import HrSiteAccount
+
+        self.fetcher = FixtureFetcher(TEST_PAGES)
+        self.account = HrSiteAccount(name='Иван', phone='9161234567')
+
+    def test_rabota(self):
+        from .search_sites import search_rabota
+
+        progress = _Progress()
+        ads = search_rabota(self.fetcher, ['грузчик'], [self.account], 2, 20, progress)
+        self.assertEqual(
+            [(ad.title, ad.ref, ad.position) for ad in ads],
+            [
+                ('Грузчики посменно', 'https://www.rabota.ru/vacancy/1002/', 2),
+                ('Разнорабочий', 'https://www.rabota.ru/vacancy/1003/', 4),
+            ]
+        )
+        self.assertTrue(all(site == 'rabota' for site, _ in progress.statuses))
+
+    def test_jerdesh(self):
+        from .search_sites import search_jerdesh
+
+        # the second page is not saved: the failed page is skipped
+        ads = search_jerdesh(self.fetcher, ['грузчик'], [self.account], 2, 20, _Progress())
+        self.assertEqual(len(ads), 1)
+        self.assertEqual(ads[0].title, 'Требуются грузчики')
+        self.assertEqual(ads[0].ref, 'http://jerdesh.ru/birge/rabota/1.html')
+        self.assertEqual(ads[0].date_time_str, 'Москва, сегодня')
@@ -1,14 +1,9 @@
 from django.shortcuts import render
 from django.http import JsonResponse
+from .crawler import Progress, get_progress
 from .forms import HrSiteAccountForm, HrSiteAdvForm
 from .models import HrSiteReport, HrSiteAdv, HrSiteAccount
-from .search_sites import *
-from django.utils import timezone
-from requests_html import HTMLSession
-from django.shortcuts import redirect
-from selenium import webdriver
-from pyvirtualdisplay import Display
-from datetime import datetime
+from .tasks import crawl_hr_sites
 
 
 def create_hr_report(request):
@@ -24,26 +19,27 @@ def create_hr_report(request):
 
 
 def search(request):
+    """
+    Starts the search in the background; the progress and the found ads
+    are returned by get_report_status.
+    """
     data = request.POST
-    try:
-        print(data)
-    except UnicodeEncodeError:
-        request.encoding = "utf-8"
-        data = request.POST
-        print(data)
-    results = []
     keywords = data.getlist('keywords')
-    print(keywords)
     mnames = data.getlist('managers')
     if 'in_vacancies' in data.keys():
         in_vacancies=data['in_vacancies']
     else:
         in_vacancies = 'no'
-    accounts = []
-    for mname in mnames:
-        accounts.extend(HrSiteAccount.objects.filter(name=mname))
+    account_ids = list(
+        HrSiteAccount.objects.filter(
+            name__in=mnames
+        ).values_list(
+            'pk',
+            flat=True
+        )
+    )
     if 'pagenum' in data.keys():
-        pagenum = data['pagenum']
+        pagenum = int(data['pagenum'])
     else:
         pagenum = 5
     sites = data.getlist('site[]')
@@ -53,64 +49,26 @@ def search(request):
         maxpos=20
     key = int(data['key'])
 
-    report = HrSiteReport()
-    report.create_time = timezone.now()
-    report.key = key
-    report.positionCount = maxpos
-    report.sites = ", ".join(sites)
-    report.managers = ", ".join([account.name + " (" + account.phone + ")" for account in accounts])
-    report.current_status = 'Подготовка...'
-    report.save()
-
-    display = None
-    if "avito" in sites or "jobmo" in sites:
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-gpu")
-        prefs = {"profile.managed_default_content_settings.images": 2}
-        options.add_experimental_option("prefs", prefs)
-        driver = webdriver.Chrome(executable_path="/usr/bin/chromedriver", chrome_options=options)
-    else:
-        driver = None
-    if "avito" in sites:
-        avito_res = search_avito(driver, keywords, accounts, pagenum, maxpos,report,in_vacancies)
-        results.extend(avito_res)
-    if "birge" in sites:
-        birge_res = search_birge(keywords, accounts, pagenum, maxpos,report)
-        results.extend(birge_res)
-    if "rabota" in sites:
-        rabota_res = search_rabota(keywords, accounts, pagenum, maxpos,report)
-        results.extend(rabota_res)
-    if "jerdesh" in sites:
-        jerdesh_res = search_jerdesh(keywords, accounts, pagenum, maxpos,report)
-        results.extend(jerdesh_res)
-    if "jobmo" in sites:
-        jobmo_res = search_jobmo(driver, keywords, accounts, pagenum, maxpos,report)
-        results.extend(jobmo_res)
-    report.current_status = 'Поиск завершен'
-    report.save()
-    if driver is not None:
-        driver.close()
-    if 'save' in data.keys():
-        print("saving ads")
-        for row in results:
-            print(row)
-            row.report = report
-            row.save()
-    else:
-        report.delete()
-    if display is not None:
-        display.stop()
-    return JsonResponse({"ads":[result.get_dict() for result in results] })
+    Progress(key).queued()
+    crawl_hr_sites(
+        key,
+        sites,
+        keywords,
+        account_ids,
+        pagenum,
+        maxpos,
+        in_vacancies,
+        'save' in data.keys()
+    )
+    return JsonResponse({'key': key})
 
 
 def get_report_status(request):
     key = request.GET.get('key') or None
-    report = HrSiteReport.objects.filter(key=int(key)).first()
+    progress = get_progress(int(key)) if key else None
 
-    if report:
-        return JsonResponse({'status': report.current_status})
+    if progress:
+        return JsonResponse(progress)
     else:
         return JsonResponse(status=400, data={})
 
@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from telegram_bot.models import TelegramUser
+from telegram_bot.models import (
+    TelegramBroadcast,
+    TelegramUser,
+)
 
 
 class TelegramUserAdmin(admin.ModelAdmin):
@@ -9,3 +12,29 @@ class TelegramUserAdmin(admin.ModelAdmin):
 
 
 admin.site.register(TelegramUser, TelegramUserAdmin)
+
+
+class TelegramBroadcastAdmin(admin.ModelAdmin):
+    list_display = (
+        'timestamp',
+        'groups',
+        'recipient_count',
+        'sent_count',
+        'failed_count',
+        'retry_count',
+        'duration',
+    )
+    readonly_fields = (
+        'timestamp',
+        'groups',
+        'message',
+        'recipient_count',
+        'sent_count',
+        'failed_count',
+        'retry_count',
+        'duration',
+        'failed_chat_ids',
+    )
+
+
+admin.site.register(TelegramBroadcast, TelegramBroadcastAdmin)
@@ -0,0 +1,181 @@
+import datetime
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import telegram
+
+from django.conf import settings
+from django_telegrambot.apps import DjangoTelegramBot
+
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+
+# Telegram limits: about 30 messages per second in total and one message
+# per second to a chat. The limiter is shared by all the broadcasts of
+# the process. RetryAfter (flood control) pauses the whole bot.
+
+MESSAGES_PER_SECOND = 30
+CHAT_INTERVAL = 1.0
+
+BROADCAST_THREADS = 8
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class RateLimiter:
+    def __init__(self, messages_per_second, chat_interval):
+        self._interval = 1.0 / messages_per_second
+        self._chat_interval = chat_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+        self._next_chat_times = {}
+
+    def _forget_old_chats(self, now):
+        self._next_chat_times = {
+            chat_id: next_time
+            for chat_id, next_time in self._next_chat_times.items()
+            if next_time > now
+        }
+
+    def reserve(self, chat_id):
+        """
+        Returns the delay (seconds) after which a message to the chat
+        may be sent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if len(self._next_chat_times) > 10000:
+                self._forget_old_chats(now)
+            send_time = max(
+                now,
+                self._next_time,
+                self._next_chat_times.get(chat_id, 0.0)
+            )
+            self._next_time = send_time + self._interval
+            self._next_chat_times[chat_id] = send_time + self._chat_interval
+        return send_time - now
+
+    def wait(self, chat_id):
+        delay = self.reserve(chat_id)
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._next_time = max(self._next_time, time.monotonic() + seconds)
+
+
+_limiter = RateLimiter(MESSAGES_PER_SECOND, CHAT_INTERVAL)
+
+
+def group_chat_ids(group_names, bot_name=models.OFFICE_BOT):
+    """
+    Chat ids of the users of the groups, each chat once
+    (a user may be in several groups).
+    """
+    return list(
+        models.TelegramUser.objects.filter(
+            user__groups__name__in=group_names,
+            chat_id__isnull=False,
+            bot=bot_name,
+        ).order_by(
+            'chat_id'
+        ).values_list(
+            'chat_id',
+            flat=True
+        ).distinct()
+    )
+
+
+def _backoff(attempt):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+
+
+def send_with_retries(bot, chat_id, message, limiter=_limiter, sleep=time.sleep):
+    """
+    Returns (sent, retry count).
+    """
+    retries = 0
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.wait(chat_id)
+        try:
+            bot.sendMessage(
+                chat_id,
+                text=message,
+                parse_mode=telegram.ParseMode.HTML
+            )
+            return True, retries
+        except telegram.error.RetryAfter as e:
+            limiter.pause(e.retry_after)
+            delay = e.retry_after
+        except telegram.error.BadRequest as e:
+            logger.warning('Telegram chat %s: %s', chat_id, e)
+            return False, retries
+        except telegram.error.NetworkError:
+            # Timeouts and connection errors
+            delay = _backoff(attempt)
+        except telegram.TelegramError as e:
+            logger.warning('Telegram chat %s: %s', chat_id, e)
+            return False, retries
+
+        if attempt + 1 < MAX_ATTEMPTS:
+            retries += 1
+            sleep(delay)
+
+    logger.warning('Telegram chat %s: gave up after %s attempts', chat_id, MAX_ATTEMPTS)
+    return False, retries
+
+
+def broadcast(bot, message, chat_ids, limiter=_limiter, sleep=time.sleep):
+    """
+    Sends the message to the chats concurrently.
+    Returns {'sent': ..., 'failed': [chat id, ...], 'retries': ...}.
+    """
+    def _send(chat_id):
+        return send_with_retries(bot, chat_id, message, limiter, sleep)
+
+    with ThreadPoolExecutor(max_workers=BROADCAST_THREADS) as executor:
+        results = list(executor.map(_send, chat_ids))
+
+    return {
+        'sent': sum(1 for sent, _ in results if sent),
+        'failed': [
+            chat_id
+            for chat_id, (sent, _) in zip(chat_ids, results)
+            if not sent
+        ],
+        'retries': sum(retries for _, retries in results),
+    }
+
+
+def broadcast_to_groups(message, group_names):
+    """
+    Sends the message with the office bot to the users of the groups
+    and records the delivery stats (models.TelegramBroadcast).
+    """
+    bot = DjangoTelegramBot.getBot(settings.OFFICE_TELEGRAMBOT_TOKEN)
+    if bot is None:
+        return None
+
+    chat_ids = group_chat_ids(group_names)
+    started = time.monotonic()
+    stats = broadcast(bot, message, chat_ids)
+
+    return models.TelegramBroadcast.objects.create(
+        groups=', '.join(group_names),
+        message=message,
+        recipient_count=len(chat_ids),
+        sent_count=stats['sent'],
+        failed_count=len(stats['failed']),
+        retry_count=stats['retries'],
+        duration=datetime.timedelta(seconds=time.monotonic() - started),
+        failed_chat_ids=', '.join(stats['failed']),
+    )
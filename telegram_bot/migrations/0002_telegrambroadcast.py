@@ -0,0 +1,32 @@
+# Generated by Django 3.2.12 on 2023-02-14 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('groups', models.TextField(verbose_name='Группы')),
+                ('message', models.TextField(verbose_name='Сообщение')),
+                ('recipient_count', models.PositiveIntegerField(default=0, verbose_name='Получателей')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Доставлено')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Не доставлено')),
+                ('retry_count', models.PositiveIntegerField(default=0, verbose_name='Повторных попыток')),
+                ('duration', models.DurationField(blank=True, null=True, verbose_name='Длительность')),
+                ('failed_chat_ids', models.TextField(blank=True, default='', verbose_name='Чаты с ошибками')),
+            ],
+            options={
+                'verbose_name': 'Рассылка',
+                'verbose_name_plural': 'Рассылки',
+            },
+        ),
+    ]
@@ -47,3 +47,49 @@ class TelegramUser(models.Model):
 
     def __str__(self):
         return '{}'.format(self.phone)
+
+
+class TelegramBroadcast(models.Model):
+    timestamp = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Время'
+    )
+    groups = models.TextField(
+        verbose_name='Группы'
+    )
+    message = models.TextField(
+        verbose_name='Сообщение'
+    )
+    recipient_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Получателей'
+    )
+    sent_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Доставлено'
+    )
+    failed_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Не доставлено'
+    )
+    retry_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Повторных попыток'
+    )
+    duration = models.DurationField(
+        null=True,
+        blank=True,
+        verbose_name='Длительность'
+    )
+    failed_chat_ids = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Чаты с ошибками'
+    )
+
+    class Meta:
+        verbose_name = 'Рассылка'
+        verbose_name_plural = 'Рассылки'
+
+    def __str__(self):
+        return '{} {}'.format(self.timestamp, self.groups)
@@ -1,3 +1,63 @@
-from django.test import TestCase
+import telegram
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .broadcast import (
+    MAX_ATTEMPTS,
+    RateLimiter,
+    broadcast,
+)
+
+
+class _Bot:
+    def __init__(self, errors):
+        # {chat id: [exception to raise on the attempts, ...]}
+        self.errors = errors
+        self.sent = []
+
+    def sendMessage(self, chat_id, text, parse_mode):
+        errors = self.errors.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append(chat_id)
+
+
+class BroadcastTest(SimpleTestCase):
+    def _broadcast(self, bot, chat_ids):
+        delays = []
+        stats = broadcast(
+            bot,
+            'message',
+            chat_ids,
+            limiter=RateLimiter(1000, 0),
+            sleep=delays.append
+        )
+        return stats, delays
+
+    def test_retry_after(self):
+        bot = _Bot({'2': [telegram.error.RetryAfter(3)]})
+        stats, delays = self._broadcast(bot, ['1', '2', '3'])
+
+        self.assertEqual(sorted(bot.sent), ['1', '2', '3'])
+        self.assertEqual(stats, {'sent': 3, 'failed': [], 'retries': 1})
+        self.assertEqual(delays, [3.0])
+
+    def test_failures(self):
+        bot = _Bot({
+            '1': [telegram.error.Unauthorized('blocked')],
+            '2': [telegram.error.TimedOut()] * MAX_ATTEMPTS,
+        })
+        stats, delays = self._broadcast(bot, ['1', '2', '3'])
+
+        self.assertEqual(bot.sent, ['3'])
+        self.assertEqual(
+            stats,
+            {'sent': 1, 'failed': ['1', '2'], 'retries': MAX_ATTEMPTS - 1}
+        )
+        self.assertEqual(len(delays), MAX_ATTEMPTS - 1)
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(10, 1.0)
+        self.assertEqual(limiter.reserve('1'), 0)
+        self.assertAlmostEqual(limiter.reserve('2'), 0.1, places=2)
+        self.assertAlmostEqual(limiter.reserve('1'), 1.0, places=2)
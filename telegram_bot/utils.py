@@ -6,7 +6,7 @@ from django.conf import settings
 
 from django_telegrambot.apps import DjangoTelegramBot
 
-from . import models
+from .broadcast import broadcast_to_groups
 
 
 def send_message(chat_id, message):
@@ -26,11 +26,4 @@ def send_message(chat_id, message):
 
 
 def send_message_to_group(message, group_name):
-    users = models.TelegramUser.objects.filter(
-        user__groups__name=group_name,
-        chat_id__isnull=False,
-        bot=models.OFFICE_BOT,
-    )
-    for user in users:
-        chat_id = user.chat_id
-        send_message(chat_id, message)
+    broadcast_to_groups(message, [group_name])
@@ -56,6 +56,7 @@ from the_redhuman_is.models import (
 from the_redhuman_is.models.delivery import (
     DeliveryRequestOperator,
 )
+from the_redhuman_is.models.turnout_calculators import TimesheetCalculationContext
 from the_redhuman_is.models.worker import (
     WorkerUser,
 )
@@ -540,6 +541,7 @@ def _update_turnouts(request, timesheet, forms):
     if foreman_index >= 0:
         indexes.append(foreman_index)
 
+    saved_turnouts = []
     for i in indexes:
         form = forms[i]
         turnout = form.save(commit=False)
@@ -621,11 +623,18 @@ def _update_turnouts(request, timesheet, forms):
         except ObjectDoesNotExist:
             pass
 
+        saved_turnouts.append((i, turnout, deduction_worker))
+
+    # Калькуляторы используют данные всего табеля (часы за сутки, выработку
+    # и т.п.), поэтому начисления пересчитываются после сохранения всех выходов
+    calculation_context = TimesheetCalculationContext(timesheet)
+    for i, turnout, deduction_worker in saved_turnouts:
         update_turnout_payments(
             turnout.pk,
             request.user,
             deduction_worker,
-            force_commit=True
+            force_commit=True,
+            context=calculation_context
         )
 
         worker = turnout.worker
@@ -445,6 +445,7 @@ admin.site.register(delivery.Location)
 _register(delivery.DeliveryWorkerFCMToken, ['user'], readonly_ids=['timestamp'])
 _register(delivery.MobileAppStatus, ['user', 'location'], readonly_ids=['timestamp'])
 _register(delivery.OnlineStatusMark, ['user'], readonly_ids=['timestamp'])
+_register(delivery.PushCampaign, [], readonly_ids=['timestamp'])
 
 _register(delivery.DeliveryInvoice, ['author', 'customer'], readonly_ids=['timestamp'])
 
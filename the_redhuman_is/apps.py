@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class TheRedhumanIsConfig(AppConfig):
     name = 'the_redhuman_is'
+
+    def ready(self):
+        # signal receivers outside of the models modules
+        from the_redhuman_is.services.delivery import (  # noqa: F401
+            map_snapshot,
+            self_assign_pool,
+        )
+        from the_redhuman_is.services import worker  # noqa: F401
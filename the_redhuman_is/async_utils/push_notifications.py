@@ -38,3 +38,87 @@ def send_single_message(title, body, data, tag, token):
     )
 
     return messaging.send(message)
+
+
+# FCM does not accept more than 500 tokens in a single multicast message
+MULTICAST_MAX_TOKENS = 500
+
+
+def send_multicast_message(title, body, data, tag, tokens):
+    if not CERT_FILENAME:
+        return None
+
+    if title is not None or body is not None:
+        notification = messaging.AndroidNotification(
+            title=title,
+            body=body,
+            tag=tag
+        )
+    else:
+        notification = None
+    android_config = messaging.AndroidConfig(
+        collapse_key='status_update',
+        notification=notification,
+        data=data
+    )
+    message = messaging.MulticastMessage(
+        android=android_config,
+        tokens=tokens,
+    )
+
+    return messaging.send_multicast(message)
+
+
+# FCM does not accept more than 500 messages in a single batch
+BATCH_MAX_MESSAGES = 500
+
+
+def send_messages(messages):
+    """
+    Sends different messages in a single batch request.
+    `messages` is a list of (title, body, data, tag, token).
+    """
+    if not CERT_FILENAME:
+        return None
+
+    batch = []
+    for title, body, data, tag, token in messages:
+        if title is not None or body is not None:
+            notification = messaging.AndroidNotification(
+                title=title,
+                body=body,
+                tag=tag
+            )
+        else:
+            notification = None
+        android_config = messaging.AndroidConfig(
+            collapse_key='status_update',
+            notification=notification,
+            data=data
+        )
+        batch.append(
+            messaging.Message(
+                android=android_config,
+                token=token,
+            )
+        )
+
+    return messaging.send_all(batch)
+
+
+def unregistered_tokens(tokens, batch_response):
+    """
+    Returns the tokens which FCM reported as no longer valid
+    (the app was removed or the token belongs to another project).
+    """
+    if batch_response is None:
+        return []
+
+    return [
+        token
+        for token, response in zip(tokens, batch_response.responses)
+        if isinstance(
+            response.exception,
+            (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+        )
+    ]
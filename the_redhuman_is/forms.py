@@ -13,6 +13,7 @@ from dal import autocomplete
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.forms import SimpleArrayField
 from django.db.models import Q
 from django.forms import widgets
 from django.utils import timezone
@@ -341,6 +342,12 @@ def all_worker_search_form():
 WorkerSearchFormSet = forms.formset_factory(WorkerSearchForm)
 
 
+class WorkersDebtorsFilterForm(forms.Form):
+    min_saldo = forms.DecimalField(label='Долг от', required=False)
+    max_saldo = forms.DecimalField(label='Долг до', required=False)
+    top = forms.IntegerField(label='Первые', required=False, min_value=1)
+
+
 class WorkerWithContractSearchForm(forms.Form):
     worker = forms.ModelChoiceField(
         queryset=Worker.objects.all(),
@@ -1643,6 +1650,12 @@ class MakeExpenseForm(forms.Form):
 
 class PhotoLoadSessionForm(forms.Form):
     file = forms.FileField(required=False)
+    # Complete chunked uploads (see PhotoUploadChunkForm), comma separated
+    upload = SimpleArrayField(
+        forms.UUIDField(),
+        required=False,
+        widget=forms.HiddenInput()
+    )
     comment = forms.CharField(widget=forms.Textarea(attrs={'rows': 2}),
                               required=False,
                               label='Комментарий')
@@ -1658,6 +1671,16 @@ class PhotoLoadSessionForm(forms.Form):
         )
 
 
+class PhotoUploadChunkForm(forms.Form):
+    """
+    A chunk of a file from Dropzone (chunking: true).
+    """
+    dzuuid = forms.UUIDField()
+    dzchunkbyteoffset = forms.IntegerField(min_value=0)
+    dztotalfilesize = forms.IntegerField(min_value=1)
+    file = forms.FileField(allow_empty_file=False)
+
+
 class PhotoLoadSessionCommentForm(forms.Form):
     comment = forms.CharField(widget=forms.Textarea, required=True,
                               label='Комментарий')
@@ -1,13 +1,58 @@
 from django.core.management.base import BaseCommand
 
-
 from the_redhuman_is import models
+from the_redhuman_is.models.paysheet_v2 import WorkerReceipt
+from the_redhuman_is.services.photo_coverage import (
+    request_turnout_timesheets,
+    without_photos,
+)
 
 
 class Command(BaseCommand):
+    help = 'Prints the timesheets of the request turnouts without photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paysheets',
+            action='store_true',
+            help='Also print the closed paysheets without photos',
+        )
+        parser.add_argument(
+            '--receipts',
+            action='store_true',
+            help='Also print the worker receipts without photos',
+        )
+
     def handle(self, *args, **options):
-        turnouts = models.RequestWorkerTurnout.objects.all()
-        for turnout in turnouts:
-            timesheet = turnout.workerturnout.timesheet
-            if not models.get_photos(timesheet).exists():
-                print(timesheet)
+        timesheets = without_photos(
+            request_turnout_timesheets()
+        ).select_related(
+            'customer',
+            'cust_location',
+        ).order_by(
+            'sheet_date',
+            'pk',
+        )
+        for timesheet in timesheets.iterator():
+            print(timesheet)
+
+        if options['paysheets']:
+            paysheets = without_photos(
+                models.Paysheet_v2.objects.filter(is_closed=True)
+            ).order_by(
+                'pk'
+            )
+            for paysheet in paysheets.iterator():
+                print(paysheet)
+
+        if options['receipts']:
+            receipts = without_photos(
+                WorkerReceipt.objects.all()
+            ).order_by(
+                'pk'
+            ).values_list(
+                'pk',
+                'url',
+            )
+            for pk, url in receipts.iterator():
+                print('Чек {} {}'.format(pk, url))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from the_redhuman_is.services.delivery.summary import (
+    count_stale_summaries,
+    refresh_request_summaries,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized delivery request counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report the number of missing or out of sync summaries',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            print('Out of sync summaries: {}'.format(count_stale_summaries()))
+        else:
+            print('Fixed summaries: {}'.format(refresh_request_summaries()))
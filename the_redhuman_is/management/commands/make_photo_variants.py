@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from the_redhuman_is.services.photo_variants import (
+    BACKFILL_THREADS,
+    backfill_photo_variants,
+    photos_without_variants,
+)
+
+
+class Command(BaseCommand):
+    help = 'Makes the resized variants of the photos without them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=BACKFILL_THREADS,
+            help='Number of parallel threads',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Process at most this number of photos',
+        )
+
+    def handle(self, *args, **options):
+        photo_pks = photos_without_variants().order_by(
+            '-pk'
+        ).values_list(
+            'pk',
+            flat=True
+        )
+        if options['limit']:
+            photo_pks = photo_pks[:options['limit']]
+
+        done, failed = backfill_photo_variants(
+            list(photo_pks),
+            threads=options['threads']
+        )
+        print('Photos with variants: {}, failed: {}'.format(done, failed))
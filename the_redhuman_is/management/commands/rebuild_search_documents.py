@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from the_redhuman_is.models.search import (
+    update_request_search_documents,
+    update_worker_search_documents,
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds search documents of all the delivery requests and workers'
+
+    def handle(self, *args, **options):
+        update_request_search_documents()
+        update_worker_search_documents()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from the_redhuman_is.models.models import reconcile_worker_balances
+
+
+class Command(BaseCommand):
+    help = 'Recomputes precomputed worker balances from the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report the number of out of sync balances',
+        )
+
+    def handle(self, *args, **options):
+        count = reconcile_worker_balances(dry_run=options['check'])
+        if options['check']:
+            print('Out of sync balances: {}'.format(count))
+        else:
+            print('Fixed balances: {}'.format(count))
@@ -0,0 +1,28 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from huey.consumer_options import ConsumerConfig
+
+
+class Command(BaseCommand):
+    help = 'Runs the consumer of the push campaign queue (see tasks.push_campaign_huey)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of workers',
+        )
+
+    def handle(self, *args, **options):
+        from the_redhuman_is.tasks import push_campaign_huey
+
+        config = ConsumerConfig(workers=options['workers'])
+        config.validate()
+        logger = logging.getLogger('huey')
+        if not logger.handlers:
+            config.setup_logger(logger)
+
+        push_campaign_huey.create_consumer(**config.values).run()
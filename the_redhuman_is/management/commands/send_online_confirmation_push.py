@@ -4,32 +4,22 @@ from django.core.management import BaseCommand
 from django.utils import timezone
 
 from the_redhuman_is import models
-from the_redhuman_is import tasks
-
-
-def send_message(worker, date):
-    token = models.DeliveryWorkerFCMToken.objects.filter(
-        user=worker.workeruser.user
-    ).order_by(
-        'timestamp'
-    ).last()
-    if token is not None:
-        date_str = date.strftime(format='%d.%m')
-        title = 'Заявки на завтра'
-        text = f'{worker.name}, Вы готовы завтра, {date_str}, выполнять заявки?'
-        tasks.send_push_notification(
-            None,
-            None,
-            {
-                'gt_action': 'gt_online_confirmation',
-                'gt_title': title,
-                'gt_text': text,
-                'gt_yes_text': 'Готов',
-                'gt_no_text': 'Нет',
-            },
-            'online_status_mark',
-            token.token
-        )
+from the_redhuman_is.services.push_notifications import start_campaign
+
+
+def _message(name, date):
+    date_str = date.strftime(format='%d.%m')
+    return (
+        None,
+        None,
+        {
+            'gt_action': 'gt_online_confirmation',
+            'gt_title': 'Заявки на завтра',
+            'gt_text': f'{name}, Вы готовы завтра, {date_str}, выполнять заявки?',
+            'gt_yes_text': 'Готов',
+            'gt_no_text': 'Нет',
+        },
+    )
 
 
 class Command(BaseCommand):
@@ -50,8 +40,17 @@ class Command(BaseCommand):
             workerzone__zone=zone['pk'],
             banned__isnull=True,
             is_online_tomorrow=None
+        ).values_list(
+            'pk',
+            'name',
         )
 
         tomorrow = datetime.date.today() + datetime.timedelta(days=1)
-        for worker in workers:
-            send_message(worker, tomorrow)
+        start_campaign(
+            'online_status_mark',
+            {pk: _message(name, tomorrow) for pk, name in workers},
+            # The question makes no sense tomorrow
+            deadline=timezone.make_aware(
+                datetime.datetime.combine(tomorrow, datetime.time.min)
+            ),
+        )
@@ -2,8 +2,6 @@
 
 from django.core.management.base import BaseCommand
 
-from django.db.models import Q
-
 from finance.models import update_if_changed
 
 from the_redhuman_is import models
@@ -36,20 +34,28 @@ class Command(BaseCommand):
                 timesheet__cust_location_id=location_pk
             )
 
-        for turnout in turnouts:
+        # the turnouts of a timesheet share the calculation context
+        context = None
+        for turnout in turnouts.select_related(
+            'timesheet',
+            'turnoutservice__customer_service',
+        ).order_by(
+            'timesheet'
+        ):
             timesheet = turnout.timesheet
             if not hasattr(turnout, 'turnoutservice'):
                 continue
             customer_service = turnout.turnoutservice.customer_service
 
-            calculator = models.AmountCalculator.objects.get(
-                Q(servicecalculator__last_day__isnull=True) |
-                Q(servicecalculator__last_day__gte=timesheet.sheet_date),
-                servicecalculator__customer_service=customer_service,
-                servicecalculator__first_day__lte=timesheet.sheet_date,
+            if context is None or context.timesheet.pk != timesheet.pk:
+                context = models.TimesheetCalculationContext(timesheet)
+
+            calculator = context.amount_calculator(
+                timesheet.sheet_date,
+                customer_service
             )
 
-            customer_amount = calculator.customer_calculator.get_amount(turnout)
+            customer_amount = calculator.customer_calculator.get_amount(turnout, context)
 
             turnout_customer_operation = models.TurnoutCustomerOperation.objects.filter(
                 turnout=turnout
@@ -8,6 +8,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 
 from the_redhuman_is import models
+from the_redhuman_is.services.delivery.summary import refresh_request_summaries
 
 from utils.date_time import date_from_string
 
@@ -31,6 +32,7 @@ class Command(BaseCommand):
             date__range=(first_day, last_day)
         )
 
+        updated_requests = []
         for request in requests:
             items = request.deliveryitem_set.all()
             if items.count() == 1:
@@ -60,3 +62,6 @@ class Command(BaseCommand):
                     if hasattr(item, 'normalizedaddress'):
                         item.normalizedaddress.delete()
                     item.delete()
+                    updated_requests.append(request.pk)
+
+        refresh_request_summaries(updated_requests)
@@ -1,8 +1,29 @@
 from django.core.management.base import BaseCommand
 
-from the_redhuman_is.services.worker import update_reliability
+from the_redhuman_is.services.worker import (
+    recompute_reliability,
+    update_reliability,
+)
 
 
 class Command(BaseCommand):
+    help = 'Moves the worker reliability window to today'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            nargs='+',
+            type=int,
+            help='Recompute the reliability of the workers from scratch',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute the reliability of all the workers from scratch',
+        )
+
     def handle(self, *args, **options):
-        update_reliability()
+        if options['all']:
+            recompute_reliability()
+        else:
+            update_reliability(options['workers'])
@@ -0,0 +1,78 @@
+# Generated by Django 3.2.12 on 2023-02-06 12:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_worker_balances(apps, schema_editor):
+    Operation = apps.get_model('finance', 'Operation')
+    WorkerOperatingAccount = apps.get_model(
+        'the_redhuman_is',
+        'WorkerOperatingAccount'
+    )
+    WorkerBalance = apps.get_model('the_redhuman_is', 'WorkerBalance')
+
+    def _turnovers(side):
+        return dict(
+            Operation.objects.filter(
+                **{f'{side}__worker_account__isnull': False}
+            ).order_by().values_list(
+                side
+            ).annotate(
+                amount_sum=Sum('amount')
+            )
+        )
+
+    debits = _turnovers('debet')
+    credits = _turnovers('credit')
+    zero = Decimal('0.00')
+
+    balances = []
+    for worker_id, account_id in WorkerOperatingAccount.objects.values_list(
+            'worker',
+            'account'):
+        debit = debits.get(account_id, zero)
+        credit = credits.get(account_id, zero)
+        balances.append(
+            WorkerBalance(
+                worker_id=worker_id,
+                account_id=account_id,
+                debit=debit,
+                credit=credit,
+                saldo=debit - credit
+            )
+        )
+    WorkerBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+        ('the_redhuman_is', '0011_alter_talkbankwebhookrequest_request_body'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=30, verbose_name='Дебет')),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=30, verbose_name='Кредит')),
+                ('saldo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=30, verbose_name='Сальдо')),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='worker_balance', to='finance.account', verbose_name='Расчетный счет')),
+                ('worker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='the_redhuman_is.worker', verbose_name='Работник')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='workerbalance',
+            index=models.Index(fields=['saldo'], name='workerbalance_saldo_idx'),
+        ),
+        migrations.RunPython(
+            fill_worker_balances,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.12 on 2023-02-08 11:20
+
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_search_documents(apps, schema_editor):
+    from the_redhuman_is.models.search import (
+        update_request_search_documents,
+        update_worker_search_documents,
+    )
+    update_request_search_documents(apps=apps)
+    update_worker_search_documents(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0012_workerbalance'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='DeliveryRequestSearchDocument',
+            fields=[
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='the_redhuman_is.deliveryrequest', verbose_name='Заявка')),
+                ('common', models.TextField(default='', verbose_name='Номер, водитель, адреса')),
+                ('details', models.TextField(default='', verbose_name='Маршрут, телефоны, комментарий')),
+                ('customer_comment', models.TextField(default='', verbose_name='Комментарий клиента')),
+                ('backoffice', models.TextField(default='', verbose_name='Работники, клиент')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkerSearchDocument',
+            fields=[
+                ('worker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='the_redhuman_is.worker', verbose_name='Работник')),
+                ('document', models.TextField(default='', verbose_name='ФИО, телефон, паспорта')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='workersearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['document'], name='workersearch_document_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequestsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['common'], name='reqsearch_common_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequestsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['details'], name='reqsearch_details_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequestsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['customer_comment'], name='reqsearch_cust_comment_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequestsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['backoffice'], name='reqsearch_backoffice_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(
+            fill_search_documents,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
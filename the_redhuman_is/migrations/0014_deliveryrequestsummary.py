@@ -0,0 +1,183 @@
+# Generated by Django 3.2.12 on 2023-02-10 12:45
+
+from django.db import migrations, models
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    IntegerField,
+    Min,
+    OuterRef,
+    Subquery,
+    Sum,
+    TimeField,
+)
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _photo_count(apps, step_model_name, step_name):
+    # Unchecked, not rejected photos of the not rejected workers
+    Photo = apps.get_model('the_redhuman_is', 'Photo')
+    step_model = apps.get_model('the_redhuman_is', step_model_name)
+    return Coalesce(
+        Subquery(
+            step_model.objects.filter(
+                itemworker__itemworkerrejection__isnull=True,
+                itemworker__requestworker__request=OuterRef('pk'),
+                itemworker__requestworker__workerrejection__isnull=True,
+                **{f'{step_name}confirmation__isnull': True}
+            ).annotate(
+                photo_count=Subquery(
+                    Photo.objects.filter(
+                        content_type__app_label='the_redhuman_is',
+                        content_type__model=step_name,
+                        photorejectioncomment__isnull=True,
+                        object_id=OuterRef('pk')
+                    ).values(
+                        'object_id'
+                    ).annotate(
+                        Count('pk')
+                    ).values(
+                        'pk__count'
+                    ),
+                    output_field=IntegerField(),
+                )
+            ).order_by(
+            ).values(
+                'itemworker__requestworker__request'
+            ).annotate(
+                Sum('photo_count')
+            ).values(
+                'photo_count__sum'
+            ),
+            output_field=IntegerField(),
+        ),
+        0
+    )
+
+
+def fill_request_summaries(apps, schema_editor):
+    # The historical models have no DeliveryRequestQuerySet annotations,
+    # the counters are computed here the same way.
+    DeliveryRequest = apps.get_model('the_redhuman_is', 'DeliveryRequest')
+    DeliveryRequestSummary = apps.get_model('the_redhuman_is', 'DeliveryRequestSummary')
+    DeliveryItem = apps.get_model('the_redhuman_is', 'DeliveryItem')
+    ItemWorker = apps.get_model('the_redhuman_is', 'ItemWorker')
+    Photo = apps.get_model('the_redhuman_is', 'Photo')
+    RequestWorker = apps.get_model('the_redhuman_is', 'RequestWorker')
+
+    active_workers = RequestWorker.objects.filter(
+        request=OuterRef('pk'),
+        workerrejection__isnull=True,
+    ).annotate(
+        active=Exists(
+            ItemWorker.objects.filter(
+                requestworker=OuterRef('pk'),
+                itemworkerrejection__isnull=True,
+            )
+        )
+    ).filter(
+        active=True
+    ).order_by()
+
+    def worker_count(workers):
+        return Coalesce(
+            Subquery(
+                workers.values(
+                    'request'
+                ).annotate(
+                    count=Count('pk')
+                ).values('count'),
+                output_field=IntegerField()
+            ),
+            0,
+        )
+
+    items = DeliveryItem.objects.filter(
+        request=OuterRef('pk'),
+        workers_required__gt=0,
+    ).values(
+        'request'
+    )
+
+    summaries = DeliveryRequest.objects.annotate(
+        worker_count=worker_count(active_workers),
+        worker_confirmed_count=worker_count(
+            active_workers.filter(workerconfirmation__isnull=False)
+        ),
+        new_start_photo_count=_photo_count(apps, 'ItemWorkerStart', 'itemworkerstart'),
+        new_finish_photo_count=_photo_count(apps, 'ItemWorkerFinish', 'itemworkerfinish'),
+        extra_photos_exist=Exists(
+            Photo.objects.filter(
+                content_type__app_label='the_redhuman_is',
+                content_type__model='deliveryrequest',
+                object_id=OuterRef('pk')
+            )
+        ),
+        has_self_assigned_worker=Exists(
+            active_workers.filter(author=F('worker__workeruser__user'))
+        ),
+        items_count=Coalesce(
+            Subquery(
+                items.annotate(item_count=Count('pk')).values('item_count'),
+                output_field=IntegerField()
+            ),
+            0
+        ),
+        confirmed_timepoint=Subquery(
+            items.annotate(
+                Min('confirmed_timepoint')
+            ).values(
+                'confirmed_timepoint__min'
+            ),
+            output_field=TimeField()
+        ),
+    ).order_by(
+    ).values(
+        'pk',
+        'worker_count',
+        'worker_confirmed_count',
+        'new_start_photo_count',
+        'new_finish_photo_count',
+        'extra_photos_exist',
+        'has_self_assigned_worker',
+        'items_count',
+        'confirmed_timepoint',
+    )
+
+    batch = []
+    for values in summaries.iterator(chunk_size=2000):
+        batch.append(DeliveryRequestSummary(request_id=values.pop('pk'), **values))
+        if len(batch) == 1000:
+            DeliveryRequestSummary.objects.bulk_create(batch)
+            batch = []
+    DeliveryRequestSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0013_search_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryRequestSummary',
+            fields=[
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='the_redhuman_is.deliveryrequest', verbose_name='Заявка')),
+                ('worker_count', models.PositiveIntegerField(default=0, verbose_name='Работников')),
+                ('worker_confirmed_count', models.PositiveIntegerField(default=0, verbose_name='Подтвержденных работников')),
+                ('new_start_photo_count', models.PositiveIntegerField(default=0, verbose_name='Непроверенных фото начала')),
+                ('new_finish_photo_count', models.PositiveIntegerField(default=0, verbose_name='Непроверенных фото окончания')),
+                ('extra_photos_exist', models.BooleanField(default=False, verbose_name='Есть дополнительные фото')),
+                ('has_self_assigned_worker', models.BooleanField(default=False, verbose_name='Есть самоназначенный работник')),
+                ('items_count', models.PositiveIntegerField(default=0, verbose_name='Адресов')),
+                ('confirmed_timepoint', models.TimeField(null=True, verbose_name='Подтвержденное время')),
+            ],
+        ),
+        migrations.RunPython(
+            fill_request_summaries,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
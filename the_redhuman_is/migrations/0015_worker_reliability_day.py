@@ -0,0 +1,48 @@
+# Generated by Django 3.2.12 on 2023-02-15 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0014_deliveryrequestsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerrating',
+            name='assigned_signups',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workerrating',
+            name='reliability_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workerrating',
+            name='signup_turnouts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='WorkerReliabilityDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('signed_up', models.BooleanField(default=False, verbose_name='Запись онлайн')),
+                ('turned_out', models.BooleanField(default=False, verbose_name='Выход')),
+                ('assigned', models.BooleanField(default=False, verbose_name='Назначен на адрес')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reliability_days', to='the_redhuman_is.worker', verbose_name='Работник')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='workerreliabilityday',
+            index=models.Index(fields=['date'], name='reliabilityday_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='workerreliabilityday',
+            constraint=models.UniqueConstraint(fields=('worker', 'date'), name='unique_worker_reliability_day'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.12 on 2023-02-17 16:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0017_photo_dedupe_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время создания')),
+                ('tag', models.CharField(max_length=100, verbose_name='Тег')),
+                ('deadline', models.DateTimeField(blank=True, null=True, verbose_name='Отправить до')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Начало отправки')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Конец отправки')),
+                ('audience', models.PositiveIntegerField(default=0, verbose_name='Работников')),
+                ('tokens', models.PositiveIntegerField(default=0, verbose_name='Токенов')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Доставлено в FCM')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('invalid_tokens', models.PositiveIntegerField(default=0, verbose_name='Недействительных токенов')),
+                ('expired', models.PositiveIntegerField(default=0, verbose_name='Не отправлено к сроку')),
+                ('send_seconds', models.FloatField(default=0, verbose_name='Время запросов к FCM, с')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.12 on 2023-02-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0018_push_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushcampaign',
+            name='messages',
+            field=models.JSONField(blank=True, default=list, verbose_name='Сообщения'),
+        ),
+    ]
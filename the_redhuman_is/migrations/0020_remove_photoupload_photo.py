@@ -0,0 +1,17 @@
+# Generated by Django 3.2.12 on 2023-02-20 10:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0019_push_campaign_messages'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='photoupload',
+            name='photo',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.12 on 2023-02-20 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_redhuman_is', '0020_remove_photoupload_photo'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='pushcampaign',
+            name='messages',
+        ),
+        migrations.AddField(
+            model_name='pushcampaign',
+            name='chunks',
+            field=models.PositiveIntegerField(default=0, verbose_name='Частей'),
+        ),
+        migrations.AddField(
+            model_name='pushcampaign',
+            name='chunks_done',
+            field=models.PositiveIntegerField(default=0, verbose_name='Обработано частей'),
+        ),
+    ]
@@ -18,6 +18,7 @@ from .partners import *
 from .photo import *
 from .poll import *
 from .reconciliation import *
+from .search import *
 from .turnout_calculators import *
 from .turnout_operations import *
 from .user_settings import *
@@ -84,6 +85,8 @@ __all__ = [
     'DeliveryItem',
     'DeliveryRequest',
     'DeliveryRequestConfirmation',
+    'DeliveryRequestSearchDocument',
+    'DeliveryRequestSummary',
     'DeliveryWorkerFCMToken',
     'DevelopmentManager',
     'DevelopmentManagerPosition',
@@ -103,8 +106,10 @@ __all__ = [
     'PhotoSessionCitizenship',
     'PhotoSessionComments',
     'PhotoSessionRejectedPhotos',
+    'PhotoUpload',
     'Position',
     'PreferredContractor',
+    'PushCampaign',
     'Reconciliation',
     'RecruitmentOrder',
     'Rko',
@@ -125,6 +130,7 @@ __all__ = [
     'TurnoutService',
     'UserPhone',
     'Worker',
+    'WorkerBalance',
     'WorkerBonus',
     'WorkerComments',
     'WorkerDeduction',
@@ -135,6 +141,7 @@ __all__ = [
     'WorkerQuerySet',
     'WorkerRegistration',
     'WorkerSNILS',
+    'WorkerSearchDocument',
     'WorkerSelfEmploymentData',
     'WorkerTag',
     'WorkerTurnout',
@@ -166,6 +173,7 @@ __all__ = [
     'set_turnout_output',
     'BoxPrice',
     'CalculatorOutput',
+    'TimesheetCalculationContext',
 
     # user_settings.py
     'HomePage',
@@ -36,7 +36,6 @@ from django.db.models import (
     When,
 )
 from django.db.models.functions import (
-    Cast,
     Ceil,
     Coalesce,
     Concat,
@@ -1082,8 +1081,10 @@ class DeliveryRequestQuerySet(models.QuerySet):
 
     def with_is_expiring(self, reserve_timedelta=datetime.timedelta(seconds=0)):
         min_confirmed_datetime = timezone.now() + reserve_timedelta
-        return self.with_confirmed_timepoint(
-        ).with_arrival_time(
+        queryset = self
+        if 'confirmed_timepoint' not in queryset.query.annotations:
+            queryset = queryset.with_confirmed_timepoint()
+        return queryset.with_arrival_time(
         ).annotate(
             confirmed_datetime=MakeAware(
                 F('date') + F('confirmed_timepoint'),
@@ -1250,52 +1251,44 @@ class DeliveryRequestQuerySet(models.QuerySet):
             )
         )
 
+    def with_summary(self, *field_names):
+        """
+        Reads the counters (see DeliveryRequestSummary) instead of
+        computing them by the with_* annotations with the same names.
+        """
+        defaults = {
+            'worker_count': 0,
+            'worker_confirmed_count': 0,
+            'new_start_photo_count': 0,
+            'new_finish_photo_count': 0,
+            'extra_photos_exist': False,
+            'has_self_assigned_worker': False,
+            'items_count': 0,
+            'confirmed_timepoint': None,
+        }
+        annotations = {}
+        for name in field_names:
+            if defaults[name] is None:
+                annotations[name] = F(f'summary__{name}')
+            else:
+                annotations[name] = Coalesce(f'summary__{name}', Value(defaults[name]))
+        return self.annotate(**annotations)
+
     def filter_by_text(self, text, mode='bo'):
-        queryset = self.annotate(
-            has_item_with_text=Exists(
-                DeliveryItem.objects.filter(
-                    Q(code__icontains=text) |
-                    Q(shipment_type__icontains=text) |
-                    Q(address__icontains=text),
-                    request=OuterRef('pk')
-                )
-            ),
-            pk_str=Cast(
-                'pk',
-                output_field=models.CharField()
-            )
-        )
+        # see the_redhuman_is.models.search
+        text = text.strip().lower()
         predicates = (
-            Q(pk_str__icontains=text) |
-            Q(driver_name__icontains=text) |
-            Q(has_item_with_text=True)
+            Q(search_document__common__contains=text)
         )
         if mode == 'customer_autocomplete':
             pass
         else:
-            predicates |= (
-                Q(route__icontains=text) |
-                Q(driver_phones__icontains=text) |
-                Q(comment__icontains=text)
-            )
+            predicates |= Q(search_document__details__contains=text)
             if mode == 'customer':
-                predicates |= Q(customer_comment__icontains=text)
+                predicates |= Q(search_document__customer_comment__contains=text)
             else:
-                queryset = queryset.annotate(
-                    has_worker_with_text=Exists(
-                        RequestWorker.objects.filter(
-                            Q(worker__last_name__icontains=text) |
-                            Q(worker__name__icontains=text) |
-                            Q(worker__patronymic__icontains=text),
-                            request=OuterRef('pk')
-                        )
-                    ),
-                )
-                predicates |= (
-                    Q(has_worker_with_text=True) |
-                    Q(customer__cust_name__icontains=text)
-                )
-        return queryset.filter(predicates)
+                predicates |= Q(search_document__backoffice__contains=text)
+        return self.filter(predicates)
 
     def filter_self_assign_ready(self, day, zone_id):
         queryset = self.with_is_private(
@@ -1424,7 +1417,7 @@ class DeliveryRequestQuerySet(models.QuerySet):
             item_field_names.append('distance')
         return self._finalize_item_annotation(item_field_names, item_sq)
 
-    def with_items_for_unassigned_worker(self, location=None):
+    def with_items_for_unassigned_worker(self, location=None, with_geotag=False):
         item_field_names = [
             'address',
             'id',
@@ -1447,6 +1440,9 @@ class DeliveryRequestQuerySet(models.QuerySet):
         if location is not None:
             item_sq = item_sq.with_distance(location.latitude, location.longitude)
             item_field_names.append('distance')
+        if with_geotag:
+            item_sq = item_sq.with_geotag()
+            item_field_names.append('geotag_')
         return self._finalize_item_annotation(item_field_names, item_sq)
 
     def with_items_for_backoffice(self, with_workers=False):
@@ -1832,6 +1828,54 @@ class DeliveryRequest(models.Model):
         )['confirmed_timepoint__min']
 
 
+# Counters of the request which are expensive to compute on every read.
+# Refreshed by the_redhuman_is.services.delivery.summary within the
+# transactions of services.delivery.actions (see update_delivery_request_status).
+class DeliveryRequestSummary(models.Model):
+    request = models.OneToOneField(
+        DeliveryRequest,
+        verbose_name='Заявка',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    worker_count = models.PositiveIntegerField(
+        verbose_name='Работников',
+        default=0
+    )
+    worker_confirmed_count = models.PositiveIntegerField(
+        verbose_name='Подтвержденных работников',
+        default=0
+    )
+    new_start_photo_count = models.PositiveIntegerField(
+        verbose_name='Непроверенных фото начала',
+        default=0
+    )
+    new_finish_photo_count = models.PositiveIntegerField(
+        verbose_name='Непроверенных фото окончания',
+        default=0
+    )
+    extra_photos_exist = models.BooleanField(
+        verbose_name='Есть дополнительные фото',
+        default=False
+    )
+    has_self_assigned_worker = models.BooleanField(
+        verbose_name='Есть самоназначенный работник',
+        default=False
+    )
+    items_count = models.PositiveIntegerField(
+        verbose_name='Адресов',
+        default=0
+    )
+    confirmed_timepoint = models.TimeField(
+        verbose_name='Подтвержденное время',
+        null=True
+    )
+
+    def __str__(self):
+        return str(self.request)
+
+
 class PrivateDeliveryRequest(models.Model):
     timestamp = models.DateTimeField(
         verbose_name='Время создания',
@@ -2998,6 +3042,96 @@ class DeliveryWorkerFCMToken(models.Model):
         )
 
 
+class PushCampaign(models.Model):
+    """
+    A push sent to many workers at once (see services.push_notifications),
+    with the delivery stats.
+    """
+    timestamp = models.DateTimeField(
+        verbose_name='Время создания',
+        default=timezone.now
+    )
+    tag = models.CharField(
+        verbose_name='Тег',
+        max_length=100,
+    )
+    # The pushes which were not sent by this time are dropped
+    deadline = models.DateTimeField(
+        verbose_name='Отправить до',
+        null=True,
+        blank=True,
+    )
+    started = models.DateTimeField(
+        verbose_name='Начало отправки',
+        null=True,
+        blank=True,
+    )
+    finished = models.DateTimeField(
+        verbose_name='Конец отправки',
+        null=True,
+        blank=True,
+    )
+
+    audience = models.PositiveIntegerField(
+        verbose_name='Работников',
+        default=0,
+    )
+    tokens = models.PositiveIntegerField(
+        verbose_name='Токенов',
+        default=0,
+    )
+    sent = models.PositiveIntegerField(
+        verbose_name='Доставлено в FCM',
+        default=0,
+    )
+    failed = models.PositiveIntegerField(
+        verbose_name='Ошибок',
+        default=0,
+    )
+    invalid_tokens = models.PositiveIntegerField(
+        verbose_name='Недействительных токенов',
+        default=0,
+    )
+    expired = models.PositiveIntegerField(
+        verbose_name='Не отправлено к сроку',
+        default=0,
+    )
+    # Total time of the FCM requests
+    send_seconds = models.FloatField(
+        verbose_name='Время запросов к FCM, с',
+        default=0,
+    )
+    # The campaign is finished when all its chunks are sent or expired
+    chunks = models.PositiveIntegerField(
+        verbose_name='Частей',
+        default=0,
+    )
+    chunks_done = models.PositiveIntegerField(
+        verbose_name='Обработано частей',
+        default=0,
+    )
+
+    def __str__(self):
+        return '{} {}: {}/{}'.format(
+            self.timestamp.strftime('%d.%m.%Y %H:%M:%S'),
+            self.tag,
+            self.sent,
+            self.tokens
+        )
+
+    @property
+    def queue_latency(self):
+        if self.started is None:
+            return None
+        return self.started - self.timestamp
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+
 class MobileAppStatus(models.Model):
     timestamp = models.DateTimeField(
         verbose_name='Время',
@@ -1194,6 +1194,183 @@ def delete_worker_account(sender, instance, **kwargs):
             pass
 
 
+# Precomputed saldo of the worker operating account. Kept up to date by the
+# Operation signals below; `reconcile_worker_balances` command fixes it
+# after bulk updates which bypass the signals.
+class WorkerBalance(models.Model):
+    worker = models.OneToOneField(
+        Worker,
+        on_delete=models.CASCADE,
+        verbose_name='Работник',
+        related_name='balance'
+    )
+    account = models.OneToOneField(
+        finance.models.Account,
+        on_delete=models.CASCADE,
+        verbose_name='Расчетный счет',
+        related_name='worker_balance'
+    )
+    debit = models.DecimalField(
+        verbose_name='Дебет',
+        max_digits=30,
+        decimal_places=2,
+        default=ZERO_OO
+    )
+    credit = models.DecimalField(
+        verbose_name='Кредит',
+        max_digits=30,
+        decimal_places=2,
+        default=ZERO_OO
+    )
+    # debit - credit: positive for debtors, negative for creditors
+    saldo = models.DecimalField(
+        verbose_name='Сальдо',
+        max_digits=30,
+        decimal_places=2,
+        default=ZERO_OO
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['saldo'],
+                name='workerbalance_saldo_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.worker}: {self.saldo}'
+
+
+def _worker_account_turnovers(side, accounts=None):
+    operations = finance.models.Operation.objects.filter(
+        **{f'{side}__worker_account__isnull': False}
+    )
+    if accounts is not None:
+        operations = operations.filter(
+            **{f'{side}__in': accounts}
+        )
+    return dict(
+        operations.order_by().values_list(
+            side
+        ).annotate(
+            amount_sum=Sum('amount')
+        )
+    )
+
+
+def reconcile_worker_balances(dry_run=False):
+    """
+    Recomputes all the worker balances from the ledger.
+    Returns the number of the balances which were missing or out of sync.
+    """
+    with transaction.atomic():
+        balances = WorkerBalance.objects.all()
+        if not dry_run:
+            # Locked before the ledger is read: an operation saved meanwhile
+            # waits for the commit and adds its F() increment to the fixed
+            # balance instead of being overwritten
+            balances = balances.select_for_update()
+        balances = {balance.account_id: balance for balance in balances}
+
+        debits = _worker_account_turnovers('debet')
+        credits = _worker_account_turnovers('credit')
+
+        to_create = []
+        to_update = []
+        worker_accounts = WorkerOperatingAccount.objects.values_list(
+            'worker',
+            'account',
+        )
+        for worker_id, account_id in worker_accounts:
+            debit = debits.get(account_id, ZERO_OO)
+            credit = credits.get(account_id, ZERO_OO)
+            balance = balances.get(account_id)
+            if balance is None:
+                to_create.append(
+                    WorkerBalance(
+                        worker_id=worker_id,
+                        account_id=account_id,
+                        debit=debit,
+                        credit=credit,
+                        saldo=debit - credit
+                    )
+                )
+            elif balance.debit != debit or balance.credit != credit:
+                balance.debit = debit
+                balance.credit = credit
+                balance.saldo = debit - credit
+                to_update.append(balance)
+
+        if not dry_run:
+            # A balance created meanwhile with a new worker account is kept
+            WorkerBalance.objects.bulk_create(
+                to_create,
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+            WorkerBalance.objects.bulk_update(
+                to_update,
+                ['debit', 'credit', 'saldo'],
+                batch_size=1000
+            )
+
+    return len(to_create) + len(to_update)
+
+
+@receiver(post_save, sender=WorkerOperatingAccount)
+def create_worker_balance(sender, instance, created, **kwargs):
+    if created:
+        debit = _worker_account_turnovers('debet', [instance.account_id])
+        credit = _worker_account_turnovers('credit', [instance.account_id])
+        debit = debit.get(instance.account_id, ZERO_OO)
+        credit = credit.get(instance.account_id, ZERO_OO)
+        WorkerBalance.objects.update_or_create(
+            account_id=instance.account_id,
+            defaults={
+                'worker_id': instance.worker_id,
+                'debit': debit,
+                'credit': credit,
+                'saldo': debit - credit,
+            }
+        )
+
+
+def _update_worker_balance(account_id, debit, credit):
+    # Non-worker accounts have no balance, so it is a no-op for them
+    WorkerBalance.objects.filter(
+        account_id=account_id
+    ).update(
+        debit=F('debit') + debit,
+        credit=F('credit') + credit,
+        saldo=F('saldo') + debit - credit,
+    )
+
+
+def _apply_operation(debet_id, credit_id, amount):
+    _update_worker_balance(debet_id, amount, ZERO_OO)
+    _update_worker_balance(credit_id, ZERO_OO, amount)
+
+
+@receiver(post_save, sender=finance.models.Operation)
+def update_worker_balances_on_save(sender, instance, **kwargs):
+    # See finance.models.remember_operation_before_save
+    previous = getattr(instance, '_before_save', None)
+    if previous is not None:
+        debet_id, credit_id, _, amount = previous
+        if (debet_id, credit_id, amount) == (
+                instance.debet_id, instance.credit_id, instance.amount):
+            return
+        _apply_operation(debet_id, credit_id, -amount)
+
+    _apply_operation(instance.debet_id, instance.credit_id, instance.amount)
+
+
+@receiver(post_delete, sender=finance.models.Operation)
+def update_worker_balances_on_delete(sender, instance, **kwargs):
+    _apply_operation(instance.debet_id, instance.credit_id, -instance.amount)
+
+
 class CustomerOperatingAccounts(models.Model):
     customer = models.OneToOneField(
         Customer,
@@ -1,6 +1,16 @@
+import hashlib
+import uuid
+
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import (
+    models,
+    transaction,
+)
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
 
@@ -22,15 +32,106 @@ class Photo(models.Model):
     content_object = GenericForeignKey('content_type', 'object_id')
     image = models.ImageField(upload_to=content_file_name)
 
+    # sha256 of the image. Photos with the same content share the file
+    # (and the variants).
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+    )
+    # dHash of the image (see services.photo_variants)
+    perceptual_hash = models.BigIntegerField(
+        null=True,
+        blank=True,
+    )
+    # The same or a visually identical photo of another object
+    # (a reused photo, for the fraud checks)
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+    )
+    # Resized copies of the image (see services.photo_variants):
+    # {size: {format: file name}}, e.g. {'thumb': {'jpeg': ..., 'webp': ...}}
+    variants = models.JSONField(
+        default=dict,
+        blank=True,
+    )
+
     def __str__(self):
         return 'Photo {}'.format(self.pk)
 
-    def set_image(self, image, delete_current=True):
+    def set_image(self, image, delete_current=True, content_hash=None):
+        """
+        If there is a photo with the same content, its file is reused
+        instead of storing another copy.
+        """
+        if content_hash is None:
+            content_hash = file_content_hash(image)
+        same = Photo.objects.filter(
+            content_hash=content_hash
+        ).exclude(
+            pk=self.pk
+        ).exclude(
+            image=''
+        ).order_by(
+            'pk'
+        ).first()
+
         if self.image and delete_current:
-            self.image.delete()
-        self.image = image
+            self.delete_image()
+
+        if same is None:
+            self.image = image
+            self.variants = {}
+            self.perceptual_hash = None
+            self.duplicate_of = None
+        else:
+            self.image = same.image.name
+            self.variants = same.variants
+            self.perceptual_hash = same.perceptual_hash
+            if (same.content_type_id, same.object_id) != (self.content_type_id, self.object_id):
+                self.duplicate_of = same
+            else:
+                self.duplicate_of = same.duplicate_of
+        self.content_hash = content_hash
+        self._image_changed = True
         self.save()
 
+    def _shares_content(self):
+        return Photo.objects.filter(
+            content_hash=self.content_hash
+        ).exclude(
+            pk=self.pk
+        ).exists()
+
+    def delete_image(self):
+        """
+        Deletes the file and the variants unless other photos use them.
+        """
+        if self.image and not (self.content_hash and self._shares_content()):
+            if not Photo.objects.filter(image=self.image.name).exclude(pk=self.pk).exists():
+                self.image.delete(save=False)
+            self.delete_variants()
+        self.variants = {}
+
+    def variant_file(self, size, format='jpeg'):
+        """
+        The variant of the image (a FieldFile, as `image`),
+        the image itself if there is no such variant (yet).
+        """
+        name = self.variants.get(size, {}).get(format)
+        if name is None:
+            return self.image
+        return FieldFile(self, self._meta.get_field('image'), name)
+
+    def delete_variants(self):
+        storage = self._meta.get_field('image').storage
+        for formats in self.variants.values():
+            for name in formats.values():
+                storage.delete(name)
+
     def change_target(self, target):
         self.content_type = ContentType.objects.get_for_model(type(target))
         self.object_id = target.id
@@ -42,9 +143,40 @@ class Photo(models.Model):
                 fields=['content_type', 'object_id'],
                 name='photo_contenttype_object_index',
             ),
+            models.Index(
+                fields=['content_hash'],
+                name='photo_content_hash_index',
+            ),
+            models.Index(
+                fields=['perceptual_hash'],
+                name='photo_perceptual_hash_index',
+            ),
         ]
 
 
+def file_content_hash(f):
+    """
+    sha256 of a File (an upload), read by chunks.
+    """
+    digest = hashlib.sha256()
+    for chunk in f.chunks():
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+@receiver(post_save, sender=Photo)
+def schedule_photo_variants(sender, instance, created, **kwargs):
+    image_changed = getattr(instance, '_image_changed', False)
+    instance._image_changed = False
+    # A reused file already has the variants
+    if instance.image and not instance.variants and (created or image_changed):
+        from the_redhuman_is import tasks
+        transaction.on_commit(
+            lambda: tasks.make_photo_variants(instance.pk)
+        )
+
+
 # Todo: от этого больше вреда, чем пользы, похоже
 #@receiver(pre_delete, sender=Photo)
 #def _photo_model_delete(sender, instance, **kwargs):
@@ -61,11 +193,25 @@ def save_single_photo(target, image):
 
 
 def add_photo(target, image):
+    """
+    Returns the photo of the target with the same content if there is one
+    (a repeated upload).
+    """
+    content_type = ContentType.objects.get_for_model(type(target))
+    content_hash = file_content_hash(image)
+    photo = Photo.objects.filter(
+        content_type=content_type,
+        object_id=target.id,
+        content_hash=content_hash,
+    ).first()
+    if photo is not None:
+        return photo
+
     photo = Photo.objects.create(
-        content_type=ContentType.objects.get_for_model(type(target)),
+        content_type=content_type,
         object_id=target.id,
     )
-    photo.set_image(image)
+    photo.set_image(image, content_hash=content_hash)
     return photo
 
 
@@ -74,3 +220,40 @@ def get_photos(target):
         content_type=ContentType.objects.get_for_model(type(target)),
         object_id=target.id
     )
+
+
+def photo_upload_file_name(upload):
+    return 'photo_uploads/{}.part'.format(upload.pk)
+
+
+class PhotoUpload(models.Model):
+    """
+    A resumable upload of a photo, by chunks (see services.photo_ingestion).
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+    )
+    # The start or the last chunk
+    timestamp = models.DateTimeField(
+        default=timezone.now
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+    )
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    # sha256 from the client, checked when the upload is complete
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+    )
+
+    def __str__(self):
+        return 'Photo upload {} ({}/{})'.format(self.pk, self.received, self.size)
+
+    @property
+    def is_complete(self):
+        return self.received == self.size
@@ -0,0 +1,377 @@
+from django.apps import apps as global_apps
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import (
+    models,
+    transaction,
+)
+from django.db.models import (
+    F,
+    OuterRef,
+    Subquery,
+    TextField,
+    Value,
+)
+from django.db.models.functions import (
+    Cast,
+    Coalesce,
+    Greatest,
+    Lower,
+    NullIf,
+)
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from utils.expressions import PostgresConcatWS
+
+from .delivery import (
+    DeliveryItem,
+    DeliveryRequest,
+    RequestWorker,
+)
+from .models import Customer
+from .worker import (
+    Worker,
+    WorkerPassport,
+)
+
+
+# Search documents are lowercased texts of all the searchable fields
+# separated by newlines. `contains` lookups on them are served by the trigram
+# indexes, unlike `icontains` (UPPER(...) LIKE ...) on the original columns.
+
+SEPARATOR = '\n'
+
+
+def _trigram_index(field_name, prefix, name=None):
+    return GinIndex(
+        fields=[field_name],
+        opclasses=['gin_trgm_ops'],
+        name=name or f'{prefix}_{field_name}_trgm',
+    )
+
+
+class DeliveryRequestSearchDocument(models.Model):
+    request = models.OneToOneField(
+        DeliveryRequest,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Заявка',
+        related_name='search_document'
+    )
+    # pk, driver name, codes, shipment types and addresses of the items
+    common = models.TextField(verbose_name='Номер, водитель, адреса', default='')
+    # route, driver phones, comment
+    details = models.TextField(verbose_name='Маршрут, телефоны, комментарий', default='')
+    customer_comment = models.TextField(verbose_name='Комментарий клиента', default='')
+    # worker names, customer name
+    backoffice = models.TextField(verbose_name='Работники, клиент', default='')
+
+    class Meta:
+        indexes = [
+            _trigram_index('common', 'reqsearch'),
+            _trigram_index('details', 'reqsearch'),
+            _trigram_index('customer_comment', 'reqsearch', 'reqsearch_cust_comment_trgm'),
+            _trigram_index('backoffice', 'reqsearch'),
+        ]
+
+
+class WorkerSearchDocument(models.Model):
+    worker = models.OneToOneField(
+        Worker,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Работник',
+        related_name='search_document'
+    )
+    # full name, phone, passport numbers
+    document = models.TextField(verbose_name='ФИО, телефон, паспорта', default='')
+
+    class Meta:
+        indexes = [
+            _trigram_index('document', 'workersearch'),
+        ]
+
+
+def normalize_search_text(text):
+    return text.strip().lower()
+
+
+def _concat(*expressions):
+    return Lower(
+        PostgresConcatWS(
+            Value(SEPARATOR),
+            *expressions,
+            output_field=TextField()
+        )
+    )
+
+
+def _aggregated(queryset, group_field, expression):
+    return Subquery(
+        queryset.order_by().values(
+            group_field
+        ).annotate(
+            text=StringAgg(expression, delimiter=SEPARATOR, output_field=TextField())
+        ).values(
+            'text'
+        ),
+        output_field=TextField()
+    )
+
+
+def _full_name(prefix=''):
+    return PostgresConcatWS(
+        Value(' '),
+        F(f'{prefix}last_name'),
+        F(f'{prefix}name'),
+        NullIf(F(f'{prefix}patronymic'), Value('')),
+        output_field=TextField()
+    )
+
+
+def update_request_search_documents(request_ids=None, apps=global_apps):
+    """
+    Rebuilds the search documents of the requests (of all the requests
+    if `request_ids` is None).
+    `apps` is here for the data migration.
+    """
+    request_model = apps.get_model('the_redhuman_is', 'DeliveryRequest')
+    item_model = apps.get_model('the_redhuman_is', 'DeliveryItem')
+    request_worker_model = apps.get_model('the_redhuman_is', 'RequestWorker')
+    document_model = apps.get_model('the_redhuman_is', 'DeliveryRequestSearchDocument')
+
+    requests = request_model.objects.all()
+    if request_ids is not None:
+        requests = requests.filter(pk__in=request_ids)
+
+    documents = requests.order_by().annotate(
+        items_text=_aggregated(
+            item_model.objects.filter(request=OuterRef('pk')),
+            'request',
+            PostgresConcatWS(
+                Value(SEPARATOR),
+                'code',
+                'shipment_type',
+                'address',
+                output_field=TextField()
+            )
+        ),
+        workers_text=_aggregated(
+            request_worker_model.objects.filter(request=OuterRef('pk')),
+            'request',
+            _full_name('worker__')
+        ),
+    ).annotate(
+        common_text=_concat(
+            Cast('pk', output_field=TextField()),
+            'driver_name',
+            'items_text',
+        ),
+        details_text=_concat(
+            'route',
+            'driver_phones',
+            'comment',
+        ),
+        customer_comment_text=Lower(
+            Coalesce('customer_comment', Value(''), output_field=TextField())
+        ),
+        backoffice_text=_concat(
+            'workers_text',
+            'customer__cust_name',
+        ),
+    ).values_list(
+        'pk',
+        'common_text',
+        'details_text',
+        'customer_comment_text',
+        'backoffice_text',
+    )
+
+    with transaction.atomic():
+        existing = document_model.objects.all()
+        if request_ids is not None:
+            existing = existing.filter(request__in=request_ids)
+        existing.delete()
+
+        document_model.objects.bulk_create(
+            (
+                document_model(
+                    request_id=pk,
+                    common=common,
+                    details=details,
+                    customer_comment=customer_comment,
+                    backoffice=backoffice
+                )
+                for pk, common, details, customer_comment, backoffice
+                in documents.iterator(chunk_size=2000)
+            ),
+            batch_size=2000
+        )
+
+
+def update_worker_search_documents(worker_ids=None, apps=global_apps):
+    worker_model = apps.get_model('the_redhuman_is', 'Worker')
+    passport_model = apps.get_model('the_redhuman_is', 'WorkerPassport')
+    document_model = apps.get_model('the_redhuman_is', 'WorkerSearchDocument')
+
+    workers = worker_model.objects.all()
+    if worker_ids is not None:
+        workers = workers.filter(pk__in=worker_ids)
+
+    documents = workers.order_by().annotate(
+        passports_text=_aggregated(
+            passport_model.objects.filter(workers_id=OuterRef('pk')),
+            'workers_id',
+            'another_passport_number'
+        ),
+    ).annotate(
+        document_text=_concat(
+            _full_name(),
+            'tel_number',
+            'passports_text',
+        )
+    ).values_list(
+        'pk',
+        'document_text',
+    )
+
+    with transaction.atomic():
+        existing = document_model.objects.all()
+        if worker_ids is not None:
+            existing = existing.filter(worker__in=worker_ids)
+        existing.delete()
+
+        document_model.objects.bulk_create(
+            (
+                document_model(worker_id=pk, document=document)
+                for pk, document in documents.iterator(chunk_size=2000)
+            ),
+            batch_size=2000
+        )
+
+
+def search_delivery_requests(queryset, text, mode='bo'):
+    """
+    Filters the requests like DeliveryRequestQuerySet.filter_by_text
+    and orders them by relevance.
+    """
+    text = normalize_search_text(text)
+    fields = ['search_document__common']
+    if mode != 'customer_autocomplete':
+        fields.append('search_document__details')
+        if mode == 'customer':
+            fields.append('search_document__customer_comment')
+        else:
+            fields.append('search_document__backoffice')
+
+    similarities = [TrigramSimilarity(field, text) for field in fields]
+    return queryset.filter_by_text(
+        text,
+        mode
+    ).annotate(
+        rank=Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    ).order_by(
+        '-rank',
+        '-pk'
+    )
+
+
+def search_workers(queryset, text):
+    text = normalize_search_text(text)
+    return queryset.filter_by_text(
+        text
+    ).annotate(
+        rank=TrigramSimilarity('search_document__document', text)
+    ).order_by(
+        '-rank',
+        'pk'
+    )
+
+
+def _on_commit_update_requests(request_ids):
+    transaction.on_commit(
+        lambda: update_request_search_documents(request_ids)
+    )
+
+
+def _on_commit_update_workers(worker_ids):
+    transaction.on_commit(
+        lambda: update_worker_search_documents(worker_ids)
+    )
+
+
+@receiver(post_save, sender=DeliveryRequest)
+def update_request_search_document(sender, instance, **kwargs):
+    _on_commit_update_requests([instance.pk])
+
+
+@receiver(post_save, sender=DeliveryItem)
+@receiver(post_delete, sender=DeliveryItem)
+@receiver(post_save, sender=RequestWorker)
+@receiver(post_delete, sender=RequestWorker)
+def update_parent_request_search_document(sender, instance, **kwargs):
+    _on_commit_update_requests([instance.request_id])
+
+
+def _worker_name(worker):
+    return (worker.last_name, worker.name, worker.patronymic)
+
+
+@receiver(pre_save, sender=Worker)
+def remember_worker_name(sender, instance, **kwargs):
+    instance._name_before_save = None
+    if instance.pk is not None:
+        instance._name_before_save = Worker.objects.filter(
+            pk=instance.pk
+        ).values_list(
+            'last_name',
+            'name',
+            'patronymic',
+        ).first()
+
+
+@receiver(post_save, sender=Worker)
+def update_worker_search_document(sender, instance, created, **kwargs):
+    _on_commit_update_workers([instance.pk])
+
+    # Worker names are a part of the documents of his requests
+    name_before_save = getattr(instance, '_name_before_save', None)
+    if not created and name_before_save != _worker_name(instance):
+        from the_redhuman_is import tasks
+        transaction.on_commit(
+            lambda: tasks.update_worker_requests_search_documents(instance.pk)
+        )
+
+
+@receiver(post_save, sender=WorkerPassport)
+@receiver(post_delete, sender=WorkerPassport)
+def update_passport_worker_search_document(sender, instance, **kwargs):
+    _on_commit_update_workers([instance.workers_id_id])
+
+
+@receiver(pre_save, sender=Customer)
+def remember_customer_name(sender, instance, **kwargs):
+    instance._name_before_save = None
+    if instance.pk is not None:
+        instance._name_before_save = Customer.objects.filter(
+            pk=instance.pk
+        ).values_list(
+            'cust_name',
+            flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Customer)
+def update_customer_requests_search_documents(sender, instance, created, **kwargs):
+    name_before_save = getattr(instance, '_name_before_save', None)
+    if not created and name_before_save != instance.cust_name:
+        from the_redhuman_is import tasks
+        transaction.on_commit(
+            lambda: tasks.update_customer_requests_search_documents(instance.pk)
+        )
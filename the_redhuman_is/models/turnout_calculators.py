@@ -18,6 +18,7 @@ from django.db.models import (
     Q,
     Sum,
 )
+from django.utils.functional import cached_property
 
 from the_redhuman_is.models.delivery import (
     DeliveryRequest,
@@ -26,7 +27,6 @@ from the_redhuman_is.models.delivery import (
 from the_redhuman_is.models.models import (
     Customer,
     CustomerService,
-    TimeSheet,
     WorkerTurnout,
 )
 from the_redhuman_is.models.worker import Position
@@ -195,20 +195,260 @@ class PositionCalculator(models.Model):
         )
 
 
-def _hours_worked(turnout):
+class TimesheetCalculationContext:
+    """
+    The data the calculators need for the turnouts of a timesheet (box
+    prices, output, hours per day, workers, previous turnouts), loaded once
+    for all of them. Create it after the turnouts and their output are
+    saved. `turnout_ids` limits the per-turnout data to these turnouts.
+
+    The turnouts of other timesheets (e.g. the previous turnouts of
+    a worker) are read with separate queries.
+    """
+
+    def __init__(self, timesheet, turnout_ids=None):
+        self.timesheet = timesheet
+        self.turnout_ids = None if turnout_ids is None else set(turnout_ids)
+        self._amount_calculators = {}
+        self._position_calculators = {}
+        self._box_prices = {}
+        self._intervals = {}
+        self._pairs = {}
+
+    @classmethod
+    def for_turnout(cls, turnout):
+        return cls(turnout.timesheet, [turnout.pk])
+
+    def _is_own(self, turnout):
+        return turnout.timesheet_id == self.timesheet.pk
+
+    def _covers(self, turnout):
+        return (
+            self._is_own(turnout) and
+            (self.turnout_ids is None or turnout.pk in self.turnout_ids)
+        )
+
+    def _own_turnouts(self):
+        turnouts = WorkerTurnout.objects.filter(timesheet=self.timesheet)
+        if self.turnout_ids is not None:
+            turnouts = turnouts.filter(pk__in=self.turnout_ids)
+        return turnouts
+
+    def amount_calculator(self, day, customer_service):
+        key = (day, customer_service.pk)
+        if key not in self._amount_calculators:
+            self._amount_calculators[key] = _amount_calculator(day, customer_service)
+        return self._amount_calculators[key]
+
+    def position_calculator(self, day, customer, position):
+        """
+        Returns the PositionCalculator or None.
+        """
+        key = (day, customer.pk, position.pk if position else None)
+        if key not in self._position_calculators:
+            try:
+                calculator = PositionCalculator.objects.get(
+                    Q(last_day__isnull=True) |
+                    Q(last_day__gte=day),
+                    customer=customer,
+                    position=position,
+                    first_day__lte=day,
+                )
+            except ObjectDoesNotExist:
+                calculator = None
+            self._position_calculators[key] = calculator
+        return self._position_calculators[key]
+
+    def box_prices(self, calculator_pk):
+        """
+        {box type pk: price} of the CalculatorOutput.
+        """
+        if calculator_pk not in self._box_prices:
+            self._box_prices[calculator_pk] = dict(
+                BoxPrice.objects.filter(
+                    calculator=calculator_pk
+                ).values_list(
+                    'box_type',
+                    'price'
+                )
+            )
+        return self._box_prices[calculator_pk]
+
+    def intervals(self, calculator):
+        """
+        The intervals of the SingleTurnoutCalculator ordered by begin.
+        """
+        if calculator.pk not in self._intervals:
+            self._intervals[calculator.pk] = list(
+                calculator.intervals.order_by('begin', 'pk')
+            )
+        return self._intervals[calculator.pk]
+
+    def pairs(self, calculator):
+        """
+        The conditions of the calculator as [(key, value), ...] ordered by key.
+        """
+        key = (type(calculator), calculator.pk)
+        if key not in self._pairs:
+            self._pairs[key] = list(
+                calculator.conditions.order_by(
+                    'key',
+                    'pk'
+                ).values_list(
+                    'key',
+                    'value'
+                )
+            )
+        return self._pairs[key]
+
+    @cached_property
+    def _outputs(self):
+        outputs = {}
+        for turnout_id, box_type_id, box_type_name, amount in TurnoutOutput.objects.filter(
+            turnout__in=self._own_turnouts()
+        ).values_list(
+            'turnout',
+            'box_type',
+            'box_type__name',
+            'amount',
+        ):
+            outputs.setdefault(turnout_id, []).append((box_type_id, box_type_name, amount))
+        return outputs
+
+    def outputs(self, turnout):
+        """
+        [(box type pk, box type name, amount), ...] of the turnout.
+        """
+        if self._covers(turnout):
+            return self._outputs.get(turnout.pk, [])
+        return list(
+            TurnoutOutput.objects.filter(
+                turnout=turnout
+            ).values_list(
+                'box_type',
+                'box_type__name',
+                'amount',
+            )
+        )
+
+    @cached_property
+    def _day_hours(self):
+        return dict(
+            WorkerTurnout.objects.filter(
+                timesheet__sheet_date=self.timesheet.sheet_date,
+                timesheet__cust_location=self.timesheet.cust_location_id,
+            ).order_by().values_list(
+                'turnoutservice__customer_service'
+            ).annotate(
+                Sum('hours_worked')
+            )
+        )
+
+    def total_day_hours(self, turnout):
+        """
+        Hours worked by all the workers of the location this day
+        with the service of the turnout.
+        """
+        if not hasattr(turnout, 'turnoutservice'):
+            return turnout.hours_worked
+        customer_service_id = turnout.turnoutservice.customer_service_id
+        if self._is_own(turnout):
+            return self._day_hours.get(customer_service_id) or 0
+        return WorkerTurnout.objects.filter(
+            timesheet__sheet_date=turnout.timesheet.sheet_date,
+            timesheet__cust_location=turnout.timesheet.cust_location,
+            turnoutservice__customer_service=customer_service_id
+        ).aggregate(
+            Sum('hours_worked')
+        )['hours_worked__sum'] or 0
+
+    @cached_property
+    def _timesheet_workers(self):
+        return list(
+            WorkerTurnout.objects.filter(
+                timesheet=self.timesheet
+            ).values_list(
+                'worker',
+                flat=True
+            )
+        )
+
+    def other_workers_count(self, turnout):
+        """
+        The number of the other turnouts of the timesheet.
+        """
+        if self._is_own(turnout):
+            return sum(
+                1 for worker_id in self._timesheet_workers
+                if worker_id != turnout.worker_id
+            )
+        return WorkerTurnout.objects.filter(
+            timesheet=turnout.timesheet
+        ).exclude(
+            worker=turnout.worker
+        ).count()
+
+    @staticmethod
+    def _worker_turnouts(turnouts):
+        return turnouts.order_by(
+            'timesheet__sheet_date',
+            'pk'
+        ).values_list(
+            'worker',
+            'pk',
+            'timesheet__sheet_date',
+        )
+
+    @cached_property
+    def _customer_turnouts(self):
+        customer_turnouts = {}
+        for worker_id, turnout_id, day in self._worker_turnouts(
+            WorkerTurnout.objects.filter(
+                worker__in=self._own_turnouts().values('worker'),
+                timesheet__customer=self.timesheet.customer_id,
+            )
+        ):
+            customer_turnouts.setdefault(worker_id, []).append((turnout_id, day))
+        return customer_turnouts
+
+    def customer_turnouts(self, turnout):
+        """
+        [(turnout pk, day), ...] of all the turnouts of the worker
+        for the customer of the turnout, ordered by day.
+        """
+        if self._covers(turnout):
+            return self._customer_turnouts.get(turnout.worker_id, [])
+        return [
+            (turnout_id, day)
+            for _, turnout_id, day in self._worker_turnouts(
+                WorkerTurnout.objects.filter(
+                    worker=turnout.worker_id,
+                    timesheet__customer=turnout.timesheet.customer_id,
+                )
+            )
+        ]
+
+
+def _context(turnout, context):
+    if context is None:
+        return TimesheetCalculationContext.for_turnout(turnout)
+    return context
+
+
+def _hours_worked(turnout, context=None):
     if turnout.hours_worked:
         return float(turnout.hours_worked)
     return 0.0
 
 
-def _performance(turnout):
+def _performance(turnout, context=None):
     if turnout.performance:
         return float(turnout.performance)
     return 0.0
 
 
 # Todo: get rid of this!
-def _fm_hours(turnout):
+def _fm_hours(turnout, context=None):
     hours = _hours_worked(turnout)
     performance = min(_performance(turnout), 100)
     if performance >= 85:
@@ -217,19 +457,8 @@ def _fm_hours(turnout):
         return hours * performance / 100.0
 
 
-def _total_day_hours(turnout):
-    if hasattr(turnout, 'turnoutservice'):
-        turnouts = WorkerTurnout.objects.filter(
-            timesheet__sheet_date=turnout.timesheet.sheet_date,
-            timesheet__cust_location=turnout.timesheet.cust_location,
-            turnoutservice__customer_service=turnout.turnoutservice.customer_service
-        )
-        total_hours = turnouts.aggregate(
-            Sum('hours_worked')
-        )['hours_worked__sum'] or 0
-    else:
-        total_hours = turnout.hours_worked
-    return total_hours
+def _total_day_hours(turnout, context):
+    return context.total_day_hours(turnout)
 
 
 _PARAMETERS = {
@@ -243,9 +472,9 @@ _PARAMETERS = {
 PARAMETERS_CHOICES = [(key, name) for key, (name, description, func) in _PARAMETERS.items()]
 
 
-def _get_parameter_value(turnout, parameter):
+def _get_parameter_value(turnout, parameter, context):
     name, description, func = _PARAMETERS[parameter]
-    return func(turnout)
+    return func(turnout, context)
 
 
 class ConditionalCalculator(models.Model):
@@ -277,11 +506,12 @@ class ConditionalCalculator(models.Model):
         'calc_gte_object_id'
     )
 
-    def get_amount(self, turnout):
-        if _get_parameter_value(turnout, self.parameter) < self.threshold:
-            return self.calc_lt.get_amount(turnout)
+    def get_amount(self, turnout, context=None):
+        context = _context(turnout, context)
+        if _get_parameter_value(turnout, self.parameter, context) < self.threshold:
+            return self.calc_lt.get_amount(turnout, context)
         else:
-            return self.calc_gte.get_amount(turnout)
+            return self.calc_gte.get_amount(turnout, context)
 
 
 class CalculatorInterval(models.Model):
@@ -303,7 +533,11 @@ class SingleTurnoutCalculator(models.Model):
     )
     intervals = models.ManyToManyField(CalculatorInterval)
 
-    def get_amount(self, turnout: WorkerTurnout) -> Decimal:
+    def get_amount(
+            self,
+            turnout: WorkerTurnout,
+            context: Optional[TimesheetCalculationContext] = None
+    ) -> Decimal:
         if self.parameter_2 == 'tariffs_01_04_21':
             try:
                 request = turnout.requestworkerturnout.requestworker.request
@@ -316,11 +550,15 @@ class SingleTurnoutCalculator(models.Model):
                 turnout
             )
 
-        x1 = _get_parameter_value(turnout, self.parameter_1)
-        interval = self.intervals.filter(begin__lte=x1).order_by('begin').last()
+        context = _context(turnout, context)
+        x1 = _get_parameter_value(turnout, self.parameter_1, context)
+        interval = None
+        for candidate in context.intervals(self):
+            if candidate.begin <= x1:
+                interval = candidate
         amount = 0.0
         if interval is not None:
-            x2 = _get_parameter_value(turnout, self.parameter_2)
+            x2 = _get_parameter_value(turnout, self.parameter_2, context)
             amount = interval.k * x2 + interval.b
 
         return Decimal(amount)
@@ -405,12 +643,18 @@ class Pair(models.Model):
         return '{} -> {}'.format(self.key, self.value)
 
 
-def _get_value(conditions, threshold):
+def _get_value(pairs, threshold):
+    """
+    `pairs` are (key, value) ordered by key (TimesheetCalculationContext.pairs).
+    """
     if threshold is None:
         threshold = 0
-    filtered = conditions.filter(key__lte=threshold)
-    if filtered.exists():
-        return Decimal(filtered.order_by('key').last().value)
+    value = None
+    for key, pair_value in pairs:
+        if key <= threshold:
+            value = pair_value
+    if value is not None:
+        return Decimal(value)
     return Decimal(0)
 
 
@@ -419,7 +663,7 @@ class CalculatorHourly(models.Model):
     bonus = models.FloatField('Премия', default=0)
     threshold = models.IntegerField('Бонус при часах', default=11)
 
-    def get_amount(self, turnout):
+    def get_amount(self, turnout, context=None):
         hours_worked = turnout.hours_worked if turnout.hours_worked else 0
         amount = hours_worked * Decimal(self.tariff)
         if hours_worked >= self.threshold:
@@ -438,12 +682,12 @@ class CalculatorBoxes(models.Model):
         'Плата за коробку', null=True, decimal_places=2, max_digits=8
     )
 
-    def get_amount(self, turnout):
+    def get_amount(self, turnout, context=None):
         performance = turnout.performance if turnout.performance else 0
         if self.performance_for_linear_payment and self.coefficient:
             if performance > self.performance_for_linear_payment:
                 return performance * self.coefficient
-        return _get_value(self.conditions, performance)
+        return _get_value(_context(turnout, context).pairs(self), performance)
 
     def __str__(self):
         return '{}'.format(self.pk)
@@ -452,10 +696,10 @@ class CalculatorBoxes(models.Model):
 class CalculatorForemanWorkers(models.Model):
     conditions = models.ManyToManyField(Pair)
 
-    def get_amount(self, turnout):
-        num_workers = WorkerTurnout.objects.filter(
-            timesheet=turnout.timesheet).exclude(worker=turnout.worker).count()
-        return _get_value(self.conditions, num_workers)
+    def get_amount(self, turnout, context=None):
+        context = _context(turnout, context)
+        num_workers = context.other_workers_count(turnout)
+        return _get_value(context.pairs(self), num_workers)
 
     def __str__(self):
         return '{}'.format(self.pk)
@@ -464,8 +708,8 @@ class CalculatorForemanWorkers(models.Model):
 class CalculatorHourlyInterval(models.Model):
     conditions = models.ManyToManyField(Pair)
 
-    def get_amount(self, turnout):
-        return _get_value(self.conditions, turnout.hours_worked)
+    def get_amount(self, turnout, context=None):
+        return _get_value(_context(turnout, context).pairs(self), turnout.hours_worked)
 
     def __str__(self):
         return '{}'.format(self.pk)
@@ -496,16 +740,14 @@ class CalculatorTurnouts(models.Model):
         'calc2_object_id'
     )
 
-    def get_amount(self, turnout):
-        turnouts = WorkerTurnout.objects.filter(
-            worker=turnout.worker,
-            timesheet__customer=turnout.timesheet.customer
-        ).count()
+    def get_amount(self, turnout, context=None):
+        context = _context(turnout, context)
+        turnouts = len(context.customer_turnouts(turnout))
 
         if turnouts < self.threshold:
-            return self.calc1.get_amount(turnout)
+            return self.calc1.get_amount(turnout, context)
         else:
-            return self.calc2.get_amount(turnout)
+            return self.calc2.get_amount(turnout, context)
 
     def __str__(self):
         return '{}'.format(self.pk)
@@ -534,8 +776,9 @@ class CalculatorForeman(models.Model):
         'calc2_object_id'
     )
 
-    def get_amount(self, turnout):
-        return self.calc1.get_amount(turnout) + self.calc2.get_amount(turnout)
+    def get_amount(self, turnout, context=None):
+        context = _context(turnout, context)
+        return self.calc1.get_amount(turnout, context) + self.calc2.get_amount(turnout, context)
 
     def __str__(self):
         return '{}'.format(self.pk)
@@ -548,34 +791,34 @@ class CalculatorForemanOutputSum(models.Model):
     # для дневного + ночного табеля с этим бригадиром
     # считаем суммарную выработку, и по ней оплачиваем
     # ночной табель. Дневной табель не оплачиваем.
-    def get_amount(self, foreman_turnout):
+    def get_amount(self, foreman_turnout, context=None):
+        context = _context(foreman_turnout, context)
         current_timesheet = foreman_turnout.timesheet
         if current_timesheet.sheet_turn == 'День':
             return 0
 
-        timesheets = TimeSheet.objects.filter(
-            foreman=current_timesheet.foreman,
-            sheet_date=current_timesheet.sheet_date
-        ).distinct()
-
         customer_calculator_pk = AmountCalculator.objects.get(
             foreman_object_id=self.pk
         ).customer_object_id
 
-        prices = CalculatorOutput.objects.get(
-            pk=customer_calculator_pk
-        ).prices
+        prices = context.box_prices(customer_calculator_pk)
 
         # выработка, выраженная в деньгах
         output_sum = 0
-        for timesheet in timesheets:
-            for turnout in timesheet.worker_turnouts.all():
-                for output in TurnoutOutput.objects.filter(turnout=turnout):
-                    price = prices.get(
-                        box_type=output.box_type
-                    ).price
-                    output_sum += output.amount * price
-        return _get_value(self.conditions, output_sum)
+        for box_type_id, amount in TurnoutOutput.objects.filter(
+            turnout__timesheet__foreman=current_timesheet.foreman,
+            turnout__timesheet__sheet_date=current_timesheet.sheet_date,
+        ).order_by().values_list(
+            'box_type'
+        ).annotate(
+            Sum('amount')
+        ):
+            if box_type_id not in prices:
+                raise BoxPrice.DoesNotExist(
+                    f'Нет цены для типа {box_type_id} в калькуляторе {customer_calculator_pk}'
+                )
+            output_sum += amount * prices[box_type_id]
+        return _get_value(context.pairs(self), output_sum)
 
     def __str__(self):
         return '{}'.format(self.pk)
@@ -652,15 +895,16 @@ class CalculatorOutput(models.Model):
         default=0
     )
 
-    def get_amount(self, turnout):
+    def get_amount(self, turnout, context=None):
+        context = _context(turnout, context)
         if self.is_side_job:
-            amount = Decimal(self._side_job_amount(turnout))
+            amount = Decimal(self._side_job_amount(turnout, context))
             if amount > 0:
                 amount += self.fixed_bonus
             return amount
 
         if not self.bonus_enabled:
-            amount = self._turnout_output_sum(turnout)
+            amount = self._turnout_output_sum(turnout, context)
             if amount > 0:
                 amount += self.fixed_bonus
             return amount
@@ -679,89 +923,72 @@ class CalculatorOutput(models.Model):
         # после 11.06 бонус отменен
         deadline = datetime.date(year=2019, month=6, day=11)
         if turnouts.first().timesheet.sheet_date > deadline:
-            return self._turnout_output_sum(turnout)
+            return self._turnout_output_sum(turnout, context)
 
         if turnouts.count() < 4:
             pass
         elif turnouts.count() == 4:
             for turnout in turnouts:
-                s += self._turnout_output_sum(turnout)
+                s += self._turnout_output_sum(turnout, context)
         elif turnouts.count() == 7:
             turnouts = list(turnouts)
-            s += self._turnout_output_sum(turnout)
+            s += self._turnout_output_sum(turnout, context)
             for turnout in turnouts[:3]:
                 output = 0
                 if hasattr(turnout, 'output'):
                     for item in turnout.output.all():
                         output += item.amount
 
-                turnout_sum = self._turnout_output_sum(turnout)
+                turnout_sum = self._turnout_output_sum(turnout, context)
                 if output >= 300 and turnout_sum < 1200:
                     s += (1200 - turnout_sum)
 
         else:
-            s = self._turnout_output_sum(turnout)
+            s = self._turnout_output_sum(turnout, context)
 
         return s
 
-    def _side_job_amount(self, turnout):
-        worker = turnout.worker
+    def _side_job_amount(self, turnout, context):
         if not hasattr(turnout, 'turnoutservice'):
             return 0
 
-        side_job_service = turnout.turnoutservice
-
         # Новичкам подрабатывать можно только 3 дня.
         # Дальше рабочий должен переходить либо на вахтовый вариант
         # либо на обычный
 
-        turnouts = worker.worker_turnouts.filter(
-            timesheet__customer=turnout.timesheet.customer,
-            timesheet__sheet_date__lte=turnout.timesheet.sheet_date
-        ).order_by(
-            'timesheet__sheet_date'
-        )
+        turnouts = [
+            turnout_id
+            for turnout_id, day in context.customer_turnouts(turnout)
+            if day <= turnout.timesheet.sheet_date
+        ]
 
-        if turnouts.count() > 3:
-            if turnout not in list(turnouts)[:3]:
+        if len(turnouts) > 3:
+            if turnout.pk not in turnouts[:3]:
                 return 0
 
-        if not hasattr(turnout, 'output'):
-            return 0
-
-        if not hasattr(self, 'prices'):
-            return 0
-
         vegetables = 0
-        vegetables_output = turnout.output.filter(
-            box_type__name='Овощи'
-        )
-        if vegetables_output.exists():
-            vegetables = vegetables_output.get().amount
-
-        other = turnout.output.exclude(
-            box_type__name='Овощи'
-        ).aggregate(
-            Sum('amount')
-        )['amount__sum'] or 0
+        other = 0
+        for box_type_id, box_type_name, amount in context.outputs(turnout):
+            if box_type_name == 'Овощи':
+                vegetables += amount
+            else:
+                other += amount
 
         if vegetables >= 300 or other >= 400:
             return max(
                 1000,
-                self._turnout_output_sum(turnout)
+                self._turnout_output_sum(turnout, context)
             )
 
         return 0
 
-    def _turnout_output_sum(self, turnout):
+    def _turnout_output_sum(self, turnout, context):
         s = Decimal(0)
-        if hasattr(turnout, 'output') and hasattr(self, 'prices'):
-            for item in turnout.output.all():
-                try:
-                    price = self.prices.get(box_type=item.box_type).price
-                    s += (item.amount * price)
-                except ObjectDoesNotExist:
-                    pass
+        prices = context.box_prices(self.pk)
+        for box_type_id, box_type_name, amount in context.outputs(turnout):
+            price = prices.get(box_type_id)
+            if price is not None:
+                s += (amount * price)
         return s
 
     def __str__(self):
@@ -751,21 +751,9 @@ class WorkerQuerySet(models.QuerySet):
         )
 
     def filter_by_text(self, value):
-        qs = self
-        if 'full_name' not in qs.query.annotations:
-            qs = qs.with_full_name()
-        return qs.annotate(
-            passport_number_contains_value=Exists(
-                WorkerPassport.objects.filter(
-                    workers_id=OuterRef('pk'),
-                    # is_actual=True,
-                    another_passport_number__icontains=value
-                )
-            )
-        ).filter(
-            Q(passport_number_contains_value=True) |
-            Q(tel_number__icontains=value) |
-            Q(full_name__icontains=value)
+        # full name, phone or any passport number, see the_redhuman_is.models.search
+        return self.filter(
+            search_document__document__contains=value.strip().lower()
         )
 
     def filter_by_name_or_phone(self, value):
@@ -1764,3 +1752,60 @@ class WorkerRating(models.Model):
         ],
         default=UNKNOWN,
     )
+    # Counters of the reliability window, the days before `reliability_date`
+    # (see services.worker.update_reliability)
+    reliability_date = models.DateField(
+        null=True,
+        blank=True,
+    )
+    signup_turnouts = models.PositiveIntegerField(
+        default=0,
+    )
+    assigned_signups = models.PositiveIntegerField(
+        default=0,
+    )
+
+
+class WorkerReliabilityDay(models.Model):
+    """
+    Online signup of the worker and turnouts/assignments of the day;
+    maintained by services.worker (only the days with any of them are kept).
+    """
+    worker = models.ForeignKey(
+        Worker,
+        on_delete=models.CASCADE,
+        verbose_name='Работник',
+        related_name='reliability_days',
+    )
+    date = models.DateField(
+        verbose_name='Дата',
+    )
+    signed_up = models.BooleanField(
+        verbose_name='Запись онлайн',
+        default=False,
+    )
+    turned_out = models.BooleanField(
+        verbose_name='Выход',
+        default=False,
+    )
+    assigned = models.BooleanField(
+        verbose_name='Назначен на адрес',
+        default=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['worker', 'date'],
+                name='unique_worker_reliability_day',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['date'],
+                name='reliabilityday_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.worker} {self.date}'
@@ -0,0 +1,526 @@
+import datetime
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy
+
+from django.db.models import (
+    DecimalField,
+    Exists,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
+
+import finance
+
+from the_redhuman_is.models.fine_utils import deduction_accounts
+from the_redhuman_is.models.models import (
+    TimeSheet,
+    WorkerDeduction,
+    WorkerTurnout,
+)
+from the_redhuman_is.models.reconciliation import Reconciliation
+from the_redhuman_is.models.turnout_operations import (
+    CustomerFine,
+    TurnoutDeduction,
+)
+
+#
+# Columnar engine for the customer summary report.
+#
+# All the turnouts of the period are fetched with a single query (plus a
+# couple of grouped ones for deductions and reconciliations) into numpy
+# arrays. Every report type is then a vectorized expression over these
+# columns, and the report grid is built with one `numpy.add.at` over
+# (row, day) indexes, where a row is a location x shift x service triple.
+#
+
+NEW_TURNOUT_REPORT_TYPES = (
+    'new_turnouts',
+    'new_turnouts_natural',
+    'new_applicants',
+)
+
+ORDER_REPORT_TYPES = (
+    'turnouts_ordered',
+    'unclosed_orders',
+)
+
+_DEDUCTION_REPORT_TYPES = (
+    'worker_deductions',
+    'worker_money_fines',
+)
+
+
+def _sum_subquery(model, field='operation__amount'):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                turnout=OuterRef('pk')
+            ).values(
+                'turnout'
+            ).annotate(
+                amount_sum=Sum(field)
+            ).values(
+                'amount_sum'
+            ),
+            output_field=DecimalField()
+        ),
+        0,
+        output_field=DecimalField()
+    )
+
+
+def _float_column(values):
+    return numpy.array(
+        [float(value) if value else 0.0 for value in values],
+        dtype=float
+    )
+
+
+def _bool_column(values):
+    return numpy.array([bool(value) for value in values], dtype=bool)
+
+
+_TURNOUT_FIELDS = (
+    'pk',
+    'worker',
+    'timesheet__customer',
+    'timesheet__sheet_date',
+    'timesheet__customerorder__cust_location',
+    'timesheet__customerorder__on_date',
+    'timesheet__customerorder__bid_turn',
+    'turnoutservice__customer_service',
+    'hours_worked',
+    'performance',
+    'turnoutcustomeroperation__operation__amount',
+    'turnoutoperationtopay__operation__amount',
+    'customer_fines',
+    'turnout_deductions',
+    'is_first',
+    'worker__applicant_link',
+)
+
+
+def turnout_columns(orders, citizenship: str = 'all') -> Dict[str, numpy.ndarray]:
+    turnouts = WorkerTurnout.objects.filter(
+        timesheet__customerorder__in=orders
+    )
+    if citizenship == 'russian':
+        turnouts = turnouts.filter(
+            worker__citizenship__name='РФ',
+        )
+    elif citizenship == 'not_russian':
+        turnouts = turnouts.exclude(
+            worker__citizenship__name='РФ',
+        )
+
+    rows = turnouts.annotate(
+        is_first=~Exists(
+            WorkerTurnout.objects.filter(
+                worker=OuterRef('worker'),
+                timesheet__sheet_date__lt=OuterRef('timesheet__sheet_date'),
+            )
+        ),
+        customer_fines=_sum_subquery(CustomerFine),
+        turnout_deductions=_sum_subquery(TurnoutDeduction),
+    ).order_by().values_list(*_TURNOUT_FIELDS)
+
+    (
+        pks,
+        workers,
+        customers,
+        sheet_dates,
+        locations,
+        days,
+        shifts,
+        services,
+        hours,
+        performance,
+        customer_money,
+        worker_money,
+        customer_fines,
+        turnout_deductions,
+        is_first,
+        applicant_links,
+    ) = zip(*rows) if rows else ((),) * len(_TURNOUT_FIELDS)
+
+    return {
+        'pk': numpy.array(pks, dtype=int),
+        'worker': numpy.array(workers, dtype=int),
+        'customer': numpy.array(customers, dtype=int),
+        'sheet_date': numpy.array(sheet_dates, dtype=object),
+        'location': numpy.array(locations, dtype=object),
+        'day': numpy.array(days, dtype=object),
+        'shift': numpy.array(shifts, dtype=object),
+        'service': numpy.array(services, dtype=object),
+        'hours': _float_column(hours),
+        'performance': _float_column(performance),
+        'customer_money': _float_column(customer_money),
+        'worker_money': _float_column(worker_money),
+        'customer_fines': _float_column(customer_fines),
+        'turnout_deductions': _float_column(turnout_deductions),
+        'is_first': _bool_column(is_first),
+        'has_applicant': _bool_column(applicant_links),
+    }
+
+
+def _worker_deductions(columns, first_day, last_day) -> numpy.ndarray:
+    """
+    Deductions of a worker to the customer's deduction accounts made on the
+    turnout day (the same rule as `views.customer_summary._worker_deductions`).
+    """
+    customers = set(columns['customer'].tolist())
+    account_customers = dict(
+        deduction_accounts(
+            customers=customers
+        ).annotate(
+            customer=Coalesce(
+                F('account_90_1_disciplinary_deduction_accounts__customer'),
+                F('account_90_1_fine_based_deduction_accounts__customer'),
+                F('account_90_1_industrial_accounts__customer'),
+            )
+        ).values_list(
+            'pk',
+            'customer',
+        )
+    )
+
+    deductions = WorkerDeduction.objects.filter(
+        operation__credit__in=list(account_customers.keys()),
+        operation__timepoint__date__range=(first_day, last_day),
+        operation__debet__worker_account__worker__in=set(columns['worker'].tolist()),
+    ).values(
+        'operation__debet__worker_account__worker',
+        'operation__timepoint__date',
+        'operation__credit',
+    ).annotate(
+        amount_sum=Sum('operation__amount')
+    ).order_by()
+
+    amounts = {}
+    for item in deductions:
+        key = (
+            item['operation__debet__worker_account__worker'],
+            item['operation__timepoint__date'],
+            account_customers[item['operation__credit']],
+        )
+        amounts[key] = amounts.get(key, 0.0) + float(item['amount_sum'])
+
+    return numpy.array(
+        [
+            amounts.get(key, 0.0)
+            for key in zip(
+                columns['worker'].tolist(),
+                columns['sheet_date'].tolist(),
+                columns['customer'].tolist(),
+            )
+        ],
+        dtype=float
+    )
+
+
+def _is_unreconciled(columns) -> numpy.ndarray:
+    last_closed_days = dict(
+        Reconciliation.objects.filter(
+            customer__in=set(columns['customer'].tolist()),
+            is_closed=True,
+        ).values(
+            'customer'
+        ).annotate(
+            last_day=Max('last_day')
+        ).values_list(
+            'customer',
+            'last_day',
+        )
+    )
+    return numpy.array(
+        [
+            customer not in last_closed_days or day > last_closed_days[customer]
+            for customer, day in zip(
+                columns['customer'].tolist(),
+                columns['sheet_date'].tolist(),
+            )
+        ],
+        dtype=bool
+    )
+
+
+def turnout_values(columns, report_type, first_day, last_day):
+    """
+    Per-turnout values of the report as a numpy array
+    (a pair of arrays for 'margin_percentage').
+    """
+    if report_type == 'hours':
+        return columns['hours']
+    if report_type == 'fm_hours':
+        return columns['hours'] * columns['performance'] / 100
+    if report_type in ('turnouts', 'noderived'):
+        return numpy.ones(len(columns['pk']))
+
+    customer_money = columns['customer_money']
+    worker_money = columns['worker_money']
+
+    if report_type == 'customer_money':
+        return customer_money
+    if report_type == 'customer_debt_money':
+        return numpy.where(_is_unreconciled(columns), customer_money, 0.0)
+    if report_type == 'customer_fines':
+        return columns['customer_fines']
+    if report_type == 'customer_money_fines':
+        return customer_money - columns['customer_fines']
+    if report_type == 'worker_money':
+        return worker_money
+    if report_type in _DEDUCTION_REPORT_TYPES:
+        deductions = (
+            _worker_deductions(columns, first_day, last_day) +
+            columns['turnout_deductions']
+        )
+        if report_type == 'worker_deductions':
+            return deductions
+        return worker_money - deductions
+    if report_type == 'margin':
+        return customer_money - worker_money
+    if report_type == 'margin_percentage':
+        return worker_money, customer_money
+
+    is_first = columns['is_first']
+    has_applicant = columns['has_applicant']
+    if report_type == 'new_turnouts':
+        return is_first.astype(float)
+    if report_type == 'new_turnouts_natural':
+        return (is_first & ~has_applicant).astype(float)
+    if report_type == 'new_applicants':
+        return (is_first & has_applicant).astype(float)
+
+    raise ValueError(f'Unsupported report type {report_type}')
+
+
+RowKey = Tuple[int, Optional[str], Optional[int]]
+
+
+class SummaryGrid:
+    """
+    Maps (location, shift, service) rows and days to the cells of the
+    report and accumulates values into them.
+
+    If the report is not broken down by shift/service, the corresponding
+    component of the row key is None.
+    """
+
+    def __init__(
+            self,
+            rows: List[RowKey],
+            days: List[datetime.date],
+            by_shift: bool,
+            by_service: bool
+    ):
+        self.rows = rows
+        self.days = days
+        self.by_shift = by_shift
+        self.by_service = by_service
+
+        self._row_index = {key: index for index, key in enumerate(rows)}
+        self._day_index = {day: index for index, day in enumerate(days)}
+
+        self._location_shift_rows = {}
+        for index, (location, shift, service) in enumerate(rows):
+            self._location_shift_rows.setdefault(
+                (location, shift), []
+            ).append(index)
+
+    def zeros(self):
+        return numpy.zeros((len(self.rows), len(self.days)))
+
+    def _shift(self, shift):
+        return shift if self.by_shift else None
+
+    def accumulate(self, locations, days, shifts, services, values):
+        """
+        Sums values into cells. Entries without a matching row
+        (e.g. turnouts without a service in a 'by service' layout) are skipped.
+        """
+        grid = self.zeros()
+        row_indexes = numpy.array(
+            [
+                self._row_index.get(
+                    (
+                        location,
+                        self._shift(shift),
+                        service if self.by_service else None
+                    ),
+                    -1
+                )
+                for location, shift, service in zip(locations, shifts, services)
+            ],
+            dtype=int
+        )
+        day_indexes = numpy.array(
+            [self._day_index.get(day, -1) for day in days],
+            dtype=int
+        )
+        mask = (row_indexes >= 0) & (day_indexes >= 0)
+        numpy.add.at(
+            grid,
+            (row_indexes[mask], day_indexes[mask]),
+            numpy.asarray(values, dtype=float)[mask]
+        )
+        return grid
+
+    def broadcast(self, locations, days, shifts, values):
+        """
+        Sums order level values into cells. Orders have no service, so every
+        service row of the location & shift gets the value.
+        """
+        grid = self.zeros()
+        for location, day, shift, value in zip(locations, days, shifts, values):
+            day_index = self._day_index.get(day)
+            if day_index is None:
+                continue
+            row_indexes = self._location_shift_rows.get(
+                (location, self._shift(shift)),
+                []
+            )
+            grid[row_indexes, day_index] += value
+        return grid
+
+
+def _order_totals(orders):
+    return list(
+        orders.order_by().values(
+            'cust_location',
+            'on_date',
+            'bid_turn',
+        ).annotate(
+            ordered=Sum('number_of_workers'),
+            unclosed=Coalesce(
+                Sum(
+                    'number_of_workers',
+                    filter=Q(timesheet__isnull=True)
+                ),
+                0
+            ),
+        )
+    )
+
+
+def _unpayed_worker_money(orders, summary_grid):
+    from the_redhuman_is.models.worker import Worker
+
+    workers_locations = dict(
+        Worker.objects.filter(
+            worker_turnouts__timesheet__customerorder__in=orders
+        ).distinct(
+        ).annotate(
+            last_location=Subquery(
+                TimeSheet.objects.filter(
+                    worker_turnouts__worker__pk=OuterRef('pk')
+                ).order_by(
+                    '-sheet_date'
+                ).values('cust_location')[:1]
+            ),
+        ).values_list(
+            'pk',
+            'last_location',
+        )
+    )
+
+    operations = finance.models.Operation.objects.filter(
+        paysheet_entry_operation__isnull=True,
+        paysheet_v2_operation__isnull=True,
+        timepoint__date__range=(summary_grid.days[0], summary_grid.days[-1]),
+    )
+
+    def _sums(side):
+        worker_field = f'{side}__worker_account__worker'
+        return operations.filter(
+            **{f'{worker_field}__in': list(workers_locations.keys())}
+        ).values_list(
+            worker_field,
+            'timepoint__date',
+        ).annotate(
+            amount_sum=Sum('amount')
+        ).order_by()
+
+    saldos = {}
+    for sign, side in ((-1, 'debet'), (1, 'credit')):
+        for worker, day, amount in _sums(side):
+            key = (workers_locations[worker], day)
+            saldos[key] = saldos.get(key, 0.0) + sign * float(amount)
+
+    # The saldo is shown only for the days which have orders
+    order_days = set(orders.values_list('cust_location', 'on_date'))
+    keys = [key for key in saldos.keys() if key in order_days]
+    return summary_grid.accumulate(
+        [location for location, day in keys],
+        [day for location, day in keys],
+        [None] * len(keys),
+        [None] * len(keys),
+        [saldos[key] for key in keys]
+    )
+
+
+def summary_report_grid(
+        orders,
+        summary_grid: SummaryGrid,
+        report_type: str,
+        citizenship: str = 'all'):
+    """
+    Computes the whole report as a rows x days numpy array
+    (a pair of such arrays for 'margin_percentage').
+    """
+    if report_type == 'unpayed_worker_money':
+        return _unpayed_worker_money(orders, summary_grid)
+
+    if report_type in ORDER_REPORT_TYPES or report_type == 'noderived':
+        totals = _order_totals(orders)
+        ordered_grid = summary_grid.broadcast(
+            [item['cust_location'] for item in totals],
+            [item['on_date'] for item in totals],
+            [item['bid_turn'] for item in totals],
+            [
+                item['ordered' if report_type != 'unclosed_orders' else 'unclosed']
+                for item in totals
+            ]
+        )
+        if report_type in ORDER_REPORT_TYPES:
+            return ordered_grid
+
+    if report_type not in NEW_TURNOUT_REPORT_TYPES:
+        citizenship = 'all'
+
+    columns = turnout_columns(orders, citizenship)
+    values = turnout_values(
+        columns,
+        report_type,
+        summary_grid.days[0],
+        summary_grid.days[-1]
+    )
+
+    def _accumulate(values):
+        return summary_grid.accumulate(
+            columns['location'],
+            columns['day'],
+            columns['shift'],
+            columns['service'],
+            values
+        )
+
+    if report_type == 'margin_percentage':
+        worker_money, customer_money = values
+        return _accumulate(worker_money), _accumulate(customer_money)
+
+    grid = _accumulate(values)
+    if report_type == 'noderived':
+        grid = numpy.maximum(0.0, ordered_grid - grid)
+
+    return grid
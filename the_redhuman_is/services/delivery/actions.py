@@ -65,6 +65,7 @@ from the_redhuman_is.services.delivery import (
     notifications,
     tariffs,
 )
+from the_redhuman_is.services.delivery.summary import refresh_request_summary
 from the_redhuman_is.services.delivery.utils import (
     DESCRIPTIONS,
     DeliveryWorkflowError,
@@ -875,8 +876,7 @@ def add_item_workers(
         return None, messages, confirmation_required
 
     else:
-        for worker_id in new_assignments:
-            notifications.notify_new_request_available(worker_id)
+        notifications.notify_new_request_available_bulk(new_assignments)
 
         return requestworkers, messages, confirmation_required
 
@@ -1774,6 +1774,8 @@ def create_delivery_request(
         if user_customer is None:
             try_assign_operator(request_id, user)
 
+        refresh_request_summary(delivery_request.pk)
+
     normalize_address_in_bulk([item.pk for item in items_created], delivery_request.pk, 0, user)
 
     if notify_dispatchers:
@@ -2616,6 +2618,7 @@ def add_extra_photos(request_id, images):
         raise ObjectNotFoundError(f'Заявка {request_id} не найдена.')
     for image in images:
         add_photo(delivery_request, image)
+    refresh_request_summary(delivery_request.pk)
 
 
 @log
@@ -0,0 +1,362 @@
+import datetime
+import math
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import (
+    DateTimeField,
+    FloatField,
+)
+from rest_framework.serializers import Serializer
+
+from the_redhuman_is.models.delivery import (
+    DeliveryItem,
+    DeliveryRequest,
+    ItemWorker,
+    ItemWorkerRejection,
+    LastLocation,
+    NormalizedAddress,
+    RequestWorker,
+    WorkerRejection,
+)
+from the_redhuman_is.services.delivery import retrieve
+from the_redhuman_is.services.delivery.utils import get_user_customer_location
+
+
+# Map data (see retrieve.get_requests_on_map) is kept in the cache per scope
+# (date, customer, location, requested location, zone) together with the time every request and
+# worker was changed and a grid of the coordinates, so the polls of the map
+# neither rebuild the whole day nor download it:
+#  * the snapshot is rebuilt only when something has changed since the last
+#    build (see the receivers below), but not more often than once
+#    in MAP_SNAPSHOT_MIN_AGE, and at least once in MAP_SNAPSHOT_MAX_AGE
+#    (the 'expiring' flags depend on the current time);
+#  * `since` returns only the requests and workers changed after it;
+#  * `viewport` returns only the ones inside the bounding box.
+
+MAP_SNAPSHOT_MIN_AGE = datetime.timedelta(seconds=5)
+MAP_SNAPSHOT_MAX_AGE = datetime.timedelta(minutes=1)
+MAP_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+MAP_SNAPSHOT_LOCK_TIMEOUT = 30
+
+# How long the removed requests and workers are remembered.
+# An older `since` gets the full data.
+MAP_HISTORY = datetime.timedelta(hours=1)
+
+# ~1 km
+GRID_CELL_DEGREES = 0.01
+
+_VERSION_KEY = 'map:version'
+
+
+def _snapshot_key(scope):
+    return 'map:snapshot:{}:{}:{}:{}:{}'.format(*scope)
+
+
+def _lock_key(scope):
+    return 'map:lock:{}:{}:{}:{}:{}'.format(*scope)
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = _bump_version()
+    return version
+
+
+def _bump_version():
+    try:
+        return cache.incr(_VERSION_KEY, 1)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+        return 1
+
+
+def invalidate_map_snapshots():
+    transaction.on_commit(_bump_version)
+
+
+def _cell(latitude, longitude):
+    return (
+        math.floor(latitude / GRID_CELL_DEGREES),
+        math.floor(longitude / GRID_CELL_DEGREES),
+    )
+
+
+def _request_cells(request):
+    return {
+        _cell(item['location']['latitude'], item['location']['longitude'])
+        for item in request['items']
+        if item['location'] is not None
+    }
+
+
+def _worker_cells(worker):
+    location = worker['location']
+    if location['latitude'] is None or location['longitude'] is None:
+        return set()
+    return {_cell(location['latitude'], location['longitude'])}
+
+
+def _grid(entities, get_cells):
+    """
+    Returns ({cell: [pk, ...]}, [pk of the entities without coordinates]).
+    """
+    grid = {}
+    unlocated = []
+    for pk, entity in entities.items():
+        cells = get_cells(entity['data'])
+        if not cells:
+            unlocated.append(pk)
+        for cell in cells:
+            grid.setdefault(cell, []).append(pk)
+    return grid, unlocated
+
+
+def _merge_entities(previous, current, removed, now):
+    """
+    Keeps the change time of the entities which are the same as in
+    the previous snapshot. Records the disappeared ones in `removed`.
+    """
+    entities = {}
+    for pk, data in current.items():
+        old = previous.get(pk)
+        if old is not None and old['data'] == data:
+            entities[pk] = old
+        else:
+            entities[pk] = {'data': data, 'updated': now}
+            removed.pop(pk, None)
+    for pk in previous.keys() - current.keys():
+        removed[pk] = now
+    return entities
+
+
+def _build_snapshot(date, user, zone_id, location_id, previous, version):
+    now = timezone.now()
+    # the responses have the millisecond precision (DjangoJSONEncoder)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    data = retrieve.get_requests_on_map(date, user, zone_id, location_id)
+
+    if previous is None:
+        previous = {
+            'history_start': now,
+            'requests': {},
+            'workers': {},
+            'removed_requests': {},
+            'removed_workers': {},
+        }
+
+    history_start = max(previous['history_start'], now - MAP_HISTORY)
+    removed_requests = {
+        pk: timestamp
+        for pk, timestamp in previous['removed_requests'].items()
+        if timestamp >= history_start
+    }
+    removed_workers = {
+        pk: timestamp
+        for pk, timestamp in previous['removed_workers'].items()
+        if timestamp >= history_start
+    }
+
+    requests = _merge_entities(
+        previous['requests'],
+        {request['pk']: request for request in data['delivery_requests']},
+        removed_requests,
+        now
+    )
+    workers = _merge_entities(
+        previous['workers'],
+        {worker['pk']: worker for worker in data['workers']},
+        removed_workers,
+        now
+    )
+
+    return {
+        'version': version,
+        'built': now,
+        'history_start': history_start,
+        'requests': requests,
+        'workers': workers,
+        'removed_requests': removed_requests,
+        'removed_workers': removed_workers,
+        'request_grid': _grid(requests, _request_cells),
+        'worker_grid': _grid(workers, _worker_cells),
+        'bounding_box': data['bounding_box'],
+        'city_borders': data['city_borders'],
+    }
+
+
+def _is_fresh(snapshot, version, now):
+    if snapshot is None:
+        return False
+    age = now - snapshot['built']
+    if age >= MAP_SNAPSHOT_MAX_AGE:
+        return False
+    return snapshot['version'] == version or age < MAP_SNAPSHOT_MIN_AGE
+
+
+def _scope(date, user, zone_id, location_id):
+    # The requested location is a part of the scope even for a location
+    # user: the map of another location is empty and must not be served
+    # for the user's own one
+    user_customer, user_location = get_user_customer_location(user)
+    return date, user_customer, user_location, location_id, zone_id
+
+
+def _get_snapshot(date, user, zone_id, location_id):
+    scope = _scope(date, user, zone_id, location_id)
+
+    snapshot = cache.get(_snapshot_key(scope))
+    version = _version()
+    if _is_fresh(snapshot, version, timezone.now()):
+        return snapshot
+
+    locked = cache.add(_lock_key(scope), 1, MAP_SNAPSHOT_LOCK_TIMEOUT)
+    if not locked and snapshot is not None:
+        # Somebody is rebuilding it right now
+        return snapshot
+    try:
+        snapshot = _build_snapshot(date, user, zone_id, location_id, snapshot, version)
+        cache.set(_snapshot_key(scope), snapshot, MAP_SNAPSHOT_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(_lock_key(scope))
+    return snapshot
+
+
+def _in_viewport(grid, viewport):
+    cells, unlocated = grid
+    min_cell = _cell(viewport['min_latitude'], viewport['min_longitude'])
+    max_cell = _cell(viewport['max_latitude'], viewport['max_longitude'])
+
+    def _inside(cell):
+        return (
+            min_cell[0] <= cell[0] <= max_cell[0] and
+            min_cell[1] <= cell[1] <= max_cell[1]
+        )
+
+    viewport_cell_count = (
+        (max_cell[0] - min_cell[0] + 1) *
+        (max_cell[1] - min_cell[1] + 1)
+    )
+    if viewport_cell_count < len(cells):
+        candidates = (
+            (lat, lon)
+            for lat in range(min_cell[0], max_cell[0] + 1)
+            for lon in range(min_cell[1], max_cell[1] + 1)
+        )
+    else:
+        candidates = (cell for cell in cells if _inside(cell))
+
+    pks = set(unlocated)
+    for cell in candidates:
+        pks.update(cells.get(cell, []))
+    return pks
+
+
+def _select(entities, grid, since, viewport):
+    if viewport is not None:
+        pks = _in_viewport(grid, viewport)
+    else:
+        pks = entities.keys()
+
+    return [
+        entities[pk]['data']
+        for pk in sorted(pks)
+        if since is None or entities[pk]['updated'] > since
+    ]
+
+
+class MapQuerySerializer(Serializer):
+    since = DateTimeField(allow_null=True, default=None)
+    min_latitude = FloatField(min_value=-90, max_value=90, required=False)
+    min_longitude = FloatField(min_value=-180, max_value=180, required=False)
+    max_latitude = FloatField(min_value=-90, max_value=90, required=False)
+    max_longitude = FloatField(min_value=-180, max_value=180, required=False)
+
+    VIEWPORT_FIELDS = ['min_latitude', 'min_longitude', 'max_latitude', 'max_longitude']
+
+    def validate(self, attrs):
+        viewport = {
+            name: attrs.pop(name)
+            for name in self.VIEWPORT_FIELDS
+            if name in attrs
+        }
+        if not viewport:
+            attrs['viewport'] = None
+        elif len(viewport) < len(self.VIEWPORT_FIELDS):
+            raise ValidationError('Границы области карты указаны не полностью.')
+        else:
+            attrs['viewport'] = viewport
+        return attrs
+
+
+def get_map_data(date, user, zone_id=None, location_id=None, since=None, viewport=None):
+    """
+    The same as retrieve.get_requests_on_map, but served from the snapshot.
+
+    `since` is the 'timestamp' of the previous response: only the requests
+    and workers changed after it are returned, along with the ids of the
+    removed ones. If `since` is too old, the full data is returned
+    ('full' is True).
+
+    `viewport` is a dict with min/max latitude/longitude; the requests with
+    items and the workers located inside it are returned (and the ones
+    without coordinates).
+    """
+    snapshot = _get_snapshot(date, user, zone_id, location_id)
+
+    full = since is None or since < snapshot['history_start']
+    if full:
+        since = None
+
+    def _removed(removed):
+        if since is None:
+            return []
+        return sorted(pk for pk, timestamp in removed.items() if timestamp > since)
+
+    return {
+        'timestamp': timezone.localtime(snapshot['built']),
+        'full': full,
+        'delivery_requests': _select(
+            snapshot['requests'],
+            snapshot['request_grid'],
+            since,
+            viewport
+        ),
+        'workers': _select(
+            snapshot['workers'],
+            snapshot['worker_grid'],
+            since,
+            viewport
+        ),
+        'removed_requests': _removed(snapshot['removed_requests']),
+        'removed_workers': _removed(snapshot['removed_workers']),
+        'bounding_box': snapshot['bounding_box'],
+        'city_borders': snapshot['city_borders'],
+    }
+
+
+@receiver(post_save, sender=DeliveryRequest)
+@receiver(post_delete, sender=DeliveryRequest)
+@receiver(post_save, sender=DeliveryItem)
+@receiver(post_delete, sender=DeliveryItem)
+@receiver(post_save, sender=NormalizedAddress)
+@receiver(post_save, sender=RequestWorker)
+@receiver(post_delete, sender=RequestWorker)
+@receiver(post_save, sender=WorkerRejection)
+@receiver(post_delete, sender=WorkerRejection)
+@receiver(post_save, sender=ItemWorker)
+@receiver(post_delete, sender=ItemWorker)
+@receiver(post_save, sender=ItemWorkerRejection)
+@receiver(post_delete, sender=ItemWorkerRejection)
+@receiver(post_save, sender=LastLocation)
+def invalidate_map_snapshots_on_change(sender, **kwargs):
+    invalidate_map_snapshots()
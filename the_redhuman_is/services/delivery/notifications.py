@@ -31,6 +31,7 @@ from the_redhuman_is.models.delivery import (
     ZoneGroup,
 )
 from the_redhuman_is.models.worker import Worker
+from the_redhuman_is.services.push_notifications import push_to_workers
 from the_redhuman_is import tasks
 
 from utils.date_time import string_from_date
@@ -85,16 +86,23 @@ def _last_fcm_token(worker_id):
     ).last()
 
 
+# Do not bother the same worker with 'new request' pushes more often
+NEW_REQUEST_PUSH_DEDUPE_WINDOW = 60 * 5
+
+
 def notify_new_request_available(worker_id):
-    token = _last_fcm_token(worker_id)
-    if token is not None:
-        tasks.send_push_notification(
-            'Новая заявка',
-            'Есть новая заявка для работы! Нажмите, чтобы подтвердить.',
-            None,
-            'new_request',
-            token.token
-        )
+    notify_new_request_available_bulk([worker_id])
+
+
+def notify_new_request_available_bulk(worker_ids, dedupe_window=None):
+    push_to_workers(
+        worker_ids,
+        'Новая заявка',
+        'Есть новая заявка для работы! Нажмите, чтобы подтвердить.',
+        None,
+        'new_request',
+        dedupe_window=dedupe_window
+    )
 
 
 def notify_unassigned_request_available(request: DeliveryRequest):
@@ -154,8 +162,10 @@ def notify_unassigned_request_available(request: DeliveryRequest):
         'pk',
         flat=True
     )
-    for worker_id in workers:
-        notify_new_request_available(worker_id)
+    notify_new_request_available_bulk(
+        workers,
+        dedupe_window=NEW_REQUEST_PUSH_DEDUPE_WINDOW
+    )
 
 
 def notify_driver_worker_assigned(request: DeliveryRequest, worker_id: Optional[int] = None):
@@ -73,6 +73,7 @@ from the_redhuman_is.models.turnout_calculators import (
 )
 from the_redhuman_is.models.worker import Worker
 
+from the_redhuman_is.services.delivery import self_assign_pool
 from the_redhuman_is.services.delivery.tariffs import METRO_LINES
 from the_redhuman_is.services.delivery.utils import (
     ObjectNotFoundError,
@@ -192,7 +193,82 @@ class DeliveryRequestBackofficeFilter(DeliveryRequestBaseFilter):
         return queryset
 
 
-def _get_request_queryset(with_workers=False, with_customer_amount=False):
+# Annotations of the backoffice request list which may be skipped
+# (see `fields` argument of get_delivery_request_list):
+# name -> (queryset -> annotated queryset, values fields)
+REQUEST_LIST_OPTIONAL_FIELDS = {
+    'operator': (
+        operator.methodcaller('with_operator'),
+        ['operator'],
+    ),
+    'worker_count': (
+        operator.methodcaller('with_summary', 'worker_count'),
+        ['worker_count'],
+    ),
+    'worker_confirmed_count': (
+        operator.methodcaller('with_summary', 'worker_confirmed_count'),
+        ['worker_confirmed_count'],
+    ),
+    'customer_resolution': (
+        operator.methodcaller('with_customer_resolution'),
+        ['customer_resolution'],
+    ),
+    'is_overdue': (
+        operator.methodcaller('with_is_overdue'),
+        ['is_overdue'],
+    ),
+    'has_self_assigned_worker': (
+        operator.methodcaller('with_summary', 'has_self_assigned_worker'),
+        ['has_self_assigned_worker'],
+    ),
+    'is_private': (
+        operator.methodcaller('with_is_private'),
+        ['is_private'],
+    ),
+    'extra_photos_exist': (
+        operator.methodcaller('with_summary', 'extra_photos_exist'),
+        ['extra_photos_exist'],
+    ),
+    'confirmation_time': (
+        operator.methodcaller('with_confirmation_time'),
+        ['confirmation_time'],
+    ),
+    'arrival_time': (
+        operator.methodcaller('with_arrival_time'),
+        ['arrival_time'],
+    ),
+    'new_photo_count': (
+        operator.methodcaller(
+            'with_summary',
+            'new_start_photo_count',
+            'new_finish_photo_count'
+        ),
+        ['new_start_photo_count', 'new_finish_photo_count'],
+    ),
+    # items, hours, pay_estimate, timepoint_ok
+    'items': (
+        None,  # depends on `with_workers`, see _get_request_queryset
+        [
+            'confirmed_timepoint',
+            'hours',
+            'items',
+            'delivery_service__hours',
+            'delivery_service__travel_hours',
+            'delivery_service__zone',
+        ],
+    ),
+}
+
+
+def _get_request_queryset(
+        with_workers=False,
+        with_customer_amount=False,
+        optional_fields=None
+):
+    """
+    `optional_fields` - names from REQUEST_LIST_OPTIONAL_FIELDS,
+    None means all of them.
+    """
     fields = [
         'pk',
         'date',
@@ -202,13 +278,9 @@ def _get_request_queryset(with_workers=False, with_customer_amount=False):
         'status',
         'status_description',
         'timestamp',
-        'confirmed_timepoint',
         'comment',
         'location_id',
         'location__location_name',
-        'operator',
-        'worker_count',
-        'worker_confirmed_count',
         'author_id',
         'author__first_name',
         'author__username',
@@ -216,39 +288,21 @@ def _get_request_queryset(with_workers=False, with_customer_amount=False):
         'customer__cust_name',
         'delivery_service_id',
         'delivery_service__operator_service_name',
-        'customer_resolution',
-        'is_overdue',
-        'has_self_assigned_worker',
-        'is_private',
-        'extra_photos_exist',
-        'confirmation_time',
-        'arrival_time',
-        'new_start_photo_count',
-        'new_finish_photo_count',
-        'hours',
-        'items',
-        'delivery_service__hours',
-        'delivery_service__travel_hours',
-        'delivery_service__zone',
     ]
-    request_qs = DeliveryRequest.objects.all(
-    ).with_operator(
-    ).with_worker_count(
-    ).with_worker_count(
-        confirmed=True
-    ).with_customer_resolution(
-    ).with_is_overdue(
-    ).with_has_self_assigned_worker(
-    ).with_is_private(
-    ).with_extra_photos_exist(
-    ).with_confirmation_time(
-    ).with_arrival_time(
-    ).with_new_start_photo_count(
-    ).with_new_finish_photo_count(
-    ).with_items_for_backoffice(
-        with_workers=with_workers
-    ).with_hours(
-    )
+    if optional_fields is None:
+        optional_fields = REQUEST_LIST_OPTIONAL_FIELDS.keys()
+
+    request_qs = DeliveryRequest.objects.all()
+    for name, (annotate, values) in REQUEST_LIST_OPTIONAL_FIELDS.items():
+        if name not in optional_fields:
+            continue
+        if name == 'items':
+            request_qs = request_qs.with_items_for_backoffice(
+                with_workers=with_workers
+            ).with_hours()
+        else:
+            request_qs = annotate(request_qs)
+        fields.extend(values)
 
     if with_customer_amount:
         request_qs = request_qs.with_customer_amount()
@@ -383,14 +437,20 @@ def _delivery_request_format_in_place(request):
         del request['location__location_name']
         request['location'] = None
 
-    request['new_photo_count'] = (
-        request.pop('new_start_photo_count') +
-        request.pop('new_finish_photo_count')
-    )
+    if 'new_start_photo_count' in request:
+        request['new_photo_count'] = (
+            request.pop('new_start_photo_count') +
+            request.pop('new_finish_photo_count')
+        )
 
     if request['comment'] == '':
         request['comment'] = None
 
+    request['driver_phones'] = format_phones(request['driver_phones'])
+
+    if 'items' not in request:
+        return
+
     for item in request['items']:
         metro = item['metro']
         if metro is not None:
@@ -410,22 +470,44 @@ def _delivery_request_format_in_place(request):
     request['timepoint_ok'] = _is_timepoint_ok(request)
     _calculate_item_lateness(request)
 
-    request['driver_phones'] = format_phones(request['driver_phones'])
-
 
-def get_delivery_request_list(user, filter_args):
+def get_delivery_request_list(
+        user,
+        filter_args,
+        before=None,
+        limit=None,
+        optional_fields=None
+):
+    """
+    Keyset pagination: `before` is the `next` value of the previous page
+    (requests are ordered by -pk), `limit` is the page size.
+    Without `limit` all the requests are returned.
+    """
     request_qs = _get_request_queryset(
         with_workers=True,
-        with_customer_amount=user.is_superuser
+        with_customer_amount=user.is_superuser,
+        optional_fields=optional_fields
     )
     if not user.is_superuser:
         request_qs = request_qs.exclude(status=DeliveryRequest.REMOVED)
 
-    requests = list(DeliveryRequestBackofficeFilter(filter_args, queryset=request_qs).qs)
+    request_qs = DeliveryRequestBackofficeFilter(filter_args, queryset=request_qs).qs
+    if before is not None:
+        request_qs = request_qs.filter(pk__lt=before)
+    if limit is not None:
+        request_qs = request_qs[:limit + 1]
+
+    requests = list(request_qs)
+    next_pk = None
+    if limit is not None and len(requests) > limit:
+        requests = requests[:limit]
+        next_pk = requests[-1]['pk']
+
     for request in requests:
         _delivery_request_format_in_place(request)
-        _delete_tariff_fields(request)
-        del request['confirmed_timepoint']
+        if 'items' in request:
+            _delete_tariff_fields(request)
+            del request['confirmed_timepoint']
 
     if 'unprofitable' in filter_args:
         fields_to_delete = ['worker_amount']
@@ -435,9 +517,23 @@ def get_delivery_request_list(user, filter_args):
             for field_name in fields_to_delete:
                 del request[field_name]
 
-    return {
+    result = {
         'data': requests,
     }
+    if limit is not None:
+        result['next'] = next_pk
+    return result
+
+
+def get_delivery_request_count(user, filter_args):
+    request_qs = DeliveryRequest.objects.all()
+    if not user.is_superuser:
+        request_qs = request_qs.exclude(status=DeliveryRequest.REMOVED)
+
+    return DeliveryRequestBackofficeFilter(
+        filter_args,
+        queryset=request_qs
+    ).qs.count()
 
 
 def _get_photo_queryset(base_pks, base_model):
@@ -450,6 +546,7 @@ def _get_photo_queryset(base_pks, base_model):
         'id',
         'object_id',
         'image',
+        'variants',
         'photorejectioncomment__rejection_comment',
     )
 
@@ -462,6 +559,7 @@ def _serialize_request_photos(photos):
             photo = {
                 'id': e['id'],
                 'url': e['image'],
+                'variants': e['variants'],
                 'rejected': e['photorejectioncomment__rejection_comment']
             }
             photos_for_object.append(photo)
@@ -818,6 +916,7 @@ def _serialize_finish_photo_confirmation(row):
             res['photos'].append({
                 'id': main_photo_id,
                 'url': row['photo__image'],
+                'variants': row['photo__variants'],
                 'rejected': None,
                 'timestamp': row['photo__timestamp'],
                 'main': True,
@@ -881,6 +980,7 @@ def get_photo_annotation(model):
                 obj=JSONObject(
                     id='id',
                     url='image',
+                    variants='variants',
                     rejected=JSONObject(
                         author=Coalesce(
                             NullIf('photorejectioncomment__author__first_name', Value('')),
@@ -953,6 +1053,7 @@ def get_delivery_photo_queryset(model):
         fields.extend([
             'photo_id',
             'photo__image',
+            'photo__variants',
             'photo__timestamp',
         ])
     else:
@@ -1039,6 +1140,7 @@ def get_extra_photos(request_id):
             'id',
             'timestamp',
             'image',
+            'variants',
         ).order_by(
             'timestamp',
             'pk',
@@ -1095,6 +1197,8 @@ def get_requests_on_map_querysets(
         date=date,
     ).exclude(
         status__in=DeliveryRequest.FINAL_STATUSES
+    ).with_summary(
+        'confirmed_timepoint'
     ).with_is_expiring(
         datetime.timedelta(minutes=15),
     ).with_is_worker_assignment_delayed(
@@ -1282,7 +1386,8 @@ def _get_requests_in_progress_queryset_for_worker(
         status__in=DeliveryRequest.FINAL_STATUSES
     ).filter(
         requestworker__worker=worker_id
-    ).with_confirmed_timepoint(
+    ).with_summary(
+        'confirmed_timepoint'
     ).with_worker_timepoint(
         worker_id=worker_id
     ).with_items_for_assigned_worker(
@@ -1449,7 +1554,6 @@ def _best_requests_for_worker(
         worker_id: int,
         location: Optional[Location],
 ):
-    today = timezone.localdate()
     try:
         zone_id = WorkerZone.objects.values_list(
             'zone',
@@ -1458,44 +1562,15 @@ def _best_requests_for_worker(
             worker_id=worker_id
         )
     except WorkerZone.DoesNotExist:
-        return DeliveryRequest.objects.none()
+        return []
 
-    return DeliveryRequest.objects.all(
-    ).with_new_worker_timepoint(
-    ).filter_self_assign_ready(
-        today,
+    return self_assign_pool.best_requests_for_worker(
+        worker_id,
         zone_id,
-    ).annotate(
-        already_assigned=Exists(
-            RequestWorker.objects.filter(
-                request=OuterRef('pk'),
-                worker=worker_id,
-            )
-        ),
-    ).filter(
-        already_assigned=False,
-    ).with_confirmed_timepoint(
-    ).with_items_for_unassigned_worker(
-        location=location
-    ).annotate(
-        min_hours=F('delivery_service__hours') - F('delivery_service__travel_hours')
-    ).values(
-        'id',
-        'date',
-        'confirmed_timepoint',
-        'new_worker_timepoint',
-        'deliveryrequestoperator__operator__first_name',
-        'min_hours',
-        'items',
-        'delivery_service__hours',
-        'delivery_service__travel_hours',
-        'delivery_service__zone',
-        'status',
-    ).order_by(
-        'date',
-        'new_worker_timepoint',
-        'pk',
-    )[:RECOMMENDED_REQUEST_LIMIT]
+        timezone.localdate(),
+        location,
+        RECOMMENDED_REQUEST_LIMIT
+    )
 
 
 def _delivery_request_recommended_format_in_place(request):
@@ -1668,8 +1743,9 @@ def _get_request_queryset_for_customer(customer_id, user_location_id=None, api=F
     ).filter(
         customer=customer_id,
         date__gte=CUSTOMER_REQUEST_MIN_DATE
-    ).with_confirmed_timepoint(
-    ).with_worker_count(
+    ).with_summary(
+        'confirmed_timepoint',
+        'worker_count'
     ).with_worker_count(
         turnout=False
     ).with_customer_resolution(
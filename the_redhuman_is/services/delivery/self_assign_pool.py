@@ -0,0 +1,210 @@
+import math
+
+import numpy
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from the_redhuman_is.models.delivery import (
+    DeliveryItem,
+    DeliveryRequest,
+    DeliveryRequestOperator,
+    ItemWorker,
+    ItemWorkerRejection,
+    NormalizedAddress,
+    PrivateDeliveryRequest,
+    RequestWorker,
+    WorkerRejection,
+)
+
+
+# The requests open for self-assignment are the same for all the workers
+# of a zone, except the ones a worker is already assigned to. They are
+# kept in the cache (the pool) per zone and day and rebuilt after staffing
+# changes (see the receivers below), so the recommendations are picked from
+# the pool instead of querying the requests for every worker.
+# The picked requests are cached per worker and location cell
+# until the next staffing change.
+
+POOL_TIMEOUT = 60 * 10
+WORKER_RECOMMENDATIONS_TIMEOUT = 60
+
+# ~1 km
+LOCATION_CELL_DEGREES = 0.01
+
+EARTH_DIAMETER_KM = 12742
+
+_VERSION_KEY = 'selfassign:version'
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = _bump_version()
+    return version
+
+
+def _bump_version():
+    try:
+        return cache.incr(_VERSION_KEY, 1)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+        return 1
+
+
+def invalidate_self_assign_pools():
+    transaction.on_commit(_bump_version)
+
+
+def _pool_key(zone_id, day, version):
+    return f'selfassign:pool:{zone_id}:{day}:{version}'
+
+
+def _recommendations_key(worker_id, zone_id, day, version, location):
+    if location is None:
+        cell = None
+    else:
+        cell = (
+            math.floor(location.latitude / LOCATION_CELL_DEGREES),
+            math.floor(location.longitude / LOCATION_CELL_DEGREES),
+        )
+    return f'selfassign:worker:{worker_id}:{zone_id}:{day}:{version}:{cell}'
+
+
+def _build_pool(zone_id, day):
+    requests = list(
+        DeliveryRequest.objects.all(
+        ).with_new_worker_timepoint(
+        ).filter_self_assign_ready(
+            day,
+            zone_id,
+        ).with_summary(
+            'confirmed_timepoint'
+        ).with_items_for_unassigned_worker(
+            with_geotag=True
+        ).annotate(
+            min_hours=F('delivery_service__hours') - F('delivery_service__travel_hours')
+        ).values(
+            'id',
+            'date',
+            'confirmed_timepoint',
+            'new_worker_timepoint',
+            'deliveryrequestoperator__operator__first_name',
+            'min_hours',
+            'items',
+            'delivery_service__hours',
+            'delivery_service__travel_hours',
+            'delivery_service__zone',
+            'status',
+        ).order_by(
+            'date',
+            'new_worker_timepoint',
+            'pk',
+        )
+    )
+
+    assigned_workers = {}
+    for request_id, worker_id in RequestWorker.objects.filter(
+        request__in=[request['id'] for request in requests]
+    ).values_list(
+        'request',
+        'worker',
+    ):
+        assigned_workers.setdefault(request_id, set()).add(worker_id)
+
+    return [
+        (request, assigned_workers.get(request['id'], set()))
+        for request in requests
+    ]
+
+
+def _get_pool(zone_id, day, version):
+    key = _pool_key(zone_id, day, version)
+    pool = cache.get(key)
+    if pool is None:
+        pool = _build_pool(zone_id, day)
+        cache.set(key, pool, POOL_TIMEOUT)
+    return pool
+
+
+def haversine_km(latitudes, longitudes, latitude, longitude):
+    """
+    Distances (km) from the point to the arrays of points, the same formula
+    as utils.expressions.Haversine.
+    """
+    latitudes = numpy.radians(latitudes)
+    longitudes = numpy.radians(longitudes)
+    latitude = math.radians(latitude)
+    longitude = math.radians(longitude)
+    return EARTH_DIAMETER_KM * numpy.arcsin(numpy.sqrt(
+        (1 - numpy.cos(latitudes - latitude)) / 2 +
+        numpy.cos(latitudes) * math.cos(latitude) *
+        (1 - numpy.cos(longitudes - longitude)) / 2
+    ))
+
+
+def _set_item_distances(requests, location):
+    items = [item for request in requests for item in request['items']]
+    located = [item for item in items if item['geotag_'] is not None]
+    if location is not None and located:
+        distances = haversine_km(
+            numpy.array([item['geotag_']['latitude'] for item in located], dtype=float),
+            numpy.array([item['geotag_']['longitude'] for item in located], dtype=float),
+            location.latitude,
+            location.longitude
+        )
+        for item, distance in zip(located, distances.tolist()):
+            item['distance'] = distance
+
+    for item in items:
+        geotag = item.pop('geotag_')
+        if location is not None and geotag is None:
+            item['distance'] = None
+
+
+def best_requests_for_worker(worker_id, zone_id, day, location, limit):
+    """
+    The same as the query of retrieve._best_requests_for_worker:
+    the first `limit` requests of the zone (ordered by the new worker
+    timepoint) which the worker is not assigned to.
+    """
+    version = _version()
+    key = _recommendations_key(worker_id, zone_id, day, version, location)
+    requests = cache.get(key)
+    if requests is None:
+        requests = []
+        for request, assigned_workers in _get_pool(zone_id, day, version):
+            if worker_id not in assigned_workers:
+                requests.append(request)
+                if len(requests) == limit:
+                    break
+        _set_item_distances(requests, location)
+        cache.set(key, requests, WORKER_RECOMMENDATIONS_TIMEOUT)
+    return requests
+
+
+@receiver(post_save, sender=DeliveryRequest)
+@receiver(post_delete, sender=DeliveryRequest)
+@receiver(post_save, sender=PrivateDeliveryRequest)
+@receiver(post_delete, sender=PrivateDeliveryRequest)
+@receiver(post_save, sender=DeliveryRequestOperator)
+@receiver(post_delete, sender=DeliveryRequestOperator)
+@receiver(post_save, sender=DeliveryItem)
+@receiver(post_delete, sender=DeliveryItem)
+@receiver(post_save, sender=NormalizedAddress)
+@receiver(post_save, sender=RequestWorker)
+@receiver(post_delete, sender=RequestWorker)
+@receiver(post_save, sender=WorkerRejection)
+@receiver(post_delete, sender=WorkerRejection)
+@receiver(post_save, sender=ItemWorker)
+@receiver(post_delete, sender=ItemWorker)
+@receiver(post_save, sender=ItemWorkerRejection)
+@receiver(post_delete, sender=ItemWorkerRejection)
+def invalidate_self_assign_pools_on_change(sender, **kwargs):
+    invalidate_self_assign_pools()
@@ -0,0 +1,99 @@
+from typing import (
+    Iterable,
+    Optional,
+)
+
+from django.db import transaction
+
+from the_redhuman_is.models.delivery import (
+    DeliveryRequest,
+    DeliveryRequestSummary,
+)
+
+
+SUMMARY_FIELDS = [
+    'worker_count',
+    'worker_confirmed_count',
+    'new_start_photo_count',
+    'new_finish_photo_count',
+    'extra_photos_exist',
+    'has_self_assigned_worker',
+    'items_count',
+    'confirmed_timepoint',
+]
+
+
+def _computed_summaries(request_ids: Optional[Iterable[int]] = None):
+    request_qs = DeliveryRequest.objects.all()
+    if request_ids is not None:
+        request_qs = request_qs.filter(pk__in=list(request_ids))
+
+    return request_qs.with_worker_count(
+    ).with_worker_count(
+        confirmed=True
+    ).with_new_start_photo_count(
+    ).with_new_finish_photo_count(
+    ).with_extra_photos_exist(
+    ).with_has_self_assigned_worker(
+    ).with_items_count(
+    ).with_confirmed_timepoint(
+    ).order_by(
+    ).values(
+        'pk',
+        *SUMMARY_FIELDS
+    )
+
+
+def _stored_summaries(request_ids: Optional[Iterable[int]] = None):
+    summaries = DeliveryRequestSummary.objects.all()
+    if request_ids is not None:
+        summaries = summaries.filter(request__in=list(request_ids))
+    return {summary.request_id: summary for summary in summaries}
+
+
+def _out_of_sync(request_ids=None):
+    stored = _stored_summaries(request_ids)
+
+    to_create = []
+    to_update = []
+    for values in _computed_summaries(request_ids).iterator(chunk_size=2000):
+        request_id = values.pop('pk')
+        summary = stored.get(request_id)
+        if summary is None:
+            to_create.append(
+                DeliveryRequestSummary(request_id=request_id, **values)
+            )
+        elif any(getattr(summary, name) != value for name, value in values.items()):
+            for name, value in values.items():
+                setattr(summary, name, value)
+            to_update.append(summary)
+
+    return to_create, to_update
+
+
+def refresh_request_summaries(request_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recomputes the counters of the requests (of all the requests if
+    `request_ids` is None) and stores the changed ones.
+    Call it inside the transaction which changes workers, items or photos
+    of the requests.
+    Returns the number of the summaries which were missing or out of sync.
+    """
+    with transaction.atomic():
+        to_create, to_update = _out_of_sync(request_ids)
+        DeliveryRequestSummary.objects.bulk_create(to_create, batch_size=1000)
+        DeliveryRequestSummary.objects.bulk_update(
+            to_update,
+            SUMMARY_FIELDS,
+            batch_size=1000
+        )
+    return len(to_create) + len(to_update)
+
+
+def refresh_request_summary(request_id: int) -> None:
+    refresh_request_summaries([request_id])
+
+
+def count_stale_summaries() -> int:
+    to_create, to_update = _out_of_sync()
+    return len(to_create) + len(to_update)
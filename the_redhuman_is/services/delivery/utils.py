@@ -70,6 +70,7 @@ from the_redhuman_is.models.photo import Photo
 from the_redhuman_is.models.turnout_calculators import get_delivery_request_hours
 from the_redhuman_is.models.worker import Country
 from the_redhuman_is.services import reconciliations
+from the_redhuman_is.services.delivery.summary import refresh_request_summary
 
 from the_redhuman_is.services.delivery_requests import (
     MAX_ARRIVAL_DELTA,
@@ -176,6 +177,8 @@ DESCRIPTIONS = {k: v for k, v in DeliveryRequest.STATUS_TYPES}
 
 
 def update_delivery_request_status(delivery_request, user):
+    refresh_request_summary(delivery_request.pk)
+
     def _save(status, description=None):
         delivery_request.status = status
         if description is None:
@@ -1,4 +1,7 @@
-from django.db.models import Sum
+from django.db.models import (
+    Q,
+    Sum,
+)
 
 from finance.models import (
     Account,
@@ -52,3 +55,145 @@ def close_operations(last_day):
         timepoint__date__lte=last_day
     )
     operations.update(is_closed=True)
+
+
+class IntervalSaldos:
+    """
+    Computes `Account.interval_saldo()` for many (account, interval) pairs
+    at once: the accounts tree and the operations of all the requested
+    accounts are fetched with a few queries, the saldos are then summed up
+    in memory.
+
+    Usage:
+        saldos = IntervalSaldos(
+            [(account, first_day, last_day), ...],
+            exclude={...}
+        )
+        saldos.get(account, first_day, last_day)
+    """
+
+    def __init__(self, requests, exclude=None):
+        requests = list(requests)
+        self._saldos = {}
+        if not requests:
+            return
+
+        roots = {account.pk for account, first_day, last_day in requests}
+        self._children = self._load_children(roots)
+
+        accounts = set()
+        for root in roots:
+            accounts.update(self._subtree(root))
+
+        first_day = min(first_day for account, first_day, last_day in requests)
+        last_day = max(last_day for account, first_day, last_day in requests)
+        self._load_operations(accounts, first_day, last_day, exclude)
+
+        for account, first_day, last_day in requests:
+            self._saldos[(account.pk, first_day, last_day)] = self._saldo(
+                account.pk,
+                first_day,
+                last_day
+            )
+
+    def get(self, account, first_day, last_day):
+        if isinstance(account, list):
+            return sum([self.get(a, first_day, last_day) for a in account])
+        return self._saldos[(account.pk, first_day, last_day)]
+
+    @staticmethod
+    def _load_children(roots):
+        # The same rule as Account.operations(): closed children are skipped
+        children = {}
+        loaded = set()
+        level = set(roots)
+        while level:
+            loaded.update(level)
+            level_children = Account.objects.filter(
+                parent__in=level,
+                closed=False,
+            ).values_list(
+                'parent',
+                'pk',
+            )
+            level = set()
+            for parent, child in level_children:
+                children.setdefault(parent, []).append(child)
+                if child not in loaded:
+                    level.add(child)
+        return children
+
+    def _subtree(self, account_pk):
+        subtree = [account_pk]
+        index = 0
+        while index < len(subtree):
+            subtree.extend(self._children.get(subtree[index], []))
+            index += 1
+        return subtree
+
+    def _load_operations(self, accounts, first_day, last_day, exclude):
+        accounts = list(accounts)
+        operations = Operation.objects.all()
+        if exclude:
+            operations = operations.exclude(**exclude)
+
+        self._simple = {'debet': {}, 'credit': {}}
+        self._interval = {'debet': {}, 'credit': {}}
+        for side in ('debet', 'credit'):
+            side_operations = operations.filter(
+                **{f'{side}__in': accounts}
+            ).order_by()
+
+            simple = side_operations.filter(
+                intervalpayment__isnull=True,
+                timepoint__date__range=(first_day, last_day),
+            ).values_list(
+                side,
+                'timepoint__date',
+            ).annotate(
+                amount_sum=Sum('amount')
+            )
+            for account, day, amount in simple:
+                self._simple[side].setdefault(account, []).append((day, amount))
+
+            interval = side_operations.filter(
+                Q(intervalpayment__first_day__range=(first_day, last_day)) |
+                Q(intervalpayment__last_day__range=(first_day, last_day)),
+                intervalpayment__isnull=False,
+            ).values_list(
+                side,
+                'amount',
+                'intervalpayment__first_day',
+                'intervalpayment__last_day',
+            )
+            for account, amount, interval_first_day, interval_last_day in interval:
+                self._interval[side].setdefault(account, []).append(
+                    (amount, interval_first_day, interval_last_day)
+                )
+
+    def _side_sum(self, side, subtree, first_day, last_day):
+        total = ZERO_OO
+        for account in subtree:
+            for day, amount in self._simple[side].get(account, []):
+                if first_day <= day <= last_day:
+                    total += amount
+
+            for amount, interval_first_day, interval_last_day in self._interval[side].get(account, []):
+                # See Account.interval_saldo()
+                if not (
+                    first_day <= interval_first_day <= last_day or
+                    first_day <= interval_last_day <= last_day
+                ):
+                    continue
+                total_days = (interval_last_day - interval_first_day).days + 1
+                intersection_first_day = max(first_day, interval_first_day)
+                intersection_last_day = min(last_day, interval_last_day)
+                intersection_days = (intersection_last_day - intersection_first_day).days + 1
+                total += amount * intersection_days / total_days
+        return total
+
+    def _saldo(self, account_pk, first_day, last_day):
+        subtree = self._subtree(account_pk)
+        debit = self._side_sum('debet', subtree, first_day, last_day)
+        credit = self._side_sum('credit', subtree, first_day, last_day)
+        return round(debit - credit, 2)
@@ -0,0 +1,139 @@
+from django.db.models import (
+    Exists,
+    OuterRef,
+    Sum,
+)
+
+from finance.models import Operation
+
+from the_redhuman_is.models import (
+    CustomerService,
+    TurnoutService,
+    WorkerTurnout,
+)
+
+from utils.numbers import ZERO_OO
+
+
+def _by_day(values_list):
+    totals = {}
+    for *key, day, amount in values_list:
+        totals.setdefault(tuple(key), []).append((day, amount or 0))
+    return totals
+
+
+def _is_selfemployed(operation_debet_ref):
+    return Exists(
+        CustomerService.objects.filter(
+            account_20_selfemployed_work=OuterRef(operation_debet_ref)
+        )
+    )
+
+
+class EfficiencyTotals:
+    """
+    Hours, customer amounts, deductions and fines of all the customers
+    (and of their services) for the period, grouped by day, so the totals of
+    any customer/legal entity interval inside the period are summed up
+    in memory instead of running aggregate queries per interval.
+    """
+
+    def __init__(self, first_day, last_day):
+        period = (first_day, last_day)
+
+        self._hours = _by_day(
+            WorkerTurnout.objects.filter(
+                timesheet__sheet_date__range=period
+            ).order_by().values_list(
+                'timesheet__customer',
+                'timesheet__sheet_date',
+            ).annotate(
+                amount_sum=Sum('hours_worked')
+            )
+        )
+
+        def _operations(relation):
+            return _by_day(
+                Operation.objects.filter(
+                    **{f'{relation}__turnout__timesheet__sheet_date__range': period}
+                ).order_by().values_list(
+                    f'{relation}__turnout__timesheet__customer',
+                    f'{relation}__turnout__timesheet__sheet_date',
+                ).annotate(
+                    amount_sum=Sum('amount')
+                )
+            )
+
+        self._customer_amounts = _operations('turnoutcustomeroperation')
+        self._deductions = _operations('turnoutdeduction')
+        self._fines = _operations('customerfine')
+
+        self._service_hours = _by_day(
+            TurnoutService.objects.filter(
+                turnout__timesheet__sheet_date__range=period
+            ).annotate(
+                selfemployed=_is_selfemployed(
+                    'turnout__turnoutoperationtopay__operation__debet'
+                )
+            ).order_by().values_list(
+                'turnout__timesheet__customer',
+                'customer_service',
+                'selfemployed',
+                'turnout__timesheet__sheet_date',
+            ).annotate(
+                amount_sum=Sum('turnout__hours_worked')
+            )
+        )
+
+        self._service_amounts = _by_day(
+            Operation.objects.filter(
+                turnoutcustomeroperation__turnout__timesheet__sheet_date__range=period,
+                turnoutcustomeroperation__turnout__turnoutservice__isnull=False,
+            ).annotate(
+                selfemployed=_is_selfemployed(
+                    'turnoutcustomeroperation__turnout__'
+                    'turnoutoperationtopay__operation__debet'
+                )
+            ).order_by().values_list(
+                'turnoutcustomeroperation__turnout__timesheet__customer',
+                'turnoutcustomeroperation__turnout__turnoutservice__customer_service',
+                'selfemployed',
+                'turnoutcustomeroperation__turnout__timesheet__sheet_date',
+            ).annotate(
+                amount_sum=Sum('amount')
+            )
+        )
+
+    @staticmethod
+    def _interval_sum(totals, key, first_day, last_day, zero=ZERO_OO):
+        return sum(
+            (
+                amount
+                for day, amount in totals.get(key, [])
+                if first_day <= day <= last_day
+            ),
+            zero
+        )
+
+    def customer_info(self, customer, first_day, last_day):
+        """
+        Returns (hours, customer amount, deductions, fines) of the customer.
+        """
+        key = (customer.pk,)
+        return (
+            self._interval_sum(self._hours, key, first_day, last_day, 0),
+            self._interval_sum(self._customer_amounts, key, first_day, last_day),
+            self._interval_sum(self._deductions, key, first_day, last_day),
+            self._interval_sum(self._fines, key, first_day, last_day),
+        )
+
+    def service_info(self, service, selfemployed, first_day, last_day):
+        """
+        Returns (hours, customer amount) of the customer service turnouts,
+        either of selfemployed workers or of all the others.
+        """
+        key = (service.customer_id, service.pk, selfemployed)
+        return (
+            self._interval_sum(self._service_hours, key, first_day, last_day, 0),
+            self._interval_sum(self._service_amounts, key, first_day, last_day),
+        )
@@ -53,6 +53,14 @@ def is_period_closed(timepoint):
     ).exists()
 
 
+def is_interval_closed(first_day, last_day):
+    return PeriodCloseDocument.objects.filter(
+        created=True,
+        begin__lte=first_day,
+        end__gte=last_day
+    ).exists()
+
+
 def can_close_period(first_day, last_day):
     timesheets = TimeSheet.objects.order_by().filter(
         sheet_date__gte=first_day,
@@ -0,0 +1,175 @@
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import (
+    Dict,
+    List,
+    Set,
+)
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import (
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Value,
+)
+
+from the_redhuman_is.models import (
+    Paysheet_v2,
+    Photo,
+    TimeSheet,
+    WorkerTurnout,
+)
+from the_redhuman_is.models.paysheet_v2 import WorkerReceipt
+from the_redhuman_is.services.paysheet import paysheet_receipts
+
+#
+# Photo coverage: which objects have no photos.
+#
+# Photos are attached with a generic relation (content_type, object_id),
+# covered by the photo_contenttype_object_index. Every check here is an
+# anti-join (NOT EXISTS) of a queryset against this index, so a missing
+# photo set is a single query whatever the number of objects.
+#
+
+
+def photo_exists(model, outer_ref='pk'):
+    return Exists(
+        Photo.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            object_id=OuterRef(outer_ref),
+        )
+    )
+
+
+def without_photos(queryset):
+    return queryset.filter(~photo_exists(queryset.model))
+
+
+def missing_photo_pks(queryset) -> Set[int]:
+    return set(
+        without_photos(
+            queryset.order_by()
+        ).values_list(
+            'pk',
+            flat=True
+        )
+    )
+
+
+def request_turnout_timesheets():
+    """
+    Timesheets with the turnouts of delivery requests.
+    """
+    return TimeSheet.objects.filter(
+        Exists(
+            WorkerTurnout.objects.filter(
+                timesheet=OuterRef('pk'),
+                requestworkerturnout__isnull=False,
+            )
+        )
+    )
+
+
+def reconciliation_paysheets(reconciliation):
+    return Paysheet_v2.objects.filter(
+        paysheet_entries__paysheet_entry_operations__operation__turnoutoperationtopay__turnout__in=reconciliation.turnouts()
+    ).distinct()
+
+
+def reconciliation_paysheet_receipts(reconciliation, paysheets) -> Dict[int, List[int]]:
+    """
+    {paysheet pk: [receipt pk, ...]}: the receipts of the paysheets for the
+    workers with the turnouts in the reconciliation. A single query.
+    """
+    turnouts_in_reconciliation = WorkerTurnout.objects.filter(
+        worker=OuterRef('worker'),
+        timesheet__sheet_date__gte=reconciliation.first_day,
+        timesheet__sheet_date__lte=reconciliation.last_day,
+        timesheet__customer=reconciliation.customer_id,
+    )
+    if reconciliation.location_id is not None:
+        turnouts_in_reconciliation = turnouts_in_reconciliation.filter(
+            timesheet__cust_location=reconciliation.location_id,
+        )
+
+    querysets = [
+        paysheet_receipts(
+            paysheet
+        ).filter(
+            Exists(turnouts_in_reconciliation)
+        ).annotate(
+            paysheet_id=Value(paysheet.pk, output_field=IntegerField()),
+            receipt_id=F('pk'),
+        ).order_by().values_list(
+            'paysheet_id',
+            'receipt_id',
+        ).distinct()
+        for paysheet in paysheets
+    ]
+    if not querysets:
+        return {}
+
+    receipts = {paysheet.pk: [] for paysheet in paysheets}
+    for paysheet_id, receipt_id in querysets[0].union(*querysets[1:], all=True):
+        receipts[paysheet_id].append(receipt_id)
+    for receipt_ids in receipts.values():
+        receipt_ids.sort()
+    return receipts
+
+
+@dataclass
+class ReconciliationPhotoCoverage:
+    paysheets: List[Paysheet_v2]
+    paysheet_receipts: Dict[int, List[int]]
+    paysheets_without_photos: Set[int] = field(default_factory=set)
+    receipts_without_photos: Set[int] = field(default_factory=set)
+
+    @property
+    def is_complete(self):
+        return not self.receipts_without_photos
+
+
+def reconciliation_photo_coverage(reconciliation) -> ReconciliationPhotoCoverage:
+    """
+    The paysheets of the reconciliation, their receipts (see
+    reconciliation_paysheet_receipts) and the ones of them without photos.
+    Check it before building the package: a receipt without a photo makes
+    the package incomplete.
+    """
+    paysheets = list(reconciliation_paysheets(reconciliation))
+    receipts = reconciliation_paysheet_receipts(reconciliation, paysheets)
+    receipt_ids = {
+        receipt_id
+        for receipt_ids in receipts.values()
+        for receipt_id in receipt_ids
+    }
+    return ReconciliationPhotoCoverage(
+        paysheets=paysheets,
+        paysheet_receipts=receipts,
+        paysheets_without_photos=missing_photo_pks(
+            Paysheet_v2.objects.filter(pk__in=[paysheet.pk for paysheet in paysheets])
+        ),
+        receipts_without_photos=missing_photo_pks(
+            WorkerReceipt.objects.filter(pk__in=receipt_ids)
+        ),
+    )
+
+
+def photos_by_object(model, object_ids) -> Dict[int, List[Photo]]:
+    """
+    {object id: [photo, ...]} for the objects of the model, a single query.
+    """
+    photos = {}
+    for photo in Photo.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            object_id__in=object_ids,
+    ).order_by(
+        'object_id',
+        'pk',
+    ):
+        photos.setdefault(photo.object_id, []).append(photo)
+    return photos
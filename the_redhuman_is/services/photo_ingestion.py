@@ -0,0 +1,182 @@
+import datetime
+import os
+
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from the_redhuman_is.models import (
+    Photo,
+    PhotoUpload,
+    add_photo,
+)
+from the_redhuman_is.models.photo import (
+    file_content_hash,
+    photo_upload_file_name,
+)
+
+#
+# Resumable photo uploads.
+#
+# The client starts an upload with the size (and the sha256) of the image
+# and sends it by chunks, each with its offset. After a broken connection
+# the client asks for the offset and continues from it. The bytes are
+# always sent and checked against the hash: a known hash alone must not
+# give access to another photo. The complete upload is passed to an action instead of the image (see
+# `upload_image`) or to a photo load session (`add_uploaded_photo`) and
+# becomes a photo with add_photo, which reuses the file of a photo with
+# the same content.
+#
+
+MAX_UPLOAD_SIZE = 30 * 1024 * 1024
+UPLOAD_LIFETIME = datetime.timedelta(days=1)
+
+
+class PhotoUploadError(Exception):
+    pass
+
+
+class UploadOffsetMismatch(PhotoUploadError):
+    def __init__(self, offset):
+        super().__init__(f'Ожидается часть с позиции {offset}.')
+        self.offset = offset
+
+
+def _storage():
+    return Photo._meta.get_field('image').storage
+
+
+def _part_path(upload):
+    return _storage().path(photo_upload_file_name(upload))
+
+
+def start_upload(author, size, content_hash='', upload_id=None):
+    """
+    `upload_id` is for the clients which name the uploads themselves
+    (Dropzone), the upload is returned if it is already started.
+    """
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise PhotoUploadError(f'Недопустимый размер файла: {size}.')
+
+    if upload_id is not None:
+        upload = PhotoUpload.objects.filter(pk=upload_id).first()
+        if upload is not None:
+            if upload.author_id != author.pk or upload.size != size:
+                raise PhotoUploadError(f'Загрузка {upload_id} уже существует.')
+            return upload
+
+    if upload_id is not None:
+        kwargs = {'pk': upload_id}
+    else:
+        kwargs = {}
+    return PhotoUpload.objects.create(
+        **kwargs,
+        author=author,
+        size=size,
+        content_hash=content_hash,
+    )
+
+
+def get_upload(upload_id, author, for_update=False):
+    uploads = PhotoUpload.objects.all()
+    if for_update:
+        uploads = uploads.select_for_update()
+    try:
+        return uploads.get(pk=upload_id, author=author)
+    except PhotoUpload.DoesNotExist:
+        raise PhotoUploadError(f'Загрузка {upload_id} не найдена.')
+
+
+def upload_offset(upload):
+    return upload.received
+
+
+@transaction.atomic
+def append_chunk(upload_id, author, offset, chunk):
+    """
+    Appends the chunk (a File) at the offset, returns the new offset.
+    A repeated chunk (already received) is skipped.
+    """
+    upload = get_upload(upload_id, author, for_update=True)
+    current = upload_offset(upload)
+    if offset + chunk.size <= current:
+        return current
+    if offset != current:
+        raise UploadOffsetMismatch(current)
+    if current + chunk.size > upload.size:
+        raise PhotoUploadError('Размер загрузки превышен.')
+
+    path = _part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as f:
+        f.truncate(current)
+        for data in chunk.chunks():
+            f.write(data)
+
+    upload.received = current + chunk.size
+    # The upload is in use, see delete_stale_uploads
+    upload.timestamp = timezone.now()
+    upload.save(update_fields=['received', 'timestamp'])
+    return upload.received
+
+
+@contextmanager
+def upload_image(upload_id, author):
+    """
+    A File with the uploaded image, closed on exit. Raises PhotoUploadError
+    if the upload is not complete or the content doesn't match the hash.
+    """
+    upload = get_upload(upload_id, author)
+    if upload.received != upload.size:
+        raise PhotoUploadError(
+            f'Загрузка {upload.pk} не завершена: {upload.received} из {upload.size}.'
+        )
+    image = File(open(_part_path(upload), 'rb'), name='{}.jpg'.format(upload.pk))
+
+    try:
+        if upload.content_hash and file_content_hash(image) != upload.content_hash:
+            raise PhotoUploadError(f'Загрузка {upload.pk} повреждена: не совпадает хеш.')
+        yield image
+    finally:
+        image.close()
+
+
+def add_uploaded_photo(target, upload_id, author):
+    """
+    add_photo with a complete upload, the upload is deleted after the commit.
+    """
+    with upload_image(upload_id, author) as image:
+        photo = add_photo(target, image)
+    transaction.on_commit(lambda: delete_upload(upload_id))
+    return photo
+
+
+def delete_upload(upload_id):
+    upload = PhotoUpload.objects.filter(pk=upload_id).first()
+    if upload is None:
+        return
+    path = _part_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
+
+
+def delete_stale_uploads(now=None):
+    """
+    Deletes the uploads which were not used within UPLOAD_LIFETIME.
+    """
+    if now is None:
+        now = timezone.now()
+    upload_ids = list(
+        PhotoUpload.objects.filter(
+            timestamp__lt=now - UPLOAD_LIFETIME
+        ).values_list(
+            'pk',
+            flat=True
+        )
+    )
+    for upload_id in upload_ids:
+        delete_upload(upload_id)
+    return len(upload_ids)
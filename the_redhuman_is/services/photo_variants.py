@@ -0,0 +1,264 @@
+import hashlib
+import io
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Q
+
+from PIL import (
+    Image,
+    ImageOps,
+)
+
+from the_redhuman_is.models import Photo
+
+
+logger = logging.getLogger(__name__)
+
+#
+# Resized copies of the uploaded photos.
+#
+# A photo gets a thumbnail and a medium size copy, each as JPEG and WebP,
+# made by a huey task after the upload (see models.photo). The files are
+# stored next to the original, their names start with the hash of the
+# original, and Photo.variants maps (size, format) to the file names.
+# The task also sets the perceptual hash of the photo and flags it as
+# a duplicate (Photo.duplicate_of) if a photo of another object looks
+# the same.
+#
+
+# The longest side, px
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 1280,
+}
+
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 75, 'method': 4}),
+}
+
+BACKFILL_THREADS = 4
+
+DHASH_SIZE = 8
+
+# dHash of the solid or near-uniform images (dark or covered lens shots)
+# and of the even gradients: such photos look alike without being copies
+DEGENERATE_DHASHES = {0, -1}
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _variant_name(photo, digest, size, extension):
+    directory = os.path.dirname(photo.image.name)
+    return os.path.join(directory, 'variants', f'{digest[:16]}_{size}.{extension}')
+
+
+def dhash(image):
+    """
+    64 bit difference hash of a PIL image as a signed integer (bigint):
+    the signs of the horizontal gradients of the 9x8 grayscale thumbnail.
+    Survives rescaling and recompression.
+    """
+    small = image.convert('L').resize(
+        (DHASH_SIZE + 1, DHASH_SIZE),
+        Image.LANCZOS
+    )
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            right = pixels[row * (DHASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    if value >= 1 << 63:
+        value -= 1 << 64
+    return value
+
+
+def render_variants(content):
+    """
+    ({size: {format: (bytes, extension)}}, dhash) for the image bytes.
+    The images smaller than a size are not scaled up.
+    """
+    with Image.open(io.BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        result = {}
+        for size, max_side in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            formats = {}
+            for format, (pil_format, extension, options) in VARIANT_FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                formats[format] = (buffer.getvalue(), extension)
+            result[size] = formats
+        return result, dhash(image)
+
+
+def _names(variants):
+    return {
+        name
+        for formats in variants.values()
+        for name in formats.values()
+    }
+
+
+def make_photo_variants(photo_pk):
+    """
+    Makes the variants of the photo, replacing the old ones.
+    Returns False if there is no photo or image.
+
+    The variant files are shared by the photos with the same content: the
+    ones in use by other photos are reused and never deleted here.
+    """
+    photo = Photo.objects.filter(pk=photo_pk).first()
+    if photo is None or not photo.image:
+        return False
+
+    with photo.image.open('rb') as f:
+        content = f.read()
+    image_name = photo.image.name
+
+    digest = content_hash(content)
+    photos = Photo.objects.filter(
+        pk=photo.pk,
+        image=image_name,
+    )
+
+    same = Photo.objects.filter(
+        content_hash=digest
+    ).exclude(
+        pk=photo.pk
+    ).exclude(
+        variants={}
+    ).order_by(
+        'pk'
+    ).first()
+    if same is not None:
+        # The variants are already made for another photo
+        return bool(
+            photos.update(
+                content_hash=digest,
+                perceptual_hash=same.perceptual_hash,
+                variants=same.variants,
+                duplicate_of=find_duplicate(photo, digest, same.perceptual_hash),
+            )
+        )
+
+    names_in_use = _names_in_use(photo, {digest, photo.content_hash})
+    storage = photo.image.storage
+    rendered, perceptual_hash = render_variants(content)
+    variants = {}
+    for size, formats in rendered.items():
+        for format, (data, extension) in formats.items():
+            name = _variant_name(photo, digest, size, extension)
+            if name in names_in_use and storage.exists(name):
+                # The same content is rendered the same way
+                variants.setdefault(size, {})[format] = name
+                continue
+            if storage.exists(name):
+                storage.delete(name)
+            variants.setdefault(size, {})[format] = storage.save(name, ContentFile(data))
+
+    # The image may have been replaced while the variants were made, then
+    # the variants are made again by the task of the new image
+    updated = photos.update(
+        content_hash=digest,
+        perceptual_hash=perceptual_hash,
+        variants=variants,
+        duplicate_of=find_duplicate(photo, digest, perceptual_hash),
+    )
+    if updated:
+        stale_names = _names(photo.variants) - _names(variants)
+    else:
+        stale_names = _names(variants)
+    for name in stale_names - _names_in_use(photo, {digest, photo.content_hash}):
+        storage.delete(name)
+
+    return bool(updated)
+
+
+def _names_in_use(photo, content_hashes):
+    """
+    The variant files of the other photos with the content hashes.
+    """
+    names = set()
+    for variants in Photo.objects.filter(
+            content_hash__in=[h for h in content_hashes if h]
+    ).exclude(
+        pk=photo.pk
+    ).values_list(
+        'variants',
+        flat=True
+    ):
+        names |= _names(variants)
+    return names
+
+
+def find_duplicate(photo, digest, perceptual_hash):
+    """
+    The first photo of another object with the same content or the same
+    perceptual hash (unless the hash is degenerate).
+    """
+    same = Q(content_hash=digest)
+    if perceptual_hash not in DEGENERATE_DHASHES:
+        same |= Q(perceptual_hash=perceptual_hash)
+    return Photo.objects.filter(
+        same
+    ).exclude(
+        pk=photo.pk
+    ).exclude(
+        content_type=photo.content_type_id,
+        object_id=photo.object_id,
+    ).order_by(
+        'pk'
+    ).values_list(
+        'pk',
+        flat=True
+    ).first()
+
+
+def photos_without_variants():
+    # The content hash is set at the upload, the variants only by the task
+    return Photo.objects.exclude(
+        image=''
+    ).filter(
+        variants={}
+    )
+
+
+def backfill_photo_variants(photo_pks, threads=BACKFILL_THREADS):
+    """
+    Makes the variants of the photos in parallel threads
+    (Pillow releases the GIL while resizing and encoding).
+    Returns (done, failed) counts.
+    """
+    def _make(photo_pks):
+        done = 0
+        try:
+            for photo_pk in photo_pks:
+                try:
+                    if make_photo_variants(photo_pk):
+                        done += 1
+                except Exception:
+                    logger.exception('Failed to make the variants of photo %s', photo_pk)
+        finally:
+            connection.close()
+        return done
+
+    photo_pks = list(photo_pks)
+    chunks = [photo_pks[i::threads] for i in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        done = sum(executor.map(_make, chunks))
+
+    return done, len(photo_pks) - done
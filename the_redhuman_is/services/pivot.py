@@ -0,0 +1,124 @@
+from typing import (
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy
+
+#
+# Pivot tables over columnar data.
+#
+# The entries are given as parallel columns (row key, column key, value),
+# usually straight from a `values_list` query. Row and column keys are
+# mapped to integer codes, the entries are placed into the cells of
+# a rows x columns object array with one fancy assignment. Cells with
+# several entries (e.g. two turnouts of a worker on the same day) join
+# their values with a separator.
+#
+
+
+def factorize(keys, order=None) -> Tuple[List[Hashable], numpy.ndarray]:
+    """
+    Returns (unique keys, codes of the keys). The unique keys are in the
+    order of `order` if given (keys not in it get the code -1), in the order
+    of appearance otherwise.
+    """
+    if order is None:
+        index = {}
+        codes = numpy.array(
+            [index.setdefault(key, len(index)) for key in keys],
+            dtype=int
+        )
+        return list(index.keys()), codes
+
+    index = {key: code for code, key in enumerate(order)}
+    codes = numpy.array([index.get(key, -1) for key in keys], dtype=int)
+    return list(order), codes
+
+
+class PivotTable:
+    """
+    `cells` is a len(rows) x len(columns) object array, None for the empty
+    cells.
+    """
+
+    def __init__(self, rows: List[Hashable], columns: List[Hashable], cells: numpy.ndarray):
+        self.rows = rows
+        self.columns = columns
+        self.cells = cells
+
+    def __len__(self):
+        return len(self.rows)
+
+    def items(self):
+        """
+        (row key, [cell, ...]) pairs.
+        """
+        return zip(self.rows, self.cells.tolist())
+
+    def row_groups(self, key_index: int = -1) -> Dict[Hashable, List[int]]:
+        """
+        Indexes of the rows by a component of the (tuple) row key,
+        in the order of appearance.
+        """
+        groups = {}
+        for index, key in enumerate(self.rows):
+            groups.setdefault(key[key_index], []).append(index)
+        return groups
+
+
+def pivot(
+        row_keys: Sequence[Hashable],
+        column_keys: Sequence[Hashable],
+        values: Sequence,
+        rows: Optional[Sequence[Hashable]] = None,
+        columns: Optional[Sequence[Hashable]] = None,
+        separator: str = '/'
+) -> PivotTable:
+    """
+    Pivots the entries (row_keys[i], column_keys[i], values[i]).
+    `rows` and `columns` fix the keys and their order; the entries with
+    other keys are skipped. Otherwise the keys are taken in the order of
+    appearance. None values create the row but don't fill the cell.
+    """
+    row_list, row_codes = factorize(row_keys, rows)
+    column_list, column_codes = factorize(column_keys, columns)
+    value_list = list(values)
+    values = numpy.empty(len(value_list), dtype=object)
+    values[:] = value_list
+
+    cells = numpy.full((len(row_list), len(column_list)), None, dtype=object)
+
+    mask = (
+        (row_codes >= 0) &
+        (column_codes >= 0) &
+        numpy.not_equal(values, None)
+    )
+    flat = row_codes[mask] * len(column_list) + column_codes[mask]
+    values = values[mask]
+    if not len(flat):
+        return PivotTable(row_list, column_list, cells)
+
+    counts = numpy.bincount(flat, minlength=cells.size)
+    single = counts[flat] == 1
+    cells.flat[flat[single]] = values[single]
+
+    # Cells with several values, the values are joined in the order of the
+    # entries
+    multiple = ~single
+    if multiple.any():
+        order = numpy.argsort(flat[multiple], kind='stable')
+        multiple_flat = flat[multiple][order]
+        multiple_values = values[multiple][order]
+        cell_indexes, starts = numpy.unique(multiple_flat, return_index=True)
+        for cell_index, group in zip(
+                cell_indexes,
+                numpy.split(multiple_values, starts[1:])
+        ):
+            cells.flat[cell_index] = separator.join(str(value) for value in group)
+
+    return PivotTable(row_list, column_list, cells)
@@ -0,0 +1,230 @@
+import logging
+import time
+
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from the_redhuman_is.async_utils import push_notifications
+from the_redhuman_is.models.delivery import (
+    DeliveryWorkerFCMToken,
+    PushCampaign,
+)
+from the_redhuman_is import tasks
+
+from utils.functools import chunked
+
+
+logger = logging.getLogger(__name__)
+
+
+def last_fcm_tokens(worker_ids: Iterable[int]) -> Dict[int, str]:
+    """
+    Latest FCM token of every worker in a single query.
+    Workers without a token are absent from the result.
+    """
+    tokens = DeliveryWorkerFCMToken.objects.filter(
+        user__workeruser__worker__in=list(worker_ids)
+    ).order_by(
+        'user__workeruser__worker',
+        '-timestamp',
+    ).distinct(
+        'user__workeruser__worker'
+    ).values_list(
+        'user__workeruser__worker',
+        'token',
+    )
+    return dict(tokens)
+
+
+def _dedupe_key(tag: str, worker_id: int) -> str:
+    return f'push:{tag}:{worker_id}'
+
+
+def _exclude_recently_notified(
+        worker_ids: List[int],
+        tag: str,
+        window: int
+) -> List[int]:
+    keys = {_dedupe_key(tag, worker_id): worker_id for worker_id in worker_ids}
+    already_notified = cache.get_many(keys.keys())
+    fresh = {
+        key: worker_id
+        for key, worker_id in keys.items()
+        if key not in already_notified
+    }
+    cache.set_many({key: 1 for key in fresh}, window)
+    return list(fresh.values())
+
+
+def push_to_workers(
+        worker_ids: Iterable[int],
+        title: Optional[str],
+        body: Optional[str],
+        data: Optional[dict],
+        tag: str,
+        dedupe_window: Optional[int] = None
+) -> int:
+    """
+    Sends the same push notification to many workers using FCM multicast.
+
+    If `dedupe_window` (seconds) is given, the workers who have already got
+    a push with the same `tag` within the window are skipped.
+
+    Returns the number of tokens the push was enqueued for.
+    """
+    worker_ids = list(worker_ids)
+    if dedupe_window:
+        worker_ids = _exclude_recently_notified(worker_ids, tag, dedupe_window)
+    if not worker_ids:
+        return 0
+
+    tokens = list(last_fcm_tokens(worker_ids).values())
+    for chunk in chunked(tokens, push_notifications.MULTICAST_MAX_TOKENS):
+        tasks.send_multicast_push_notification(title, body, data, tag, chunk)
+
+    return len(tokens)
+
+
+def _delete_invalid_tokens(tokens, response):
+    invalid_tokens = push_notifications.unregistered_tokens(tokens, response)
+    if invalid_tokens:
+        DeliveryWorkerFCMToken.objects.filter(
+            token__in=invalid_tokens
+        ).delete()
+    return invalid_tokens
+
+
+def do_send_multicast(
+        title: Optional[str],
+        body: Optional[str],
+        data: Optional[dict],
+        tag: str,
+        tokens: List[str]
+):
+    """
+    !!! Should be a part of a huey task (see tasks.py)
+    """
+    response = push_notifications.send_multicast_message(
+        title,
+        body,
+        data,
+        tag,
+        tokens
+    )
+
+    _delete_invalid_tokens(tokens, response)
+    return response
+
+
+#
+# Push campaigns.
+#
+# A campaign sends pushes (possibly a personal one for every worker) to
+# many workers by huey tasks of a separate queue (tasks.push_campaign_huey)
+# instead of a task per worker in the main one, so the other tasks
+# (payments, geocoding) are not delayed. The tokens are resolved in a
+# single query. The messages are split into FCM batches of
+# CAMPAIGN_CHUNK_SIZE up front, a task per batch gets only its own batch.
+# A batch FCM failed to take is counted as failed. The messages
+# not sent by the deadline are dropped. PushCampaign keeps the stats.
+#
+
+CAMPAIGN_CHUNK_SIZE = push_notifications.BATCH_MAX_MESSAGES
+
+
+def start_campaign(
+        tag: str,
+        messages: Dict[int, Tuple[Optional[str], Optional[str], Optional[dict]]],
+        deadline=None
+) -> PushCampaign:
+    """
+    `messages` is {worker id: (title, body, data)}.
+    The sending starts after the commit.
+    """
+    tokens = last_fcm_tokens(messages.keys())
+    chunks = list(
+        chunked(
+            (
+                (title, body, data, tag, tokens[worker_id])
+                for worker_id, (title, body, data) in messages.items()
+                if worker_id in tokens
+            ),
+            CAMPAIGN_CHUNK_SIZE
+        )
+    )
+    campaign = PushCampaign.objects.create(
+        tag=tag,
+        deadline=deadline,
+        audience=len(messages),
+        tokens=len(tokens),
+        chunks=len(chunks),
+    )
+    if chunks:
+        def _enqueue():
+            for chunk in chunks:
+                tasks.send_push_campaign(campaign.pk, chunk)
+        transaction.on_commit(_enqueue)
+    else:
+        campaign.finished = campaign.timestamp
+        campaign.save(update_fields=['finished'])
+    return campaign
+
+
+def _send_chunk(chunk):
+    start = time.monotonic()
+    try:
+        response = push_notifications.send_messages(chunk)
+    except Exception:
+        logger.exception('Failed to send a push campaign chunk')
+        response = None
+    return response, time.monotonic() - start
+
+
+def do_send_campaign_chunk(campaign_id: int, messages: List[tuple]):
+    """
+    Sends a chunk of the campaign messages, (title, body, data, tag, token)
+    each.
+
+    !!! Should be a part of a huey task (see tasks.py)
+    """
+    campaigns = PushCampaign.objects.filter(pk=campaign_id)
+    now = timezone.now()
+    campaigns.filter(started__isnull=True).update(started=now)
+
+    deadline = campaigns.values_list('deadline', flat=True).get()
+    if deadline is not None and now > deadline:
+        stats = {'expired': F('expired') + len(messages)}
+    else:
+        response, seconds = _send_chunk(messages)
+        if response is None:
+            sent, failed = 0, len(messages)
+        else:
+            sent, failed = response.success_count, response.failure_count
+        invalid_tokens = _delete_invalid_tokens(
+            [token for *_, token in messages],
+            response
+        )
+        stats = {
+            'sent': F('sent') + sent,
+            'failed': F('failed') + failed,
+            'invalid_tokens': F('invalid_tokens') + len(invalid_tokens),
+            'send_seconds': F('send_seconds') + seconds,
+        }
+
+    campaigns.update(chunks_done=F('chunks_done') + 1, **stats)
+    campaigns.filter(
+        finished__isnull=True,
+        chunks_done=F('chunks'),
+    ).update(
+        finished=timezone.now()
+    )
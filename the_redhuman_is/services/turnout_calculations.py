@@ -6,8 +6,6 @@ from django.core.exceptions import ObjectDoesNotExist
 
 from django.db import transaction
 
-from django.db.models import Q
-
 from finance.models import (
     Operation,
     update_if_changed,
@@ -26,10 +24,7 @@ from the_redhuman_is.models.models import (
 )
 from the_redhuman_is.models.paysheet_v2 import Paysheet_v2EntryOperation
 
-from the_redhuman_is.models.turnout_calculators import (
-    _amount_calculator,
-    PositionCalculator,
-)
+from the_redhuman_is.models.turnout_calculators import TimesheetCalculationContext
 from the_redhuman_is.models.turnout_operations import (
     TurnoutAdjustingOperation,
     TurnoutCustomerOperation,
@@ -70,11 +65,14 @@ def _amount_change_message(current_amount, new_amount):
 #
 # Предполагается, что за блокировку/атомарность отвечает внешний код.
 #
+# context - TimesheetCalculationContext, общий для выходов одного табеля.
+#
 class TurnoutCalculation:
-    def __init__(self, turnout, author, deduction_worker=None):
+    def __init__(self, turnout, author, deduction_worker=None, context=None):
         self.turnout = turnout
         self.author = author
         self.deduction_worker = deduction_worker
+        self.context = context
 
     def setup(self):
         self.fetch_calculator_and_stuff()
@@ -90,6 +88,8 @@ class TurnoutCalculation:
         self.worker_account = self.worker.worker_account
 
         self.timesheet = TimeSheet.objects.get(worker_turnouts=self.turnout)
+        if self.context is None:
+            self.context = TimesheetCalculationContext(self.timesheet, [self.turnout.pk])
         self.customer = self.timesheet.customer
         self.customer_account = CustomerOperatingAccounts.objects.get(
             customer_id=self.customer
@@ -109,7 +109,7 @@ class TurnoutCalculation:
         if self.customer_service is None:
             self.calculator = None
         else:
-            self.calculator = _amount_calculator(
+            self.calculator = self.context.amount_calculator(
                 self.timesheet.sheet_date,
                 self.customer_service
             )
@@ -176,7 +176,10 @@ class TurnoutCalculation:
     def setup_customer_operation(self):
         assert self.customer_service is not None
 
-        customer_amount = self.calculator.customer_calculator.get_amount(self.turnout)
+        customer_amount = self.calculator.customer_calculator.get_amount(
+            self.turnout,
+            self.context
+        )
 
         self.new_customer_operation = Operation(
             timepoint=self.timesheet.sheet_date,
@@ -193,23 +196,18 @@ class TurnoutCalculation:
 
         # Todo: is this a correct way to get foreman?
         if self.worker == self.timesheet.foreman:
-            amount = self.calculator.foreman_calculator.get_amount(self.turnout)
+            amount = self.calculator.foreman_calculator.get_amount(self.turnout, self.context)
         else:
-            amount = self.calculator.worker_calculator.get_amount(self.turnout)
+            amount = self.calculator.worker_calculator.get_amount(self.turnout, self.context)
 
         # Надбавка за должность
-        try:
-            position_calculator = PositionCalculator.objects.get(
-                Q(last_day__isnull=True) |
-                Q(last_day__gte=self.timesheet.sheet_date),
-                customer=self.customer,
-                position=self.worker.position,
-                first_day__lte=self.timesheet.sheet_date,
-            )
-        except ObjectDoesNotExist:
-            pass
-        else:
-            amount += position_calculator.calculator.get_amount(self.turnout)
+        position_calculator = self.context.position_calculator(
+            self.timesheet.sheet_date,
+            self.customer,
+            self.worker.position
+        )
+        if position_calculator is not None:
+            amount += position_calculator.calculator.get_amount(self.turnout, self.context)
 
         return amount
 
@@ -490,10 +488,16 @@ class TurnoutCalculation:
 
 
 @transaction.atomic
-def update_turnout_payments(turnout_pk, author, deduction_worker=None, force_commit=False):
+def update_turnout_payments(
+        turnout_pk,
+        author,
+        deduction_worker=None,
+        force_commit=False,
+        context=None
+):
     turnout = WorkerTurnout.objects.select_for_update().get(pk=turnout_pk)
 
-    calculation = TurnoutCalculation(turnout, author, deduction_worker)
+    calculation = TurnoutCalculation(turnout, author, deduction_worker, context)
     calculation.setup()
 
     messages, confirmation_required = calculation.get_reports()
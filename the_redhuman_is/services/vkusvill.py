@@ -0,0 +1,428 @@
+import datetime
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+
+import xlrd
+
+from django.db import transaction
+from django.db.models import (
+    Q,
+    Sum,
+)
+from django.utils import timezone
+
+from the_redhuman_is.models import (
+    BoxType,
+    TimeSheet,
+    TurnoutOutput,
+    Worker,
+    WorkerTurnout,
+)
+from the_redhuman_is.services.pivot import pivot
+from the_redhuman_is.models.turnout_calculators import TimesheetCalculationContext
+from the_redhuman_is.services.turnout_calculations import update_turnout_payments
+from utils.date_time import string_from_date
+
+
+VKUSVILL_PK = 16
+VKUSVILL_SERVICE_PK = 8
+
+WAREHOUSES = {
+    'ТИЛСИ': 'Молоко',
+    'Кавказский': 'Молоко',
+    'Склад_Сухой': 'Молоко',
+    'Склад долгосрочной продукции': 'Долгосрок',
+    'Склад_Хлеба': 'Хлеб',
+    'Склад_Овощи_Фрукты': 'Овощи',
+    'Склад_Охл_Мясо': 'Мясо',
+    'Зона отгрузки заморозки': 'Заморозка'
+}
+
+# The sheets of a performance book (a sheet per day) are parsed in parallel
+# processes, every process opens the book on demand and reads only its
+# sheets.
+PARSE_PROCESSES = 4
+
+A_RX = re.compile(r'^([AА]\d+.*)$')
+
+
+def _number(value):
+    return int(value or 0)
+
+
+def parse_performance_sheet(name, rows, outline_levels, year):
+    """
+    `rows` are the values of the first four columns of the sheet,
+    `outline_levels` are the outline levels of the rows.
+    Returns (day, {terminal: {box type: (errors more, errors less,
+    performance)}}, [errors]).
+    """
+    day = datetime.date(
+        day=int(name[:2]),
+        month=int(name[3:5]),
+        year=year
+    )
+
+    state = 'initial'
+    level = None
+    terminal = None
+
+    result = {}
+    errors = []
+
+    for row, (value, errors_more, errors_less, performance) in enumerate(rows):
+        m = A_RX.match(value)
+        if m:
+            state = 'new_terminal'
+            terminal = m.group(1)
+        elif value in ['С пересчетом', 'Без пересчета']:
+            if terminal:
+                state = 'new_warehouse'
+                level = outline_levels[row + 1]
+            else:
+                errors.append(
+                    'Лист {}, строка {}: значение <{}> до того, как был указан терминал'.format(
+                        string_from_date(day),
+                        row,
+                        value
+                    )
+                )
+        elif state == 'new_warehouse':
+            if outline_levels[row] == level:
+                terminal_data = result.setdefault(terminal, {})
+                box_type = WAREHOUSES[value]
+                prev_errors_more, prev_errors_less, prev_performance = terminal_data.get(
+                    box_type,
+                    (0, 0, 0)
+                )
+                terminal_data[box_type] = (
+                    _number(errors_more) + prev_errors_more,
+                    _number(errors_less) + prev_errors_less,
+                    _number(performance) + prev_performance
+                )
+            elif outline_levels[row] < level:
+                state = 'initial'
+
+    return day, result, errors
+
+
+def _sheet_rows(sheet):
+    columns = [sheet.col_values(col, 0, sheet.nrows) for col in range(4)]
+    for column in columns:
+        column.extend([''] * (sheet.nrows - len(column)))
+    outline_levels = [
+        sheet.rowinfo_map[row].outline_level if row in sheet.rowinfo_map else 0
+        for row in range(sheet.nrows + 1)
+    ]
+    return list(zip(*columns)), outline_levels
+
+
+def _parse_sheets(file_contents, sheet_indices, year):
+    book = xlrd.open_workbook(
+        file_contents=file_contents,
+        formatting_info=True,
+        on_demand=True
+    )
+    try:
+        parsed = []
+        for index in sheet_indices:
+            sheet = book.sheet_by_index(index)
+            rows, outline_levels = _sheet_rows(sheet)
+            parsed.append(
+                parse_performance_sheet(sheet.name, rows, outline_levels, year)
+            )
+            book.unload_sheet(index)
+        return parsed
+    finally:
+        book.release_resources()
+
+
+def parse_performance_book(file_contents, year=None):
+    """
+    Returns ({day: {terminal: {box type: (errors more, errors less,
+    performance)}}}, {day string: [errors]}).
+    """
+    if year is None:
+        year = timezone.localdate().year
+
+    book = xlrd.open_workbook(
+        file_contents=file_contents,
+        formatting_info=True,
+        on_demand=True
+    )
+    sheet_count = book.nsheets
+    book.release_resources()
+
+    process_count = min(PARSE_PROCESSES, sheet_count)
+    chunks = [
+        list(range(first, sheet_count, process_count))
+        for first in range(process_count)
+    ]
+    if process_count <= 1:
+        parsed_chunks = [_parse_sheets(file_contents, chunk, year) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=process_count) as executor:
+            parsed_chunks = list(
+                executor.map(
+                    _parse_sheets,
+                    [file_contents] * process_count,
+                    chunks,
+                    [year] * process_count
+                )
+            )
+
+    # In the order of the sheets
+    parsed = sorted(
+        (
+            (index, sheet)
+            for chunk, sheets in zip(chunks, parsed_chunks)
+            for index, sheet in zip(chunk, sheets)
+        ),
+        key=lambda item: item[0]
+    )
+
+    result = {}
+    errors = {}
+    for _, (day, data, sheet_errors) in parsed:
+        if day in result:
+            raise Exception(
+                'Неподдерживаемый формат: в файле несколько листов с датой {}.'.format(
+                    string_from_date(day)
+                )
+            )
+        result[day] = data
+        if sheet_errors:
+            errors[string_from_date(day)] = sheet_errors
+
+    return result, errors
+
+
+def performance_turnouts(days=None, first_day=None, last_day=None):
+    turnouts = WorkerTurnout.objects.filter(
+        timesheet__customer__pk=VKUSVILL_PK,
+        turnoutservice__customer_service__service__pk=VKUSVILL_SERVICE_PK
+    )
+    if days is not None:
+        turnouts = turnouts.filter(timesheet__sheet_date__in=days)
+    if first_day is not None:
+        turnouts = turnouts.filter(timesheet__sheet_date__gte=first_day)
+    if last_day is not None:
+        turnouts = turnouts.filter(timesheet__sheet_date__lte=last_day)
+    return turnouts
+
+
+def turnouts_by_day_code(days):
+    """
+    Returns {(day, worker code name): [(turnout pk, timesheet pk), ...]}.
+    """
+    index = {}
+    turnouts = performance_turnouts(days).values_list(
+        'pk',
+        'timesheet',
+        'timesheet__sheet_date',
+        'worker_code_name',
+    ).distinct()
+    for turnout_id, timesheet_id, day, code_name in turnouts:
+        index.setdefault((day, code_name), []).append((turnout_id, timesheet_id))
+    return index
+
+
+@transaction.atomic
+def import_performance(data, author):
+    """
+    Sets the output of the turnouts from the parsed performance book
+    (see parse_performance_book) and recalculates their payments.
+    Returns the number of the turnouts with the output.
+    """
+    index = turnouts_by_day_code(data.keys())
+
+    # {turnout pk: (timesheet pk, {box type name: values})}
+    turnout_outputs = {}
+    for day, terminals in data.items():
+        for code_name, output in terminals.items():
+            for turnout_id, timesheet_id in index.get((day, code_name), []):
+                if output:
+                    turnout_outputs[turnout_id] = (timesheet_id, output)
+
+    if not turnout_outputs:
+        return 0
+
+    box_types = dict(
+        BoxType.objects.filter(
+            customer__pk=VKUSVILL_PK
+        ).values_list(
+            'name',
+            'pk',
+        )
+    )
+    for _, output in turnout_outputs.values():
+        for box_type_name in output.keys():
+            if box_type_name not in box_types:
+                raise BoxType.DoesNotExist(
+                    f'Тип коробок "{box_type_name}" не найден.'
+                )
+
+    current_outputs = {
+        (output.turnout_id, output.box_type_id): output
+        for output in TurnoutOutput.objects.filter(
+            turnout__in=turnout_outputs.keys()
+        )
+    }
+
+    # Не хочется обнулять сразу всю выработку, на случай, если есть
+    # внесенные вручную данные, которых почему-то нет в xls
+    to_update = []
+    for output in current_outputs.values():
+        output.amount = 0
+        to_update.append(output)
+    to_create = []
+    for turnout_id, (_, output) in turnout_outputs.items():
+        for box_type_name, (errors_more, errors_less, performance) in output.items():
+            key = (turnout_id, box_types[box_type_name])
+            if key in current_outputs:
+                current_outputs[key].amount = performance
+                current_outputs[key].errors = errors_more + errors_less
+            else:
+                to_create.append(
+                    TurnoutOutput(
+                        turnout_id=turnout_id,
+                        box_type_id=key[1],
+                        amount=performance,
+                        errors=errors_more + errors_less
+                    )
+                )
+
+    TurnoutOutput.objects.bulk_update(to_update, ['amount', 'errors'], batch_size=1000)
+    TurnoutOutput.objects.bulk_create(to_create, batch_size=1000)
+
+    # Калькуляторы используют выработку всего табеля, поэтому начисления
+    # пересчитываются после сохранения выработки всех выходов
+    timesheet_turnouts = {}
+    for turnout_id, (timesheet_id, _) in turnout_outputs.items():
+        timesheet_turnouts.setdefault(timesheet_id, []).append(turnout_id)
+    for timesheet in TimeSheet.objects.filter(pk__in=timesheet_turnouts.keys()):
+        turnout_ids = sorted(timesheet_turnouts[timesheet.pk])
+        context = TimesheetCalculationContext(timesheet, turnout_ids)
+        for turnout_id in turnout_ids:
+            update_turnout_payments(
+                turnout_id,
+                author,
+                force_commit=True,
+                context=context
+            )
+
+    return len(turnout_outputs)
+
+
+REPORT_TYPES = [
+    ('terminals', 'Терминалы'),
+    ('performance', 'Выработка'),
+    ('errors', 'Пересорт'),
+]
+
+
+def _report_entries(first_day, last_day, report_type):
+    """
+    (worker pk, output name, day, value) tuples of the report.
+    """
+    # Without the joins of the filter: they would multiply the sums
+    turnouts = WorkerTurnout.objects.filter(
+        pk__in=performance_turnouts(
+            first_day=first_day,
+            last_day=last_day
+        ).values('pk')
+    )
+
+    if report_type == 'terminals':
+        return [
+            (worker, None, day, code_name)
+            for worker, day, code_name in turnouts.order_by(
+                'pk'
+            ).values_list(
+                'worker',
+                'timesheet__sheet_date',
+                'worker_code_name',
+            )
+        ]
+
+    if report_type == 'errors':
+        return [
+            (worker, None, day, errors)
+            for worker, day, errors in turnouts.annotate(
+                errors=Sum(
+                    'deductions__operation__amount',
+                    filter=Q(deductions__operation__comment__icontains='Пересорт')
+                )
+            ).order_by(
+                'pk'
+            ).values_list(
+                'worker',
+                'timesheet__sheet_date',
+                'errors',
+            )
+        ]
+
+    if report_type == 'performance':
+        return list(
+            TurnoutOutput.objects.filter(
+                turnout__in=turnouts
+            ).exclude(
+                amount=0
+            ).values(
+                'turnout',
+                'turnout__worker',
+                'box_type__name',
+                'turnout__timesheet__sheet_date',
+            ).annotate(
+                amount_sum=Sum('amount')
+            ).order_by(
+                'turnout_id',
+                'box_type__name',
+            ).values_list(
+                'turnout__worker',
+                'box_type__name',
+                'turnout__timesheet__sheet_date',
+                'amount_sum',
+            )
+        )
+
+    raise ValueError(f'Unsupported report type {report_type}')
+
+
+def performance_report(first_day, last_day, days, report_type):
+    """
+    Returns (PivotTable, {worker pk: Worker}). The rows of the table are
+    (worker pk, output name) in the order of the workers, the columns are
+    the days. Several turnouts of a worker on a day are shown as 'a/b'.
+    """
+    entries = _report_entries(first_day, last_day, report_type)
+    workers, names, entry_days, values = (
+        zip(*entries) if entries else ((), (), (), ())
+    )
+
+    workers_by_pk = {
+        worker.pk: worker
+        for worker in Worker.objects.filter(
+            pk__in=set(workers)
+        ).only(
+            'pk',
+            'last_name',
+            'name',
+            'patronymic',
+        )
+    }
+    worker_positions = {pk: index for index, pk in enumerate(workers_by_pk)}
+    rows = sorted(
+        set(zip(workers, names)),
+        key=lambda row: (worker_positions[row[0]], row[1] or '')
+    )
+
+    table = pivot(
+        list(zip(workers, names)),
+        entry_days,
+        values,
+        rows=rows,
+        columns=days
+    )
+    return table, workers_by_pk
@@ -8,18 +8,17 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from django.db.models import (
     Case,
-    Count,
-    Exists,
     ExpressionWrapper,
     F,
     FloatField,
-    IntegerField,
-    OuterRef,
-    Subquery,
     Value,
     When,
 )
-from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
 from django.utils import timezone
 
 from finance.models import Account
@@ -27,11 +26,13 @@ from the_redhuman_is.models.delivery import (
     ItemWorker,
     OnlineSignup,
     OnlineStatusMark,
+    RequestWorker,
     RequestWorkerTurnout,
 )
 from the_redhuman_is.models.worker import (
     Worker,
     WorkerRating,
+    WorkerReliabilityDay,
     WorkerUser,
 )
 from the_redhuman_is.services import catch_lock_error
@@ -62,108 +63,327 @@ def get_accounts_for_workers(worker_ids):
     return {a.worker_id: a for a in accounts}
 
 
-def update_reliability(interval=30, worker_ids=None):
-    today = timezone.localdate()
-    date_interval = (today - timedelta(days=interval), today - timedelta(days=1))
-
-    ratings = WorkerRating.objects.annotate(
-        signup_turnouts=Coalesce(
-            Subquery(
-                OnlineSignup.objects.filter(
-                    worker=OuterRef('worker'),
-                    date__range=date_interval,
-                ).annotate(
-                    has_turnout=Exists(
-                        RequestWorkerTurnout.objects.filter(
-                            requestworker__worker=OuterRef('worker'),
-                            requestworker__request__date__range=date_interval,
-                            requestworker__request__date=OuterRef('date'),
-                        )
-                    )
-                ).filter(
-                    has_turnout=True,
-                ).values(
-                    'worker'
-                ).annotate(
-                    Count('pk'),
-                ).values(
-                    'pk__count',
-                ),
-            ),
-            0,
+# Reliability is 5 * (signups with a turnout) / (signups with a turnout or
+# an assignment) over the RELIABILITY_INTERVAL days before today (5 if there
+# are none). Signups, turnouts and assignments are kept per worker and day
+# (WorkerReliabilityDay, refreshed by the receivers below) and the window
+# counters of WorkerRating are shifted every night by adding the day which
+# enters the window and subtracting the one which leaves it, so only the
+# workers with those days are updated.
+
+RELIABILITY_INTERVAL = 30
+
+
+def _reliability_value():
+    return Case(
+        When(
+            assigned_signups=0,
+            then=Value(5.),
+        ),
+        default=ExpressionWrapper(
+            Value(5.) * F('signup_turnouts') / F('assigned_signups'),
             output_field=FloatField()
+        )
+    )
+
+
+def _set_reliability(worker_ids):
+    WorkerRating.objects.filter(
+        worker__in=worker_ids
+    ).update(
+        reliability=_reliability_value()
+    )
+
+
+def _contributions(signed_up, turned_out, assigned):
+    """
+    Returns the (signup turnouts, assigned signups) of a day.
+    """
+    return (
+        int(signed_up and turned_out),
+        int(signed_up and (turned_out or assigned)),
+    )
+
+
+def _day_delta(values, previous):
+    """
+    The change of the window counters (signup turnouts, assigned signups)
+    when a day changes from `previous` to `values`.
+    """
+    new_contributions = _contributions(*values)
+    old_contributions = _contributions(*previous)
+    return (
+        new_contributions[0] - old_contributions[0],
+        new_contributions[1] - old_contributions[1],
+    )
+
+
+def _window_deltas(entering_days, leaving_days):
+    """
+    {worker pk: (signup turnouts, assigned signups)} to add to the window
+    counters when the days [(worker pk, signed up, turned out, assigned), ...]
+    enter and leave the window. The workers without changes are omitted.
+    """
+    deltas = {}
+    for sign, days in [(1, entering_days), (-1, leaving_days)]:
+        for worker_id, *values in days:
+            signup_turnouts, assigned_signups = _contributions(*values)
+            worker_deltas = deltas.setdefault(worker_id, [0, 0])
+            worker_deltas[0] += sign * signup_turnouts
+            worker_deltas[1] += sign * assigned_signups
+    return {
+        worker_id: tuple(worker_deltas)
+        for worker_id, worker_deltas in deltas.items()
+        if worker_deltas != [0, 0]
+    }
+
+
+def _source_days(worker_ids, first_day, last_day=None):
+    """
+    Returns {(worker pk, date): [signed up, turned out, assigned]}
+    for the days having any of them.
+    """
+    def _filter(queryset, worker_field, date_field):
+        queryset = queryset.filter(**{f'{date_field}__gte': first_day})
+        if last_day is not None:
+            queryset = queryset.filter(**{f'{date_field}__lte': last_day})
+        if worker_ids is not None:
+            queryset = queryset.filter(**{f'{worker_field}__in': worker_ids})
+        return queryset.order_by().values_list(
+            worker_field,
+            date_field,
+        ).distinct()
+
+    days = {}
+    sources = [
+        (OnlineSignup.objects.all(), 'worker', 'date'),
+        (
+            RequestWorkerTurnout.objects.all(),
+            'requestworker__worker',
+            'requestworker__request__date'
         ),
-        signups=Coalesce(
-            Subquery(
-                OnlineSignup.objects.filter(
-                    worker=OuterRef('worker')
-                ).values(
-                    'worker'
-                ).annotate(
-                    Count('pk'),
-                ).values(
-                    'pk__count',
-                ),
-            ),
-            0,
-            output_field=FloatField(),
+        (
+            ItemWorker.objects.all(),
+            'requestworker__worker',
+            'requestworker__request__date'
         ),
-        no_assignments=Coalesce(
-            Subquery(
-                OnlineSignup.objects.filter(
-                    worker=OuterRef('worker')
-                ).annotate(
-                    has_turnout=Exists(
-                        RequestWorkerTurnout.objects.filter(
-                            requestworker__worker=OuterRef('worker'),
-                            requestworker__request__date__range=date_interval,
-                            requestworker__request__date=OuterRef('date'),
-                        )
-                    ),
-                    has_assignments=Exists(
-                        ItemWorker.objects.filter(
-                            requestworker__worker=OuterRef('worker'),
-                            requestworker__request__date__range=date_interval,
-                            requestworker__request__date=OuterRef('date'),
-                        )
-                    )
-                ).filter(
-                    has_turnout=False,
-                    has_assignments=False,
-                ).values(
-                    'worker'
-                ).annotate(
-                    Count('pk'),
-                ).values(
-                    'pk__count',
-                ),
-            ),
-            0,
-            output_field=FloatField(),
+    ]
+    for index, (queryset, worker_field, date_field) in enumerate(sources):
+        for key in _filter(queryset, worker_field, date_field):
+            days.setdefault(key, [False, False, False])[index] = True
+    return days
+
+
+def recompute_reliability(worker_ids=None, today=None):
+    """
+    Rebuilds the days and the window counters of the workers (of all the
+    workers with ratings if `worker_ids` is None) from the signups,
+    turnouts and assignments.
+    """
+    if today is None:
+        today = timezone.localdate()
+    first_day = today - timedelta(days=RELIABILITY_INTERVAL)
+
+    if worker_ids is not None:
+        worker_ids = list(worker_ids)
+    # The days after the window are kept too: they enter it later
+    days = _source_days(worker_ids, first_day)
+
+    sums = {}
+    for (worker_id, date), values in days.items():
+        if date < today:
+            signup_turnouts, assigned_signups = _contributions(*values)
+            worker_sums = sums.setdefault(worker_id, [0, 0])
+            worker_sums[0] += signup_turnouts
+            worker_sums[1] += assigned_signups
+
+    with transaction.atomic():
+        stored_days = WorkerReliabilityDay.objects.filter(date__gte=first_day)
+        ratings = WorkerRating.objects.all()
+        if worker_ids is not None:
+            stored_days = stored_days.filter(worker__in=worker_ids)
+            ratings = ratings.filter(worker__in=worker_ids)
+
+        stored_days.delete()
+        WorkerReliabilityDay.objects.bulk_create(
+            [
+                WorkerReliabilityDay(
+                    worker_id=worker_id,
+                    date=date,
+                    signed_up=signed_up,
+                    turned_out=turned_out,
+                    assigned=assigned,
+                )
+                for (worker_id, date), (signed_up, turned_out, assigned) in days.items()
+            ],
+            batch_size=1000
         )
-    ).annotate(
-        assigned_signups=ExpressionWrapper(
-            F('signups') - F('no_assignments'),
-            output_field=IntegerField()
+
+        ratings = list(ratings)
+        for rating in ratings:
+            rating.reliability_date = today
+            rating.signup_turnouts, rating.assigned_signups = sums.get(
+                rating.worker_id,
+                (0, 0)
+            )
+        WorkerRating.objects.bulk_update(
+            ratings,
+            ['reliability_date', 'signup_turnouts', 'assigned_signups'],
+            batch_size=1000
         )
-    ).annotate(
-        online_reliability=Case(
-            When(
-                assigned_signups=0,
-                then=Value(5.),
-            ),
-            default=ExpressionWrapper(
-                Value(5.) * F('signup_turnouts') / F('assigned_signups'),
-                output_field=FloatField()
+        _set_reliability([rating.worker_id for rating in ratings])
+
+
+def refresh_reliability_days(keys):
+    """
+    Recomputes the days [(worker pk, date), ...] and adjusts the window
+    counters of the ratings whose window includes the changed days.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    worker_ids = {worker_id for worker_id, _ in keys}
+    dates = {date for _, date in keys}
+
+    days = _source_days(worker_ids, min(dates), max(dates))
+    changed_workers = set()
+    with transaction.atomic():
+        stored_days = {
+            (day.worker_id, day.date): day
+            for day in WorkerReliabilityDay.objects.select_for_update().filter(
+                worker__in=worker_ids,
+                date__in=dates,
             )
-        ),
-    )
+        }
+        for key in keys:
+            worker_id, date = key
+            values = tuple(days.get(key, (False, False, False)))
+            day = stored_days.get(key)
+            if day is None:
+                previous = (False, False, False)
+            else:
+                previous = (day.signed_up, day.turned_out, day.assigned)
+            if values == previous:
+                continue
+
+            if not any(values):
+                day.delete()
+            else:
+                WorkerReliabilityDay.objects.update_or_create(
+                    worker_id=worker_id,
+                    date=date,
+                    defaults={
+                        'signed_up': values[0],
+                        'turned_out': values[1],
+                        'assigned': values[2],
+                    }
+                )
+
+            signup_turnouts, assigned_signups = _day_delta(values, previous)
+            if signup_turnouts != 0 or assigned_signups != 0:
+                WorkerRating.objects.filter(
+                    worker=worker_id,
+                    reliability_date__gt=date,
+                    reliability_date__lte=date + timedelta(days=RELIABILITY_INTERVAL),
+                ).update(
+                    signup_turnouts=F('signup_turnouts') + signup_turnouts,
+                    assigned_signups=F('assigned_signups') + assigned_signups,
+                )
+                changed_workers.add(worker_id)
+
+        _set_reliability(changed_workers)
+
+
+def update_reliability(worker_ids=None):
+    """
+    Moves the reliability window to today: only the ratings of the workers
+    with the days entering or leaving the window are changed. The ratings
+    which were never computed (or missed the previous night) and the ones
+    of `worker_ids` are recomputed from scratch.
+    """
+    today = timezone.localdate()
     if worker_ids:
-        ratings = ratings.filter(
-            worker__in=worker_ids
+        recompute_reliability(worker_ids, today)
+        return
+
+    yesterday = today - timedelta(days=1)
+    expired_day = yesterday - timedelta(days=RELIABILITY_INTERVAL)
+
+    def _days(date):
+        return WorkerReliabilityDay.objects.filter(
+            date=date
+        ).values_list(
+            'worker',
+            'signed_up',
+            'turned_out',
+            'assigned',
+        )
+
+    deltas = _window_deltas(_days(yesterday), _days(expired_day))
+
+    with transaction.atomic():
+        changed_workers = []
+        for worker_id, (signup_turnouts, assigned_signups) in deltas.items():
+            WorkerRating.objects.filter(
+                worker=worker_id,
+                reliability_date=yesterday,
+            ).update(
+                reliability_date=today,
+                signup_turnouts=F('signup_turnouts') + signup_turnouts,
+                assigned_signups=F('assigned_signups') + assigned_signups,
+            )
+            changed_workers.append(worker_id)
+
+        WorkerRating.objects.filter(
+            reliability_date=yesterday
+        ).update(
+            reliability_date=today
+        )
+        _set_reliability(changed_workers)
+
+    stale_workers = list(
+        WorkerRating.objects.exclude(
+            reliability_date=today
+        ).values_list(
+            'worker',
+            flat=True
         )
+    )
+    if stale_workers:
+        recompute_reliability(stale_workers, today)
 
-    ratings.update(reliability=F('online_reliability'))
+    WorkerReliabilityDay.objects.filter(
+        date__lt=today - timedelta(days=RELIABILITY_INTERVAL)
+    ).delete()
+
+
+def _refresh_reliability_on_commit(keys):
+    keys = list(keys)
+    transaction.on_commit(lambda: refresh_reliability_days(keys))
+
+
+@receiver(post_save, sender=OnlineSignup)
+@receiver(post_delete, sender=OnlineSignup)
+def refresh_reliability_on_signup_change(sender, instance, **kwargs):
+    if kwargs.get('created', True):
+        _refresh_reliability_on_commit([(instance.worker_id, instance.date)])
+
+
+@receiver(post_save, sender=RequestWorkerTurnout)
+@receiver(post_delete, sender=RequestWorkerTurnout)
+@receiver(post_save, sender=ItemWorker)
+@receiver(post_delete, sender=ItemWorker)
+def refresh_reliability_on_assignment_change(sender, instance, **kwargs):
+    # Only creation and deletion change the day
+    if kwargs.get('created', True):
+        _refresh_reliability_on_commit(
+            RequestWorker.objects.filter(
+                pk=instance.requestworker_id
+            ).values_list(
+                'worker',
+                'request__date',
+            )
+        )
 
 
 class NoWorkPermit(Exception):
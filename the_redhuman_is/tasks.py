@@ -11,8 +11,13 @@ from functools import wraps
 
 from django.contrib.auth.models import User
 from django.db import models
-from huey import crontab
+from huey import (
+    RedisHuey,
+    crontab,
+)
 from huey.contrib.djhuey import (
+    HUEY,
+    close_db,
     db_periodic_task,
     db_task,
     lock_task,
@@ -26,8 +31,8 @@ from the_redhuman_is.async_utils import (
     smsc_sms,
 )
 
+from telegram_bot.broadcast import broadcast_to_groups
 from telegram_bot.utils import send_message
-from telegram_bot.utils import send_message_to_group
 from utils.date_time import UTCFormatter
 
 
@@ -38,6 +43,28 @@ def send_push_notification(title, body, data, tag, token):
     # Todo: do something with response?
 
 
+@db_task()
+def send_multicast_push_notification(title, body, data, tag, tokens):
+    from the_redhuman_is.services.push_notifications import do_send_multicast
+    do_send_multicast(title, body, data, tag, tokens)
+
+
+# Push campaigns have their own queue, so a campaign never delays the other
+# tasks. It is consumed by a separate process: manage.py run_push_campaigns
+push_campaign_huey = RedisHuey(
+    'push_campaigns',
+    immediate=HUEY.immediate,
+    connection_pool=getattr(HUEY.storage, 'pool', None),
+)
+
+
+@push_campaign_huey.task()
+@close_db
+def send_push_campaign(campaign_id, messages):
+    from the_redhuman_is.services.push_notifications import do_send_campaign_chunk
+    do_send_campaign_chunk(campaign_id, messages)
+
+
 def send_push_notification_to_user(title, body, tag, user):
     from the_redhuman_is.services.delivery_requests import last_user_fcm_token
 
@@ -66,14 +93,19 @@ def send_tg_message(chat_id, message):
 
 @db_task()
 def send_tg_message_to_clerks(message):
-    send_message_to_group(message, 'Операционисты')
-    send_message_to_group(message, 'Доставка-проверяющий')
-    send_message_to_group(message, 'Верификация новых пользователей')
+    broadcast_to_groups(
+        message,
+        [
+            'Операционисты',
+            'Доставка-проверяющий',
+            'Верификация новых пользователей',
+        ]
+    )
 
 
 @db_task()
 def send_tg_message_to_dispatchers(message):
-    send_message_to_group(message, 'Доставка-диспетчер')
+    broadcast_to_groups(message, ['Доставка-диспетчер'])
 
 
 @task()
@@ -110,11 +142,76 @@ def import_requests_and_make_report(user_pk, customer_pk, file_pk, notify_dispat
     do_import_requests_and_make_report(user_pk, customer_pk, file_pk, notify_dispatchers)
 
 
+@db_task()
+def update_worker_requests_search_documents(worker_pk):
+    from the_redhuman_is.models.search import update_request_search_documents
+    from the_redhuman_is.models.delivery import DeliveryRequest
+    update_request_search_documents(
+        list(
+            DeliveryRequest.objects.filter(
+                requestworker__worker=worker_pk
+            ).values_list(
+                'pk',
+                flat=True
+            ).distinct()
+        )
+    )
+
+
+@db_task()
+def update_customer_requests_search_documents(customer_pk):
+    from the_redhuman_is.models.search import update_request_search_documents
+    from the_redhuman_is.models.delivery import DeliveryRequest
+    update_request_search_documents(
+        list(
+            DeliveryRequest.objects.filter(
+                customer=customer_pk
+            ).values_list(
+                'pk',
+                flat=True
+            )
+        )
+    )
+
+
 @db_task(retries=5, retry_delay=timedelta(hours=1).seconds)
 def fetch_receipt_image(receipt_pk):
     receipts.fetch_receipt_image(receipt_pk)
 
 
+@db_task()
+def make_photo_variants(photo_pk):
+    from the_redhuman_is.services.photo_variants import make_photo_variants
+
+    make_photo_variants(photo_pk)
+
+
+# A safety net for the ledger changes which bypass the Operation signals
+# (raw SQL, queryset updates)
+@db_periodic_task(crontab(hour=3, minute=0))
+@lock_task('reconcile_worker_balances')
+def reconcile_worker_balances():
+    from the_redhuman_is.models.models import reconcile_worker_balances
+
+    reconcile_worker_balances()
+
+
+@db_periodic_task(crontab(hour=3, minute=30))
+@lock_task('reconcile_account_turnovers')
+def reconcile_account_turnovers():
+    from finance.models import reconcile_account_turnovers
+
+    reconcile_account_turnovers()
+
+
+@db_periodic_task(crontab(hour=4, minute=30))
+@lock_task('delete_stale_photo_uploads')
+def delete_stale_photo_uploads():
+    from the_redhuman_is.services.photo_ingestion import delete_stale_uploads
+
+    delete_stale_uploads()
+
+
 @db_task()
 def make_paysheet_payments_with_talk_bank(author_id: int, paysheet_id: int):
     from the_redhuman_is.services.paysheet.talk_bank import start_paysheet_payments
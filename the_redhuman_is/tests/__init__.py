@@ -1,2 +1,7 @@
 from .calculators import *
+from .customer_summary import *
 from .delivery import *
+from .photo import *
+from .push_notifications import *
+from .vkusvill import *
+from .worker import *
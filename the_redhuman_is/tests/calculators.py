@@ -12,6 +12,7 @@ from the_redhuman_is.models.delivery import DeliveryRequest
 from the_redhuman_is.models.turnout_calculators import (
     EstimateSumItem,
     EstimateSumRequest,
+    _get_value,
     calculate_delivery_request_hours,
     estimate_delivery_request_sum,
 )
@@ -341,3 +342,19 @@ class CalculateHoursTest(SimpleTestCase):
             calculate_delivery_request_hours(7, 4, time(10, 0), base_hours=Decimal(3)),
             (3, 4, 0),
         )
+
+
+class PairValueTest(SimpleTestCase):
+    PAIRS = [(0.0, 100.0), (5.0, 200.0), (10.0, 300.0)]
+
+    def test_value(self):
+        self.assertEqual(_get_value(self.PAIRS, Decimal('4.99')), Decimal(100))
+        self.assertEqual(_get_value(self.PAIRS, 5), Decimal(200))
+        self.assertEqual(_get_value(self.PAIRS, Decimal(12)), Decimal(300))
+
+    def test_below_first_key(self):
+        self.assertEqual(_get_value(self.PAIRS[1:], 1), Decimal(0))
+        self.assertEqual(_get_value([], 1), Decimal(0))
+
+    def test_no_threshold(self):
+        self.assertEqual(_get_value(self.PAIRS, None), Decimal(100))
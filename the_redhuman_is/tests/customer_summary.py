@@ -0,0 +1,52 @@
+import datetime
+
+from django.test import SimpleTestCase
+
+from the_redhuman_is.services.customer_summary import SummaryGrid
+
+
+_DAYS = [datetime.date(2022, 3, 1), datetime.date(2022, 3, 2)]
+
+
+class SummaryGridTest(SimpleTestCase):
+    def test_no_breakdown(self) -> None:
+        summary_grid = SummaryGrid([(1, None, None), (2, None, None)], _DAYS, False, False)
+        grid = summary_grid.accumulate(
+            [1, 1, 2, 3],
+            [_DAYS[0], _DAYS[0], _DAYS[1], _DAYS[1]],
+            ['День', 'Ночь', None, 'День'],
+            [10, None, 11, 12],
+            [1.0, 2.0, 4.0, 8.0],
+        )
+        self.assertEqual(grid.tolist(), [[3.0, 0.0], [0.0, 4.0]])
+
+    def test_by_shift_and_service(self) -> None:
+        rows = [
+            (1, 'День', 10),
+            (1, 'Ночь', 10),
+            (1, 'День', 11),
+            (1, 'Ночь', 11),
+        ]
+        summary_grid = SummaryGrid(rows, _DAYS, True, True)
+        grid = summary_grid.accumulate(
+            [1, 1, 1],
+            [_DAYS[0], _DAYS[1], _DAYS[1]],
+            ['День', 'Ночь', 'Ночь'],
+            [10, 11, None],
+            [1.0, 2.0, 4.0],
+        )
+        self.assertEqual(
+            grid.tolist(),
+            [[1.0, 0.0], [0.0, 0.0], [0.0, 0.0], [0.0, 2.0]]
+        )
+
+    def test_broadcast_to_services(self) -> None:
+        rows = [(1, None, 10), (1, None, 11)]
+        summary_grid = SummaryGrid(rows, _DAYS, False, True)
+        grid = summary_grid.broadcast(
+            [1, 1],
+            [_DAYS[0], datetime.date(2022, 4, 1)],
+            ['День', 'Ночь'],
+            [5, 7],
+        )
+        self.assertEqual(grid.tolist(), [[5.0, 0.0], [5.0, 0.0]])
@@ -1,7 +1,15 @@
 import datetime
+import io
+import zipfile
 
 from django.test import SimpleTestCase
 
+from unittest.mock import patch
+
+from the_redhuman_is.services.delivery import (
+    map_snapshot,
+    self_assign_pool,
+)
 from the_redhuman_is.services.delivery_utils import (
     slot_index,
     slots_chain,
@@ -9,6 +17,7 @@ from the_redhuman_is.services.delivery_utils import (
 )
 
 from utils.date_time import as_default_timezone
+from utils.files import iter_zip
 
 
 def _timepoint(hour: int, minute: int, extra_days: int=0) -> datetime.datetime:
@@ -82,3 +91,129 @@ class TimeSlotsTest(SimpleTestCase):
         _assert(3, 6, 9, [2, 3])
         _assert(4, 10, 11, [4])
         _assert(5, 12, 33, [])
+
+
+class StreamingZipTest(SimpleTestCase):
+    def test_archive_is_valid(self) -> None:
+        contents = {
+            'report.xlsx': b'x' * 100000,
+            '1.jpg': b'',
+            '2.jpg': b'y' * 10,
+        }
+        entries = (
+            (name, io.BytesIO(data))
+            for name, data in contents.items()
+        )
+        chunks = list(iter_zip(entries, chunk_size=4096))
+        self.assertGreater(len(chunks), 2)
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            {name: archive.read(name) for name in archive.namelist()},
+            contents
+        )
+
+
+class MapSnapshotTest(SimpleTestCase):
+    def test_merge_keeps_change_time_of_unchanged(self) -> None:
+        before = datetime.datetime(2023, 2, 10, 12, 0)
+        now = datetime.datetime(2023, 2, 10, 12, 1)
+        previous = {
+            1: {'data': {'pk': 1, 'v': 'a'}, 'updated': before},
+            2: {'data': {'pk': 2, 'v': 'b'}, 'updated': before},
+            3: {'data': {'pk': 3, 'v': 'c'}, 'updated': before},
+        }
+        removed = {4: before}
+        entities = map_snapshot._merge_entities(
+            previous,
+            {
+                1: {'pk': 1, 'v': 'a'},
+                2: {'pk': 2, 'v': 'changed'},
+                4: {'pk': 4, 'v': 'back'},
+            },
+            removed,
+            now
+        )
+        self.assertEqual(entities[1]['updated'], before)
+        self.assertEqual(entities[2]['updated'], now)
+        self.assertEqual(entities[4]['updated'], now)
+        self.assertEqual(removed, {3: now})
+
+    def test_viewport(self) -> None:
+        def _request(pk, *points):
+            return {
+                'data': {
+                    'items': [
+                        {'location': {'latitude': lat, 'longitude': lon} if lat else None}
+                        for lat, lon in points
+                    ]
+                }
+            }
+
+        requests = {
+            1: _request(1, (55.75, 37.61)),
+            2: _request(2, (55.75, 37.61), (59.93, 30.31)),
+            3: _request(3, (59.93, 30.31)),
+            4: _request(4, (None, None)),
+        }
+        grid = map_snapshot._grid(requests, map_snapshot._request_cells)
+        moscow = {
+            'min_latitude': 55.5,
+            'min_longitude': 37.3,
+            'max_latitude': 56.0,
+            'max_longitude': 37.9,
+        }
+        self.assertEqual(map_snapshot._in_viewport(grid, moscow), {1, 2, 4})
+        small = {
+            'min_latitude': 59.925,
+            'min_longitude': 30.305,
+            'max_latitude': 59.935,
+            'max_longitude': 30.315,
+        }
+        self.assertEqual(map_snapshot._in_viewport(grid, small), {2, 3, 4})
+
+    def test_query_requires_whole_viewport(self) -> None:
+        serializer = map_snapshot.MapQuerySerializer(data={'min_latitude': 55})
+        self.assertFalse(serializer.is_valid())
+
+        serializer = map_snapshot.MapQuerySerializer(data={})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data, {'since': None, 'viewport': None})
+
+    def test_requested_location_in_scope(self) -> None:
+        date = datetime.date(2023, 2, 10)
+        with patch.object(map_snapshot, 'get_user_customer_location', return_value=(None, 7)):
+            own = map_snapshot._scope(date, None, None, None)
+            other = map_snapshot._scope(date, None, None, 8)
+        self.assertNotEqual(
+            map_snapshot._snapshot_key(own),
+            map_snapshot._snapshot_key(other)
+        )
+
+
+class SelfAssignPoolTest(SimpleTestCase):
+    def test_item_distances(self) -> None:
+        class _Location:
+            latitude = 55.7558
+            longitude = 37.6173
+
+        requests = [
+            {'items': [
+                {'id': 1, 'geotag_': {'latitude': 59.9386, 'longitude': 30.3141}},
+                {'id': 2, 'geotag_': None},
+            ]},
+            {'items': [
+                {'id': 3, 'geotag_': {'latitude': 55.7558, 'longitude': 37.6173}},
+            ]},
+        ]
+        self_assign_pool._set_item_distances(requests, _Location)
+        items = [item for request in requests for item in request['items']]
+        self.assertAlmostEqual(items[0]['distance'], 634, delta=2)
+        self.assertIsNone(items[1]['distance'])
+        self.assertAlmostEqual(items[2]['distance'], 0)
+        self.assertTrue(all('geotag_' not in item for item in items))
+
+        requests = [{'items': [{'id': 1, 'geotag_': None}]}]
+        self_assign_pool._set_item_distances(requests, None)
+        self.assertEqual(requests[0]['items'], [{'id': 1}])
@@ -0,0 +1,269 @@
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.test import SimpleTestCase
+
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from the_redhuman_is.models import Photo
+from the_redhuman_is.models import photo as photo_models
+from the_redhuman_is.services import photo_ingestion
+from the_redhuman_is.services.photo_ingestion import (
+    PhotoUploadError,
+    UploadOffsetMismatch,
+)
+from the_redhuman_is.services import photo_variants
+from the_redhuman_is.services.photo_variants import (
+    VARIANT_SIZES,
+    dhash,
+    find_duplicate,
+    render_variants,
+)
+
+
+def _image_bytes(width, height, mode='RGB', format='JPEG'):
+    f = io.BytesIO()
+    Image.new(mode, (width, height), 'red').save(f, format)
+    return f.getvalue()
+
+
+class PhotoVariantsTest(SimpleTestCase):
+    def test_sizes(self):
+        variants, _ = render_variants(_image_bytes(3000, 2000))
+        self.assertEqual(set(variants.keys()), set(VARIANT_SIZES.keys()))
+        for size, formats in variants.items():
+            self.assertEqual(set(formats.keys()), {'jpeg', 'webp'})
+            for data, extension in formats.values():
+                with Image.open(io.BytesIO(data)) as image:
+                    self.assertEqual(image.size[0], VARIANT_SIZES[size])
+                    self.assertEqual(
+                        image.format,
+                        {'jpg': 'JPEG', 'webp': 'WEBP'}[extension]
+                    )
+
+    def test_small_and_transparent(self):
+        variants, _ = render_variants(_image_bytes(100, 50, mode='RGBA', format='PNG'))
+        data, _ = variants['medium']['jpeg']
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_dhash(self):
+        gradient = Image.linear_gradient('L').rotate(90).resize((1200, 900))
+        recompressed = io.BytesIO()
+        gradient.resize((400, 300)).save(recompressed, 'JPEG', quality=50)
+        with Image.open(io.BytesIO(recompressed.getvalue())) as copy:
+            self.assertEqual(dhash(gradient), dhash(copy))
+        self.assertNotEqual(dhash(gradient), dhash(gradient.rotate(180)))
+        self.assertTrue(-2 ** 63 <= dhash(gradient) < 2 ** 63)
+
+    def test_uniform_dhash(self):
+        self.assertEqual(dhash(Image.new('RGB', (640, 480), 'black')), 0)
+
+    def test_degenerate_dhash_not_duplicate(self):
+        photo = Photo(pk=1, content_type_id=2, object_id=3)
+        with patch.object(photo_variants.Photo, 'objects') as objects:
+            find_duplicate(photo, 'digest', 0)
+            self.assertEqual(objects.filter.call_args[0], (Q(content_hash='digest'),))
+
+            find_duplicate(photo, 'digest', 12345)
+            self.assertEqual(
+                objects.filter.call_args[0],
+                (Q(content_hash='digest') | Q(perceptual_hash=12345),)
+            )
+
+
+class _Upload:
+    def __init__(self, size, content_hash=''):
+        self.pk = 'upload'
+        self.size = size
+        self.received = 0
+        self.content_hash = content_hash
+        self.timestamp = None
+        self.save = MagicMock()
+
+
+class PhotoUploadTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'uploads', 'upload.part')
+        self.content = b'0123456789'
+        self.upload = _Upload(len(self.content), hashlib.sha256(self.content).hexdigest())
+        for name, value in [
+                ('get_upload', MagicMock(return_value=self.upload)),
+                ('_part_path', MagicMock(return_value=self.path)),
+        ]:
+            patcher = patch.object(photo_ingestion, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _append(self, offset, data):
+        # Without the transaction.atomic decorator
+        return photo_ingestion.append_chunk.__wrapped__(
+            self.upload.pk,
+            None,
+            offset,
+            ContentFile(data)
+        )
+
+    def _stored(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_chunks(self):
+        self.assertEqual(self._append(0, self.content[:4]), 4)
+        self.assertEqual(self._append(4, self.content[4:]), 10)
+        self.assertEqual(self._stored(), self.content)
+        self.assertIsNotNone(self.upload.timestamp)
+
+    def test_resume(self):
+        self._append(0, self.content[:4])
+        # A repeated chunk (the answer was lost) is skipped
+        self.assertEqual(self._append(0, self.content[:4]), 4)
+        with self.assertRaises(UploadOffsetMismatch) as context:
+            self._append(6, self.content[6:])
+        self.assertEqual(context.exception.offset, 4)
+        self.assertEqual(self._append(4, self.content[4:]), 10)
+        self.assertEqual(self._stored(), self.content)
+
+    def test_partially_written_chunk(self):
+        self._append(0, self.content[:4])
+        # The write of the next chunk was interrupted after the file got it
+        with open(self.path, 'ab') as f:
+            f.write(b'45')
+        self._append(4, self.content[4:])
+        self.assertEqual(self._stored(), self.content)
+
+    def test_too_big(self):
+        with self.assertRaises(PhotoUploadError):
+            self._append(0, self.content + b'!')
+
+    def test_image(self):
+        self._append(0, self.content)
+        with photo_ingestion.upload_image(self.upload.pk, None) as image:
+            self.assertEqual(image.read(), self.content)
+        self.assertTrue(image.closed)
+
+    def test_incomplete(self):
+        self._append(0, self.content[:4])
+        with self.assertRaises(PhotoUploadError):
+            with photo_ingestion.upload_image(self.upload.pk, None):
+                pass
+
+    def test_hash_mismatch(self):
+        self.upload.content_hash = hashlib.sha256(b'other').hexdigest()
+        self._append(0, self.content)
+        with self.assertRaises(PhotoUploadError):
+            with photo_ingestion.upload_image(self.upload.pk, None):
+                pass
+
+    def test_known_hash_needs_bytes(self):
+        # A hash of a stored photo doesn't complete the upload
+        author = MagicMock(pk=1)
+        with patch.object(photo_ingestion.PhotoUpload, 'objects') as objects:
+            objects.create.return_value = self.upload
+            upload = photo_ingestion.start_upload(
+                author,
+                len(self.content),
+                self.upload.content_hash
+            )
+        objects.create.assert_called_once_with(
+            author=author,
+            size=len(self.content),
+            content_hash=self.upload.content_hash,
+        )
+        self.assertEqual(photo_ingestion.upload_offset(upload), 0)
+        with self.assertRaises(PhotoUploadError):
+            with photo_ingestion.upload_image(upload.pk, author):
+                pass
+
+
+class PhotoDedupeTest(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(Photo, 'objects')
+        self.objects = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _same_content(self, photo):
+        self.objects.filter.return_value.exclude.return_value.exclude.return_value.\
+            order_by.return_value.first.return_value = photo
+
+    def test_set_image_reuses_file(self):
+        same = Photo(
+            pk=1,
+            content_type_id=1,
+            object_id=9,
+            image='photo/1/a.jpg',
+            content_hash='h',
+            perceptual_hash=7,
+            variants={'thumb': {'jpeg': 'photo/1/variants/h_thumb.jpg'}},
+        )
+        self._same_content(same)
+        photo = Photo(pk=2, content_type_id=1, object_id=5)
+        with patch.object(Photo, 'save'):
+            photo.set_image(ContentFile(b'data', name='b.jpg'), content_hash='h')
+
+        self.assertEqual(photo.image.name, 'photo/1/a.jpg')
+        self.assertEqual(photo.variants, same.variants)
+        self.assertEqual(photo.perceptual_hash, 7)
+        # Another object: a reused photo
+        self.assertEqual(photo.duplicate_of, same)
+
+    def test_set_image_new_content(self):
+        self._same_content(None)
+        photo = Photo(pk=2, content_type_id=1, object_id=5)
+        image = ContentFile(b'data', name='b.jpg')
+        with patch.object(Photo, 'save'):
+            photo.set_image(image)
+
+        self.assertEqual(photo.content_hash, hashlib.sha256(b'data').hexdigest())
+        self.assertIsNone(photo.duplicate_of)
+        self.assertEqual(photo.variants, {})
+
+    def test_add_photo_repeated_upload(self):
+        existing = Photo(pk=3, content_type_id=1, object_id=5)
+        self.objects.filter.return_value.first.return_value = existing
+        target = MagicMock(id=5)
+        with patch.object(photo_models.ContentType.objects, 'get_for_model'):
+            photo = photo_models.add_photo(target, ContentFile(b'data', name='b.jpg'))
+
+        self.assertIs(photo, existing)
+        self.assertEqual(
+            self.objects.filter.call_args.kwargs['content_hash'],
+            hashlib.sha256(b'data').hexdigest()
+        )
+        self.objects.create.assert_not_called()
+
+    def _delete_image(self, shared):
+        photo = Photo(
+            pk=2,
+            image='photo/1/a.jpg',
+            content_hash='h',
+            variants={'thumb': {'jpeg': 'photo/1/variants/h_thumb.jpg'}},
+        )
+        self.objects.filter.return_value.exclude.return_value.exists.return_value = shared
+        with patch.object(FieldFile, 'delete') as delete, \
+                patch.object(Photo, 'delete_variants') as delete_variants:
+            photo.delete_image()
+        self.assertEqual(photo.variants, {})
+        return delete, delete_variants
+
+    def test_delete_shared_image(self):
+        delete, delete_variants = self._delete_image(shared=True)
+        delete.assert_not_called()
+        delete_variants.assert_not_called()
+
+    def test_delete_image(self):
+        delete, delete_variants = self._delete_image(shared=False)
+        delete.assert_called_once()
+        delete_variants.assert_called_once_with()
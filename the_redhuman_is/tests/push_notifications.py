@@ -0,0 +1,109 @@
+import datetime
+
+from django.db.models import F
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from the_redhuman_is.services import push_notifications as push_service
+from the_redhuman_is.services.push_notifications import (
+    do_send_campaign_chunk,
+    start_campaign,
+)
+
+
+def _messages(count):
+    return [(None, None, {'n': str(n)}, 'tag', f'token{n}') for n in range(count)]
+
+
+class PushCampaignStartTest(SimpleTestCase):
+    def test_chunks(self):
+        tokens = {worker_id: f'token{worker_id}' for worker_id in range(5)}
+        messages = {worker_id: (None, None, {'n': str(worker_id)}) for worker_id in range(6)}
+        with patch.object(push_service, 'last_fcm_tokens', return_value=tokens), \
+                patch.object(push_service, 'PushCampaign') as campaign_model, \
+                patch.object(push_service, 'CAMPAIGN_CHUNK_SIZE', 2), \
+                patch.object(push_service.transaction, 'on_commit', lambda f: f()), \
+                patch.object(push_service.tasks, 'send_push_campaign') as send_push_campaign:
+            campaign = start_campaign('tag', messages)
+
+        campaign_model.objects.create.assert_called_once_with(
+            tag='tag',
+            deadline=None,
+            audience=6,
+            tokens=5,
+            chunks=3,
+        )
+        # Every task gets only its own chunk
+        self.assertEqual(
+            [call_args[0] for call_args in send_push_campaign.call_args_list],
+            [
+                (campaign.pk, _messages(5)[:2]),
+                (campaign.pk, _messages(5)[2:4]),
+                (campaign.pk, _messages(5)[4:]),
+            ]
+        )
+
+
+class PushCampaignChunkTest(SimpleTestCase):
+    def _send(self, messages, deadline=None, response=None, error=None):
+        campaign_model = MagicMock()
+        campaigns = campaign_model.objects.filter.return_value
+        campaigns.values_list.return_value.get.return_value = deadline
+        send_messages = MagicMock(return_value=response, side_effect=error)
+        with patch.object(push_service, 'PushCampaign', campaign_model), \
+                patch.object(push_service.push_notifications, 'send_messages', send_messages), \
+                patch.object(push_service, '_delete_invalid_tokens', return_value=[]), \
+                patch.object(push_service, 'logger') as logger:
+            do_send_campaign_chunk(1, messages)
+        self.assertEqual(logger.exception.called, error is not None)
+        return campaigns, send_messages
+
+    def _stats(self, campaigns):
+        stats = campaigns.update.call_args[1]
+        self.assertEqual(stats.pop('chunks_done'), F('chunks_done') + 1)
+        return stats
+
+    def _assert_finish_checked(self, campaigns):
+        campaigns.filter.assert_called_with(
+            finished__isnull=True,
+            chunks_done=F('chunks'),
+        )
+        self.assertIn('finished', campaigns.filter.return_value.update.call_args[1])
+
+    def test_chunk(self):
+        messages = _messages(2)
+        campaigns, send_messages = self._send(
+            messages,
+            response=MagicMock(success_count=1, failure_count=1)
+        )
+        send_messages.assert_called_once_with(messages)
+        stats = self._stats(campaigns)
+        self.assertEqual(stats['sent'], F('sent') + 1)
+        self.assertEqual(stats['failed'], F('failed') + 1)
+        self.assertEqual(stats['invalid_tokens'], F('invalid_tokens') + 0)
+        self._assert_finish_checked(campaigns)
+
+    def test_send_error(self):
+        campaigns, send_messages = self._send(
+            _messages(2),
+            error=ValueError('FCM is down')
+        )
+        stats = self._stats(campaigns)
+        self.assertEqual(stats['sent'], F('sent') + 0)
+        self.assertEqual(stats['failed'], F('failed') + 2)
+        # The chunk is done, the campaign can be finished
+        self._assert_finish_checked(campaigns)
+
+    def test_deadline_expired(self):
+        campaigns, send_messages = self._send(
+            _messages(3),
+            deadline=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        send_messages.assert_not_called()
+        self.assertEqual(self._stats(campaigns), {'expired': F('expired') + 3})
+        self._assert_finish_checked(campaigns)
@@ -0,0 +1,88 @@
+import datetime
+import io
+
+import xlwt
+
+from django.test import SimpleTestCase
+
+from the_redhuman_is.services.pivot import pivot
+from the_redhuman_is.services.vkusvill import parse_performance_book
+
+
+def _performance_book(days):
+    wb = xlwt.Workbook(encoding='utf-8')
+    for day in days:
+        ws = wb.add_sheet(day.strftime('%d.%m'))
+        rows = [
+            (0, ('A1 Иванов',)),
+            (0, ('С пересчетом',)),
+            (1, ('Склад_Сухой', 1, 2, 100)),
+            (1, ('ТИЛСИ', 0, 1, 50)),
+            (1, ('Склад_Хлеба', '', '', 10)),
+            (0, ('Итого',)),
+        ]
+        for row, (level, values) in enumerate(rows):
+            ws.row(row).level = level
+            for col, value in enumerate(values):
+                ws.write(row, col, value)
+    f = io.BytesIO()
+    wb.save(f)
+    return f.getvalue()
+
+
+class PerformanceBookTest(SimpleTestCase):
+    def test_parse(self):
+        days = [datetime.date(2023, 2, day) for day in range(1, 7)]
+        data, errors = parse_performance_book(_performance_book(days), year=2023)
+
+        self.assertEqual(list(data.keys()), days)
+        self.assertEqual(errors, {})
+        for day in days:
+            self.assertEqual(
+                data[day],
+                {
+                    'A1 Иванов': {
+                        'Молоко': (1, 3, 150),
+                        'Хлеб': (0, 0, 10),
+                    }
+                }
+            )
+
+    def test_duplicate_days(self):
+        day = datetime.date(2023, 2, 1)
+        wb = xlwt.Workbook(encoding='utf-8')
+        wb.add_sheet('01.02')
+        wb.add_sheet('01.02 (2)')
+        f = io.BytesIO()
+        wb.save(f)
+        with self.assertRaises(Exception):
+            parse_performance_book(f.getvalue(), year=day.year)
+
+
+class PivotTest(SimpleTestCase):
+    def test_pivot(self):
+        days = [datetime.date(2023, 2, day) for day in range(1, 4)]
+        table = pivot(
+            [(1, 'Молоко'), (2, 'Хлеб'), (1, 'Молоко'), (1, 'Молоко'), (3, None)],
+            [days[0], days[1], days[2], days[2], days[0]],
+            [10, 20, 30, 40, None],
+            columns=days
+        )
+        self.assertEqual(
+            list(table.items()),
+            [
+                ((1, 'Молоко'), [10, None, '30/40']),
+                ((2, 'Хлеб'), [None, 20, None]),
+                ((3, None), [None, None, None]),
+            ]
+        )
+
+    def test_fixed_rows(self):
+        table = pivot(['a', 'b', 'c'], [0, 0, 1], [1, 2, 3], rows=['c', 'a'], columns=[0, 1])
+        self.assertEqual(table.rows, ['c', 'a'])
+        self.assertEqual(table.cells.tolist(), [[None, 3], [1, None]])
+
+    def test_empty(self):
+        table = pivot([], [], [], columns=[0, 1])
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.cells.shape, (0, 2))
@@ -0,0 +1,145 @@
+import datetime
+
+from contextlib import nullcontext
+
+from django.db.models import F
+from django.test import SimpleTestCase
+
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from the_redhuman_is.services import worker
+from the_redhuman_is.services.worker import (
+    RELIABILITY_INTERVAL,
+    _contributions,
+    _day_delta,
+    _window_deltas,
+    refresh_reliability_days,
+)
+
+
+class ReliabilityContributionsTest(SimpleTestCase):
+    def test_contributions(self):
+        # (signup turnouts, assigned signups)
+        self.assertEqual(_contributions(True, True, False), (1, 1))
+        self.assertEqual(_contributions(True, True, True), (1, 1))
+        self.assertEqual(_contributions(True, False, True), (0, 1))
+        # a signup without a turnout or an assignment is not counted
+        self.assertEqual(_contributions(True, False, False), (0, 0))
+        # turnouts without a signup are not counted
+        self.assertEqual(_contributions(False, True, True), (0, 0))
+
+    def test_day_delta(self):
+        # a turnout
+        self.assertEqual(_day_delta((True, True, True), (True, False, True)), (1, 0))
+        # the assignment is removed
+        self.assertEqual(_day_delta((True, False, False), (True, False, True)), (0, -1))
+        self.assertEqual(_day_delta((False, True, True), (False, False, False)), (0, 0))
+
+
+class ReliabilityWindowShiftTest(SimpleTestCase):
+    def test_window_deltas(self):
+        entering = [
+            (1, True, True, True),
+            (2, True, False, True),
+            (3, True, True, False),
+        ]
+        leaving = [
+            (1, True, False, True),
+            (3, True, True, True),
+            (4, True, True, False),
+            (5, False, True, True),
+        ]
+        self.assertEqual(
+            _window_deltas(entering, leaving),
+            {
+                1: (1, 0),
+                2: (0, 1),
+                # 3 has the same contributions entering and leaving,
+                # 5 has none
+                4: (-1, -1),
+            }
+        )
+
+    def test_no_days(self):
+        self.assertEqual(_window_deltas([], []), {})
+
+
+class _Day:
+    def __init__(self, worker_id, date, signed_up, turned_out, assigned):
+        self.worker_id = worker_id
+        self.date = date
+        self.signed_up = signed_up
+        self.turned_out = turned_out
+        self.assigned = assigned
+        self.delete = MagicMock()
+
+
+class RefreshReliabilityDaysTest(SimpleTestCase):
+    day = datetime.date(2023, 2, 10)
+
+    def _refresh(self, source_days, stored_days):
+        day_model = MagicMock()
+        day_model.objects.select_for_update.return_value.filter.return_value = stored_days
+        rating_model = MagicMock()
+        with patch.object(worker, '_source_days', return_value=source_days), \
+                patch.object(worker, 'WorkerReliabilityDay', day_model), \
+                patch.object(worker, 'WorkerRating', rating_model), \
+                patch.object(worker, '_set_reliability') as set_reliability, \
+                patch.object(worker.transaction, 'atomic', nullcontext):
+            refresh_reliability_days([(1, self.day)])
+        return day_model, rating_model, set_reliability
+
+    def _assert_rating_update(self, rating_model, signup_turnouts, assigned_signups):
+        rating_model.objects.filter.assert_called_once_with(
+            worker=1,
+            reliability_date__gt=self.day,
+            reliability_date__lte=self.day + datetime.timedelta(days=RELIABILITY_INTERVAL),
+        )
+        rating_model.objects.filter.return_value.update.assert_called_once_with(
+            signup_turnouts=F('signup_turnouts') + signup_turnouts,
+            assigned_signups=F('assigned_signups') + assigned_signups,
+        )
+
+    def test_turnout_added(self):
+        day_model, rating_model, set_reliability = self._refresh(
+            {(1, self.day): [True, True, True]},
+            [_Day(1, self.day, True, False, True)]
+        )
+        day_model.objects.update_or_create.assert_called_once_with(
+            worker_id=1,
+            date=self.day,
+            defaults={
+                'signed_up': True,
+                'turned_out': True,
+                'assigned': True,
+            }
+        )
+        self._assert_rating_update(rating_model, 1, 0)
+        set_reliability.assert_called_once_with({1})
+
+    def test_assignment_removed(self):
+        stored_day = _Day(1, self.day, True, False, True)
+        day_model, rating_model, set_reliability = self._refresh(
+            {(1, self.day): [True, False, False]},
+            [stored_day]
+        )
+        self._assert_rating_update(rating_model, 0, -1)
+        set_reliability.assert_called_once_with({1})
+
+    def test_day_without_sources_deleted(self):
+        stored_day = _Day(1, self.day, True, False, True)
+        day_model, rating_model, set_reliability = self._refresh({}, [stored_day])
+        stored_day.delete.assert_called_once_with()
+        self._assert_rating_update(rating_model, 0, -1)
+
+    def test_unchanged_day(self):
+        day_model, rating_model, set_reliability = self._refresh(
+            {(1, self.day): [True, True, False]},
+            [_Day(1, self.day, True, True, False)]
+        )
+        day_model.objects.update_or_create.assert_not_called()
+        rating_model.objects.filter.assert_not_called()
+        set_reliability.assert_called_once_with(set())
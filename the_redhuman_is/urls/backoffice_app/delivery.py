@@ -177,6 +177,11 @@ urlpatterns = [
         main_workplace.list_requests,
         name='backoffice_delivery_request_list'
     ),
+    path(
+        'request/count/',
+        main_workplace.count_requests,
+        name='backoffice_delivery_request_count'
+    ),
     path(
         'request/detail/',
         main_workplace.request_detail,
@@ -75,6 +75,21 @@ urlpatterns = [
         delivery_mobile.confirm_request_worker,
         name='api_v2_confirm_request_worker'
     ),
+    path(
+        'photo_upload/start/',
+        delivery_mobile.photo_upload_start,
+        name='api_v2_photo_upload_start'
+    ),
+    path(
+        'photo_upload/status/',
+        delivery_mobile.photo_upload_status,
+        name='api_v2_photo_upload_status'
+    ),
+    path(
+        'photo_upload/chunk/',
+        delivery_mobile.photo_upload_chunk,
+        name='api_v2_photo_upload_chunk'
+    ),
     path(
         'request/item/worker/start/',
         delivery_mobile.item_worker_start,
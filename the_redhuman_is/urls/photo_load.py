@@ -76,6 +76,11 @@ urlpatterns = [
         photo_load_views.worker_turnout_output,
         name='worker_turnout_output'
     ),
+    path(
+        'upload_chunk/',
+        photo_load_views.photo_load_upload_chunk,
+        name='photo_load_upload_chunk'
+    ),
     url(
         r'^bad_photo_alert/$',
         photo_load_views.bad_photo_alert,
@@ -321,6 +321,11 @@ urlpatterns = [
         operating_account.detail_json,
         name='operating_account_detail_json'
     ),
+    url(
+        r'^operating_account/(?P<pk>[0-9]+)/ledger/json/$',
+        operating_account.ledger_json,
+        name='operating_account_ledger_json'
+    ),
     url(
         r'^operating_account/detail/',
         operating_account.total_detail,
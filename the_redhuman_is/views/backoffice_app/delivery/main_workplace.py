@@ -379,13 +379,45 @@ class ForceCommit(metaclass=SerializerMetaclass):
     force_commit = BooleanField(default=False)
 
 
+class RequestListQuerySerializer(Serializer):
+    before = IntegerField(min_value=1, required=False)
+    limit = IntegerField(min_value=1, max_value=1000, required=False)
+    fields = CharField(required=False)
+
+    def validate_fields(self, value):
+        fields = {field for field in value.split(',') if field}
+        unknown_fields = fields - retrieve.REQUEST_LIST_OPTIONAL_FIELDS.keys()
+        if unknown_fields:
+            raise ValidationError(
+                'Неизвестные поля: {}'.format(', '.join(sorted(unknown_fields)))
+            )
+        return fields
+
+
 @bo_api(['GET'])
 def list_requests(request):
+    serializer = RequestListQuerySerializer(data=request.GET)
+    serializer.is_valid(raise_exception=True)
     return JsonResponse(
-        retrieve.get_delivery_request_list(request.user, request.GET)
+        retrieve.get_delivery_request_list(
+            request.user,
+            request.GET,
+            before=serializer.validated_data.get('before'),
+            limit=serializer.validated_data.get('limit'),
+            optional_fields=serializer.validated_data.get('fields'),
+        )
     )
 
 
+@bo_api(['GET'])
+def count_requests(request):
+    return JsonResponse({
+        'data': {
+            'count': retrieve.get_delivery_request_count(request.user, request.GET),
+        }
+    })
+
+
 class RequestDetailQuerySerializer(Serializer):
     id = IntegerField(source='request_id', min_value=1)
     with_photos = BooleanField(default=False)
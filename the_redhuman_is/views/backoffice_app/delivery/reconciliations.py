@@ -6,7 +6,6 @@ from datetime import (
     timedelta,
 )
 from uuid import uuid4
-from zipfile import ZipFile
 
 import openpyxl
 from django.contrib.auth.models import User
@@ -34,9 +33,10 @@ from the_redhuman_is.tasks import send_email
 from the_redhuman_is.views.backoffice_app.auth import bo_api
 from the_redhuman_is.views.delivery import (
     _fill_details_sheet,
-    _add_images_to_zip,
+    _timesheet_images,
 )
 from the_redhuman_is.views.utils import get_first_last_day
+from utils.files import iter_zip
 from utils.functools import strtobool
 
 
@@ -260,13 +260,16 @@ def send_daily_reconciliation_report(daily_reconciliation, author):
     excel_report = io.BytesIO()
     wb.save(excel_report)
 
-    images_archive = io.BytesIO()
-    with ZipFile(images_archive, 'w') as zip_file:
-        _add_images_to_zip(
-            zip_file,
-            daily_reconciliation.date,
-            daily_reconciliation.location.customer_id,
+    # The attachment has to be in memory anyway, but the photos are
+    # copied into it by chunks
+    images_archive = b''.join(
+        iter_zip(
+            _timesheet_images(
+                daily_reconciliation.date,
+                daily_reconciliation.location.customer_id,
+            )
         )
+    )
 
     if daily_reconciliation.all_requests_confirmed:
         confirm_daily_reconciliation(daily_reconciliation.pk, author=author)
@@ -285,7 +288,7 @@ def send_daily_reconciliation_report(daily_reconciliation, author):
                 daily_reconciliation.zone_name,
                 daily_reconciliation.date.strftime('%d.%m.%Y'),
             ),
-            'body': images_archive.getvalue(),
+            'body': images_archive,
             'mime_type': ('application', 'zip')
         },
     ]
@@ -6,7 +6,14 @@ from rest_framework.serializers import Serializer
 from rest_framework.views import APIView
 
 from the_redhuman_is.models import Worker
-from the_redhuman_is.services.delivery import retrieve
+from the_redhuman_is.models.search import (
+    search_delivery_requests,
+    search_workers,
+)
+from the_redhuman_is.services.delivery import (
+    map_snapshot,
+    retrieve,
+)
 from the_redhuman_is.services.delivery.utils import ObjectNotFoundError
 from the_redhuman_is.views import delivery
 from the_redhuman_is.views.backoffice_app.auth import bo_api
@@ -24,11 +31,11 @@ class MapRequestAutocomplete(Select2QuerySetView, APIView):
         )
 
         if self.q:
-            delivery_requests = delivery_requests.filter_by_text(self.q)
+            delivery_requests = search_delivery_requests(delivery_requests, self.q)
+        else:
+            delivery_requests = delivery_requests.order_by('pk')
 
-        return delivery_requests.order_by(
-            'pk'
-        ).values(
+        return delivery_requests.values(
             'pk',
             'driver_name',
         )
@@ -51,11 +58,11 @@ class MapWorkerAutocomplete(Select2QuerySetView, APIView):
         )
 
         if self.q:
-            workers = workers.filter_by_text(self.q)
+            workers = search_workers(workers, self.q)
+        else:
+            workers = workers.order_by('full_name')
 
-        return workers.order_by(
-            'full_name'
-        ).values(
+        return workers.values(
             'pk',
             'full_name',
         )
@@ -67,7 +74,7 @@ class MapWorkerAutocomplete(Select2QuerySetView, APIView):
         return result['full_name']
 
 
-class ZoneSerializer(Serializer):
+class ZoneSerializer(map_snapshot.MapQuerySerializer):
     zone = IntegerField(min_value=1, source='zone_id', allow_null=True, default=None)
 
 
@@ -76,7 +83,7 @@ def requests_on_map(request):
     serializer = ZoneSerializer(data=request.GET)
     serializer.is_valid(raise_exception=True)
     return JsonResponse(
-        retrieve.get_requests_on_map(
+        map_snapshot.get_map_data(
             user=request.user,
             date=timezone.localdate(),
             **serializer.validated_data
@@ -27,10 +27,13 @@ from the_redhuman_is import services
 from the_redhuman_is.services.delivery.utils import ObjectNotFoundError
 from the_redhuman_is.views.backoffice_app.auth import bo_api
 from the_redhuman_is.views.utils import ConflictError
+from finance.models import turnover_saldos
+
 from utils.filter import (
     ChoiceInFilter,
     ChoiceInConvertFilter,
     CompactChoiceFilter,
+    ConsistentOrderingFilter,
     FilterSet,
 )
 from utils.functools import merge_dicts
@@ -74,6 +77,17 @@ class WorkerFilter(FilterSet):
         choices={v: k for k, v in _READINESS.items()},
     )
     last_call_date = DateFilter(method='filter_by_last_call_date')
+    order = ConsistentOrderingFilter(
+        fields=(
+            ('last_name', 'name'),
+            ('input_date', 'input_date'),
+            ('last_turnout_date', 'last_turnout_date'),
+            ('last_active_day', 'last_active_day'),
+            ('planned_contact_day', 'planned_contact_day'),
+            ('workerrating__reliability', 'reliability'),
+        ),
+        discriminator=('pk',)
+    )
 
     @staticmethod
     def filter_by_planned_contact_day(queryset, name, value):
@@ -181,32 +195,51 @@ def serialize_worker_in_place(worker, balance):
     worker['tel_number'] = format_phone(worker['tel_number'])
 
 
+class WorkerListPageSerializer(Serializer):
+    limit = IntegerField(min_value=1, max_value=500, required=False)
+    offset = IntegerField(min_value=0, default=0)
+
+
+def get_worker_balances(worker_ids):
+    accounts = services.worker.get_accounts_for_workers(worker_ids)
+    saldos = turnover_saldos(accounts.values())
+    return {
+        pk: -saldos[account.pk]
+        for pk, account in accounts.items()
+    }
+
+
 @bo_api(['GET'])
 def worker_list(request):
+    page = WorkerListPageSerializer(data=request.GET)
+    page.is_valid(raise_exception=True)
+    limit = page.validated_data.get('limit')
+    offset = page.validated_data['offset']
+
     worker_qs = get_worker_queryset()
     if 'search_text' in request.GET:
-        workers = list(
-            worker_qs.filter_by_name_or_phone(
+        # the other filters are ignored while searching
+        worker_qs = WorkerFilter(
+            {'order': request.GET['order']} if 'order' in request.GET else {},
+            queryset=worker_qs.filter_by_name_or_phone(
                 request.GET['search_text']
             )
-        )
+        ).qs
     else:
-        workers = list(WorkerFilter(request.GET, queryset=worker_qs).qs)
+        worker_qs = WorkerFilter(request.GET, queryset=worker_qs).qs
 
-    worker_ids = [w['id'] for w in workers]
-    accounts = services.worker.get_accounts_for_workers(worker_ids)
-    balances = {
-        pk: -account.turnover_saldo()
-        for pk, account in accounts.items()
-    }
+    result = {}
+    if limit is not None:
+        result['count'] = worker_qs.count()
+        worker_qs = worker_qs[offset:offset + limit]
+    workers = list(worker_qs)
+
+    balances = get_worker_balances([w['id'] for w in workers])
     for worker in workers:
         serialize_worker_in_place(worker, balances[worker['id']])
 
-    return JsonResponse(
-        {
-            'results': workers
-        }
-    )
+    result['results'] = workers
+    return JsonResponse(result)
 
 
 @bo_api(['GET'])
@@ -221,8 +254,7 @@ def worker_detail(request, pk):
     except Worker.DoesNotExist:
         raise ObjectNotFoundError(f'Работник {pk} не найден.')
 
-    accounts = services.worker.get_accounts_for_workers([pk])
-    balance = -accounts[pk].turnover_saldo()
+    balance = get_worker_balances([pk])[pk]
     serialize_worker_in_place(worker, balance)
 
     return JsonResponse(worker)
@@ -8,6 +8,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.fields import (
     BooleanField,
     CharField,
+    ChoiceField,
     DateField,
     DecimalField,
     IntegerField,
@@ -148,17 +149,23 @@ def list_customer_locations(request):
 class PhotoQuerySerializer(Serializer):
     request = IntegerField(source='request_id', min_value=1)
     photo = IntegerField(source='photo_id', min_value=1)
+    size = ChoiceField(choices=['thumb', 'medium'], required=False)
+    format = ChoiceField(choices=['jpeg', 'webp'], default='jpeg')
 
 
 @customer_api(['GET'])
 def request_photo(request):
     serializer = PhotoQuerySerializer(data=request.GET)
     serializer.is_valid(raise_exception=True)
+    size = serializer.validated_data.pop('size', None)
+    format = serializer.validated_data.pop('format')
     photo = retrieve.get_photo_for_customer(
         user=request.user,
         **serializer.validated_data
     )
     if photo:
+        if size is not None:
+            return content_response(photo.variant_file(size, format))
         return content_response(photo.image)
     else:
         return HttpResponseNotFound()
@@ -24,7 +24,6 @@ from django.http import JsonResponse
 
 from django.views.decorators.http import require_POST
 
-from django.utils import timezone
 
 import finance
 
@@ -33,27 +32,16 @@ from the_redhuman_is.auth import staff_account_required
 from the_redhuman_is import forms
 from the_redhuman_is import models
 
+from the_redhuman_is.services import vkusvill
+from the_redhuman_is.services.vkusvill import (
+    VKUSVILL_PK,
+    VKUSVILL_SERVICE_PK,
+)
 from the_redhuman_is.views.utils import get_first_last_day
 from utils.date_time import days_from_interval
 from utils.date_time import string_from_date
 
 
-YEAR = timezone.now().date().year
-VKUSVILL_PK = 16
-VKUSVILL_SERVICE_PK = 8
-
-WAREHOUSES = {
-    'ТИЛСИ': 'Молоко',
-    'Кавказский': 'Молоко',
-    'Склад_Сухой': 'Молоко',
-    'Склад долгосрочной продукции': 'Долгосрок',
-    'Склад_Хлеба': 'Хлеб',
-    'Склад_Овощи_Фрукты': 'Овощи',
-    'Склад_Охл_Мясо': 'Мясо',
-    'Зона отгрузки заморозки': 'Заморозка'
-}
-
-
 @staff_account_required
 def management_page(request):
     return render(
@@ -65,93 +53,6 @@ def management_page(request):
     )
 
 
-def _parse_performance_sheet(sheet):
-    name = sheet.name
-    day = int(name[:2])
-    month = int(name[3:5])
-    day = datetime.date(
-        day=day,
-        month=month,
-        year=YEAR
-    )
-
-    A_RX = re.compile('^([AА]\d+.*)$')
-
-    state = 'initial'
-    level = None
-    terminal = None
-
-    result = {}
-    errors = []
-
-    for row in range(0, sheet.nrows):
-        value = sheet.cell_value(row, 0)
-        m = A_RX.match(value)
-        if m:
-            state = 'new_terminal'
-            terminal = m.group(1)
-        elif value in ['С пересчетом', 'Без пересчета']:
-            if terminal:
-                state = 'new_warehouse'
-                level = sheet.rowinfo_map[row + 1].outline_level
-            else:
-                errors.append(
-                    'Лист {}, строка {}: значение <{}> до того, как был указан терминал'.format(
-                        string_from_date(day),
-                        row,
-                        value
-                    )
-                )
-        elif state == 'new_warehouse':
-            if sheet.rowinfo_map[row].outline_level == level:
-                errors_more = int(sheet.cell_value(row, 1) or 0)
-                errors_less = int(sheet.cell_value(row, 2) or 0)
-                performance = int(sheet.cell_value(row, 3) or 0)
-                if terminal not in result:
-                    result[terminal] = {}
-                terminal_data = result[terminal]
-                box_type = WAREHOUSES[sheet.cell_value(row, 0)] # warehouse
-                if box_type in terminal_data:
-                    (
-                        prev_errors_more,
-                        prev_errors_less,
-                        prev_performance
-                    ) = terminal_data[box_type]
-                    terminal_data[box_type] = (
-                        errors_more + prev_errors_more,
-                        errors_less + prev_errors_less,
-                        performance + prev_performance
-                    )
-                else:
-                    terminal_data[box_type] = (
-                        errors_more,
-                        errors_less,
-                        performance
-                    )
-            elif sheet.rowinfo_map[row].outline_level < level:
-                state = 'initial'
-
-    return day, result, errors
-
-
-def _parse_performance_book(book):
-    result = {}
-    errors = {}
-    for sheet in book.sheets():
-        day, data, sheet_errors = _parse_performance_sheet(sheet)
-        if day in result:
-            raise Exception(
-                'Неподдерживаемый формат: в файле несколько листов с датой {}.'.format(
-                    string_from_date(day)
-                )
-            )
-        result[day] = data
-        if sheet_errors:
-            errors[string_from_date(day)] = sheet_errors
-
-    return result, errors
-
-
 # Todo: deprecated? remove?
 def _get_output_difference(data):
     grid = {}
@@ -236,13 +137,10 @@ def _get_output_difference(data):
 def performance_file_report(request, pk):
     performance_file = models.PerformanceFile.objects.get(pk=pk)
 
-    book = xlrd.open_workbook(
-        file_contents=performance_file.data_file.read(),
-        formatting_info=True
+    data, errors = vkusvill.parse_performance_book(
+        performance_file.data_file.read()
     )
 
-    data, errors = _parse_performance_book(book)
-
     not_in_xls = []
     not_in_turnouts = []
 
@@ -306,46 +204,10 @@ def save_and_check_performance_file(request):
 def import_performance_file(request, pk):
     performance_file = models.PerformanceFile.objects.get(pk=pk)
 
-    book = xlrd.open_workbook(
-        file_contents=performance_file.data_file.read(),
-        formatting_info=True
+    data, errors = vkusvill.parse_performance_book(
+        performance_file.data_file.read()
     )
-
-    data, errors = _parse_performance_book(book)
-
-    turnouts = models.WorkerTurnout.objects.filter(
-        timesheet__customer__pk=VKUSVILL_PK,
-        timesheet__sheet_date__in=data.keys(),
-        turnoutservice__customer_service__service__pk=VKUSVILL_SERVICE_PK
-    ).select_related(
-        'timesheet'
-    )
-
-    for turnout in turnouts:
-        code_name = turnout.worker_code_name
-        day_data = data[turnout.timesheet.sheet_date]
-        output = day_data.get(code_name, {})
-        # Не хочется обнулять сразу всю выработку, на случай, если есть
-        # внесенные вручную данные, которых почему-то нет в xls
-        if output:
-            current_output = models.TurnoutOutput.objects.filter(
-                turnout=turnout
-            )
-            current_output.update(amount=0)
-
-        for box_type_name, values in output.items():
-            (errors_more, errors_less, performance) = values
-
-            box_type = models.BoxType.objects.get(
-                name=box_type_name,
-                customer__pk=VKUSVILL_PK
-            )
-            models.set_turnout_output(
-                turnout,
-                box_type,
-                performance,
-                errors_more + errors_less
-            )
+    vkusvill.import_performance(data, request.user)
 
     performance_file.on_import_complete()
 
@@ -528,33 +390,11 @@ def import_errors_file(request, pk):
     )
 
 
-def _code_name(turnout):
-    return turnout.worker_code_name
-
-
-def _errors(turnout):
-    return turnout.errors
-
-
-_REPORT_TYPES = [
-    ('terminals', 'Терминалы', _code_name),
-    ('performance', 'Выработка', None),
-    ('errors', 'Пересорт', _errors),
-]
-
-
-def _report_choices():
-    return [(type_id, name) for type_id, name, func in _REPORT_TYPES]
-
-
-_INFO_GETTERS = { type_id: func for type_id, name, func in _REPORT_TYPES }
-
-
 class PerformanceReportFilter(forms.DaysIntervalForm):
     report_type = CharField(
         label='Вариант отчета',
         widget=widgets.Select(
-            choices=_report_choices(),
+            choices=vkusvill.REPORT_TYPES,
             attrs={
                 'class': 'form-control form-control-sm',
                 'style': 'max-width: 140px;'
@@ -563,48 +403,31 @@ class PerformanceReportFilter(forms.DaysIntervalForm):
     )
 
 
-def _xls_performance_report(days, grid):
-    output_indices = {}
-
-    for worker, data in grid.items():
-        for output_name, cells in data.items():
-            if output_name not in output_indices:
-                output_indices[output_name] = len(output_indices)
-
+def _xls_performance_report(days, rows):
     wb = xlwt.Workbook(encoding='utf-8')
     style = xlwt.XFStyle()
 
     weekdays = ['пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс']
 
-    sheets = []
-    for k, v in output_indices.items():
-        if k is None:
-            name = 'Sheet'
-        else:
-            name = k
-        ws = wb.add_sheet(name, cell_overwrite_ok=True)
-        ws.col(0).width = 10000
-        col_num = 1
-        for day in days:
-            ws.write(0, col_num, day.strftime('%d.%m'), style)
-            ws.write(1, col_num, weekdays[day.weekday()], style)
-            col_num += 1
-        sheets.append(ws)
-
-    row_nums = [2 for i in range(len(sheets))]
-
-    for worker, data in grid.items():
-        for output_name, cells in data.items():
-            sheet_index = output_indices[output_name]
-            sheet = sheets[sheet_index]
-            col_num = 0
-            sheet.write(row_nums[sheet_index], col_num, str(worker), style)
-            col_num += 1
-            for cell in cells:
-                if cell is not None:
-                    sheet.write(row_nums[sheet_index], col_num, cell, style)
-                col_num += 1
-            row_nums[sheet_index] += 1
+    sheets = {}
+    row_nums = {}
+    for worker, output_name, cells in rows:
+        if output_name not in sheets:
+            ws = wb.add_sheet(output_name or 'Sheet', cell_overwrite_ok=True)
+            ws.col(0).width = 10000
+            for col_num, day in enumerate(days, 1):
+                ws.write(0, col_num, day.strftime('%d.%m'), style)
+                ws.write(1, col_num, weekdays[day.weekday()], style)
+            sheets[output_name] = ws
+            row_nums[output_name] = 2
+
+        sheet = sheets[output_name]
+        row_num = row_nums[output_name]
+        sheet.write(row_num, 0, str(worker), style)
+        for col_num, cell in enumerate(cells, 1):
+            if cell is not None:
+                sheet.write(row_num, col_num, cell, style)
+        row_nums[output_name] += 1
 
     response = HttpResponse(content_type='application/vnd.ms-excel')
     response[
@@ -621,62 +444,19 @@ def performance_report(request):
     days = days_from_interval(first_day, last_day)
     report_type = request.GET.get('report_type', 'terminals')
 
-    grid = {}
-
-    turnouts = models.WorkerTurnout.objects.filter(
-        timesheet__customer__pk=VKUSVILL_PK,
-        timesheet__sheet_date__gte=first_day,
-        timesheet__sheet_date__lte=last_day,
-        turnoutservice__customer_service__service__pk=VKUSVILL_SERVICE_PK,
-    ).select_related(
-        'worker',
-        'timesheet'
-    ).prefetch_related(
-        'output',
-        'output__box_type',
-    ).annotate(
-        errors=Subquery(
-            finance.models.Operation.objects.filter(
-                turnoutdeduction__turnout=OuterRef('pk'),
-                comment__icontains='Пересорт'
-            ).values(
-                'amount'
-            )
-        )
-    ).order_by(
-        'worker'
+    table, workers = vkusvill.performance_report(
+        first_day,
+        last_day,
+        days,
+        report_type
     )
-
-    func = _INFO_GETTERS[report_type]
-
-    def _add(worker, output_name, day, value):
-        if worker not in grid:
-            grid[worker] = {}
-
-        worker_data = grid[worker]
-        if output_name not in worker_data:
-            worker_data[output_name] = [None for i in range(len(days))]
-
-        day_index = (day - first_day).days
-        row = worker_data[output_name]
-        if row[day_index]:
-            row[day_index] = '{}/{}'.format(row[day_index], value)
-        else:
-            row[day_index] = value
-
-    for turnout in turnouts:
-        worker = turnout.worker
-        day = turnout.timesheet.sheet_date
-
-        if report_type == 'performance':
-            for output in turnout.output.all():
-                if output.amount != 0:
-                    _add(worker, output.box_type.name, day, output.amount)
-        else:
-            _add(worker, None, day, func(turnout))
+    rows = [
+        (workers[worker_pk], output_name, cells)
+        for (worker_pk, output_name), cells in table.items()
+    ]
 
     if request.GET.get('format') == 'xls':
-        return _xls_performance_report(days, grid)
+        return _xls_performance_report(days, rows)
 
     return render(
         request,
@@ -690,7 +470,7 @@ def performance_report(request):
                 }
             ),
             'days': days,
-            'grid': grid
+            'rows': rows
         }
     )
 
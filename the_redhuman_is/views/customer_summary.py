@@ -2,21 +2,22 @@
 
 import datetime
 
+import numpy
 import xlwt
 
 from django.urls import reverse
-from django.db.models import OuterRef
-from django.db.models import Subquery
 from django.db.models import Sum
 from django.http import HttpResponse
 from django.shortcuts import render
 
-import finance
-
 from the_redhuman_is import forms
 from the_redhuman_is import models
 
 from the_redhuman_is.models.fine_utils import deduction_accounts
+from the_redhuman_is.services.customer_summary import (
+    SummaryGrid,
+    summary_report_grid,
+)
 
 from utils.date_time import date_time_from_string
 from utils.date_time import string_from_date
@@ -49,22 +50,6 @@ CUSTOMER_FETCH_TYPES = [
 _LAYOUT_TYPES_DICT = dict(LAYOUT_TYPES)
 
 
-def _hours(turnout):
-    if turnout.hours_worked:
-        return float(turnout.hours_worked)
-    return 0.0
-
-
-def _fm_hours(turnout):
-    if turnout.hours_worked and turnout.performance:
-        return float(turnout.hours_worked * turnout.performance / 100)
-    return 0.0
-
-
-def _turnouts(turnout):
-    return 1.0
-
-
 def _money(turnout, model):
     operations = model.objects.filter(
         turnout=turnout
@@ -79,35 +64,10 @@ def _money(turnout, model):
     return 0.0
 
 
-def _customer_money(turnout):
-    return _money(turnout, models.TurnoutCustomerOperation)
-
-
-def _customer_debt_money(turnout):
-    customer = turnout.timesheet.customer
-    recs = models.Reconciliation.objects.filter(
-        customer=customer,
-        is_closed=True
-    ).order_by(
-        '-last_day'
-    )
-    if not recs.exists() or turnout.timesheet.sheet_date > recs.first().last_day:
-        return _customer_money(turnout)
-    return 0
-
-
 def _customer_fines(turnout):
     return _money(turnout, models.CustomerFine)
 
 
-def _customer_money_fines(turnout):
-    return _customer_money(turnout) - _customer_fines(turnout)
-
-
-def _worker_money(turnout):
-    return _money(turnout, models.TurnoutOperationToPay)
-
-
 def _worker_deductions(turnout):
     worker = turnout.worker
     timesheet = turnout.timesheet
@@ -128,18 +88,6 @@ def _worker_deductions(turnout):
     return worker_deductions_sum + _money(turnout, models.TurnoutDeduction)
 
 
-def _worker_money_fines(turnout):
-    return _worker_money(turnout) - _worker_deductions(turnout)
-
-
-def _margin(turnout):
-    return _customer_money(turnout) - _worker_money(turnout)
-
-
-def _margin_percentage(turnout):
-    return _worker_money(turnout), _customer_money(turnout)
-
-
 def _has_applicant(turnout):
     return hasattr(turnout.worker, 'applicant_link')
 
@@ -152,47 +100,26 @@ def _is_turnout_new_applicant(turnout):
     return turnout.is_first() and _has_applicant(turnout)
 
 
-def _new_turnouts(turnout):
-    if turnout.is_first():
-        return 1.0
-
-    return 0.0
-
-
-def _new_turnouts_natural(turnout):
-    if _is_turnout_new_natural(turnout):
-        return 1.0
-
-    return 0.0
-
-
-def _new_applicants(turnout):
-    if _is_turnout_new_applicant(turnout):
-        return 1.0
-
-    return 0.0
-
-
 _REPORT_TYPES = [
-    ('hours',                'Часы по табелю',         _hours),
-    ('fm_hours',             'Часы * пр-ность',        _fm_hours),
-    ('turnouts',             'Выходы по табелю',       _turnouts),
-    ('turnouts_ordered',     'Выходы по заявке',       None),
-    ('noderived',            'Недопоставка',           _turnouts),
-    ('unclosed_orders',      'Незакрытые заявки',      None),
-    ('customer_money',       'Стоимость услуг',        _customer_money),
-    ('customer_debt_money',  'Услуги без актов',       _customer_debt_money),
-    ('customer_fines',       'Штрафы',                 _customer_fines),
-    ('customer_money_fines', 'Услуги минус штрафы',    _customer_money_fines),
-    ('worker_money',         'Затраты на рабочих',     _worker_money),
-    ('unpayed_worker_money', 'Долг рабочим',           None),
-    ('worker_deductions',    'Вычеты рабочим',         _worker_deductions),
-    ('worker_money_fines',   'Рабочие минус вычеты',   _worker_money_fines),
-    ('margin',               'Наценка',                _margin),
-    ('margin_percentage',    'Наценка в %',            _margin_percentage),
-    ('new_turnouts',         'Новые выходы',           _new_turnouts),
-    ('new_turnouts_natural', 'Новые без подбора',      _new_turnouts_natural),
-    ('new_applicants',       'Новые от подбора',       _new_applicants),
+    ('hours',                'Часы по табелю'),
+    ('fm_hours',             'Часы * пр-ность'),
+    ('turnouts',             'Выходы по табелю'),
+    ('turnouts_ordered',     'Выходы по заявке'),
+    ('noderived',            'Недопоставка'),
+    ('unclosed_orders',      'Незакрытые заявки'),
+    ('customer_money',       'Стоимость услуг'),
+    ('customer_debt_money',  'Услуги без актов'),
+    ('customer_fines',       'Штрафы'),
+    ('customer_money_fines', 'Услуги минус штрафы'),
+    ('worker_money',         'Затраты на рабочих'),
+    ('unpayed_worker_money', 'Долг рабочим'),
+    ('worker_deductions',    'Вычеты рабочим'),
+    ('worker_money_fines',   'Рабочие минус вычеты'),
+    ('margin',               'Наценка'),
+    ('margin_percentage',    'Наценка в %'),
+    ('new_turnouts',         'Новые выходы'),
+    ('new_turnouts_natural', 'Новые без подбора'),
+    ('new_applicants',       'Новые от подбора'),
 ]
 
 SUPERUSERS_ONLY = {
@@ -209,17 +136,14 @@ SUPERUSERS_ONLY = {
 def _report_types(request):
     types = []
     for item in _REPORT_TYPES:
-        type_id, type_name, func = item
+        type_id, type_name = item
         if request.user.is_superuser or type_id not in SUPERUSERS_ONLY:
             types.append(item)
     return types
 
 
 def _report_type_choices(request):
-    return [(type_id, name) for type_id, name, func in _report_types(request)]
-
-
-_INFO_GETTERS = { type_id: func for type_id, type_name, func in _REPORT_TYPES }
+    return _report_types(request)
 
 
 # Todo: share this with other similar forms?
@@ -246,7 +170,7 @@ def _get_form_params(request):
 
     param_report_type = request.GET.get('report_type')
     report_types = _report_types(request)
-    supported_types = [type_id for type_id, type_name, func in report_types]
+    supported_types = [type_id for type_id, type_name in report_types]
     if param_report_type not in supported_types:
         param_report_type = supported_types[0]
 
@@ -325,8 +249,6 @@ def _make_xls_response(days, column_sums, data, sum_average, sum_overall):
 
 
 def report(request):
-    from the_redhuman_is.models.paysheet_v2 import _saldo
-
     (
         customer_fetch_type,
         customers,
@@ -372,55 +294,10 @@ def report(request):
         pk__in=[l['cust_location'] for l in locations_dict]
     )
 
-    workers = models.Worker.objects.filter(
-        worker_turnouts__timesheet__customerorder__in=orders
-    ).distinct(
-    ).annotate(
-        last_location=Subquery(
-            models.TimeSheet.objects.filter(
-                worker_turnouts__worker__pk=OuterRef('pk')
-            ).order_by(
-                '-sheet_date'
-            ).values('cust_location')[:1]
-        ),
-    )
-    workers_locations = {}
-
-    def _fill_workers_locations():
-        for worker in workers:
-            location = worker.last_location
-            if location not in workers_locations:
-                workers_locations[location] = []
-            workers_locations[location].append(worker)
-
     days = [
         first_day + datetime.timedelta(days=d) for d in range(0, (last_day-first_day).days + 1)
     ]
 
-    def _filter_turnouts(order):
-        try:
-            timesheet = models.TimeSheet.objects.get(customerorder=order)
-        except models.TimeSheet.DoesNotExist:
-            turnouts = models.WorkerTurnout.objects.none()
-        else:
-            turnouts = timesheet.worker_turnouts.all()
-            if report_type in ['new_turnouts', 'new_turnouts_natural', 'new_applicants']:
-                if citizenship == 'russian':
-                    turnouts = turnouts.filter(
-                        worker__citizenship__name='РФ',
-                    )
-                elif citizenship == 'not_russian':
-                    turnouts = turnouts.exclude(
-                        worker__citizenship__name='РФ',
-                    )
-        return turnouts.select_related('timesheet')
-
-    if report_type == 'margin_percentage':
-        column_sums = [(0.0, 0.0) for day in days]
-    else:
-        column_sums = [0.0 for day in days]
-    data = []
-
     def _url(location, day, shift, service):
         uri = request.build_absolute_uri(
             reverse(
@@ -437,133 +314,94 @@ def report(request):
             uri += '?service={}'.format(service.service.pk)
         return uri
 
-    def _add(t1, t2):
-        if isinstance(t1, tuple):
-            return tuple([sum(x) for x in zip(t1, t2)])
-        else:
-            return t1 + t2
+    _filling_params = {
+        'no_breakdown':      (False, False),
+        'shift':             (True, False),
+        'service':           (False, True),
+        'shift_and_service': (True, True)
+    }
 
-    turnout_value_getter = _INFO_GETTERS[report_type]
+    by_shift, by_service = _filling_params[layout_type]
 
-    def _day_value(day, location, shift, service):
-        if report_type == 'margin_percentage':
-            day_value = (0.0, 0.0)
+    def _items():
+        if by_shift:
+            shifts = ['День', 'Ночь']
         else:
-            day_value = 0.0
-        day_orders = orders.filter(
-            on_date=day,
-            cust_location=location,
-        )
-        if shift:
-            day_orders = day_orders.filter(
-                bid_turn=shift
+            shifts = [None]
+        if by_service:
+            services = models.CustomerService.objects.filter(
+                customer__in=[location.customer_id for location in locations]
+            ).select_related(
+                'service'
             )
-        for order in day_orders:
-            if report_type == 'turnouts_ordered':
-                day_value += order.number_of_workers
-            elif report_type == 'unclosed_orders':
-                if not models.TimeSheet.objects.filter(customerorder=order).exists():
-                    day_value += order.number_of_workers
-            elif report_type == 'unpayed_worker_money':
-                if not workers_locations:
-                    _fill_workers_locations()
-                ws = workers_locations.get(location.pk, [])
-                debit_operations = finance.models.Operation.objects.filter(
-                    paysheet_entry_operation__isnull=True,
-                    paysheet_v2_operation__isnull=True,
-                    timepoint__date=day,
-                    debet__worker_account__worker__in=ws,
-                )
-                credit_operations = finance.models.Operation.objects.filter(
-                    paysheet_entry_operation__isnull=True,
-                    paysheet_v2_operation__isnull=True,
-                    timepoint__date=day,
-                    credit__worker_account__worker__in=ws,
-                )
-                return float(_saldo(debit_operations, credit_operations))
+        for location in locations:
+            if by_service:
+                location_services = [
+                    service for service in services
+                    if service.customer_id == location.customer_id
+                ]
             else:
-                turnouts = _filter_turnouts(order)
-                if service:
-                    turnouts = turnouts.filter(
-                        turnoutservice__customer_service=service
-                    ).distinct()
-                for turnout in turnouts:
-                    day_value = _add(day_value, turnout_value_getter(turnout))
-            if report_type == 'noderived':
-                day_value -= order.number_of_workers
-        if report_type == 'noderived':
-            day_value = max(0, -day_value)
-
-        return day_value
-
-    def _do_fill_data(items):
-        for location, shift, service in items:
-            row_name = '{} {}'.format(
-                location.customer_id,
-                location.location_name,
+                location_services = [None]
+            for service in location_services:
+                for shift in shifts:
+                    yield location, shift, service
+
+    items = list(_items())
+    summary_grid = SummaryGrid(
+        [
+            (location.pk, shift, service.pk if service else None)
+            for location, shift, service in items
+        ],
+        days,
+        by_shift,
+        by_service
+    )
+    grid = summary_report_grid(orders, summary_grid, report_type, citizenship)
+
+    if report_type == 'margin_percentage':
+        worker_grid, customer_grid = grid
+        column_sums = list(
+            zip(
+                worker_grid.sum(axis=0).tolist(),
+                customer_grid.sum(axis=0).tolist()
             )
-            if service:
-                row_name += ' - {}'.format(service.service.name)
-            if shift:
-                row_name += ' - {}'.format(shift)
+        )
+        grid = numpy.dstack((worker_grid, customer_grid))
+    else:
+        column_sums = grid.sum(axis=0).tolist()
+
+    data = []
+    for row_index, (location, shift, service) in enumerate(items):
+        row_name = '{} {}'.format(
+            location.customer_id,
+            location.location_name,
+        )
+        if service:
+            row_name += ' - {}'.format(service.service.name)
+        if shift:
+            row_name += ' - {}'.format(shift)
 
+        row = []
+        for day_index, day in enumerate(days):
             if report_type == 'margin_percentage':
-                row_sum = (0.0, 0.0)
+                day_value = tuple(grid[row_index, day_index].tolist())
             else:
-                row_sum = 0.0
-            row = []
-            for i in range(len(days)):
-                day = days[i]
-                day_value = _day_value(
-                    day,
-                    location,
-                    shift,
-                    service
-                )
-
-                row_sum = _add(row_sum, day_value)
-                column_sums[i] = _add(column_sums[i], day_value)
+                day_value = grid[row_index, day_index].item()
                 if day_value == 0:
                     day_value = ''
-                row.append(
-                    (day_value, _url(location, day, shift, service))
-                )
-
-            if report_type == 'margin_percentage':
-                data.append((location, row_name, row, row_sum))
-            else:
-                data.append((location, row_name, row, row_sum / len(days), row_sum))
-
-    def _fill_data(shift, service):
-        def _items(shift, service):
-            if shift:
-                shifts = ['День', 'Ночь']
-            else:
-                shifts = [None]
-            for location in locations:
-                if service:
-                    services = list(
-                        models.CustomerService.objects.filter(
-                            customer=location.customer_id
-                        )
-                    )
-                else:
-                    services = [None]
-                for service in services:
-                    for shift in shifts:
-                        yield location, shift, service
-
-        _do_fill_data(_items(shift, service))
+            row.append(
+                (day_value, _url(location, day, shift, service))
+            )
 
-    _filling_params = {
-        'no_breakdown':      (False, False),
-        'shift':             (True, False),
-        'service':           (False, True),
-        'shift_and_service': (True, True)
-    }
+        if report_type == 'margin_percentage':
+            row_sum = tuple(grid[row_index].sum(axis=0).tolist())
+            data.append((location, row_name, row, row_sum))
+        else:
+            row_sum = grid[row_index].sum().item()
+            data.append((location, row_name, row, row_sum / len(days), row_sum))
 
-    shift, service = _filling_params[layout_type]
-    _fill_data(shift, service)
+    def _add(t1, t2):
+        return tuple([sum(x) for x in zip(t1, t2)])
 
     def _percentage(value):
         worker, customer = value
@@ -22,8 +22,6 @@ import openpyxl.writer.excel
 from functools import reduce
 from operator import add
 
-from zipfile import ZipFile
-
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import (
     Field,
@@ -106,7 +104,12 @@ from dal.autocomplete import Select2QuerySetView
 
 from urllib.parse import quote
 
-from doc_templates.http_responses import xlsx_content_response
+from doc_templates.http_responses import (
+    workbook_temporary_file,
+    xlsx_content_response,
+    xlsx_streaming_response,
+    zip_streaming_response,
+)
 
 from the_redhuman_is import forms
 from the_redhuman_is import models
@@ -154,6 +157,7 @@ from the_redhuman_is.services.delivery import (
     tariffs,
     utils,
 )
+from the_redhuman_is.services.delivery.summary import refresh_request_summaries
 from the_redhuman_is.services.delivery_requests import (
     update_fcm_token,
     update_import_processed_timestamp,
@@ -963,6 +967,10 @@ def _do_import_requests(user, customer, wb, ws, merge=True):
         if delivery_request:
             tariffs.try_to_update_tariff(delivery_request, user)
 
+    # The address normalization may skip the items, the counters are
+    # refreshed here in any case
+    refresh_request_summaries(set(items_to_normalize) | set(routes_to_check))
+
     error_count = 0
 
     source_column_count = parser.source_column_count
@@ -1256,6 +1264,10 @@ def _write_interval_req_row(
     return current_row
 
 
+# Rows fetched per round trip by the server-side cursors of the reports
+REPORT_ITERATOR_CHUNK_SIZE = 200
+
+
 def _fill_details_caption(ws):
     captions = [
         ('Дата', 12),
@@ -1295,7 +1307,8 @@ def _get_day_report_queryset(day, customer_id, location_id):
         status__in=DeliveryRequest.SUCCESS_STATUSES,
         customer=customer_id,
         location=location_id
-    ).with_items_count(
+    ).with_summary(
+        'items_count'
     ).annotate(
         item_data=Subquery(
             DeliveryItem.objects.filter(
@@ -1376,7 +1389,7 @@ def _fill_details_sheet(ws, day, customer_id, location_id):
 
     current_row = 2
 
-    for request in requests:
+    for request in requests.iterator(chunk_size=REPORT_ITERATOR_CHUNK_SIZE):
         worked_hours = sum(worker['hours'] for worker in request['workers'])
         amount = sum(worker['amount'] for worker in request['workers'])
         current_row = _write_interval_req_row(
@@ -1501,7 +1514,7 @@ def _fill_total_sheet(ws, day, workers, hours, amount):
     ws.append(signature_labels)
 
 
-def _add_images_to_zip(zip_file, day, customer_id):
+def _timesheet_images(day, customer_id):
     # alternatively, _fill_details_sheet could be refactored to return timesheet pks
 
     turnout_sq = RequestWorkerTurnout.objects.filter(
@@ -1537,19 +1550,17 @@ def _add_images_to_zip(zip_file, day, customer_id):
     ).order_by(
         'pk'
     )
-    for timesheet in timesheets:
+    storage = Photo.image.field.storage
+    for timesheet in timesheets.iterator(chunk_size=REPORT_ITERATOR_CHUNK_SIZE):
         _, ext = os.path.splitext(timesheet['photo_url'])
-        with open(
-                Photo.image.field.storage.path(timesheet['photo_url']),
-                'rb'
-        ) as image_contents:
-            zip_file.writestr(
+        with storage.open(timesheet['photo_url'], 'rb') as image_contents:
+            yield (
                 '{}{}'.format(timesheet['pk'], jpeg_to_jpg(ext)),
-                image_contents.read()
+                image_contents
             )
 
 
-def _day_report(day, customer_id, location_id):
+def _day_report_files(day, customer_id, location_id):
     wb = openpyxl.Workbook(write_only=True)
     workers, hours, amount = _fill_details_sheet(
         wb.create_sheet(),
@@ -1559,24 +1570,19 @@ def _day_report(day, customer_id, location_id):
     )
     _fill_total_sheet(wb.create_sheet(), day, workers, hours, amount)
 
-    # Todo: move to some utils?
-    proxy_file = io.BytesIO()
-    with ZipFile(proxy_file, "w") as zip_file:
-        zip_file.writestr(
-            'report_{}.xlsx'.format(string_from_date(day)),
-            openpyxl.writer.excel.save_virtual_workbook(wb)
-        )
-        _add_images_to_zip(zip_file, day, customer_id)
+    with workbook_temporary_file(wb) as workbook_file:
+        yield 'report_{}.xlsx'.format(string_from_date(day)), workbook_file
 
-    response = HttpResponse(content_type='application/zip')
-    response[
-        'Content-Disposition'
-    ] = "attachment; filename*=UTF-8''{}".format(
+    yield from _timesheet_images(day, customer_id)
+
+
+def _day_report(day, customer_id, location_id):
+    # The archive is written while it is being sent: the workbook rows
+    # and the photos are never held in memory all together.
+    return zip_streaming_response(
+        _day_report_files(day, customer_id, location_id),
         'day_report_{}.zip'.format(string_from_date(day))
     )
-    response.write(proxy_file.getvalue())
-
-    return response
 
 
 def _fill_interval_titles(ws, current_row, first_day, last_day):
@@ -1672,7 +1678,10 @@ def _fill_interval_sheet(ws, request_qs, first_day, last_day):
     # Sheet parameters such as column width and row height need to be set before any cell data.
     # Setting sheet parameters after WriteOnlyWorksheet.append has been called has no effect.
     current_row = 5
-    for day, day_requests in itertools.groupby(request_qs, key=operator.itemgetter('date')):
+    for day, day_requests in itertools.groupby(
+            request_qs.iterator(chunk_size=REPORT_ITERATOR_CHUNK_SIZE),
+            key=operator.itemgetter('date')
+    ):
         for _ in range(sum(
                 lcm(len(request['items']), len(request['workers']))
                 for request in day_requests
@@ -1689,7 +1698,10 @@ def _fill_interval_sheet(ws, request_qs, first_day, last_day):
     total_hours = 0
     total_amount = 0
 
-    for day, day_requests in itertools.groupby(request_qs, key=operator.itemgetter('date')):
+    for day, day_requests in itertools.groupby(
+            request_qs.iterator(chunk_size=REPORT_ITERATOR_CHUNK_SIZE),
+            key=operator.itemgetter('date')
+    ):
         day_workers = 0
         day_hours = 0
         day_amount = 0
@@ -1905,8 +1917,9 @@ def _get_interval_report_queryset(first_day, last_day, customer_id, location_id)
     if location_id is not None:
         request_qs = request_qs.filter(location=location_id)
 
-    return request_qs.with_confirmed_timepoint(
-    ).with_items_count(
+    return request_qs.with_summary(
+        'confirmed_timepoint',
+        'items_count'
     ).with_items_for_customer(
         item_field_names=[
             'code',
@@ -1982,7 +1995,7 @@ def interval_report_response(first_day, last_day, customer, location):
 
     _fill_interval_sheet(ws, request_qs, first_day, last_day)
 
-    return xlsx_content_response(
+    return xlsx_streaming_response(
         wb,
         '{}_{}_{}-{}.xlsx'.format(
             customer.cust_name,
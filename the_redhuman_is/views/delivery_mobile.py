@@ -1,5 +1,7 @@
+from contextlib import contextmanager
 from typing import cast
 
+from django.db import transaction
 from django.http import (
     HttpResponse,
     JsonResponse,
@@ -9,8 +11,10 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.fields import (
     BooleanField,
     CharField,
+    FileField,
     ImageField,
     IntegerField,
+    UUIDField,
 )
 
 from rest_framework.serializers import Serializer
@@ -23,6 +27,11 @@ from the_redhuman_is.services.delivery.actions import (
     SuspiciousLocation,
     WorkerPermissionDenied,
 )
+from the_redhuman_is.services import photo_ingestion
+from the_redhuman_is.services.photo_ingestion import (
+    PhotoUploadError,
+    UploadOffsetMismatch,
+)
 from the_redhuman_is.services.poll import try_register_answer
 from the_redhuman_is.views.delivery import mobile_api
 
@@ -82,27 +91,126 @@ def confirm_request_worker(request):
     )
 
 
+class PhotoUploadStartSerializer(Serializer):
+    size = IntegerField(min_value=1)
+    sha256 = CharField(min_length=64, max_length=64, required=False, source='content_hash')
+
+
+class PhotoUploadSerializer(Serializer):
+    upload = UUIDField(source='upload_id')
+
+
+class PhotoUploadChunkSerializer(PhotoUploadSerializer):
+    offset = IntegerField(min_value=0)
+    chunk = FileField(allow_empty_file=False)
+
+
+def _upload_response(upload_id, offset):
+    return JsonResponse({'upload': upload_id, 'offset': offset})
+
+
+@mobile_api
+def photo_upload_start(request):
+    serializer = PhotoUploadStartSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        upload = photo_ingestion.start_upload(
+            request.user,
+            **serializer.validated_data
+        )
+    except PhotoUploadError as exc:
+        raise ValidationError(detail={'error': exc.args[0]})
+    return _upload_response(upload.pk, photo_ingestion.upload_offset(upload))
+
+
+@mobile_api
+def photo_upload_status(request):
+    serializer = PhotoUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        upload = photo_ingestion.get_upload(
+            serializer.validated_data['upload_id'],
+            request.user
+        )
+    except PhotoUploadError as exc:
+        raise ValidationError(detail={'error': exc.args[0]})
+    return _upload_response(upload.pk, photo_ingestion.upload_offset(upload))
+
+
+@mobile_api
+def photo_upload_chunk(request):
+    serializer = PhotoUploadChunkSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    upload_id = serializer.validated_data['upload_id']
+    try:
+        offset = photo_ingestion.append_chunk(
+            upload_id,
+            request.user,
+            serializer.validated_data['offset'],
+            serializer.validated_data['chunk'],
+        )
+    except UploadOffsetMismatch as exc:
+        return JsonResponse(
+            {
+                'error': exc.args[0],
+                'upload': upload_id,
+                'offset': exc.offset,
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+    except PhotoUploadError as exc:
+        raise ValidationError(detail={'error': exc.args[0]})
+    return _upload_response(upload_id, offset)
+
+
 class ItemStartFinishSerializer(RequestSerializer):
     item = IntegerField(min_value=0, source='item_id')
-    image = ImageField()
+    # An image or a complete chunked upload (see photo_upload_start)
+    image = ImageField(required=False)
+    upload = UUIDField(required=False, source='upload_id')
+
+    def validate(self, data):
+        if 'image' not in data and 'upload_id' not in data:
+            raise ValidationError({'image': 'Нужно изображение или загрузка.'})
+        return data
 
 
 class ItemStartSerializer(ItemStartFinishSerializer):
     force_commit = BooleanField(default=True)
 
 
+@contextmanager
+def _item_image(request, validated_data):
+    """
+    Replaces the upload with its image while the action runs, the upload
+    is deleted after the commit.
+    """
+    upload_id = validated_data.pop('upload_id', None)
+    if upload_id is None:
+        yield
+        return
+    try:
+        with photo_ingestion.upload_image(upload_id, request.user) as image:
+            validated_data['image'] = image
+            yield
+    except PhotoUploadError as exc:
+        raise ValidationError(detail={'error': exc.args[0]})
+    transaction.on_commit(lambda: photo_ingestion.delete_upload(upload_id))
+
+
 @mobile_api
 def item_worker_start(request):
     worker_id = cast(int, request.user.workeruser.worker_id)
     serializer = ItemStartSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     try:
-        actions.log_itemworker_start(
-            user=request.user,
-            worker_id=worker_id,
-            location=request.location,
-            **serializer.validated_data
-        )
+        with _item_image(request, serializer.validated_data):
+            actions.log_itemworker_start(
+                user=request.user,
+                worker_id=worker_id,
+                location=request.location,
+                **serializer.validated_data
+            )
     except SuspiciousLocation as exc:
         raise ValidationError(
             detail={
@@ -125,12 +233,13 @@ def item_worker_finish(request):
     worker_id = cast(int, request.user.workeruser.worker_id)
     serializer = ItemStartFinishSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    actions.log_itemworker_finish(
-        user=request.user,
-        worker_id=worker_id,
-        location=request.location,
-        **serializer.validated_data
-    )
+    with _item_image(request, serializer.validated_data):
+        actions.log_itemworker_finish(
+            user=request.user,
+            worker_id=worker_id,
+            location=request.location,
+            **serializer.validated_data
+        )
     request_id = serializer.validated_data['request_id']
     return JsonResponse(
         retrieve.get_delivery_request_detail_for_worker(
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.shortcuts import render
 
@@ -19,6 +20,10 @@ from finance.model_utils import get_root_account
 from the_redhuman_is import forms
 from the_redhuman_is import models
 
+from the_redhuman_is.services.finance.common import IntervalSaldos
+from the_redhuman_is.services.finance.efficiency import EfficiencyTotals
+from the_redhuman_is.services.finance.period_closure import is_interval_closed
+
 from the_redhuman_is.views.utils import get_first_last_day
 
 from the_redhuman_is.views.operating_account import _describe_operation
@@ -27,15 +32,7 @@ from the_redhuman_is.views.operating_account import _order
 from utils.date_time import string_from_date
 
 
-def _interval_saldo(accounts, first_day, last_day):
-    if isinstance(accounts, list):
-        return sum([_interval_saldo(a, first_day, last_day) for a in accounts])
-
-    return accounts.interval_saldo(
-        first_day,
-        last_day,
-        exclude={'sheet_close_operation__isnull': False}
-    )
+_INTERVAL_SALDO_EXCLUDE = {'sheet_close_operation__isnull': False}
 
 
 def _print_strange_operations(operations, first_day, last_day):
@@ -175,76 +172,104 @@ def split_customer(customer, first_day, last_day):
         yield customer, entity, max(first_day, entity.first_day), entity_last_day
 
 
-def collect_customer_info(customer, first_day, last_day):
-    hours_worked = models.WorkerTurnout.objects.filter(
-        timesheet__customer=customer,
-        timesheet__sheet_date__range=(
-            first_day,
-            last_day
-        )
-    ).aggregate(
-        s=Sum('hours_worked')
-    )['s'] or 0
+class _Result(object):
+    pass
 
-    customer_amount = finance.models.amount_sum(
-        finance.models.Operation.objects.filter(
-            turnoutcustomeroperation__turnout__timesheet__customer=customer,
-            turnoutcustomeroperation__turnout__timesheet__sheet_date__range=(
-                first_day,
-                last_day
-            )
-        )
-    )
 
-    deductions = finance.models.amount_sum(
-        finance.models.Operation.objects.filter(
-            turnoutdeduction__turnout__timesheet__customer=customer,
-            turnoutdeduction__turnout__timesheet__sheet_date__range=(
-                first_day,
-                last_day
-            )
-        )
-    )
+def _efficiency(profit, revenue):
+    if revenue > 0:
+        return 100 * profit / revenue
+    else:
+        return 0
 
-    fines = finance.models.amount_sum(
-        finance.models.Operation.objects.filter(
-            customerfine__turnout__timesheet__customer=customer,
-            customerfine__turnout__timesheet__sheet_date__range=(
-                first_day,
-                last_day
-            )
-        )
-    )
 
-    return hours_worked, customer_amount, deductions, fines
+# Closed periods can't change, so their reports are computed only once
+_CLOSED_PERIOD_REPORT_TIMEOUT = 60 * 60 * 24 * 30
 
 
-def efficiency_report(request):
-    first_day, last_day = get_first_last_day(request)
+def _efficiency_report_cache_key(first_day, last_day):
+    return 'efficiency_report:{}:{}'.format(
+        first_day.isoformat(),
+        last_day.isoformat()
+    )
 
+
+def _efficiency_report_data(first_day, last_day):
     customers = models.Customer.objects.filter(
         timesheets__sheet_date__range=(first_day, last_day)
     ).distinct(
     ).order_by(
         'cust_name'
+    ).select_related(
+        'customer_accounts__account_20_root'
     )
 
+    customer_pks = [customer.pk for customer in customers]
+
     split_customers = []
     for customer in customers:
         for c, e, f, l in split_customer(customer, first_day, last_day):
             split_customers.append((c, e, f, l))
 
+    industrial = {}
+    for accounts in models.CustomerIndustrialAccounts.objects.filter(
+                customer__in=customer_pks
+            ).select_related(
+                'account_20',
+                'cost_type',
+            ):
+        industrial.setdefault(accounts.customer_id, []).append(accounts)
+
+    services = {}
+    for service in models.CustomerService.objects.filter(
+                customer__in=customer_pks
+            ).select_related(
+                'service',
+                'account_20_general_work',
+                'account_20_general_taxes',
+                'account_20_selfemployed_work',
+                'account_20_selfemployed_taxes',
+            ):
+        services.setdefault(service.customer_id, []).append(service)
+
+    root_10 = get_root_account('10')
+    root_20 = get_root_account('20')
+    root_26 = get_root_account('26')
+
+    # Все сальдо на интервалах считаются за один проход
+    saldo_requests = [
+        (root_10, first_day, last_day),
+        (root_20, first_day, last_day),
+        (root_26, first_day, last_day),
+    ]
+    for customer, entity, interval_first_day, interval_last_day in split_customers:
+        interval_accounts = [customer.customer_accounts.account_20_root]
+        interval_accounts.extend(
+            accounts.account_20 for accounts in industrial.get(customer.pk, [])
+        )
+        for service in services.get(customer.pk, []):
+            interval_accounts.extend([
+                service.account_20_general_work,
+                service.account_20_general_taxes,
+                service.account_20_selfemployed_work,
+                service.account_20_selfemployed_taxes,
+            ])
+        saldo_requests.extend(
+            (account, interval_first_day, interval_last_day)
+            for account in interval_accounts
+        )
+    saldos = IntervalSaldos(saldo_requests, exclude=_INTERVAL_SALDO_EXCLUDE)
+
+    totals = EfficiencyTotals(first_day, last_day)
+
     # Группируем некоторые субсчета счетов 20/клиент/*
     account_20_industrial = {}
     for customer, entity, interval_first_day, interval_last_day in split_customers:
         customer_interval = (customer, interval_first_day, interval_last_day)
         account_20_industrial[customer_interval] = {}
-        industrial = models.CustomerIndustrialAccounts.objects.filter(
-            customer=customer
-        )
-        for accounts in industrial:
+        for accounts in industrial.get(customer.pk, []):
             account = accounts.account_20
-            saldo = _interval_saldo(account, interval_first_day, interval_last_day)
+            saldo = saldos.get(account, interval_first_day, interval_last_day)
             if saldo != 0 or hasattr(account, 'account_20_foremans'):
                 account_20_industrial[customer_interval][accounts.cost_type.name] = (
                     account.pk,
@@ -260,21 +285,12 @@ def efficiency_report(request):
 
     account_20_industrial_titles.sort()
 
-    def _efficiency(profit, revenue):
-        if revenue > 0:
-            return 100 * profit / revenue
-        else:
-            return 0
-
     vat_total = 0
 
-    class Result(object):
-        pass
-
     results = []
 
     for customer, legal_entity, interval_first_day, interval_last_day in split_customers:
-        result = Result()
+        result = _Result()
         results.append(result)
 
         result.first_day = interval_first_day
@@ -282,7 +298,7 @@ def efficiency_report(request):
 
         result.customer = customer
 
-        hours_worked, customer_amount, deductions, fines = collect_customer_info(
+        hours_worked, customer_amount, deductions, fines = totals.customer_info(
             customer,
             interval_first_day,
             interval_last_day
@@ -310,7 +326,7 @@ def efficiency_report(request):
         accounts = customer.customer_accounts
 
         account_20 = accounts.account_20_root
-        production_costs = _interval_saldo(account_20, interval_first_day, interval_last_day)
+        production_costs = saldos.get(account_20, interval_first_day, interval_last_day)
         result.costs = production_costs + result.fines
         if count_vat:
             result.costs += result.vat_amount
@@ -332,66 +348,32 @@ def efficiency_report(request):
         )
 
         result.services = []
-        services = models.CustomerService.objects.filter(
-            customer=customer
-        )
 
         result.profit = round(result.profit, 2)
 
-        for service in services:
-            service_hours_general = models.TurnoutService.objects.filter(
-                customer_service=service,
-                turnout__timesheet__customer=customer,
-                turnout__timesheet__sheet_date__range=(interval_first_day, interval_last_day),
-            ).distinct(
-            ).exclude(
-                turnout__turnoutoperationtopay__operation__debet__account_20_selfemployed_work_service__isnull=False
-            ).aggregate(
-                s=Sum('turnout__hours_worked')
-            )['s'] or 0
-            service_hours_selfemployed = models.TurnoutService.objects.filter(
-                customer_service=service,
-                turnout__timesheet__customer=customer,
-                turnout__timesheet__sheet_date__range=(interval_first_day, interval_last_day),
-                turnout__turnoutoperationtopay__operation__debet__account_20_selfemployed_work_service__isnull=False
-            ).distinct(
-            ).aggregate(
-                s=Sum('turnout__hours_worked')
-            )['s'] or 0
-            if service_hours_general == 0 and service_hours_selfemployed == 0:
-                continue
-
-            service_amount_general = finance.models.amount_sum(
-                finance.models.Operation.objects.filter(
-                    turnoutcustomeroperation__turnout__timesheet__customer=customer,
-                    turnoutcustomeroperation__turnout__timesheet__sheet_date__range=(
-                        interval_first_day,
-                        interval_last_day
-                    ),
-                    turnoutcustomeroperation__turnout__turnoutservice__customer_service=service,
-                ).exclude(
-                    turnoutcustomeroperation__turnout__turnoutoperationtopay__operation__debet__account_20_selfemployed_work_service__isnull=False,
-                ).distinct()
+        for service in services.get(customer.pk, []):
+            service_hours_general, service_amount_general = totals.service_info(
+                service,
+                False,
+                interval_first_day,
+                interval_last_day
             )
-            service_amount_selfemployed = finance.models.amount_sum(
-                finance.models.Operation.objects.filter(
-                    turnoutcustomeroperation__turnout__timesheet__customer=customer,
-                    turnoutcustomeroperation__turnout__timesheet__sheet_date__range=(
-                        interval_first_day,
-                        interval_last_day
-                    ),
-                    turnoutcustomeroperation__turnout__turnoutservice__customer_service=service,
-                    turnoutcustomeroperation__turnout__turnoutoperationtopay__operation__debet__account_20_selfemployed_work_service__isnull=False,
-                ).distinct()
+            service_hours_selfemployed, service_amount_selfemployed = totals.service_info(
+                service,
+                True,
+                interval_first_day,
+                interval_last_day
             )
+            if service_hours_general == 0 and service_hours_selfemployed == 0:
+                continue
 
-            service_costs_general = _interval_saldo(
+            service_costs_general = saldos.get(
                 [service.account_20_general_work, service.account_20_general_taxes],
                 interval_first_day,
                 interval_last_day
             )
 
-            service_costs_selfemployed = _interval_saldo(
+            service_costs_selfemployed = saldos.get(
                 [service.account_20_selfemployed_work, service.account_20_selfemployed_taxes],
                 interval_first_day,
                 interval_last_day
@@ -490,13 +472,9 @@ def efficiency_report(request):
         _fines(first_day, last_day)
     )
 
-    root_10 = get_root_account('10')
-    root_20 = get_root_account('20')
-    root_26 = get_root_account('26')
-
-    costs_10 = _interval_saldo(root_10, first_day, last_day)
-    costs_20 = abs(_interval_saldo(root_20, first_day, last_day))
-    costs_26 = abs(_interval_saldo(root_26, first_day, last_day))
+    costs_10 = saldos.get(root_10, first_day, last_day)
+    costs_20 = abs(saldos.get(root_20, first_day, last_day))
+    costs_26 = abs(saldos.get(root_26, first_day, last_day))
 
     costs = sum([
         vat_total,
@@ -514,41 +492,58 @@ def efficiency_report(request):
     efficiency = _efficiency(profit, revenue)
     efficiency_wo_vat = _efficiency(profit, revenue - vat_total)
 
+    return {
+        'first_day': first_day,
+        'last_day': last_day,
+        'costs_20_titles': titles,
+        'results': results,
+
+        'total_hours': total_hours,
+        'revenue': round(revenue, 2),
+        'turnout_deductions': turnout_deductions,
+        'worker_deductions': worker_deductions,
+
+        'costs': round(costs, 2),
+        'vat_total': round(vat_total, 2),
+        'fines': fines,
+        'costs_10': costs_10,
+        'costs_20': costs_20,
+        'raw_20_bonus': raw_20_bonus,
+        'costs_26': costs_26,
+
+        'account_10': root_10.pk,
+        'account_20': root_20.pk,
+        'account_26': root_26.pk,
+
+        'profit': round(profit, 2),
+        'efficiency': efficiency,
+        'efficiency_wo_vat': efficiency_wo_vat,
+    }
+
+
+def efficiency_report(request):
+    first_day, last_day = get_first_last_day(request)
+
+    if is_interval_closed(first_day, last_day):
+        key = _efficiency_report_cache_key(first_day, last_day)
+        data = cache.get(key)
+        if data is None:
+            data = _efficiency_report_data(first_day, last_day)
+            cache.set(key, data, _CLOSED_PERIOD_REPORT_TIMEOUT)
+    else:
+        data = _efficiency_report_data(first_day, last_day)
+
     return render(
         request,
         'the_redhuman_is/reports/efficiency.html',
         {
-            'first_day': first_day,
-            'last_day': last_day,
             'interval_form': forms.DaysIntervalForm(
                 initial={
                     'first_day': first_day,
                     'last_day': last_day
                 }
             ),
-            'costs_20_titles': titles,
-            'results': results,
-
-            'total_hours': total_hours,
-            'revenue': round(revenue, 2),
-            'turnout_deductions': turnout_deductions,
-            'worker_deductions': worker_deductions,
-
-            'costs': round(costs, 2),
-            'vat_total': round(vat_total, 2),
-            'fines': fines,
-            'costs_10': costs_10,
-            'costs_20': costs_20,
-            'raw_20_bonus': raw_20_bonus,
-            'costs_26': costs_26,
-
-            'account_10': root_10.pk,
-            'account_20': root_20.pk,
-            'account_26': root_26.pk,
-
-            'profit': round(profit, 2),
-            'efficiency': efficiency,
-            'efficiency_wo_vat': efficiency_wo_vat,
+            **data
         }
     )
 
@@ -23,8 +23,10 @@ from the_redhuman_is.auth import IsCustomer
 from the_redhuman_is.models.delivery import DeliveryRequest
 from the_redhuman_is.models.models import get_user_location
 from the_redhuman_is.models.reconciliation import Reconciliation
+from the_redhuman_is.models.search import search_delivery_requests
 from the_redhuman_is.services.delivery import (
     actions,
+    map_snapshot,
     retrieve,
 )
 from the_redhuman_is.services.delivery.utils import (
@@ -306,7 +308,7 @@ def update_item(request):
     )
 
 
-class LocationSerializer(Serializer):
+class LocationSerializer(map_snapshot.MapQuerySerializer):
     location = IntegerField(min_value=1, source='location_id', allow_null=True, default=None)
 
 
@@ -315,7 +317,7 @@ def requests_on_map(request):
     serializer = LocationSerializer(data=request.GET)
     serializer.is_valid(raise_exception=True)
     return JsonResponse(
-        retrieve.get_requests_on_map(
+        map_snapshot.get_map_data(
             date=timezone.localdate(),
             user=request.user,
             **serializer.validated_data
@@ -343,14 +345,15 @@ class MapRequestAutocomplete(Select2QuerySetView, APIView):
             delivery_requests = delivery_requests.filter(is_worker_assignment_delayed=True)
 
         if self.q:
-            delivery_requests = delivery_requests.filter_by_text(
+            delivery_requests = search_delivery_requests(
+                delivery_requests,
                 self.q,
                 mode='customer_autocomplete'
             )
+        else:
+            delivery_requests = delivery_requests.order_by('pk')
 
-        return delivery_requests.order_by(
-            'pk',
-        ).values(
+        return delivery_requests.values(
             'pk',
             'driver_name',
             'items',
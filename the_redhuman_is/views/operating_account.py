@@ -5,14 +5,10 @@ import re
 
 from django.urls import reverse
 
-from django.db.models import Case
+from django.db.models import Exists
 from django.db.models import OuterRef
 from django.db.models import Q
-from django.db.models import SmallIntegerField
-from django.db.models import Subquery
 from django.db.models import Sum
-from django.db.models import Value
-from django.db.models import When
 
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
@@ -23,6 +19,8 @@ from django.utils.timezone import localdate
 
 import finance
 
+from finance import ledger
+
 from import1c.models import unimported_operations_count
 
 from ..auth import staff_account_required
@@ -85,13 +83,13 @@ def cache_clear(request):
     return redirect('the_redhuman_is:operating_account_tree')
 
 
-def _describe_account(account):
+def _describe_account(account, saldo):
     return {
         'name': account.name,
         'fullname': account.full_name,
-        'saldo': float(account.turnover_saldo()),
+        'saldo': float(saldo),
         'account_pk': account.id,
-        'has_child': account.children.count() != 0
+        'has_child': account.has_children
     }
 
 
@@ -110,7 +108,20 @@ def tree_json(request, pk):
             closed=False
         ).order_by('name')
 
-    children = [_describe_account(account) for account in accounts]
+    accounts = list(
+        accounts.annotate(
+            has_children=Exists(
+                finance.models.Account.objects.filter(
+                    parent=OuterRef('pk')
+                )
+            )
+        )
+    )
+    saldos = finance.models.turnover_saldos(accounts)
+    children = [
+        _describe_account(account, saldos[account.pk])
+        for account in accounts
+    ]
 
     return JsonResponse(
         {
@@ -274,38 +285,18 @@ def detail_json(request, pk):
     )
 
     first_day, last_day = get_first_last_day(request, set_initial=False)
-    debit_operations, credit_operations = _account_operations(
-        account,
+    all_ops = ledger.account_operations(
+        ledger.subtree_account_ids(account),
         first_day,
-        last_day,
-        search_text
+        last_day
     )
+    if search_text:
+        all_ops = ledger.search_operations(all_ops, search_text)
 
-    all_ops_related_fields = ['debet', 'credit']
-    # join parent accounts all the way down
-    # looks crazy but drastically reduce number of queries
-    for x in range(5):
-        all_ops_related_fields.append('debet' + '__parent' * (x + 1))
-        all_ops_related_fields.append('credit' + '__parent' * (x + 1))
-
-    all_ops = (debit_operations | credit_operations).select_related(
-        *all_ops_related_fields
-    ).annotate(
-        direction=Case(
-            When(pk__in=debit_operations, then=Value(1)),  # debet
-            default=Value(-1),  # credit
-            output_field=SmallIntegerField()
-        ),
-        first_day=Subquery(
-            finance.models.IntervalPayment.objects.filter(
-                operation=OuterRef('pk')
-            ).values('first_day')
-        ),
-        last_day=Subquery(
-            finance.models.IntervalPayment.objects.filter(
-                operation=OuterRef('pk')
-            ).values('last_day')
-        ),
+    all_ops = all_ops.select_related(
+        'debet',
+        'credit',
+        'author',
     ).order_by(order)
 
     totalRecords = all_ops.count()
@@ -329,6 +320,40 @@ def detail_json(request, pk):
     )
 
 
+@staff_account_required
+def ledger_json(request, pk):
+    account = get_object_or_404(finance.models.Account, pk=pk)
+    first_day, last_day = get_first_last_day(request, set_initial=False)
+    try:
+        cursor = request.GET.get('after')
+        if cursor:
+            cursor = ledger.decode_cursor(cursor)
+        limit = int(request.GET.get('limit', ledger.LEDGER_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'Неправильные параметры запроса.'}, status=400)
+    limit = max(1, min(limit, ledger.MAX_LEDGER_PAGE_SIZE))
+
+    page = ledger.ledger_page(
+        account,
+        first_day,
+        last_day,
+        search_text=request.GET.get('search_text'),
+        cursor=cursor or None,
+        descending=request.GET.get('order_dir') == 'desc',
+        limit=limit
+    )
+
+    return JsonResponse(
+        {
+            'data': [
+                _describe_operation(request, operation) + [operation.balance]
+                for operation in page['operations']
+            ],
+            'next': page['next'],
+        }
+    )
+
+
 _DATE_RX = re.compile("^(\d{1,2})\.(\d{2})\.(\d{4})$")
 _TIME_RX = re.compile("^(\d{1,2})\:(\d{2})$")
 
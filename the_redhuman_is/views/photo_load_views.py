@@ -40,6 +40,7 @@ from django.views.generic import (
 from the_redhuman_is.forms import (
     PhotoLoadSessionCommentForm,
     PhotoLoadSessionForm,
+    PhotoUploadChunkForm,
     TimeSheetSelectForm,
     TimeSheetWOutImagesForm,
     WorkerContractForm,
@@ -73,6 +74,11 @@ from the_redhuman_is.models.worker import (
     WorkerRating,
 )
 
+from the_redhuman_is.services import photo_ingestion
+from the_redhuman_is.services.photo_ingestion import (
+    PhotoUploadError,
+    UploadOffsetMismatch,
+)
 from the_redhuman_is.services.delivery_worker_zones import (
     NoWorkerZoneData,
     TooManyZones,
@@ -157,6 +163,46 @@ class CustomLoginRequired(LoginRequiredMixin):
                                                          **kwargs)
 
 
+def _add_session_photos(request, session, form):
+    for key in request.FILES:
+        models.add_photo(session, request.FILES[key])
+    for upload_id in form.cleaned_data['upload']:
+        photo_ingestion.add_uploaded_photo(session, upload_id, request.user)
+
+
+@require_POST
+def photo_load_upload_chunk(request):
+    """
+    Receives the photos of a session by chunks, the session gets them as
+    the complete uploads (see PhotoLoadSessionForm).
+    """
+    if not request.user.is_authenticated or get_customer_account(request):
+        return JsonResponse({'error': 'Доступ запрещен.'}, status=403)
+
+    form = PhotoUploadChunkForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors}, status=400)
+
+    upload_id = form.cleaned_data['dzuuid']
+    try:
+        photo_ingestion.start_upload(
+            request.user,
+            form.cleaned_data['dztotalfilesize'],
+            upload_id=upload_id,
+        )
+        offset = photo_ingestion.append_chunk(
+            upload_id,
+            request.user,
+            form.cleaned_data['dzchunkbyteoffset'],
+            form.cleaned_data['file'],
+        )
+    except UploadOffsetMismatch as exc:
+        return JsonResponse({'error': exc.args[0], 'offset': exc.offset}, status=409)
+    except PhotoUploadError as exc:
+        return JsonResponse({'error': exc.args[0]}, status=400)
+    return JsonResponse({'offset': offset})
+
+
 class PhotoLoadListView(CustomLoginRequired, ListView):
     template_name = 'the_redhuman_is/photo_load_list.html'
     model = PhotoLoadSession
@@ -292,22 +338,24 @@ class PhotoLoadAddView(CustomLoginRequired, FormView):
         form_class = self.get_form_class()
         form = self.get_form(form_class)
         if form.is_valid():
-            with transaction.atomic():
-                # create session
-                session = PhotoLoadSession.objects.create(
-                    content_type=self.kwargs['name'],
-                    status='new',
-                    sender=self.request.user
-                )
-                # add comment
-                if form.cleaned_data['comment']:
-                    PhotoSessionComments.objects.create(
-                        comment=form.cleaned_data['comment'],
-                        sender=self.request.user,
-                        session=session
+            try:
+                with transaction.atomic():
+                    # create session
+                    session = PhotoLoadSession.objects.create(
+                        content_type=self.kwargs['name'],
+                        status='new',
+                        sender=self.request.user
                     )
-                for key in request.FILES:
-                    models.add_photo(session, request.FILES[key])
+                    # add comment
+                    if form.cleaned_data['comment']:
+                        PhotoSessionComments.objects.create(
+                            comment=form.cleaned_data['comment'],
+                            sender=self.request.user,
+                            session=session
+                        )
+                    _add_session_photos(request, session, form)
+            except PhotoUploadError as exc:
+                return JsonResponse({'error': exc.args[0]}, status=400)
 
             # send telegram message
             session_url = reverse_lazy(
@@ -379,8 +427,11 @@ class PhotoLoadUpdateView(CustomLoginRequired, FormView):
                     session=session
                 )
             # add pictures
-            for key in request.FILES:
-                models.add_photo(session, request.FILES[key])
+            try:
+                _add_session_photos(request, session, form)
+            except PhotoUploadError as exc:
+                transaction.set_rollback(True)
+                return JsonResponse({'error': exc.args[0]}, status=400)
             # send telegram message
             session_url = reverse_lazy(
                 'the_redhuman_is:photo_load_session_sort',
@@ -13,7 +13,6 @@ from dal.autocomplete import Select2QuerySetView
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import user_passes_test
-from django.contrib.contenttypes.models import ContentType
 
 from django.core.exceptions import (
     ObjectDoesNotExist,
@@ -48,14 +47,13 @@ from the_redhuman_is import (
 )
 
 from the_redhuman_is.forms import ReconciliationCreateForm
-from the_redhuman_is.models import (
-    Photo,
-    WorkerTurnout
-)
 from the_redhuman_is.models.paysheet_v2 import WorkerReceipt
 from the_redhuman_is.models.reconciliation import ReconciliationInvoice
 
-from the_redhuman_is.services.paysheet import paysheet_receipts
+from the_redhuman_is.services.photo_coverage import (
+    photos_by_object,
+    reconciliation_photo_coverage,
+)
 
 from the_redhuman_is.views.filters import ReconciliationFilter
 
@@ -381,54 +379,32 @@ class ReceiptWithNoPhotoError(Exception):
     pass
 
 
-def _checks(reconciliation):
-    turnouts = reconciliation.turnouts()
-    paysheets = models.Paysheet_v2.objects.filter(
-        paysheet_entries__paysheet_entry_operations__operation__turnoutoperationtopay__turnout__in=turnouts
-    ).distinct()
-
-    for paysheet in paysheets:
-        for photo in models.get_photos(paysheet):
-            if not photo:
-                continue
+def _checks(coverage):
+    paysheet_photos = photos_by_object(
+        models.Paysheet_v2,
+        [paysheet.pk for paysheet in coverage.paysheets]
+    )
+    receipt_photos = photos_by_object(
+        WorkerReceipt,
+        [
+            receipt_id
+            for receipt_ids in coverage.paysheet_receipts.values()
+            for receipt_id in receipt_ids
+        ]
+    )
 
+    for paysheet in coverage.paysheets:
+        for photo in paysheet_photos.get(paysheet.pk, []):
             cut_img = hide_all_if_check(photo.image.path)
             if cut_img is not None:
                 yield cut_img
 
-        turnouts_in_reconciliation_qs = WorkerTurnout.objects.filter(
-            worker=OuterRef('worker'),
-            timesheet__sheet_date__gte=reconciliation.first_day,
-            timesheet__sheet_date__lte=reconciliation.last_day,
-            timesheet__customer=reconciliation.customer_id,
-        )
-        if reconciliation.location_id is not None:
-            turnouts_in_reconciliation_qs = turnouts_in_reconciliation_qs.filter(
-                timesheet__cust_location=reconciliation.location_id,
-            )
-        receipt_pks = set(
-            paysheet_receipts(
-                paysheet
-            ).annotate(
-                is_in_reconciliation=Exists(
-                    turnouts_in_reconciliation_qs
-                )
-            ).filter(
-                is_in_reconciliation=True
-            ).values_list('pk', flat=True)
-        )
-        receipt_photos = Photo.objects.filter(
-            content_type=ContentType.objects.get_for_model(WorkerReceipt),
-            object_id__in=receipt_pks
-        )
-        photo_receipt_ids = set(photo.object_id for photo in receipt_photos)
-        if receipt_pks != photo_receipt_ids:
-            raise ReceiptWithNoPhotoError(f'Нет фото у чеков {receipt_pks - photo_receipt_ids}.')
-        for photo in receipt_photos:
-            cut_img = hide_all_if_check(photo.image.path)
-            if cut_img is None:
-                raise ReceiptWithNoPhotoError(f'Битое фото у чека {photo.object_id}.')
-            yield cut_img
+        for receipt_id in coverage.paysheet_receipts[paysheet.pk]:
+            for photo in receipt_photos.get(receipt_id, []):
+                cut_img = hide_all_if_check(photo.image.path)
+                if cut_img is None:
+                    raise ReceiptWithNoPhotoError(f'Битое фото у чека {photo.object_id}.')
+                yield cut_img
 
 
 # Todo: need some refactoring vvv
@@ -553,6 +529,12 @@ def _migration_cards(reconciliation):
 def extra_documents(request, pk):
     reconciliation = models.Reconciliation.objects.get(pk=pk)
 
+    coverage = reconciliation_photo_coverage(reconciliation)
+    if not coverage.is_complete:
+        raise ReceiptWithNoPhotoError(
+            f'Нет фото у чеков {coverage.receipts_without_photos}.'
+        )
+
     # Todo: move to some utils?
     proxy_file = io.BytesIO()
     with ZipFile(proxy_file, 'w') as zip_file:
@@ -576,7 +558,7 @@ def extra_documents(request, pk):
                 worker_list
             )
 
-        for i, check in enumerate(_checks(reconciliation)):
+        for i, check in enumerate(_checks(coverage)):
             zip_file.writestr(
                 f'чек {i + 1}.jpg',
                 check
@@ -32,6 +32,7 @@ from the_redhuman_is.models import (
     TimeSheet,
     TurnoutOperationToPay,
     Worker,
+    WorkerBalance,
     WorkerTurnout,
 )
 
@@ -345,31 +346,41 @@ def _add_saldo(accounts, is_saldo_credit=True):
 
 @staff_account_required
 def workers_debtors(request):
-    accounts = Account.objects.filter(
-        worker_account__isnull=False,
-        children__isnull=True,
+    balances = WorkerBalance.objects.filter(
+        account__children__isnull=True,
+        saldo__gt=0,
     )
 
-    accounts = _add_saldo(
-        accounts,
-        False
-    ).select_related(
-        'worker_account__worker'
-    ).exclude(
-        saldo__lte=0
-    )
+    form = forms.WorkersDebtorsFilterForm(request.GET)
+    if form.is_valid():
+        min_saldo = form.cleaned_data['min_saldo']
+        if min_saldo is not None:
+            balances = balances.filter(saldo__gte=min_saldo)
+        max_saldo = form.cleaned_data['max_saldo']
+        if max_saldo is not None:
+            balances = balances.filter(saldo__lte=max_saldo)
+
+        balances = balances.select_related(
+            'worker'
+        ).order_by(
+            '-saldo'
+        )
+        top = form.cleaned_data['top']
+        if top:
+            balances = balances[:top]
 
-    workers = []
-    total = 0
-    for account in accounts:
-        saldo = account.saldo
-        total += saldo
-        workers.append((account.worker_account.worker, saldo))
+        workers = [(balance.worker, balance.saldo) for balance in balances]
+    else:
+        workers = []
+
+    # The total of the listed workers (after `top`)
+    total = sum((saldo for _, saldo in workers), ZERO_OO)
 
     return render(
         request,
         'the_redhuman_is/reports/workers_debtors.html',
         {
+            'form': form,
             'workers': workers,
             'total': total
         }
@@ -404,22 +415,21 @@ def workers_creditors(request):
         worker_turnouts__timesheet__sheet_date__gte=last_day
     )
 
-    accounts = _add_saldo(
-        Account.objects.filter(
-            worker_account__worker__in=workers
-        )
-    ).annotate(
-        worker=F('worker_account__worker')
-    ).exclude(
-        saldo__lte=0
+    balances = WorkerBalance.objects.filter(
+        worker__in=workers,
+        saldo__lt=0,
+    ).select_related(
+        'worker'
+    ).order_by(
+        'saldo'
     )
 
     creditors = []
     total = 0
-    for account in accounts:
-        saldo = account.saldo
+    for balance in balances:
+        saldo = -balance.saldo
         total += saldo
-        creditors.append((Worker.objects.get(pk=account.worker), saldo))
+        creditors.append((balance.worker, saldo))
 
     return render(
         request,
@@ -1,6 +1,12 @@
+import io
 import os
 import time
 
+from zipfile import ZipFile
+
+
+STREAMING_CHUNK_SIZE = 64 * 1024
+
 
 def remove_old_files(path, day):
     if os.path.exists(path):
@@ -26,3 +32,54 @@ def jpeg_to_jpg(filename):
     if filename.endswith('jpeg'):
         return filename[:-4] + 'jpg'
     return filename
+
+
+def iter_file(file_obj, chunk_size=STREAMING_CHUNK_SIZE):
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    # Non-seekable sink: ZipFile writes data descriptors after the entries
+    # instead of seeking back, so the archive can be sent while it is written.
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries, chunk_size=STREAMING_CHUNK_SIZE):
+    """
+    Yields a zip archive chunk by chunk.
+    `entries` is an iterable of (name, binary file object) pairs, every file
+    is copied by chunks while the next pair isn't requested yet,
+    so the entries generator may keep the file open around the yield.
+    """
+    buffer = _ZipStreamBuffer()
+    with ZipFile(buffer, 'w') as zip_file:
+        for name, file_obj in entries:
+            with zip_file.open(name, 'w') as entry:
+                for chunk in iter_file(file_obj, chunk_size):
+                    entry.write(chunk)
+                    data = buffer.pop()
+                    if data:
+                        yield data
+            data = buffer.pop()
+            if data:
+                yield data
+    yield buffer.pop()
@@ -6,6 +6,7 @@ from distutils.util import strtobool as to_bool
 from itertools import (
     filterfalse,
     groupby,
+    islice,
     tee,
 )
 
@@ -75,6 +76,19 @@ def pairwise(iterable):
     return zip(a, b)
 
 
+def chunked(iterable, size):
+    """
+    Splits iterable into lists of at most `size` elements
+    chunked('ABCDEFG', 3) --> ABC DEF G
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 def merge_dicts(*args, function=operator.add):
     iterator = iter(args)
     res = next(iterator)
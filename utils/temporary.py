@@ -12,7 +12,7 @@ from django.contrib.auth.models import User
 
 from django.core.exceptions import ObjectDoesNotExist
 
-from finance.models import Operation
+from finance.models import force_update_operation
 
 
 from utils.date_time import (
@@ -486,7 +486,7 @@ def update_customer_values_01_04():
                 debit = customer_service.account_20_general_work
                 tax_debit = customer_service.account_20_general_taxes
 
-            Operation.objects.filter(pk=turnout_operation.operation.pk).update(debet=debit)
+            force_update_operation(turnout_operation.operation, debet=debit)
 
             tax_operation = models.TurnoutTaxOperation.objects.get(turnout=turnout)
-            Operation.objects.filter(pk=tax_operation.operation.pk).update(debet=tax_debit)
+            force_update_operation(tax_operation.operation, debet=tax_debit)